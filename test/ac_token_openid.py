@@ -1,5 +1,9 @@
 import requests
 import json
+from api_client import api_post
+from log_utils import get_logger, dump_payload
+
+logger = get_logger(__name__)
 #成功しました（4月17日）うまくいかなかった原因はMyAppのところで使うURLとスコープを間違えていたからだと思う。
 
 # 4月20日追記：デフォルトでは、TikTokアカウントユーザーが以前に同じ権限で開発者アプリを承認している場合、ステップ2の「権限スコープの確認および承認ページ」はスキップされます。代わりに、TikTokアカウントユーザーは直接リダイレクトURLにリダイレクトされます。
@@ -16,13 +20,8 @@ auth_code = "L-yfrqq004rVilK-sfTymSAh1iROwrtU4mfz9S8a_IRExGdh3rriVutkI6q7VJLQA_U
 redirect_uri = "https://mates-promo.com/"
 # ------------------
 
-# APIエンドポイントURL
-url = "https://business-api.tiktok.com/open_api/v1.3/tt_user/oauth2/token/"
-
-# リクエストヘッダー
-headers = {
-    'Content-Type': 'application/json'
-}
+# APIエンドポイントのパス
+PATH = "tt_user/oauth2/token/"
 
 # リクエストボディ (ペイロード)
 payload = {
@@ -35,11 +34,9 @@ payload = {
 
 try:
     # POSTリクエストを送信
-    # requestsライブラリは自動的にリダイレクトに従います (`--location`相当)
-    # jsonパラメータに辞書を渡すと、自動的にJSON文字列に変換し、
-    # Content-Typeヘッダーを 'application/json' に設定します。
-    # ここでは明示的にヘッダーも指定していますが、jsonパラメータだけでも十分な場合が多いです。
-    response = requests.post(url, headers=headers, json=payload)
+    # api_post は共有の Session で送り、リダイレクトには自動的に従います (`--location`相当)。
+    # ペイロードは JSON 文字列に変換され、Content-Type ヘッダーも 'application/json' になります。
+    response = api_post(PATH, payload=payload)
 
     # レスポンスステータスコードを確認 (エラーがあれば例外を発生させる)
     response.raise_for_status()
@@ -48,26 +45,25 @@ try:
     response_data = response.json()
 
     # 結果を出力
-    print("リクエスト成功")
-    print("ステータスコード:", response.status_code)
-    print("レスポンスボディ:")
-    print(json.dumps(response_data, indent=4, ensure_ascii=False)) # きれいに整形して出力
+    logger.info("リクエスト成功")
+    logger.info("ステータスコード: %s", response.status_code)
+    dump_payload(logger, "レスポンスボディ", response_data) # トークンを含むので TIKTOK_DEBUG_PAYLOAD=1 のときだけ出力
 
 except requests.exceptions.RequestException as e:
     # ネットワークエラーやHTTPエラーが発生した場合
-    print(f"リクエストエラー: {e}")
+    logger.error("リクエストエラー: %s", e)
     if hasattr(e, 'response') and e.response is not None:
-        print("ステータスコード:", e.response.status_code)
+        logger.info("ステータスコード: %s", e.response.status_code)
         try:
             # エラーレスポンスの内容も表示試行
-            print("エラーレスポンスボディ:", e.response.text)
+            logger.error("エラーレスポンスボディ: %s", e.response.text)
         except Exception:
-            print("エラーレスポンスボディの読み取りに失敗しました。")
+            logger.error("エラーレスポンスボディの読み取りに失敗しました。")
 
 except json.JSONDecodeError:
     # レスポンスがJSON形式でなかった場合
-    print("レスポンスのJSONデコードに失敗しました。")
-    print("ステータスコード:", response.status_code)
-    print("レスポンスボディ (生):", response.text)
+    logger.error("レスポンスのJSONデコードに失敗しました。")
+    logger.info("ステータスコード: %s", response.status_code)
+    logger.info("レスポンスボディ (生): %s", response.text)
 
 
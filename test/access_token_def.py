@@ -1,18 +1,17 @@
-import requests
+from api_client import api_post
+from log_utils import get_logger
 
-url = "https://business-api.tiktok.com/open_api/v1.3/tt_user/oauth2/token/"
+logger = get_logger(__name__)
 
-headers = {
-    "Content-Type": "application/json"
-}
+PATH = "tt_user/oauth2/token/"
 
 payload = {
     "app_id": "7480734449341038609",  # あなたのapp_id
     "secret": "01fe5c05bf14a9cb67b1d2e4cbc79b8d73e555bc",     # TikTok Businessで発行されたsecret
     "auth_code": "c4363ca4eca895394f4d341a1536f5715978f80b"
 }
-response = requests.post(url, headers=headers, json=payload)
+response = api_post(PATH, payload=payload)
 
-print(response.json())
+logger.info("%s", response.json())
 
 
@@ -1,18 +1,16 @@
-import requests
+from api_client import api_get
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # 自分のアクセストークンをここに入力
 ACCESS_TOKEN = '9552d08e79c2028f31329663cf6aa2ed320bd10b'
 
-# TikTok APIのエンドポイント
-url = 'https://business-api.tiktok.com/open_api/v1.2/oauth2/advertiser/get/'
-
-# ヘッダーにアクセストークンを設定
-headers = {
-    'Access-Token': ACCESS_TOKEN
-}
+# TikTok APIのエンドポイント (v1.2)
+PATH = '/open_api/v1.2/oauth2/advertiser/get/'
 
-# GETリクエストを送信
-response = requests.get(url, headers=headers)
+# GETリクエストを送信 (アクセストークンは Access-Token ヘッダーに入る)
+response = api_get(PATH, ACCESS_TOKEN)
 
 # レスポンスを表示
 if response.status_code == 200:
@@ -21,11 +19,11 @@ if response.status_code == 200:
     
     if advertisers:
         for adv in advertisers:
-            print(f"Advertiser Name: {adv.get('advertiser_name')}")
-            print(f"Advertiser ID: {adv.get('advertiser_id')}")
-            print('-------------------------')
+            logger.info("Advertiser Name: %s", adv.get('advertiser_name'))
+            logger.info("Advertiser ID: %s", adv.get('advertiser_id'))
+            logger.info("-------------------------")
     else:
-        print("Advertiser ID が見つかりませんでした。")
+        logger.info("Advertiser ID が見つかりませんでした。")
 else:
-    print(f"エラー: ステータスコード {response.status_code}")
-    print(response.text)
+    logger.error("エラー: ステータスコード %s", response.status_code)
+    logger.info("%s", response.text)
@@ -0,0 +1,181 @@
+"""
+TikTok Business API 共通のHTTP通信部分。
+これまでは各スクリプトがモジュールレベルの requests.get を直接呼んでいたため、
+毎回 business-api.tiktok.com へのTLSハンドシェイクが発生していた。
+ここでプロセス内で1つの Session (コネクションプール付き) を持ち、全エンドポイントで使い回す。
+また全リクエストを rate_limiter のスケジューラに通し、レート制限時は待ってから再送する。
+"""
+
+import os
+import json
+import time
+import threading
+from urllib.parse import urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import get_scheduler, is_rate_limited, retry_after_seconds
+from log_utils import get_logger, log_request
+
+logger = get_logger(__name__)
+
+# --- 設定 ---
+SCHEME = "https"
+NETLOC = "business-api.tiktok.com"
+API_VERSION_PATH = "/open_api/v1.3/"
+
+# (接続タイムアウト, 読み込みタイムアウト) 秒
+DEFAULT_TIMEOUT = (float(os.getenv("TIKTOK_CONNECT_TIMEOUT", "5")), float(os.getenv("TIKTOK_READ_TIMEOUT", "60")))
+
+# コネクションプールの大きさ (並列実行数より小さいと接続が使い回されずに捨てられる)
+POOL_MAXSIZE = int(os.getenv("TIKTOK_POOL_MAXSIZE", "32"))
+
+# 全リクエスト共通のヘッダー
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_url(path):
+    # type: (str) -> str
+    """
+    Build request URL (クエリパラメータは api_get / api_post で params として渡す)
+    :param path: Request path (例: "/open_api/v1.3/business/get/" または "business/get/")
+    :return: Request URL
+    """
+    if not path.startswith("/"):
+        path = API_VERSION_PATH + path
+    return urlunparse((SCHEME, NETLOC, path, "", "", ""))
+
+
+def encode_params(params):
+    """
+    クエリパラメータを TikTok API の形式に揃える関数。
+    文字列以外 (リストや辞書) は JSON 文字列に変換する (fields などはJSON配列で渡す必要がある)。
+    """
+    if not params:
+        return {}
+    return {k: v if isinstance(v, str) else json.dumps(v) for k, v in params.items() if v is not None}
+
+
+def resolve_business_id(business_id=None):
+    """Business ID を返す関数 (None なら環境変数 TIKTOK_BUSINESS_ID、どちらもなければ ValueError)"""
+    business_id = business_id or os.getenv("TIKTOK_BUSINESS_ID")
+    if not business_id:
+        raise ValueError("Business ID が指定されていません (引数 business_id または環境変数 TIKTOK_BUSINESS_ID)")
+    return business_id
+
+
+def get_session():
+    """
+    プロセス内で共有する requests.Session を返す関数 (初回呼び出し時に作成)。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def api_get(path, access_token=None, params=None, headers=None, timeout=None, stream=False):
+    """
+    TikTok Business API に GET リクエストを送る共通関数。
+
+    Args:
+        path (str): エンドポイントのパス ("business/get/" など) または完全なURL
+        access_token (str): Access-Token ヘッダーに入れるトークン (不要なAPIでは None)
+        params (dict): クエリパラメータ (リストはJSON文字列に変換される)
+        headers (dict): 追加のヘッダー
+        timeout (tuple): (接続, 読み込み) タイムアウト秒。None なら DEFAULT_TIMEOUT
+        stream (bool): レスポンスボディを逐次読み込むかどうか
+
+    Returns:
+        requests.Response: レスポンス (ステータスコードの確認は呼び出し側で行う)
+    """
+    url = path if path.startswith("http") else build_url(path)
+    request_headers = {}
+    if access_token:
+        request_headers["Access-Token"] = access_token
+    if headers:
+        request_headers.update(headers)
+
+    business_id = (params or {}).get("business_id")
+    return _send_with_rate_limit(
+        business_id,
+        stream,
+        lambda: get_session().get(
+            url,
+            headers=request_headers,
+            params=encode_params(params),
+            timeout=timeout or DEFAULT_TIMEOUT,
+            stream=stream,
+        ),
+    )
+
+
+def api_post(path, access_token=None, payload=None, headers=None, timeout=None):
+    """
+    TikTok Business API に JSON ボディの POST リクエストを送る共通関数。
+    """
+    url = path if path.startswith("http") else build_url(path)
+    request_headers = {"Content-Type": "application/json"}
+    if access_token:
+        request_headers["Access-Token"] = access_token
+    if headers:
+        request_headers.update(headers)
+
+    business_id = (payload or {}).get("business_id")
+    return _send_with_rate_limit(
+        business_id,
+        False,
+        lambda: get_session().post(url, headers=request_headers, json=payload, timeout=timeout or DEFAULT_TIMEOUT),
+    )
+
+
+def _send_with_rate_limit(business_id, stream, send):
+    """
+    スケジューラからトークンを取ってからリクエストを送り、
+    レート制限を受けた場合はバックオフしてから再キューする。
+    再試行回数を使い切った場合は最後のレスポンスをそのまま返す (エラー処理は呼び出し側)。
+    最終的なレスポンスごとに log_request で1行のサマリを出す (待ち時間・再試行を含めた所要時間)。
+    """
+    scheduler = get_scheduler()
+    attempt = 0
+    started = time.monotonic()
+    while True:
+        scheduler.acquire(business_id)
+        response = send()
+        if not is_rate_limited(response, stream=stream):
+            scheduler.on_success(business_id)
+            _log_response(response, started, business_id, attempt)
+            return response
+        if attempt >= scheduler.max_retries:
+            logger.warning("警告: レート制限の再試行回数 (%s回) を超えました (business_id=%s)。", scheduler.max_retries, business_id)
+            _log_response(response, started, business_id, attempt, rate_limited=True)
+            return response
+        response.close()
+        scheduler.on_throttled(business_id, attempt, retry_after_seconds(response))
+        attempt += 1
+
+
+def _log_response(response, started, business_id, attempt, **fields):
+    # アクセストークンやクエリ文字列はログに残さない
+    log_request(
+        response.request.method,
+        response.url.split("?", 1)[0],
+        response.status_code,
+        (time.monotonic() - started) * 1000,
+        business_id=business_id,
+        attempts=attempt + 1,
+        **fields,
+    )
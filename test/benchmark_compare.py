@@ -0,0 +1,245 @@
+"""
+管理している全アカウントのメトリクスを、カテゴリのベンチマーク (business/benchmark/) と比べるモジュール。
+testGetBenchmarks は決め打ちのカテゴリ1つを取得して表示するだけだった。
+
+ベンチマークはカテゴリごとに1日キャッシュする (ttl_cache)。多くのアカウントが同じカテゴリなので、
+1回取得したベースラインで何十アカウント分の比較ができ、その日のうちは API を呼ばない。
+比較は全アカウント分を1回で行う (アカウント × メトリクスの行列をベースラインの行列で割る):
+    <metric>_ratio : ベースラインに対する比 (1.0 = カテゴリの平均並み)
+    <metric>_pct   : 同じカテゴリの管理アカウントの中でのパーセンタイル (0〜1)
+    score          : ratio の対数 (log2) の平均。これで全アカウントを順位付けする
+"""
+
+import os
+import argparse
+import datetime
+
+import numpy as np
+
+from testGetBenchmarks import fetch_benchmark
+from api_client import resolve_business_id
+from profile_metrics import AGGREGATE_SUM_COLUMNS, aggregate_windows
+from ttl_cache import TTLCache
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_NAMESPACE = "business_benchmark"
+# ベンチマークのキャッシュの有効期限 (秒、既定は1日)
+CACHE_TTL = float(os.getenv("TIKTOK_BENCHMARK_CACHE_TTL", str(24 * 3600)))
+# ベンチマークのフィールド名の前に付いている、平均などを表す接頭辞 (取り除いてアカウントのメトリクス名と合わせる)
+_BASELINE_PREFIXES = ("average_", "avg_", "median_")
+# 比較する期間の既定の日数
+DEFAULT_DAYS = 28
+SHEET_NAME = "testTikTokBenchmarks"
+
+
+def baseline_metrics(data, prefix=""):
+    """
+    ベンチマークのレスポンスの data から、数値のフィールドだけを {メトリクス名: 値} にする関数。
+    入れ子の辞書はキーを "." でつなぎ、"average_" などの接頭辞は取り除く。
+    """
+    metrics = {}
+    for key, value in (data or {}).items():
+        if isinstance(value, dict):
+            metrics.update(baseline_metrics(value, f"{prefix}{key}."))
+            continue
+        if isinstance(value, bool):
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            continue
+        for head in _BASELINE_PREFIXES:
+            if key.startswith(head):
+                key = key[len(head):]
+                break
+        metrics[f"{prefix}{key}"] = number
+    return metrics
+
+
+def get_baselines(categories, business_id=None, access_token=None, cache=None):
+    """
+    カテゴリごとのベースラインを返す関数 (キャッシュにないカテゴリだけ API を呼ぶ)。
+    business_id が None なら環境変数 TIKTOK_BUSINESS_ID を使う。
+
+    Returns:
+        dict: category → {メトリクス名: 値} (取得に失敗したカテゴリは含まない)
+
+    Raises:
+        ValueError: API を呼ぶ必要があるのに Business ID が指定されていない場合
+    """
+    cache = cache or TTLCache(CACHE_NAMESPACE, CACHE_TTL)
+    categories = sorted({c for c in categories if c})
+    baselines = cache.get_many(categories)
+    misses = [c for c in categories if c not in baselines]
+    logger.info("ベンチマーク: カテゴリ%s件 (キャッシュ%s件・API%s件)", len(categories), len(baselines), len(misses))
+
+    fetched = {}
+    if misses:
+        # カテゴリごとのエラーとして握りつぶさないよう、API を呼ぶ前に確認する
+        business_id = resolve_business_id(business_id)
+    for category in misses:
+        try:
+            fetched[category] = baseline_metrics(fetch_benchmark(category, business_id, access_token))
+        except Exception as e:
+            logger.error("ベンチマークの取得に失敗しました (category=%s): %s", category, e)
+    cache.set_many(fetched)
+    baselines.update(fetched)
+    return baselines
+
+
+def account_metrics(accounts, start_date, end_date, store=None, per_day=True, access_token=None, fetch=True):
+    """
+    日別データ (profile_store) から、アカウントごとの期間のメトリクスを集計する関数。
+    ローカルに足りない日は、先に API から取得して保存する (profile_store.fetch_profile_with_store)。
+    それでも足りない日が残るアカウント (API で取得できない古い日など) は、0 としてベンチマークと比べないよう
+    メトリクスを NaN にする (days_covered 列に集計できた日数を入れる)。
+
+    Args:
+        accounts (dict): business_id → category
+        start_date (str): 'YYYY-MM-DD'
+        end_date (str): 'YYYY-MM-DD'
+        store (ProfileMetricsStore): 日別データのストア (None ならローカルDBのものを使う)
+        per_day (bool): 期間の合計を日数で割った1日あたりの値にするか (ベンチマークは平均値なので既定は True)
+        access_token (str): 足りない日の取得に使うアクセストークン (None なら、API を呼ぶときに lazy_clients.get_access_token())
+        fetch (bool): False なら API を呼ばず、ローカルのデータだけで集計する
+
+    Returns:
+        pd.DataFrame: business_id, category, username, days_covered, AGGREGATE_SUM_COLUMNS の列
+    """
+    import pandas as pd
+    from profile_store import ProfileMetricsStore, fetch_profile_with_store
+    from testGetProfileRefactaring import FIELDS_LIST, request_profile_data
+
+    store = store or ProfileMetricsStore()
+    days = (datetime.date.fromisoformat(end_date) - datetime.date.fromisoformat(start_date)).days + 1
+    rows = []
+    for business_id, category in accounts.items():
+        if fetch and store.missing_ranges(business_id, start_date, end_date, fields_list=FIELDS_LIST):
+            if access_token is None:
+                from lazy_clients import get_access_token
+                access_token = get_access_token()
+            response_data, error_info = fetch_profile_with_store(start_date, end_date, business_id, FIELDS_LIST,
+                                                                 access_token, store, request_profile_data)
+            if response_data is None or response_data.get("code", 0) != 0:
+                logger.error("エラー: アカウント %s の日別データを取得できませんでした: %s", business_id,
+                             error_info or (response_data or {}).get("message"))
+
+        covered = len(store.stored_dates(business_id, start_date, end_date))
+        result = aggregate_windows(store.build_response(business_id, start_date, end_date), [(start_date, end_date)])[0]
+        row = {"business_id": business_id, "category": category, "username": result.get("username"),
+               "days_covered": covered}
+        if covered < days:
+            logger.warning("警告: アカウント %s の日別データが %s 日中 %s 日分しかないため、ベンチマークとの比較から外します。",
+                           business_id, days, covered)
+        for column in AGGREGATE_SUM_COLUMNS:
+            value = result.get(column)
+            value = float(value) if isinstance(value, (int, float)) and covered == days else np.nan
+            row[column] = value / days if per_day else value
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def compare_to_baselines(accounts_df, baselines, metrics=None):
+    """
+    全アカウントのメトリクスを、カテゴリのベースラインと1回でまとめて比較する関数。
+
+    Args:
+        accounts_df (pd.DataFrame): business_id, category とメトリクスの列を持つ DataFrame
+        baselines (dict): category → {メトリクス名: 値}
+        metrics (list): 比較するメトリクス (None ならアカウントとベースラインの両方にあるもの全て)
+
+    Returns:
+        pd.DataFrame: score の高い順に並べた比較表 (rank, business_id, category, score, <metric>_ratio, <metric>_pct)
+    """
+    import pandas as pd
+
+    baseline_df = pd.DataFrame.from_dict(baselines, orient="index")
+    if metrics is None:
+        metrics = [c for c in accounts_df.columns if c in baseline_df.columns]
+    if not metrics or accounts_df.empty:
+        logger.warning("警告: ベースラインと比較できるメトリクスがありません。")
+        return pd.DataFrame(columns=["rank", "business_id", "category", "score"])
+
+    values = accounts_df[metrics].to_numpy(dtype=float)
+    # 各アカウントの行にそのカテゴリのベースラインを並べた行列 (ベースラインがないカテゴリは NaN)
+    aligned = baseline_df.reindex(columns=metrics).reindex(accounts_df["category"].to_numpy()).to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(aligned > 0, values / aligned, np.nan)
+        log_ratio = np.log2(np.where(ratio > 0, ratio, np.nan))
+    valid = np.isfinite(log_ratio)
+    counts = valid.sum(axis=1)
+    score = np.where(counts > 0, np.where(valid, log_ratio, 0.0).sum(axis=1) / np.maximum(counts, 1), np.nan)
+
+    percentiles = accounts_df.groupby("category")[metrics].rank(pct=True)
+
+    result = accounts_df[[c for c in ("business_id", "username", "category") if c in accounts_df.columns]].copy()
+    result["score"] = score
+    for i, metric in enumerate(metrics):
+        result[f"{metric}_ratio"] = ratio[:, i]
+        result[f"{metric}_pct"] = percentiles[metric].to_numpy()
+    result.insert(0, "rank", result["score"].rank(ascending=False, method="min", na_option="bottom").astype(int))
+    return result.sort_values("rank", kind="mergesort").reset_index(drop=True)
+
+
+def parse_accounts(value):
+    """"business_id=CATEGORY,business_id=CATEGORY" を {business_id: category} にする関数"""
+    accounts = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            business_id, category = item.split("=", 1)
+            if business_id.strip() and category.strip():
+                accounts[business_id.strip()] = category.strip()
+    return accounts
+
+
+def write_comparison_to_sheet(df, sheet_name=SHEET_NAME):
+    """比較表をシートに書き込む関数 (毎回シート全体を書き換える)"""
+    import gspread
+    import gspread_dataframe as gd
+    from testIntegrateVideoData import SERVICE_ACCOUNT_FILE, SCOPES, SPREADSHEET_ID
+    from lazy_clients import get_gspread_client
+
+    try:
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
+        worksheet = client.open_by_key(SPREADSHEET_ID).worksheet(sheet_name)
+        worksheet.clear()
+        gd.set_with_dataframe(worksheet, df)
+        logger.info("ベンチマークとの比較 %s 行をシート '%s' に書き込みました。", len(df), sheet_name)
+    except gspread.exceptions.WorksheetNotFound:
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", sheet_name)
+    except Exception as e:
+        logger.error("予期せぬエラーが発生しました: %s", e)
+
+
+def main():
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(description="管理アカウントのメトリクスをカテゴリのベンチマークと比較する")
+    parser.add_argument("--accounts", default=os.getenv("TIKTOK_BUSINESS_CATEGORIES", ""),
+                        help="business_id=CATEGORY のカンマ区切り (既定: 環境変数 TIKTOK_BUSINESS_CATEGORIES)")
+    parser.add_argument("--business-id", default=os.getenv("TIKTOK_BUSINESS_ID"),
+                        help="ベンチマークの取得に使う Business ID (既定: 環境変数 TIKTOK_BUSINESS_ID)")
+    parser.add_argument("--start-date", default=(today - datetime.timedelta(days=DEFAULT_DAYS)).isoformat())
+    parser.add_argument("--end-date", default=(today - datetime.timedelta(days=1)).isoformat())
+    parser.add_argument("--local-only", action="store_true",
+                        help="アカウントの日別データを API から補わず、ローカルに保存済みのものだけで集計する")
+    parser.add_argument("--sheet", action="store_true", help=f"結果をシート '{SHEET_NAME}' に書き込む")
+    args = parser.parse_args()
+
+    accounts = parse_accounts(args.accounts)
+    if not accounts:
+        parser.error("アカウントが指定されていません (--accounts または TIKTOK_BUSINESS_CATEGORIES)")
+    if not args.business_id:
+        parser.error("Business ID が指定されていません (--business-id または TIKTOK_BUSINESS_ID)")
+
+    baselines = get_baselines(accounts.values(), args.business_id)
+    df = compare_to_baselines(account_metrics(accounts, args.start_date, args.end_date, fetch=not args.local_only), baselines)
+    if args.sheet:
+        write_comparison_to_sheet(df)
+    else:
+        logger.info("%s", df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
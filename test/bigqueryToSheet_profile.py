@@ -5,6 +5,9 @@ from google.cloud import bigquery
 from google.oauth2 import service_account
 import gspread
 from google.oauth2.service_account import Credentials
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 load_dotenv()
 
@@ -69,7 +72,7 @@ def get_bigquery_data():
     # 列名を日本語に変更
     df.rename(columns=FIELD_MAPPING, inplace=True)
     
-    print(f"BigQueryから{len(df)}行のデータを取得しました")
+    logger.info("BigQueryから%s行のデータを取得しました", len(df))
     return df
 
 def update_spreadsheet(df):
@@ -120,40 +123,40 @@ def update_spreadsheet(df):
             sheet.update(range_name=f'A{start_row}',
                         values=data_values,
                         value_input_option='USER_ENTERED') # または 'RAW'
-            print(f"スプレッドシートに{len(data_values)}行のデータを更新しました") # 成功時にメッセージ表示
+            logger.info("スプレッドシートに%s行のデータを更新しました", len(data_values)) # 成功時にメッセージ表示
 
         # --- ここから追加 ---
         except gspread.exceptions.APIError as e:
-            print(f"Google Sheets APIエラーが発生しました: {e}")
+            logger.error("Google Sheets APIエラーが発生しました: %s", e)
             # エラーの詳細を知りたい場合、レスポンス内容を出力
             # import json
             # print(f"APIエラー詳細: {json.dumps(e.response.json(), indent=2)}")
             return False # エラーが発生したことを示す
         except Exception as e:
-            print(f"スプレッドシート更新中に予期せぬエラーが発生しました: {e}")
+            logger.error("スプレッドシート更新中に予期せぬエラーが発生しました: %s", e)
             return False # エラーが発生したことを示す
             # --- ここまで追加 ---
     else:
-        print("書き込むデータがありません。")
+        logger.info("書き込むデータがありません。")
 
         return True # 正常に処理が完了した場合 (書き込むデータがない場合も含む)
 
 def main():
     """メイン処理"""
-    print("TikTokデータ連携処理を開始します")
+    logger.info("TikTokデータ連携処理を開始します")
     
     # BigQueryからデータを取得
     df = get_bigquery_data()
     
     # データが空でないか確認
     if df.empty:
-        print("取得したデータが空です")
+        logger.info("取得したデータが空です")
         return
         
     # スプレッドシートを更新
     update_spreadsheet(df)
     
-    print("TikTokデータ連携処理が正常に完了しました")
+    logger.info("TikTokデータ連携処理が正常に完了しました")
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,388 @@
+"""
+tiktok_data/ に溜まったまだロードしていない JSON (プロフィール・動画・コメント) を、
+テーブルごとに1回のロードジョブで BigQuery に入れるモジュール。
+outputToBigQuery_video.upload_tiktok_data_to_bigquery は決め打ちのファイル1つを読み、
+ファイルごとにクライアントを作ってロードジョブを投げていたので、何週間分ものバックフィルでは
+何百ものジョブになっていた。
+
+    1. ファイル名のパターンで種類ごとにファイルを探し、マニフェスト (bq_load_manifest) にないものだけを選ぶ
+    2. 種類ごとに全ファイルの行をまとめる
+         profile : outputToBigQuery_video.flatten_profile と同じ行 (JSON でロード)
+         video   : data.videos を video_arrow で1つの Arrow テーブルにする (Parquet でロード)。
+                   json_stream が保存するページごとのファイル (tiktok_video_<日時>_pNNN.json) も同じ形式
+         comments: data.comments を1行 = 1コメントにする (JSON でロード)
+    3. テーブルごとにロードジョブを1つ投げ、成功したらそのファイルをマニフェストに記録する
+       (失敗したファイルは記録しないので、次回もう一度対象になる)
+
+動画とコメントは、ページのアーカイブが重なっていたり、testGetComments が毎回同じ1ページ目を保存していたり、
+testOutputToBigquery.output (video_sync) が同じテーブルに差分を追記していたりするので、
+そのまま追記すると同じ item_id / comment_id の行が何度も入る。プロフィールも、更新された (mtime が変わった)
+ファイルや期間の重なるファイルを読むと同じアカウント・日付の行が何度も入る。
+そこでまとめた行をキーで重複除去 (新しいファイルの行を優先) して、実行ごとに別名のステージング用のテーブルにロードし、
+MERGE でロード先にまだないキーの行だけを挿入する (すでにある行は上書きしない)。
+"""
+
+import os
+import glob
+import json
+import argparse
+import datetime
+import threading
+import uuid
+
+from outputToBigQuery_video import (
+    SERVICE_ACCOUNT_FILE, PROJECT_ID, DATASET_ID, TABLE_NAME as PROFILE_TABLE_NAME,
+    build_bigquery_client, flatten_profile,
+)
+from testOutputToBigquery import TABLE_NAME as VIDEO_TABLE_NAME
+from comment_index import video_id_from_path
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+DATA_DIR = "tiktok_data"
+COMMENT_TABLE_NAME = os.getenv("TIKTOK_COMMENT_TABLE", "commentDataNo1")
+
+# 種類 → (ファイル名のパターン, ロード先のテーブル, 重複を除くキーの列 (None なら追記するだけ))
+# プロフィールのレスポンスには business_id が入っていないので、アカウントは username で見分ける
+SOURCES = {
+    "profile": ("tiktok_profile_*.json", PROFILE_TABLE_NAME, ("username", "metrics_date")),
+    "video": ("tiktok_video_*.json", VIDEO_TABLE_NAME, ("item_id",)),
+    "comments": ("tiktok_comments_*.json", COMMENT_TABLE_NAME, ("comment_id",)),
+}
+# ステージング用のテーブルの名前に付ける接尾辞 (実行ごとに別の名前を付け、ロードが終わったら削除する)
+STAGING_SUFFIX = "__bulk_staging"
+
+# プロフィールのテーブルの列 (outputToBigQuery_video.flatten_profile の行)
+PROFILE_COLUMNS = [
+    ("request_id", "STRING"),
+    ("username", "STRING"),
+    ("display_name", "STRING"),
+    ("total_likes", "INTEGER"),
+    ("followers_count", "INTEGER"),
+    ("processed_at", "TIMESTAMP"),
+    ("metrics_date", "DATE"),
+    ("metrics_video_views", "INTEGER"),
+    ("metrics_unique_video_views", "INTEGER"),
+    ("metrics_profile_views", "INTEGER"),
+    ("metrics_comments", "INTEGER"),
+    ("metrics_shares", "INTEGER"),
+    ("metrics_engaged_audience", "INTEGER"),
+    ("metrics_bio_link_clicks", "INTEGER"),
+]
+
+# コメントのテーブルの列 (列名, BigQuery の型)
+COMMENT_COLUMNS = [
+    ("comment_id", "STRING"),
+    ("video_id", "STRING"),
+    ("parent_comment_id", "STRING"),
+    ("user_id", "STRING"),
+    ("username", "STRING"),
+    ("display_name", "STRING"),
+    ("text", "STRING"),
+    ("likes", "INTEGER"),
+    ("replies", "INTEGER"),
+    ("pinned", "BOOLEAN"),
+    ("owner", "BOOLEAN"),
+    ("status", "STRING"),
+    ("create_time", "TIMESTAMP"),
+    ("source_file", "STRING"),
+]
+
+
+class LoadManifest:
+    """
+    BigQuery にロード済みのファイルを記録するマニフェスト。
+
+    Args:
+        db_path (str): DBファイルのパス (None なら local_db の既定のパス)
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS bq_load_manifest (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    target_table TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    loaded_at TEXT NOT NULL
+                )
+            """)
+
+    def pending(self, paths):
+        """まだロードしていない (またはロードしてから更新された) ファイルだけを返す関数"""
+        with self._lock:
+            loaded = dict(self.conn.execute("SELECT path, mtime FROM bq_load_manifest"))
+        return [path for path in paths if loaded.get(path) != os.path.getmtime(path)]
+
+    def mark_loaded(self, entries, target_table):
+        """
+        ロードが成功したファイルを記録する関数。
+
+        Args:
+            entries (dict): path → そのファイルからロードした行数
+            target_table (str): ロード先のテーブル
+        """
+        loaded_at = datetime.datetime.now().isoformat(timespec="seconds")
+        rows = [(path, os.path.getmtime(path), target_table, count, loaded_at) for path, count in entries.items()]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bq_load_manifest (path, mtime, target_table, row_count, loaded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+
+# --- 行への変換 ---
+def flatten_comments(data, video_id=None, source_file=None):
+    """
+    コメント一覧のレスポンスを、1行 = 1コメントの辞書のリストにする関数。
+
+    Args:
+        data (dict): APIのレスポンス (testGetComments / comment_crawler が保存する形式)
+        video_id (str): コメントに video_id がない場合に使う動画 ID (ファイル名から取り出したもの)
+        source_file (str): 読み込んだファイル名 (source_file 列に入れる)
+
+    Returns:
+        list: 行の辞書のリスト
+    """
+    rows = []
+    for comment in (data.get("data") or {}).get("comments") or []:
+        row = {column: comment.get(column) for column, _ in COMMENT_COLUMNS}
+        row["video_id"] = str(comment.get("video_id") or video_id or "") or None
+        try:
+            # create_time は UNIX 秒 (文字列で返ってくることもある)
+            row["create_time"] = datetime.datetime.fromtimestamp(
+                int(row["create_time"]), datetime.timezone.utc).isoformat()
+        except (TypeError, ValueError):
+            row["create_time"] = None
+        row["source_file"] = source_file
+        rows.append(row)
+    return rows
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def collect_rows(kind, paths):
+    """
+    ファイルのリストから、テーブルにロードする行をまとめて取り出す関数。
+    読み込めなかったファイルは結果に含めない (マニフェストにも記録されず、次回もう一度読む)。
+
+    Returns:
+        tuple: (行のリスト, {path: 行数})
+    """
+    processed_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows, counts = [], {}
+    for path in paths:
+        try:
+            data = _read_json(path)
+        except (OSError, ValueError) as e:
+            logger.error("ファイルを読み込めませんでした (%s): %s", path, e)
+            continue
+        if data.get("code") not in (0, None):
+            # エラー応答を保存したファイルは行なしでロード済みにする (毎回読み直さない)
+            logger.warning("警告: エラー応答のファイルのためスキップします (%s): %s", path, data.get("message"))
+            counts[path] = 0
+            continue
+        if kind == "profile":
+            file_rows = flatten_profile(data, processed_at)
+        elif kind == "video":
+            file_rows = (data.get("data") or {}).get("videos") or []
+        else:
+            file_rows = flatten_comments(data, video_id_from_path(path), os.path.basename(path))
+        rows.extend(file_rows)
+        counts[path] = len(file_rows)
+    return rows, counts
+
+
+def dedupe_rows(rows, key):
+    """
+    key の列の値が全て同じ行を1行にする関数 (後ろの行 = 新しいファイルの行を残す。key の列が欠けている行は除く)。
+
+    Args:
+        rows (list): 行の辞書のリスト
+        key (tuple): 重複を見分ける列名のタプル
+    """
+    latest = {}
+    for row in rows:
+        values = tuple(row.get(column) for column in key)
+        if all(value not in (None, "") for value in values):
+            latest[tuple(str(value) for value in values)] = row
+    return list(latest.values())
+
+
+def staging_table_ref(table_ref):
+    """実行ごとに別のステージング用のテーブル名を返す関数 (同時に動いた実行どうしで上書きし合わないように)"""
+    return f"{table_ref}{STAGING_SUFFIX}_{uuid.uuid4().hex[:12]}"
+
+
+# --- ロード ---
+def _load_json_rows(client, table_ref, rows, schema=None, write_disposition="WRITE_APPEND"):
+    """
+    行の辞書のリストを JSON (NDJSON) で1回のロードジョブにする (完了まで待つ)。
+    schema を渡さない場合は autodetect に任せる (ロード先のテーブルがまだなくても作れるように)。
+    """
+    from google.cloud import bigquery
+
+    job_config = bigquery.LoadJobConfig(write_disposition=write_disposition)
+    if schema is not None:
+        job_config.schema = schema
+    else:
+        job_config.autodetect = True
+    job = client.load_table_from_json(rows, table_ref, job_config=job_config)
+    job.result()
+    return job
+
+
+def _merge_new_rows(client, staging_ref, table_ref, key):
+    """
+    ステージング用のテーブルから、ロード先にまだない key (列名のタプル) の行だけを MERGE で挿入する関数。
+    ロード先がなければステージングと同じスキーマで作り、ステージングにしかない列はロード先に追加する。
+
+    Returns:
+        bigquery.QueryJob: 完了したクエリジョブ
+    """
+    from google.cloud import bigquery
+    from google.api_core.exceptions import NotFound
+
+    staging = client.get_table(staging_ref)
+    try:
+        target = client.get_table(table_ref)
+    except NotFound:
+        target = client.create_table(bigquery.Table(table_ref, schema=staging.schema))
+    existing = {field.name for field in target.schema}
+    missing = [field for field in staging.schema if field.name not in existing]
+    if missing:
+        target.schema = [*target.schema, *missing]
+        client.update_table(target, ["schema"])
+
+    columns = [f"`{field.name}`" for field in staging.schema]
+    query = f"""
+        MERGE `{table_ref}` T
+        USING `{staging_ref}` S
+        ON {" AND ".join(f"T.`{column}` = S.`{column}`" for column in key)}
+        WHEN NOT MATCHED THEN
+          INSERT ({", ".join(columns)}) VALUES ({", ".join(f"S.{column}" for column in columns)})
+    """
+    job = client.query(query)
+    job.result()
+    return job
+
+
+def load_kind(client, kind, paths, manifest):
+    """
+    1種類のファイルをまとめて、ロードジョブ1つでテーブルに入れる関数。
+
+    Returns:
+        int: ロード先に入った行数 (失敗した場合は 0)
+    """
+    from google.cloud import bigquery
+    from video_arrow import videos_to_arrow, load_videos_parquet
+
+    _, table_name, key = SOURCES[kind]
+    rows, counts = collect_rows(kind, paths)
+    if key:
+        rows = dedupe_rows(rows, key)
+    if not rows:
+        manifest.mark_loaded(counts, table_name)
+        return 0
+
+    table_ref = f"{PROJECT_ID}.{DATASET_ID}.{table_name}"
+    # 重複を除く種類は、いったん実行ごとのステージング用のテーブルに入れてから MERGE する
+    load_ref = staging_table_ref(table_ref) if key else table_ref
+    write_disposition = "WRITE_TRUNCATE" if key else "WRITE_APPEND"
+    logger.info("%s: ファイル%s件・%s行を %s にロードします。", kind, len(counts), len(rows), table_ref)
+    try:
+        if kind == "video":
+            job = load_videos_parquet(client, load_ref, videos_to_arrow(rows), write_disposition)
+        else:
+            columns = COMMENT_COLUMNS if kind == "comments" else PROFILE_COLUMNS
+            schema = [bigquery.SchemaField(column, field_type) for column, field_type in columns]
+            job = _load_json_rows(client, load_ref, rows, schema, write_disposition)
+        if job.error_result:
+            logger.error("BigQueryロードジョブ中にエラーが発生しました (%s): %s", load_ref, job.error_result)
+            return 0
+        loaded = job.output_rows
+        if key:
+            job = _merge_new_rows(client, load_ref, table_ref, key)
+            loaded = job.num_dml_affected_rows
+    except Exception as e:
+        logger.error("BigQueryへのロード中にエラーが発生しました (%s): %s", table_ref, e)
+        return 0
+    finally:
+        # ロード・MERGE が失敗してもステージング用のテーブルを残さない
+        if key:
+            try:
+                client.delete_table(load_ref, not_found_ok=True)
+            except Exception as e:
+                logger.warning("警告: ステージング用のテーブルを削除できませんでした (%s): %s", load_ref, e)
+
+    manifest.mark_loaded(counts, table_name)
+    logger.info("BigQueryテーブル '%s' に %s 件のデータをロードしました。", table_ref, loaded)
+    return loaded or 0
+
+
+def pending_files(manifest, data_dir=DATA_DIR, kinds=None):
+    """種類ごとのまだロードしていないファイルを返す関数 ({kind: [path, ...]})"""
+    pending = {}
+    for kind in kinds or SOURCES:
+        paths = sorted(glob.glob(os.path.join(data_dir, SOURCES[kind][0])))
+        pending[kind] = manifest.pending(paths)
+    return pending
+
+
+def bulk_load(data_dir=DATA_DIR, kinds=None, manifest=None, client=None):
+    """
+    まだロードしていないファイルを、種類 (テーブル) ごとに1回のロードジョブで BigQuery に入れる関数。
+
+    Args:
+        data_dir (str): JSON のあるディレクトリ
+        kinds (list): 対象の種類 ("profile" / "video" / "comments"、None なら全て)
+        manifest (LoadManifest): マニフェスト (None ならローカルDBのものを使う)
+        client (bigquery.Client): BigQuery クライアント (None なら作成する)
+
+    Returns:
+        dict: kind → ロードした行数
+    """
+    manifest = manifest or LoadManifest()
+    pending = {kind: paths for kind, paths in pending_files(manifest, data_dir, kinds).items() if paths}
+    if not pending:
+        logger.info("ロードしていないファイルはありませんでした。")
+        return {}
+
+    client = client or build_bigquery_client(SERVICE_ACCOUNT_FILE, PROJECT_ID)
+    if client is None:
+        logger.error("BigQueryクライアントの構築に失敗したため、処理を中断します。")
+        return {}
+    return {kind: load_kind(client, kind, paths, manifest) for kind, paths in pending.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ロードしていない tiktok_data/ の JSON をテーブルごとにまとめて BigQuery にロードする")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="JSON があるディレクトリ")
+    parser.add_argument("--kinds", default=",".join(SOURCES),
+                        help=f"対象の種類のカンマ区切り (既定: {','.join(SOURCES)})")
+    parser.add_argument("--dry-run", action="store_true", help="ロードせずに対象のファイル数だけを表示する")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in SOURCES]
+    if unknown:
+        parser.error(f"不明な種類です: {', '.join(unknown)}")
+
+    if args.dry_run:
+        for kind, paths in pending_files(LoadManifest(), args.data_dir, kinds).items():
+            logger.info("%s: ロードしていないファイル %s 件 (→ %s)", kind, len(paths), SOURCES[kind][1])
+        return
+    bulk_load(args.data_dir, kinds)
+
+
+if __name__ == "__main__":
+    main()
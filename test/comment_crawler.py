@@ -0,0 +1,376 @@
+"""
+コメント一覧をカーソルで最後のページまでたどるクローラー (2回目以降は前回の続きの分だけ取得する)。
+testGetComments は1ページ目 (20件) しか取得していなかったが、
+バズった動画にはコメントが数万件あり、毎時間全件をたどり直すこともできない。
+
+ここでは create_time の新しい順 (sort_field=create_time, sort_order=desc) で取得し、
+動画ごとに「見たことのある comment_id」と「最新のコメントの create_time」を SQLite に保存しておく。
+    - 初回: 最後のページまでたどる (途中で止まった場合は保存しておいたカーソルから再開する)
+    - 2回目以降: 先頭から取得し、前回までに取得済みの範囲 (前回の最新の create_time 以前の既知のコメント) に
+      届いた時点でページ送りをやめる。途中で止まった場合はカーソルとその境界を保存しておき、
+      次回はその続きから境界までたどってから、先頭に戻ってその間に増えたコメントを取得する
+ページの途中で新しいコメントが増えて同じコメントが2回返ってきても、comment_id で重複を除く。
+"""
+
+import os
+import argparse
+import datetime
+import contextlib
+import threading
+
+from testGetComments import fetch_comments, save_comments, MAX_COMMENTS_PER_PAGE
+from comment_fanout import fan_out_accounts, DEFAULT_MAX_WORKERS
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# コメントを新しい順に取得するパラメータ
+SORT_PARAMS = {"sort_field": "create_time", "sort_order": "desc"}
+
+
+def _to_int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class CommentCrawlStore:
+    """
+    動画ごとのクロールの状態 (ウォーターマーク・再開用カーソル) と、見たことのある comment_id を保存するクラス。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS comment_crawl_state (
+                    business_id TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    max_create_time INTEGER NOT NULL DEFAULT 0,
+                    resume_cursor INTEGER,
+                    catchup_boundary INTEGER,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    last_crawled_at TEXT NOT NULL,
+                    PRIMARY KEY (business_id, video_id)
+                )
+            """)
+            # 差分取得の再開用の列がない古いDBには列を追加する
+            state_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(comment_crawl_state)")}
+            if "catchup_boundary" not in state_columns:
+                self.conn.execute("ALTER TABLE comment_crawl_state ADD COLUMN catchup_boundary INTEGER")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawled_comments (
+                    comment_id TEXT PRIMARY KEY,
+                    video_id TEXT NOT NULL,
+                    create_time INTEGER,
+                    likes INTEGER,
+                    replies INTEGER,
+                    first_seen_at TEXT NOT NULL
+                )
+            """)
+            # 返信の展開 (reply_expander) 用の列がない古いDBには列を追加する
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(crawled_comments)")}
+            if "parent_comment_id" not in columns:
+                self.conn.execute("ALTER TABLE crawled_comments ADD COLUMN parent_comment_id TEXT")
+            if "replies_expanded" not in columns:
+                self.conn.execute("ALTER TABLE crawled_comments ADD COLUMN replies_expanded INTEGER NOT NULL DEFAULT 0")
+            if "replies_seen" not in columns:
+                # 前回の展開で実際に取得できた返信の件数 (削除・非表示の返信は replies に数えられていても取得できない)
+                self.conn.execute("ALTER TABLE crawled_comments ADD COLUMN replies_seen INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("""
+                    UPDATE crawled_comments SET replies_seen = (
+                        SELECT COUNT(*) FROM crawled_comments AS r WHERE r.parent_comment_id = crawled_comments.comment_id
+                    ) WHERE replies_expanded > 0
+                """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_crawled_comments_video ON crawled_comments (video_id)")
+
+    def state(self, business_id, video_id):
+        """
+        Returns:
+            dict or None: {"max_create_time", "resume_cursor", "catchup_boundary", "completed", "last_crawled_at"}、
+                          まだクロールしていなければ None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT max_create_time, resume_cursor, catchup_boundary, completed, last_crawled_at FROM comment_crawl_state "
+                "WHERE business_id = ? AND video_id = ?", (business_id, video_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"max_create_time": row[0], "resume_cursor": row[1], "catchup_boundary": row[2], "completed": bool(row[3]),
+                "last_crawled_at": row[4]}
+
+    def video_accounts(self):
+        """クロールしたことのある (video_id, business_id) の組のリストを返す関数"""
+        with self._lock:
+            return self.conn.execute("SELECT video_id, business_id FROM comment_crawl_state").fetchall()
+
+    def known_ids(self, comment_ids):
+        """comment_ids のうち、すでに保存されている comment_id の集合を返す関数"""
+        comment_ids = list(comment_ids)
+        known = set()
+        with self._lock:
+            # SQLite の変数の数の上限を超えないように分けて問い合わせる
+            for i in range(0, len(comment_ids), 500):
+                chunk = comment_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(f"SELECT comment_id FROM crawled_comments WHERE comment_id IN ({placeholders})", chunk)
+                known.update(row[0] for row in cursor)
+        return known
+
+    def record_page(self, business_id, video_id, comments, resume_cursor=None, completed=False, catchup_boundary=None):
+        """
+        1ページ分のコメントとクロールの状態を1つのトランザクションで保存する関数。
+        すでに保存されているコメントは likes・replies だけを更新する。
+
+        Args:
+            business_id (str): TikTok Business ID
+            video_id (str): 動画ID
+            comments (list): そのページのコメント
+            resume_cursor (int): 次に取得するページのカーソル (途中で止まったクロールを次回再開するため)
+            completed (bool): 最後のページまでたどり終えたか
+            catchup_boundary (int): 差分取得を再開する場合に、どこまでたどればよいか (開始時点の最新の create_time)
+        """
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = [(str(c["comment_id"]), video_id, _to_int(c.get("create_time")), _to_int(c.get("likes")),
+                 _to_int(c.get("replies")), now) for c in comments if c.get("comment_id") is not None]
+        max_create_time = max((row[2] for row in rows), default=0)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO crawled_comments (comment_id, video_id, create_time, likes, replies, first_seen_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(comment_id) DO UPDATE SET likes = excluded.likes, replies = excluded.replies
+                """,
+                rows,
+            )
+            self.conn.execute(
+                """
+                INSERT INTO comment_crawl_state (business_id, video_id, max_create_time, resume_cursor, catchup_boundary,
+                                                 completed, last_crawled_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(business_id, video_id) DO UPDATE SET
+                    max_create_time = MAX(max_create_time, excluded.max_create_time),
+                    resume_cursor = excluded.resume_cursor,
+                    catchup_boundary = excluded.catchup_boundary,
+                    completed = MAX(completed, excluded.completed),
+                    last_crawled_at = excluded.last_crawled_at
+                """,
+                (business_id, video_id, max_create_time, resume_cursor, catchup_boundary, int(completed), now),
+            )
+
+    def update_reply_counts(self, comments):
+        """
+        保存済みのコメントの likes・replies だけを更新する関数 (新しいコメントは追加しない)。
+        """
+        rows = [(_to_int(c.get("likes")), _to_int(c.get("replies")), str(c["comment_id"]))
+                for c in comments if c.get("comment_id") is not None]
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE crawled_comments SET likes = ?, replies = ? WHERE comment_id = ?", rows)
+
+    def record_replies(self, video_id, parent_comment_id, replies):
+        """
+        返信を親コメントの comment_id と一緒に保存する関数。
+        """
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = [(str(r["comment_id"]), video_id, _to_int(r.get("create_time")), _to_int(r.get("likes")),
+                 parent_comment_id, now) for r in replies if r.get("comment_id") is not None]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO crawled_comments (comment_id, video_id, create_time, likes, parent_comment_id, first_seen_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(comment_id) DO UPDATE SET likes = excluded.likes
+                """,
+                rows,
+            )
+
+    def reply_count(self, comment_id):
+        """comment_id への返信のうち、保存済みのものの件数を返す関数"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM crawled_comments WHERE parent_comment_id = ?",
+                                     (comment_id,)).fetchone()[0]
+
+    def pending_reply_threads(self, video_id):
+        """
+        前回の展開から返信数が増えたコメントを返す関数。
+
+        Returns:
+            list: (comment_id, replies, replies_expanded, replies_seen) のタプルのリスト (増えた数の多い順)
+        """
+        with self._lock:
+            return self.conn.execute(
+                """
+                SELECT comment_id, replies, replies_expanded, replies_seen FROM crawled_comments
+                WHERE video_id = ? AND parent_comment_id IS NULL AND replies > replies_expanded
+                ORDER BY replies - replies_expanded DESC
+                """,
+                (video_id,),
+            ).fetchall()
+
+    def mark_replies_expanded(self, comment_id, replies):
+        """
+        comment_id の返信を replies 件まで展開したことを、そのとき保存済みだった返信の件数 (replies_seen) と一緒に保存する関数
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE crawled_comments SET replies_expanded = ?,
+                    replies_seen = (SELECT COUNT(*) FROM crawled_comments AS r WHERE r.parent_comment_id = ?)
+                WHERE comment_id = ?
+                """,
+                (replies, comment_id, comment_id),
+            )
+
+
+def crawl_video_comments(business_id, video_id, access_token, store, sink=None, max_pages=None,
+                         page_size=MAX_COMMENTS_PER_PAGE):
+    """
+    動画1本のコメントを新しい順にたどり、まだ見たことのないコメントだけをページごとに sink に渡す関数。
+    ページは sink に渡してから、次のページのカーソルと一緒に取得済みとして記録するので、
+    途中のページで失敗しても (max_pages で止まっても)、次回は記録済みのページの続きから取得する。
+    差分取得では、開始時点の境界 (それまでの最新の create_time) を一緒に保存しておき、
+    再開したときも境界より前の既知のコメントに届くまではページ送りをやめない。
+
+    Args:
+        business_id (str): TikTok Business ID
+        video_id (str): 動画ID
+        access_token (str): 有効なアクセストークン
+        store (CommentCrawlStore): クロールの状態のストア
+        sink (callable): sink(video_id, comments) で1ページ分の新しいコメントを保存する関数 (None なら保存しない)
+        max_pages (int): 1回の実行で取得するページ数の上限 (None なら止まる条件まで)
+        page_size (int): 1ページあたりの件数
+
+    Returns:
+        int: 新しいコメントの件数
+    """
+    state = store.state(business_id, video_id)
+    initial = state is None or not state["completed"]
+    if initial:
+        # 初回のクロールが途中で止まっていた場合は、保存しておいたカーソルから最後のページまでたどる
+        cursor, boundary = (state or {}).get("resume_cursor"), None
+    elif state["resume_cursor"] is not None and state["catchup_boundary"] is not None:
+        # 差分取得が途中で止まっていた場合は、その続きから前回の開始時点の境界までたどる
+        cursor, boundary = state["resume_cursor"], state["catchup_boundary"]
+    else:
+        cursor, boundary = None, state["max_create_time"]
+    resumed = not initial and cursor is not None
+
+    new_count = 0
+    page = 0
+    while max_pages is None or page < max_pages:
+        response_data = fetch_comments(video_id, business_id, access_token, cursor=cursor,
+                                       max_count=page_size, extra_params=SORT_PARAMS)
+        data = response_data.get("data") or {}
+        comments = data.get("comments") or []
+        page += 1
+
+        known = store.known_ids(str(c["comment_id"]) for c in comments if c.get("comment_id") is not None)
+        fresh = [c for c in comments if c.get("comment_id") is not None and str(c["comment_id"]) not in known]
+        next_cursor = data.get("cursor")
+        has_more = bool(data.get("has_more")) and bool(comments) and next_cursor is not None and next_cursor != cursor
+        # 差分取得では、境界より前の見たことのあるコメント (固定表示のコメントは除く) が出てきたらそれより先は取得済み
+        # (途中から再開した場合、前回の実行で保存したコメントは境界より新しいので、ここでは止まらない)
+        reached_known = boundary is not None and any(
+            str(c.get("comment_id")) in known and not c.get("pinned") and _to_int(c.get("create_time")) <= boundary
+            for c in comments
+        )
+        finished = not has_more or reached_known
+        # 保存できたページだけを取得済みにする (sink で例外が出たらこのページは記録しない)
+        if fresh and sink is not None:
+            sink(video_id, fresh)
+        new_count += len(fresh)
+        store.record_page(business_id, video_id, comments,
+                          resume_cursor=None if finished else next_cursor,
+                          completed=initial and not has_more,
+                          catchup_boundary=None if finished else boundary)
+        if finished:
+            if not resumed:
+                break
+            # 途中から再開した分をたどり終えたら、先頭に戻ってその間に増えたコメントを取得する
+            resumed = False
+            cursor, boundary = None, store.state(business_id, video_id)["max_create_time"]
+            continue
+        cursor = next_cursor
+
+    logger.debug("コメントのクロール (video_id=%s, %s): %sページ・新しいコメント%s件",
+                 video_id, "初回" if initial else "差分", page, new_count)
+    return new_count
+
+
+def save_new_comments(video_id, comments):
+    """
+    既定の保存先: 新しいコメントを testGetComments と同じ形式で tiktok_data/ に保存する。
+    """
+    if comments:
+        save_comments({"code": 0, "message": "OK", "data": {"comments": comments}}, video_id)
+
+
+def crawl_handler(store=None, sink=save_new_comments, max_pages=None, reply_expander=None, account_sinks=None):
+    """
+    comment_fanout.fan_out_comments に渡す handler を作る関数。
+
+    Args:
+        store (CommentCrawlStore): クロールの状態のストア (None ならローカルDBのものを使う)
+        sink (callable): sink(video_id, comments) で新しいコメントを1ページ分ずつ保存する関数
+        max_pages (int): 動画1本あたりのページ数の上限
+        reply_expander (ReplyExpander): 指定した場合、クロールが終わった動画の返信の展開を予約する
+        account_sinks (dict): business_id → sink (アカウントごとに保存先を変える場合。ないアカウントは sink を使う)
+    """
+    store = store or CommentCrawlStore()
+    account_sinks = account_sinks or {}
+
+    def _handler(business_id, video, access_token):
+        video_id = str(video["item_id"])
+        count = crawl_video_comments(business_id, video_id, access_token, store,
+                                     account_sinks.get(business_id, sink), max_pages)
+        if reply_expander is not None:
+            # 返信は別のスレッドプールで取得するので、このワーカーはすぐ次の動画に進める
+            reply_expander.submit(business_id, video_id, access_token)
+        return count
+
+    return _handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全動画のコメントを前回の続きから取得する")
+    parser.add_argument("--business-ids", default=os.getenv("TIKTOK_BUSINESS_IDS", os.getenv("TIKTOK_BUSINESS_ID", "")),
+                        help="カンマ区切りの Business ID (既定: 環境変数 TIKTOK_BUSINESS_IDS / TIKTOK_BUSINESS_ID)")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="同時に取得する動画の数")
+    parser.add_argument("--max-pages", type=int, default=None,
+                        help="動画1本あたりのページ数の上限 (途中で止まったクロールは次回この続きから再開する)")
+    parser.add_argument("--expand-replies", action="store_true",
+                        help="返信数が増えたコメントの返信も取得する")
+    parser.add_argument("--sketches", action="store_true",
+                        help="新しいコメントをコメント者のスケッチ (commenter_sketches) にも足し込む")
+    args = parser.parse_args()
+
+    business_ids = [bid.strip() for bid in args.business_ids.split(",") if bid.strip()]
+    if not business_ids:
+        parser.error("Business ID が指定されていません (--business-ids または TIKTOK_BUSINESS_IDS)")
+    store = CommentCrawlStore()
+
+    with contextlib.ExitStack() as stack:
+        expander = None
+        if args.expand_replies:
+            from reply_expander import ReplyExpander, save_new_replies
+            expander = stack.enter_context(ReplyExpander(store, sink=save_new_replies))
+        account_sinks = None
+        if args.sketches:
+            from commenter_sketches import CommenterSketchStore, sketch_sink
+            sketch_store = CommenterSketchStore()
+            # アカウント単位のスケッチ (account:<business_id>) にも足し込むため、sink はアカウントごとに作る
+            account_sinks = {business_id: sketch_sink(business_id, sketch_store, next_sink=save_new_comments)
+                             for business_id in business_ids}
+
+        fan_out_accounts(business_ids, handler=crawl_handler(store, save_new_comments, args.max_pages, expander,
+                                                             account_sinks),
+                         max_workers=args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
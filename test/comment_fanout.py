@@ -0,0 +1,156 @@
+"""
+動画一覧 → コメント一覧 のファンアウト処理。
+testGetComments は video_id を1つ決め打ちして1リクエストだけ投げていたので、
+全アカウントの全動画のコメントを見るには、動画ごとに順番に呼ぶしかなく、
+数千本の動画だと1時間の枠の中で終わらなかった。
+
+ここでは動画一覧 (video_pager.iter_videos) から流れてくる item_id を優先度付きキューに入れ、
+複数のワーカースレッドで business/comment/list/ を同時に取得する。
+    - 新しく投稿された動画ほど先に取得する (キューの優先度 = create_time の降順)
+    - 同時実行数は max_workers で、リクエストの流量は api_client の共通のレート制限に従う
+    - キューの大きさに上限があるので、動画一覧の取得がコメントの取得より速くてもメモリに溜まりすぎない
+    - 取得した結果はワーカーの中でそのまま handler (保存処理) に渡す
+"""
+
+import os
+import queue
+import argparse
+import itertools
+import threading
+
+from testGetComments import fetch_comments, save_comments
+from field_projection import plan_fields
+from video_pager import iter_videos
+from lazy_clients import get_access_token
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# 同時に取得する動画の数 (環境変数で上書き可能)
+DEFAULT_MAX_WORKERS = int(os.getenv("TIKTOK_COMMENT_WORKERS", "8"))
+# キューに入れておく動画の数の上限
+QUEUE_SIZE = 200
+
+# キューの優先度 (小さいほど先に取り出される)
+_TASK, _STOP = 0, 1
+
+
+def _create_time(video):
+    try:
+        return int(video.get("create_time") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def save_first_page(business_id, video, access_token):
+    """
+    既定の handler: 動画1本のコメントの1ページ目を取得して tiktok_data/ に保存する。
+
+    Returns:
+        int: 取得したコメントの件数
+    """
+    video_id = str(video["item_id"])
+    response_data = fetch_comments(video_id, business_id, access_token)
+    save_comments(response_data, video_id)
+    return len((response_data.get("data") or {}).get("comments") or [])
+
+
+def fan_out_comments(business_id, videos, handler=save_first_page, access_token=None,
+                     max_workers=DEFAULT_MAX_WORKERS, queue_size=QUEUE_SIZE):
+    """
+    動画のイテレータから、動画ごとのコメント取得を並列に実行する関数。
+
+    Args:
+        business_id (str): TikTok Business ID
+        videos (iterable): 動画の辞書 (item_id, create_time, comments) のイテレータ
+        handler (callable): handler(business_id, video, access_token) -> int (処理したコメントの件数)
+        access_token (str): 有効なアクセストークン (None なら lazy_clients.get_access_token())
+        max_workers (int): 同時実行数の上限
+        queue_size (int): キューに入れておく動画の数の上限
+
+    Returns:
+        dict: {"videos": 処理した動画数, "skipped": コメントがなく飛ばした動画数,
+               "comments": コメントの件数, "failed": [失敗した item_id]}
+    """
+    access_token = access_token or get_access_token()
+    tasks = queue.PriorityQueue(maxsize=max(1, queue_size))
+    sequence = itertools.count()
+    stats = {"videos": 0, "skipped": 0, "comments": 0, "failed": []}
+    stats_lock = threading.Lock()
+    workers = max(1, max_workers)
+
+    def _worker():
+        while True:
+            kind, _, _, video = tasks.get()
+            if kind == _STOP:
+                return
+            video_id = str(video["item_id"])
+            try:
+                count = handler(business_id, video, access_token) or 0
+            except Exception as e:
+                logger.error("コメントの取得に失敗しました (video_id=%s): %s", video_id, e)
+                with stats_lock:
+                    stats["failed"].append(video_id)
+                continue
+            with stats_lock:
+                stats["videos"] += 1
+                stats["comments"] += count
+
+    threads = [threading.Thread(target=_worker, name=f"comment-fanout-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for video in videos:
+            if video.get("item_id") is None:
+                continue
+            # comments (コメント数) を取得している場合は、コメントのない動画を飛ばす
+            if video.get("comments") is not None and int(video["comments"] or 0) == 0:
+                stats["skipped"] += 1
+                continue
+            # 同じ優先度のときは先に入れたものから (sequence) 取り出す
+            tasks.put((_TASK, -_create_time(video), next(sequence), video))
+    finally:
+        # 停止の合図は全てのタスクより後に取り出される
+        for _ in threads:
+            tasks.put((_STOP, 0, next(sequence), None))
+        for thread in threads:
+            thread.join()
+
+    logger.info("コメント取得 (%s): 動画%s本・コメント%s件 (コメントなし%s本・失敗%s本)",
+                business_id, stats["videos"], stats["comments"], stats["skipped"], len(stats["failed"]))
+    return stats
+
+
+def fan_out_accounts(business_ids, handler=save_first_page, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    複数のアカウントの全動画のコメントを取得する関数 (アカウントごとに動画一覧を流しながら取得する)。
+
+    Returns:
+        dict: business_id → fan_out_comments の戻り値
+    """
+    access_token = get_access_token()
+    fields_list = plan_fields("video", ["comments"])
+    results = {}
+    for business_id in business_ids:
+        videos = iter_videos(business_id, access_token, fields_list)
+        results[business_id] = fan_out_comments(business_id, videos, handler, access_token, max_workers)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全動画のコメントを並列に取得する")
+    parser.add_argument("--business-ids", default=os.getenv("TIKTOK_BUSINESS_IDS", os.getenv("TIKTOK_BUSINESS_ID", "")),
+                        help="カンマ区切りの Business ID (既定: 環境変数 TIKTOK_BUSINESS_IDS / TIKTOK_BUSINESS_ID)")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="同時に取得する動画の数")
+    args = parser.parse_args()
+
+    business_ids = [bid.strip() for bid in args.business_ids.split(",") if bid.strip()]
+    if not business_ids:
+        parser.error("Business ID が指定されていません (--business-ids または TIKTOK_BUSINESS_IDS)")
+    fan_out_accounts(business_ids, max_workers=args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+保存済みのコメント (tiktok_data/tiktok_comments_<video_id>_<日時>.json) の全文検索用インデックス。
+これまではコメントを探すたびに、ディレクトリ内のすべての JSON を読み直すしかなかった。
+
+コメントは comment_id をキーにした表 (comment_index) に入れ、本文・ユーザー名は SQLite の FTS5 で索引を作る。
+    - トークナイザは trigram (日本語のように空白で区切られない文でも部分一致で探せる)。
+      trigram が使えない古い SQLite では unicode61 にする
+    - 動画・投稿者・投稿日時は通常の列 (とインデックス) で絞り込む
+    - 読み込んだファイルはパスと更新日時を記録しておき、次回は新しいファイルだけを読む
+何か月分のコメントでも、モデレーションの検索は JSON を読み直さずにミリ秒で返る。
+"""
+
+import os
+import re
+import glob
+import json
+import sqlite3
+import argparse
+import datetime
+import threading
+
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+DATA_DIR = "tiktok_data"
+COMMENT_FILE_PATTERN = "tiktok_comments_*.json"
+# ファイル名から video_id を取り出す (tiktok_comments_<video_id>_<YYYYmmdd>_<HHMMSS>[_pNNN].json)
+_FILE_NAME_PATTERN = re.compile(r"tiktok_comments_(.+?)_\d{8}_\d{6}(?:_p\d+)?\.json$")
+# trigram で検索できる最短の文字数 (これより短い語は LIKE で探す)
+TRIGRAM_MIN_LENGTH = 3
+DEFAULT_LIMIT = 100
+
+# comment_index の列 (comment_id 以外)
+COLUMNS = ["video_id", "parent_comment_id", "user_id", "username", "display_name", "text", "likes", "replies",
+           "create_time"]
+
+
+def _fts_tokenizer(conn):
+    """この SQLite で使える FTS5 のトークナイザを返す (trigram が使えなければ unicode61)"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._trigram_check USING fts5(text, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._trigram_check")
+        return "trigram"
+    except sqlite3.OperationalError:
+        logger.warning("警告: この SQLite (%s) は trigram に対応していないため unicode61 を使います。",
+                       sqlite3.sqlite_version)
+        return "unicode61"
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date_to_epoch(date_str, end_of_day=False):
+    """'YYYY-MM-DD' を、その日の始まり (end_of_day なら翌日の始まり) の UNIX 時刻にする (ローカルタイムゾーン基準)"""
+    day = datetime.date.fromisoformat(date_str)
+    if end_of_day:
+        day += datetime.timedelta(days=1)
+    return int(datetime.datetime.combine(day, datetime.time()).timestamp())
+
+
+class CommentIndex:
+    """
+    コメントの全文検索用インデックス。
+
+    Args:
+        db_path (str): DBファイルのパス (None なら local_db の既定のパス)
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS comment_index (
+                    comment_id TEXT PRIMARY KEY,
+                    video_id TEXT,
+                    parent_comment_id TEXT,
+                    user_id TEXT,
+                    username TEXT,
+                    display_name TEXT,
+                    text TEXT,
+                    likes INTEGER,
+                    replies INTEGER,
+                    create_time INTEGER
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS comment_index_video ON comment_index (video_id, create_time)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS comment_index_time ON comment_index (create_time)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS comment_index_user ON comment_index (username)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS comment_index_files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL
+                )
+            """)
+            exists = self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'comment_index_fts'").fetchone()
+            if exists:
+                self.tokenizer = "trigram" if "trigram" in exists[0] else "unicode61"
+            else:
+                self.tokenizer = _fts_tokenizer(self.conn)
+                # 本文は comment_index にだけ持ち、FTS5 には索引だけを持たせる (external content)
+                self.conn.execute(f"""
+                    CREATE VIRTUAL TABLE comment_index_fts USING fts5(
+                        text, username, display_name,
+                        content='comment_index', content_rowid='rowid', tokenize='{self.tokenizer}'
+                    )
+                """)
+            # comment_index を書き換えたら索引も合わせて書き換える (いいね数などだけの更新では索引は触らない)
+            self.conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS comment_index_ai AFTER INSERT ON comment_index BEGIN
+                    INSERT INTO comment_index_fts (rowid, text, username, display_name)
+                    VALUES (new.rowid, new.text, new.username, new.display_name);
+                END
+            """)
+            self.conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS comment_index_ad AFTER DELETE ON comment_index BEGIN
+                    INSERT INTO comment_index_fts (comment_index_fts, rowid, text, username, display_name)
+                    VALUES ('delete', old.rowid, old.text, old.username, old.display_name);
+                END
+            """)
+            self.conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS comment_index_au AFTER UPDATE ON comment_index
+                WHEN old.text IS NOT new.text OR old.username IS NOT new.username
+                     OR old.display_name IS NOT new.display_name BEGIN
+                    INSERT INTO comment_index_fts (comment_index_fts, rowid, text, username, display_name)
+                    VALUES ('delete', old.rowid, old.text, old.username, old.display_name);
+                    INSERT INTO comment_index_fts (rowid, text, username, display_name)
+                    VALUES (new.rowid, new.text, new.username, new.display_name);
+                END
+            """)
+
+    def add(self, comments, video_id=None):
+        """
+        コメントを追加する関数 (同じ comment_id はいいね数などを最新の値に更新する)。
+
+        Args:
+            comments (list): コメントの辞書のリスト
+            video_id (str): コメントに video_id がない場合に使う動画 ID
+
+        Returns:
+            int: 追加・更新したコメントの件数
+        """
+        rows = []
+        for comment in comments:
+            comment_id = comment.get("comment_id")
+            if not comment_id:
+                continue
+            rows.append((
+                str(comment_id),
+                str(comment.get("video_id") or video_id or "") or None,
+                comment.get("parent_comment_id"),
+                comment.get("user_id"),
+                comment.get("username"),
+                comment.get("display_name"),
+                comment.get("text"),
+                _to_int(comment.get("likes")),
+                _to_int(comment.get("replies")),
+                _to_int(comment.get("create_time")),
+            ))
+        if not rows:
+            return 0
+        updates = ", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in COLUMNS)
+        with self._lock, self.conn:
+            # INSERT OR REPLACE だと削除のトリガーが動かないので、UPSERT にして更新のトリガーで索引を直す
+            self.conn.executemany(
+                f"INSERT INTO comment_index (comment_id, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))}) "
+                f"ON CONFLICT(comment_id) DO UPDATE SET {updates}",
+                rows,
+            )
+        return len(rows)
+
+    def unprocessed_files(self, paths):
+        """前回読み込んでから追加・更新されたファイルだけを返す関数"""
+        with self._lock:
+            seen = dict(self.conn.execute("SELECT path, mtime FROM comment_index_files"))
+        return [path for path in paths if seen.get(path) != os.path.getmtime(path)]
+
+    def mark_file(self, path):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO comment_index_files (path, mtime) VALUES (?, ?)",
+                              (path, os.path.getmtime(path)))
+
+    def search(self, phrase=None, video_id=None, start_date=None, end_date=None, author=None, limit=DEFAULT_LIMIT):
+        """
+        コメントを検索する関数 (条件はすべて AND)。
+
+        Args:
+            phrase (str): 本文・ユーザー名・表示名に含まれる語句 (部分一致)
+            video_id (str): 動画 ID
+            start_date (str): 'YYYY-MM-DD' (この日以降に投稿されたコメント)
+            end_date (str): 'YYYY-MM-DD' (この日までに投稿されたコメント)
+            author (str): 投稿者の username または user_id
+            limit (int): 返す件数の上限
+
+        Returns:
+            list: 新しい順のコメントの辞書のリスト (comment_id, COLUMNS の各キー)
+        """
+        conditions, params = [], []
+        source = "comment_index c"
+        phrase = (phrase or "").strip()
+        if phrase:
+            if self.tokenizer == "trigram" and len(phrase) >= TRIGRAM_MIN_LENGTH:
+                source = "comment_index_fts f JOIN comment_index c ON c.rowid = f.rowid"
+                conditions.append("comment_index_fts MATCH ?")
+                params.append('"' + phrase.replace('"', '""') + '"')
+            else:
+                # trigram は3文字未満の語を索引から引けないので、短い語 (と unicode61 のとき) は LIKE で探す
+                pattern = "%" + phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                conditions.append(
+                    "(c.text LIKE ? ESCAPE '\\' OR c.username LIKE ? ESCAPE '\\' OR c.display_name LIKE ? ESCAPE '\\')")
+                params.extend([pattern] * 3)
+        if video_id:
+            conditions.append("c.video_id = ?")
+            params.append(str(video_id))
+        if start_date:
+            conditions.append("c.create_time >= ?")
+            params.append(_date_to_epoch(start_date))
+        if end_date:
+            conditions.append("c.create_time < ?")
+            params.append(_date_to_epoch(end_date, end_of_day=True))
+        if author:
+            conditions.append("(c.username = ? OR c.user_id = ?)")
+            params.extend([author, author])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f"c.{column}" for column in ["comment_id", *COLUMNS])
+        with self._lock:
+            cursor = self.conn.execute(
+                f"SELECT {columns} FROM {source} {where} ORDER BY c.create_time DESC LIMIT ?", [*params, int(limit)]
+            )
+            rows = cursor.fetchall()
+        return [dict(zip(["comment_id", *COLUMNS], row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM comment_index").fetchone()[0]
+
+
+def video_id_from_path(path):
+    """ファイル名 (tiktok_comments_<video_id>_<日時>.json) から video_id を取り出す関数"""
+    match = _FILE_NAME_PATTERN.search(os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def ingest_files(index, data_dir=DATA_DIR):
+    """
+    tiktok_data/ のコメントの JSON のうち、まだ読み込んでいないファイルだけをインデックスに入れる関数。
+
+    Returns:
+        int: 追加・更新したコメントの件数
+    """
+    paths = sorted(glob.glob(os.path.join(data_dir, COMMENT_FILE_PATTERN)))
+    pending = index.unprocessed_files(paths)
+    total = 0
+    for path in pending:
+        try:
+            with open(path, encoding="utf-8") as f:
+                comments = (json.load(f).get("data") or {}).get("comments") or []
+        except (OSError, ValueError) as e:
+            logger.error("コメントのファイルを読み込めませんでした (%s): %s", path, e)
+            continue
+        total += index.add(comments, video_id_from_path(path))
+        index.mark_file(path)
+    logger.info("コメントのインデックス: ファイル%s件・コメント%s件を読み込みました。", len(pending), total)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みのコメントをインデックスに入れて検索する")
+    parser.add_argument("phrase", nargs="?", help="本文・ユーザー名に含まれる語句")
+    parser.add_argument("--video-id", help="動画 ID で絞り込む")
+    parser.add_argument("--start-date", help="この日 (YYYY-MM-DD) 以降に投稿されたコメント")
+    parser.add_argument("--end-date", help="この日 (YYYY-MM-DD) までに投稿されたコメント")
+    parser.add_argument("--author", help="投稿者の username または user_id で絞り込む")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="表示する件数の上限")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="コメントの JSON があるディレクトリ")
+    parser.add_argument("--no-ingest", action="store_true", help="新しいファイルを読み込まずに検索だけする")
+    args = parser.parse_args()
+
+    index = CommentIndex()
+    if not args.no_ingest:
+        ingest_files(index, args.data_dir)
+    if not any([args.phrase, args.video_id, args.start_date, args.end_date, args.author]):
+        logger.info("インデックス内のコメント: %s 件", index.count())
+        return
+
+    results = index.search(args.phrase, args.video_id, args.start_date, args.end_date, args.author, args.limit)
+    for row in results:
+        posted = datetime.datetime.fromtimestamp(row["create_time"]).strftime("%Y-%m-%d %H:%M") \
+            if row["create_time"] is not None else "-"
+        logger.info("%s  video=%s  @%s  likes=%s  %s", posted, row["video_id"], row["username"], row["likes"],
+                    (row["text"] or "").replace("\n", " "))
+    logger.info("%s 件", len(results))
+
+
+if __name__ == "__main__":
+    main()
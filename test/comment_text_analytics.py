@@ -0,0 +1,410 @@
+"""
+日本語のコメント本文 (text) をまとめて集計するモジュール。
+testGetComments が保存した JSON はこれまでファイルに書き出すだけで、集計はどこでもしていなかった。
+
+コメントのバッチ1つにつき1回だけ本文をたどり、次の3つを同時に数える:
+    term   : 単語 (janome があれば形態素解析の名詞・動詞・形容詞の原形、なければ文字種の切れ目で区切った語)
+    bigram : 文字の2-gram (表記ゆれや未知語にも効く)
+    emoji  : 絵文字
+単語はそのコメントのいいね数で重み付けした値 (1 + log(1 + likes)) も足していくので、
+「多くの人が共感したコメントによく出てくる語」を上位にできる。
+
+集計結果は scope ("video:<item_id>" / "account:<business_id>") ごとに SQLite に足し込んでいき、
+scope ごとに一度数えた comment_id と読み込んだファイルは記録しておくので、新しいコメントの分だけを数えれば済む
+(毎時間すべての過去のファイルを読み直さない)。
+コメントの JSON には business_id が入っていないので、account の scope は保存済みの 動画ID → business_id の対応
+(comment_crawler・video_sync のストア) から決める。対応がわからない動画は動画単位だけで集計し、
+あとで対応がわかったらそのファイルを読み直してアカウント単位にも足し込む。
+"""
+
+import os
+import re
+import glob
+import json
+import math
+import argparse
+import datetime
+import threading
+import unicodedata
+from collections import Counter
+
+from local_db import connect
+from comment_index import video_id_from_path
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+DATA_DIR = "tiktok_data"
+COMMENT_FILE_PATTERN = "tiktok_comments_*.json"
+SHEET_NAME = "testTikTokCommentTerms"
+# シートに書き出す scope ごとの上位件数
+TOP_N = 50
+
+KINDS = ("term", "bigram", "emoji")
+
+# 絵文字 (記号・ピクトグラム・顔文字・国旗など)
+_EMOJI_PATTERN = re.compile(
+    "[\U0001F1E6-\U0001F1FF\U0001F300-\U0001F5FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF"
+    "\U0001F700-\U0001F77F\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF☀-⛿✀-➿]"
+)
+# 形態素解析を使わないときの語の切り出し (漢字・カタカナ・英数字の連続)
+_WORD_PATTERN = re.compile(r"[一-鿿々]{2,}|[゠-ヿ]{2,}|[A-Za-z][A-Za-z0-9']+")
+# 2-gram を作るときに除く文字 (空白・記号・句読点)
+_NON_TEXT_PATTERN = re.compile(r"[\s\W_]+")
+# 数えない語
+STOP_WORDS = {"する", "ある", "いる", "なる", "れる", "られる", "こと", "もの", "これ", "それ", "ここ", "よう", "さん", "ない"}
+# 数える品詞 (janome)
+_JANOME_POS = ("名詞", "動詞", "形容詞")
+
+
+def _load_janome():
+    try:
+        from janome.tokenizer import Tokenizer
+    except ImportError:
+        return None
+    return Tokenizer()
+
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """janome の Tokenizer を1回だけ作って使い回す (インストールされていなければ False)"""
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            _tokenizer = _load_janome() or False
+            if not _tokenizer:
+                logger.info("janome がインストールされていないため、文字種の切れ目で語を区切ります。")
+        return _tokenizer
+
+
+def tokenize_texts(texts):
+    """
+    コメント本文のリストを、本文ごとの語のリストにする関数 (janome の Tokenizer は get_tokenizer のものを使い回す)。
+
+    Args:
+        texts (list): 本文のリスト (NFKC で正規化済み)
+
+    Returns:
+        list: 本文ごとの語のリスト
+    """
+    tokenizer = get_tokenizer()
+    if not tokenizer:
+        return [[w.lower() for w in _WORD_PATTERN.findall(text) if w not in STOP_WORDS] for text in texts]
+
+    result = []
+    for text in texts:
+        words = []
+        for token in tokenizer.tokenize(text):
+            pos = token.part_of_speech.split(",")
+            if pos[0] not in _JANOME_POS or pos[1] in ("非自立", "接尾", "数"):
+                continue
+            base = token.base_form if token.base_form != "*" else token.surface
+            if len(base) > 1 and base not in STOP_WORDS:
+                words.append(base.lower())
+        result.append(words)
+    return result
+
+
+def count_batch(comments):
+    """
+    コメントのバッチを1回たどって、語・2-gram・絵文字の件数といいねで重み付けした値を数える関数。
+    同じコメントの中で何回出てきても1回と数える (コメント数ベースの頻度)。
+
+    Returns:
+        dict: kind → Counter(語 → 件数), "weighted" → Counter(語 → 重み付きの値)
+    """
+    texts = [unicodedata.normalize("NFKC", c.get("text") or "") for c in comments]
+    counts = {kind: Counter() for kind in KINDS}
+    weighted = {kind: Counter() for kind in KINDS}
+    for comment, text, words in zip(comments, texts, tokenize_texts(texts)):
+        weight = 1.0 + math.log1p(max(int(comment.get("likes") or 0), 0))
+        plain = _NON_TEXT_PATTERN.sub("", _EMOJI_PATTERN.sub("", text))
+        features = {
+            "term": set(words),
+            "bigram": {plain[i:i + 2] for i in range(len(plain) - 1)},
+            "emoji": set(_EMOJI_PATTERN.findall(text)),
+        }
+        for kind, items in features.items():
+            counts[kind].update(items)
+            for item in items:
+                weighted[kind][item] += weight
+    return counts, weighted
+
+
+class CommentTextStore:
+    """
+    scope ごとの語の件数と、集計済みの comment_id・ファイルを保存するクラス。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            processed_columns = [row[1] for row in self.conn.execute("PRAGMA table_info(comment_text_processed)")]
+            file_columns = [row[1] for row in self.conn.execute("PRAGMA table_info(comment_text_files)")]
+            if (processed_columns and "scope" not in processed_columns) or (file_columns and "unattributed" not in file_columns):
+                # 以前の形式では、どの scope に足し込んだかわからない (または指定した1つのアカウントに全てのファイルを
+                # 足し込んでいた) ので、集計結果ごと作り直す (次回の analyze_files でファイルから集計し直される)
+                logger.warning("警告: コメントの集計結果を作り直します (集計済みの記録の形式が変わったため)。")
+                for table in ("comment_text_processed", "comment_term_stats", "comment_text_files"):
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS comment_term_stats (
+                    scope TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    weighted REAL NOT NULL,
+                    PRIMARY KEY (scope, kind, term)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS comment_text_processed (
+                    scope TEXT NOT NULL,
+                    comment_id TEXT NOT NULL,
+                    processed_at TEXT NOT NULL,
+                    PRIMARY KEY (scope, comment_id)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS comment_text_files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    unattributed TEXT NOT NULL DEFAULT ''
+                )
+            """)
+
+    def new_comments(self, comments, scope):
+        """comments のうち、scope にまだ足し込んでいないものだけを返す関数 (同じバッチ内の重複も除く)"""
+        unique = {}
+        for comment in comments:
+            if comment.get("comment_id") is not None:
+                unique.setdefault(str(comment["comment_id"]), comment)
+        ids = list(unique)
+        known = set()
+        with self._lock:
+            # SQLite の変数の数の上限を超えないように分けて問い合わせる
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(
+                    f"SELECT comment_id FROM comment_text_processed WHERE scope = ? AND comment_id IN ({placeholders})",
+                    [scope, *chunk],
+                )
+                known.update(row[0] for row in cursor)
+        return [comment for comment_id, comment in unique.items() if comment_id not in known]
+
+    def add(self, scopes, comments, counts, weighted):
+        """
+        バッチの集計結果を scopes の全てに足し込み、コメントをその scope で集計済みにする関数 (1つのトランザクション)。
+        """
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = [(scope, kind, term, count, weighted[kind][term])
+                for scope in scopes for kind in KINDS for term, count in counts[kind].items()]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO comment_term_stats (scope, kind, term, count, weighted) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(scope, kind, term) DO UPDATE SET
+                    count = count + excluded.count,
+                    weighted = weighted + excluded.weighted
+                """,
+                rows,
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO comment_text_processed (scope, comment_id, processed_at) VALUES (?, ?, ?)",
+                [(scope, str(c["comment_id"]), now) for scope in scopes for c in comments],
+            )
+
+    def top_terms(self, scope, kind="term", order_by="weighted", limit=TOP_N):
+        """scope の上位の語を (term, count, weighted) のリストで返す関数"""
+        order_column = "weighted" if order_by == "weighted" else "count"
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT term, count, weighted FROM comment_term_stats WHERE scope = ? AND kind = ? "
+                f"ORDER BY {order_column} DESC, term LIMIT ?",
+                (scope, kind, limit),
+            ).fetchall()
+
+    def scopes(self):
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT scope FROM comment_term_stats ORDER BY scope")]
+
+    def unprocessed_files(self, paths, accounts=None):
+        """
+        前回読み込んでから追加・更新されたファイルと、前回はアカウントがわからなかった動画の
+        アカウントがわかったファイルを返す関数 (読み直しても、動画単位の集計は集計済みのコメントを除く)。
+
+        Args:
+            paths (list): ファイルのパスのリスト
+            accounts (dict): 動画ID → business_id (load_video_accounts の戻り値)
+        """
+        accounts = accounts or {}
+        with self._lock:
+            seen = {path: (mtime, unattributed.split()) for path, mtime, unattributed
+                    in self.conn.execute("SELECT path, mtime, unattributed FROM comment_text_files")}
+        result = []
+        for path in paths:
+            mtime, unattributed = seen.get(path, (None, []))
+            if mtime != os.path.getmtime(path) or any(video_id in accounts for video_id in unattributed):
+                result.append(path)
+        return result
+
+    def mark_file(self, path, unattributed=()):
+        """path を読み込み済みにする関数 (unattributed: アカウントがわからず動画単位だけで集計した動画ID)"""
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO comment_text_files (path, mtime, unattributed) VALUES (?, ?, ?)",
+                              (path, os.path.getmtime(path), " ".join(sorted(unattributed))))
+
+
+def analyze_comments(comments, scopes, store):
+    """
+    新しいコメントだけを集計して scopes に足し込む関数。
+
+    Args:
+        comments (list): コメントの辞書のリスト (text, likes, comment_id)
+        scopes (list): 足し込む先 (例: ["video:<item_id>", "account:<business_id>"])
+        store (CommentTextStore): 集計結果のストア
+
+    Returns:
+        int: 集計したコメントの件数
+    """
+    # scope ごとに未集計のコメントを出し、同じコメントの組になる scope はまとめて1回だけ数える
+    # (ふつうは video と account の scope で同じ組になるので、本文をたどるのは1回で済む)
+    groups = {}
+    for scope in scopes:
+        fresh = store.new_comments(comments, scope)
+        if fresh:
+            key = frozenset(str(c["comment_id"]) for c in fresh)
+            groups.setdefault(key, (fresh, []))[1].append(scope)
+    counted = set()
+    for key, (fresh, group_scopes) in groups.items():
+        counts, weighted = count_batch(fresh)
+        store.add(group_scopes, fresh, counts, weighted)
+        counted |= key
+    return len(counted)
+
+
+def load_video_accounts(db_path=None):
+    """
+    保存済みの 動画ID → business_id の対応を返す関数。
+    コメントのクロールの状態 (comment_crawler) と動画の差分同期の記録 (video_sync) から引く。
+    複数のアカウントに出てくる動画は、どちらのアカウントか決められないので含めない。
+
+    Returns:
+        dict: 動画ID → business_id
+    """
+    from comment_crawler import CommentCrawlStore
+    from video_sync import VideoSyncStore
+
+    pairs = set(CommentCrawlStore(db_path).video_accounts()) | set(VideoSyncStore(db_path).item_accounts())
+    accounts = {}
+    ambiguous = set()
+    for video_id, business_id in pairs:
+        if accounts.setdefault(str(video_id), str(business_id)) != str(business_id):
+            ambiguous.add(str(video_id))
+    if ambiguous:
+        logger.warning("警告: 複数のアカウントに記録されている動画 %s 本は、アカウント単位の集計に含めません。", len(ambiguous))
+    return {video_id: business_id for video_id, business_id in accounts.items() if video_id not in ambiguous}
+
+
+def analyze_files(store, data_dir=DATA_DIR, accounts=None):
+    """
+    tiktok_data/ のコメントの JSON のうち、まだ読み込んでいないファイルだけを集計する関数。
+
+    Args:
+        store (CommentTextStore): 集計結果のストア
+        data_dir (str): コメントの JSON があるディレクトリ
+        accounts (dict): 動画ID → business_id (load_video_accounts の戻り値)。
+                         ここにない動画は account の scope には足し込まない
+
+    Returns:
+        int: 集計したコメントの件数
+    """
+    accounts = accounts or {}
+    paths = sorted(glob.glob(os.path.join(data_dir, COMMENT_FILE_PATTERN)))
+    total = 0
+    unattributed_videos = set()
+    for path in store.unprocessed_files(paths, accounts):
+        try:
+            with open(path, encoding="utf-8") as f:
+                comments = (json.load(f).get("data") or {}).get("comments") or []
+        except (OSError, ValueError) as e:
+            logger.error("コメントのファイルを読み込めませんでした (%s): %s", path, e)
+            continue
+        # 動画ごとにまとめてから集計する (コメントに video_id がなければファイル名の video_id を使う)
+        file_video_id = video_id_from_path(path) or ""
+        by_video = {}
+        for comment in comments:
+            by_video.setdefault(str(comment.get("video_id") or file_video_id), []).append(comment)
+        unattributed = set()
+        for video_id, video_comments in by_video.items():
+            scopes = [f"video:{video_id}"] if video_id else []
+            if accounts.get(video_id):
+                scopes.append(f"account:{accounts[video_id]}")
+            elif video_id:
+                unattributed.add(video_id)
+            total += analyze_comments(video_comments, scopes, store)
+        store.mark_file(path, unattributed)
+        unattributed_videos |= unattributed
+    if unattributed_videos:
+        logger.info("アカウントがわからない動画 %s 本のコメントは、動画単位だけで集計しました。", len(unattributed_videos))
+    logger.info("コメントの集計: 新しいコメント %s 件", total)
+    return total
+
+
+def terms_table(store, scopes=None, kind="term", limit=TOP_N):
+    """
+    scope ごとの上位の語を1つの表 (シートにそのまま書ける DataFrame) にする関数。
+    """
+    import pandas as pd
+
+    rows = []
+    for scope in scopes or store.scopes():
+        for rank, (term, count, weighted) in enumerate(store.top_terms(scope, kind, limit=limit), start=1):
+            rows.append({"scope": scope, "kind": kind, "rank": rank, "term": term,
+                         "comments": count, "likes_weighted": round(weighted, 3)})
+    return pd.DataFrame(rows, columns=["scope", "kind", "rank", "term", "comments", "likes_weighted"])
+
+
+def write_terms_to_sheet(df, sheet_name=SHEET_NAME):
+    """集計結果をシートに書き込む関数 (毎回シート全体を書き換える)"""
+    import gspread
+    import gspread_dataframe as gd
+    from testIntegrateVideoData import SERVICE_ACCOUNT_FILE, SCOPES, SPREADSHEET_ID
+    from lazy_clients import get_gspread_client
+
+    try:
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
+        worksheet = client.open_by_key(SPREADSHEET_ID).worksheet(sheet_name)
+        worksheet.clear()
+        gd.set_with_dataframe(worksheet, df)
+        logger.info("コメントの集計 %s 行をシート '%s' に書き込みました。", len(df), sheet_name)
+    except gspread.exceptions.WorksheetNotFound:
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", sheet_name)
+    except Exception as e:
+        logger.error("予期せぬエラーが発生しました: %s", e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みのコメントの語・2-gram・絵文字を集計する")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="コメントの JSON があるディレクトリ")
+    parser.add_argument("--kind", choices=KINDS, default="term", help="シートに書き出す種類")
+    parser.add_argument("--top", type=int, default=TOP_N, help="scope ごとに書き出す件数")
+    parser.add_argument("--sheet", action="store_true", help=f"結果をシート '{SHEET_NAME}' に書き込む")
+    args = parser.parse_args()
+
+    store = CommentTextStore()
+    analyze_files(store, args.data_dir, load_video_accounts())
+    df = terms_table(store, kind=args.kind, limit=args.top)
+    if args.sheet:
+        write_terms_to_sheet(df)
+    else:
+        logger.info("%s", df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
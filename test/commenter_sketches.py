@@ -0,0 +1,331 @@
+"""
+コメントした人 (user_id / unique_identifier) の「よくコメントする人」と「ユニークなコメント者数」を、
+確率的なスケッチで数えるモジュール。
+大きいアカウントではコメントが数百万件あり、全コメントを DataFrame に持って集計するとメモリも時間も足りない。
+
+    Count-Min Sketch : コメント者ごとのコメント数の推定 (depth × width の uint32 の表。多めに数えることはあっても少なくは数えない)
+    上位候補          : Count-Min の推定値の上位 TOP_K 人だけを辞書で持つ (よくコメントする人)
+    HyperLogLog      : ユニークなコメント者数の推定 (2^p 個の uint8 のレジスタ。誤差はおよそ 1.04 / sqrt(2^p))
+
+どれも大きさが固定なのでメモリは一定で、同じ設定のスケッチどうしは足し合わせ (merge) できる。
+スケッチは scope ("video:<item_id>" / "account:<business_id>") と日付ごとに SQLite に保存し、
+任意の期間 (週・月など) や複数の scope は保存済みのスケッチを merge するだけで求まる。
+
+Count-Min は同じコメントを2回入れると2回数えるので、comment_crawler が返す「新しいコメント」だけを入れること
+(HyperLogLog は何回入れても同じ)。
+"""
+
+import json
+import hashlib
+import argparse
+import datetime
+import threading
+
+import numpy as np
+
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Count-Min Sketch の大きさ (誤差はおよそ コメント総数 × e / width、外れる確率は e^-depth)
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+# HyperLogLog のレジスタ数 = 2^HLL_P (12 なら 4096 バイト、誤差 1.6% 程度)
+HLL_P = 12
+# 上位候補として持っておく人数
+TOP_K = 100
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def hash_keys(keys):
+    """キーのリストを 64bit のハッシュ値の配列にする関数 (プロセスをまたいでも同じ値になるよう blake2b を使う)"""
+    digests = b"".join(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest() for key in keys)
+    return np.frombuffer(digests, dtype="<u8").copy()
+
+
+def _bit_length(values):
+    """uint64 の配列の各要素のビット長 (0 なら 0)"""
+    values = values.copy()
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        large = values >= np.uint64(1 << shift)
+        values[large] >>= np.uint64(shift)
+        length[large] += shift
+    return length + (values > 0)
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch。depth 本のハッシュは64bitのハッシュ値から h1 + i * h2 で作る。
+    """
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, table=None):
+        self.width = int(width)
+        self.depth = int(depth)
+        self.table = np.zeros((self.depth, self.width), dtype=np.uint32) if table is None else table
+
+    def _columns(self, hashes):
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1[None, :] + rows * h2[None, :]) & _MASK64) % np.uint64(self.width)
+
+    def add(self, hashes):
+        columns = self._columns(hashes).astype(np.int64)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], 1)
+
+    def estimate(self, hashes):
+        columns = self._columns(hashes).astype(np.int64)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("大きさの違う Count-Min Sketch は merge できません")
+        self.table += other.table
+        return self
+
+
+class HyperLogLog:
+    """
+    HyperLogLog (上位 p ビットでレジスタを選び、残りのビットの先頭の0の数 + 1 を記録する)。
+    """
+
+    def __init__(self, p=HLL_P, registers=None):
+        self.p = int(p)
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype=np.uint8) if registers is None else registers
+
+    def add(self, hashes):
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = ((64 - self.p) - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # 少ないときは線形カウントの方が正確
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        if self.p != other.p:
+            raise ValueError("精度の違う HyperLogLog は merge できません")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+
+class CommenterSketch:
+    """
+    1つの scope・期間のコメント者のスケッチ (Count-Min + 上位候補 + HyperLogLog)。
+    """
+
+    def __init__(self, cms=None, hll=None, candidates=None, comments=0, top_k=TOP_K):
+        self.cms = cms or CountMinSketch()
+        self.hll = hll or HyperLogLog()
+        # 上位候補: キー → 表示名 (推定値は Count-Min から都度求める)
+        self.candidates = dict(candidates or {})
+        self.comments = int(comments)
+        self.top_k = top_k
+
+    def add_comments(self, comments):
+        """コメントのリストを入れる関数 (コメント者のキーは user_id、なければ unique_identifier)"""
+        keys, names = [], {}
+        for comment in comments:
+            key = comment.get("user_id") or comment.get("unique_identifier")
+            if key:
+                keys.append(key)
+                names[key] = comment.get("username") or comment.get("display_name") or ""
+        if not keys:
+            return
+        hashes = hash_keys(keys)
+        self.cms.add(hashes)
+        self.hll.add(hashes)
+        self.comments += len(keys)
+        for key, name in names.items():
+            self.candidates.setdefault(key, name)
+        self._trim()
+
+    def _trim(self):
+        if len(self.candidates) <= self.top_k:
+            return
+        keys = list(self.candidates)
+        estimates = self.cms.estimate(hash_keys(keys))
+        keep = np.argsort(-estimates.astype(np.int64), kind="stable")[:self.top_k]
+        self.candidates = {keys[i]: self.candidates[keys[i]] for i in keep}
+
+    def merge(self, other):
+        self.cms.merge(other.cms)
+        self.hll.merge(other.hll)
+        self.comments += other.comments
+        for key, name in other.candidates.items():
+            self.candidates.setdefault(key, name)
+        self._trim()
+        return self
+
+    def top(self, n=10):
+        """
+        よくコメントする人の上位 n 人を返す関数。
+
+        Returns:
+            list: (key, 表示名, 推定コメント数) のリスト
+        """
+        keys = list(self.candidates)
+        if not keys:
+            return []
+        estimates = self.cms.estimate(hash_keys(keys))
+        order = np.argsort(-estimates.astype(np.int64), kind="stable")[:n]
+        return [(keys[i], self.candidates[keys[i]], int(estimates[i])) for i in order]
+
+    def distinct(self):
+        """ユニークなコメント者数の推定値"""
+        return self.hll.count()
+
+
+class CommenterSketchStore:
+    """
+    scope と日付ごとのスケッチを保存するクラス。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS commenter_sketches (
+                    scope TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    cms_width INTEGER NOT NULL,
+                    cms_depth INTEGER NOT NULL,
+                    cms_table BLOB NOT NULL,
+                    hll_p INTEGER NOT NULL,
+                    hll_registers BLOB NOT NULL,
+                    candidates TEXT NOT NULL,
+                    comments INTEGER NOT NULL,
+                    PRIMARY KEY (scope, day)
+                )
+            """)
+
+    @staticmethod
+    def _from_row(row):
+        width, depth, table, p, registers, candidates, comments = row
+        cms = CountMinSketch(width, depth, np.frombuffer(table, dtype=np.uint32).reshape(depth, width).copy())
+        hll = HyperLogLog(p, np.frombuffer(registers, dtype=np.uint8).copy())
+        return CommenterSketch(cms, hll, json.loads(candidates), comments)
+
+    def load(self, scope, day):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT cms_width, cms_depth, cms_table, hll_p, hll_registers, candidates, comments "
+                "FROM commenter_sketches WHERE scope = ? AND day = ?", (scope, day)
+            ).fetchone()
+        return self._from_row(row) if row else CommenterSketch()
+
+    def save(self, scope, day, sketch):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO commenter_sketches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, day, sketch.cms.width, sketch.cms.depth, sketch.cms.table.tobytes(),
+                 sketch.hll.p, sketch.hll.registers.tobytes(),
+                 json.dumps(sketch.candidates, ensure_ascii=False), sketch.comments),
+            )
+
+    def window(self, scopes, start_day, end_day):
+        """
+        scopes の start_day〜end_day のスケッチを全て merge したものを返す関数。
+        (例: 週のユニークなコメント者数 = 7日分の HyperLogLog の merge)
+        """
+        if isinstance(scopes, str):
+            scopes = [scopes]
+        placeholders = ",".join("?" * len(scopes))
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT cms_width, cms_depth, cms_table, hll_p, hll_registers, candidates, comments "
+                f"FROM commenter_sketches WHERE scope IN ({placeholders}) AND day BETWEEN ? AND ?",
+                [*scopes, start_day, end_day],
+            ).fetchall()
+        merged = CommenterSketch()
+        for row in rows:
+            merged.merge(self._from_row(row))
+        return merged
+
+
+def _comment_day(comment):
+    try:
+        return datetime.date.fromtimestamp(int(comment.get("create_time") or 0)).isoformat()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return datetime.date.today().isoformat()
+
+
+def update_sketches(comments, store, video_id=None, business_id=None):
+    """
+    新しいコメントを、コメントの日付ごとに動画・アカウントのスケッチへ足し込む関数。
+
+    Args:
+        comments (list): 新しいコメントのリスト (comment_crawler が返したもの)
+        store (CommenterSketchStore): スケッチのストア
+        video_id (str): 動画ID (None ならコメントの video_id)
+        business_id (str): 指定した場合、account:<business_id> にも足し込む
+
+    Returns:
+        int: 足し込んだコメントの件数
+    """
+    groups = {}
+    for comment in comments:
+        day = _comment_day(comment)
+        scopes = [f"video:{video_id or comment.get('video_id')}"]
+        if business_id:
+            scopes.append(f"account:{business_id}")
+        for scope in scopes:
+            groups.setdefault((scope, day), []).append(comment)
+
+    for (scope, day), group in groups.items():
+        sketch = store.load(scope, day)
+        sketch.add_comments(group)
+        store.save(scope, day, sketch)
+    return len(comments)
+
+
+def sketch_sink(business_id=None, store=None, next_sink=None):
+    """
+    comment_crawler.crawl_handler の sink として使える関数を作る (新しいコメントを next_sink に渡してからスケッチに足し込む)。
+    スケッチは同じコメントを2回足すと数え直せないので、next_sink (ファイルへの保存) が失敗したページは足し込まない
+    (そのページはクローラーが次回もう一度取得する)。
+    """
+    store = store or CommenterSketchStore()
+    lock = threading.Lock()
+
+    def _sink(video_id, comments):
+        if next_sink is not None:
+            next_sink(video_id, comments)
+        if comments:
+            # 同じ scope・日付のスケッチを複数のワーカーが同時に読み書きしないようにする
+            with lock:
+                update_sketches(comments, store, video_id, business_id)
+
+    return _sink
+
+
+def main():
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(description="コメント者のスケッチから上位のコメント者とユニーク数を表示する")
+    parser.add_argument("scopes", nargs="+", help="video:<item_id> / account:<business_id> (複数指定すると merge する)")
+    parser.add_argument("--start-date", default=(today - datetime.timedelta(days=6)).isoformat())
+    parser.add_argument("--end-date", default=today.isoformat())
+    parser.add_argument("--top", type=int, default=10, help="表示する上位の人数")
+    args = parser.parse_args()
+
+    sketch = CommenterSketchStore().window(args.scopes, args.start_date, args.end_date)
+    logger.info("%s〜%s: コメント%s件・ユニークなコメント者 約%s人", args.start_date, args.end_date,
+                sketch.comments, sketch.distinct())
+    for rank, (key, name, count) in enumerate(sketch.top(args.top), start=1):
+        logger.info("%2d. %s (%s): 約%s件", rank, name, key[:12], count)
+
+
+if __name__ == "__main__":
+    main()
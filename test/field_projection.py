@@ -0,0 +1,121 @@
+"""
+APIリクエストの fields を、その実行で使う「出力先 (consumer)」から逆算して最小限にするモジュール。
+これまでは /business/get/ で11フィールド、/business/video/list/ で video_view_retention や
+engagement_likes といった大きな配列を毎回取得していたが、シートに書くのは4列だけ、
+BigQuery に入れるのも一部の列だけだった。
+
+出力先ごとに必要なフィールドを CONSUMER_FIELDS に登録しておき、plan_fields で
+その実行の出力先が使うフィールドの和集合だけをリクエストする。
+大きな配列 (HEAVY_FIELDS) は通常の実行では取得せず、頻度を落とした "deep" モードの実行
+(環境変数 TIKTOK_FIELDS_MODE=deep) でだけ取得する。
+"""
+
+import os
+
+from videoFieldsName import VIDEO_FIELDS
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# --- 取得できるフィールド (この順番でリクエストする) ---
+PROFILE_FIELDS = ["username", "display_name", "followers_count", "total_likes", "video_views", "unique_video_views",
+                  "profile_views", "shares", "comments", "engaged_audience", "bio_link_clicks"]
+
+ALL_FIELDS = {
+    "profile": PROFILE_FIELDS,
+    "video": VIDEO_FIELDS,
+}
+
+# どの出力先でも必ず取得するフィールド (行を特定するためのキー)
+KEY_FIELDS = {
+    "profile": ["username"],
+    "video": ["item_id", "create_time"],
+}
+
+# レスポンスを大きくする配列フィールド (deep モードでだけ取得する)
+HEAVY_FIELDS = {
+    "profile": set(),
+    "video": {"video_view_retention", "engagement_likes", "impression_sources", "audience_countries"},
+}
+
+# --- 出力先ごとに使うフィールド ---
+# 新しい出力先 (シートのテンプレート・BigQuery のテーブル) を追加したときはここに登録する
+CONSUMER_FIELDS = {
+    "profile": {
+        # testGetProfileRefactaring.aggregate_data / profile_metrics の集計 (表示用)
+        "aggregate": ["username", "display_name", "followers_count", "total_likes", "video_views", "unique_video_views",
+                      "profile_views", "shares", "comments", "engaged_audience", "bio_link_clicks"],
+        # testIntegrateTiktokToSheet.write_profileData_to_sheet
+        # (動画再生数・プロフィール閲覧数・フォロワー増加数・リンククリック数の4列)
+        "sheet": ["username", "display_name", "video_views", "profile_views", "followers_count", "bio_link_clicks"],
+        # outputToBigQuery_video.upload_tiktok_data_to_bigquery (ProfileDataNo1 テーブル)
+        "bigquery": ["username", "display_name", "total_likes", "followers_count", "video_views", "unique_video_views",
+                     "profile_views", "comments", "shares", "engaged_audience", "bio_link_clicks"],
+    },
+    "video": {
+        # testOutputToBigquery.output (videoDataNo1 テーブル)
+        # 配列フィールドは REPEATED RECORD の列として入れ (video_arrow)、視聴維持率カーブは RetentionStore にも保存する。
+        # HEAVY_FIELDS なので通常の実行では取得せず、deep モードの実行でだけ取得する
+        "bigquery": ["item_id", "caption", "video_duration", "likes", "comments", "shares", "favorites", "create_time",
+                     "reach", "video_views", "total_time_watched", "average_time_watched", "full_video_watched_rate",
+                     "new_followers", "profile_views", "website_clicks", "phone_number_clicks",
+                     "video_view_retention", "engagement_likes", "impression_sources", "audience_countries"],
+        # 視聴維持率カーブの分析 (deep モードでだけ取得する)
+        "retention": ["item_id", "video_duration", "video_view_retention"],
+        # いいねの推移 (deep モードでだけ取得する)
+        "engagement": ["item_id", "engagement_likes"],
+        # comment_fanout (コメントのある動画だけを、新しい順に取得する)
+        "comments": ["item_id", "create_time", "comments"],
+    },
+}
+
+
+def is_deep_mode():
+    """環境変数 TIKTOK_FIELDS_MODE が "deep" なら True"""
+    return os.getenv("TIKTOK_FIELDS_MODE", "").strip().lower() == "deep"
+
+
+def configured_consumers(kind):
+    """
+    この実行の出力先を返す関数。
+    環境変数 TIKTOK_PROFILE_CONSUMERS / TIKTOK_VIDEO_CONSUMERS (カンマ区切り) で指定でき、
+    未設定なら登録されている全ての出力先。
+    """
+    value = os.getenv(f"TIKTOK_{kind.upper()}_CONSUMERS", "")
+    consumers = [c.strip() for c in value.split(",") if c.strip()]
+    return consumers or list(CONSUMER_FIELDS[kind])
+
+
+def plan_fields(kind, consumers=None, deep=None):
+    """
+    出力先が使うフィールドだけを集めた fields のリストを返す関数。
+
+    Args:
+        kind (str): "profile" または "video"
+        consumers (list): 出力先の名前のリスト (None なら configured_consumers(kind))
+        deep (bool): 大きな配列フィールドも取得するか (None なら is_deep_mode())
+
+    Returns:
+        list: リクエストする fields のリスト (ALL_FIELDS の順番)
+    """
+    if consumers is None:
+        consumers = configured_consumers(kind)
+    if deep is None:
+        deep = is_deep_mode()
+
+    registry = CONSUMER_FIELDS[kind]
+    unknown = [c for c in consumers if c not in registry]
+    if unknown:
+        raise ValueError(f"未登録の出力先です ({kind}): {unknown} (登録済み: {list(registry)})")
+
+    needed = set(KEY_FIELDS[kind])
+    for consumer in consumers:
+        needed.update(registry[consumer])
+    if not deep:
+        needed -= HEAVY_FIELDS[kind]
+
+    fields = [field for field in ALL_FIELDS[kind] if field in needed]
+    # ALL_FIELDS にまだ載っていないフィールドは最後に足す
+    fields += sorted(needed - set(fields))
+    logger.debug("fields (%s, consumers=%s, deep=%s): %s", kind, consumers, deep, fields)
+    return fields
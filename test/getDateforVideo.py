@@ -1,8 +1,9 @@
 import datetime
 import os
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from lazy_clients import get_sheets_service
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # --- 設定 (### 要変更 ###) ---
 # 1. Google Sheets APIのスコープ (通常はこのままでOK)
@@ -35,7 +36,6 @@ def get_dates_from_sheet():
         tuple: (start_date_str, end_date_str) のタプル。
                取得または変換に失敗した場合は (None, None) を返す。
     """
-    creds = None
     video_day1 = None#いったん変数は初期化しておこう
     video_day2 = None
     video_day3 = None
@@ -43,23 +43,18 @@ def get_dates_from_sheet():
     video_week2 = None
     service = None
 
+    # googleapiclient は重いので、この関数が呼ばれたときに初めて読み込む
+    from googleapiclient.errors import HttpError
+
     try:
-        # --- 認証 ---
+        # --- 認証・APIサービス構築 (プロセス内で1回だけ。2回目以降は使い回す) ---
         try:
-            creds = Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            service = get_sheets_service(SERVICE_ACCOUNT_FILE, SCOPES)
         except FileNotFoundError:
-            print(f"エラー: 認証情報ファイルが見つかりません: {SERVICE_ACCOUNT_FILE}")
+            logger.error("エラー: 認証情報ファイルが見つかりません: %s", SERVICE_ACCOUNT_FILE)
             return None, None # エラー時は None を返す
         except Exception as e:
-            print(f"エラー: 認証情報の読み込み中にエラーが発生しました: {e}")
-            return None, None
-
-        # --- APIサービス構築 ---
-        try:
-            service = build('sheets', 'v4', credentials=creds)
-        except Exception as e:
-            print(f"エラー: Google Sheets API サービスの構築中にエラーが発生しました: {e}")
+            logger.error("エラー: Google Sheets API サービスの構築中にエラーが発生しました: %s", e)
             return None, None
 
         # --- スプレッドシートからのデータ読み込み ---
@@ -68,7 +63,7 @@ def get_dates_from_sheet():
         values = result.get('values', [])
 
         if not values:
-            print(f"情報: 指定範囲 '{RANGE_NAME}' にデータが見つかりませんでした。")
+            logger.info("情報: 指定範囲 '%s' にデータが見つかりませんでした。", RANGE_NAME)
             # データがない場合も None, None を返す
             return None, None
         else:
@@ -78,7 +73,7 @@ def get_dates_from_sheet():
             value_c2 = row_data[2] if len(row_data) > 2 else None
             value_d2 = row_data[3] if len(row_data) > 3 else None
 
-            print(f"'{RANGE_NAME}' から読み取った値: A2='{value_a2}', B2='{value_b2}'") # デバッグ用
+            logger.info("'%s' から読み取った値: A2='%s', B2='%s'", RANGE_NAME, value_a2, value_b2) # デバッグ用
 
             # --- A2 の値を start_date_def に変換 ---
             if value_a2:
@@ -102,12 +97,12 @@ def get_dates_from_sheet():
                         start_date_def = dt_obj_a2.strftime('%Y-%m-%d')
                     else:
                         # どの形式にもマッチしなかった場合
-                        print(f"警告: A2の値 '{value_a2}' を既知の日付形式に変換できませんでした。")
+                        logger.warning("警告: A2の値 '%s' を既知の日付形式に変換できませんでした。", value_a2)
 
                 except (ValueError, TypeError, AttributeError) as e:
-                    print(f"警告: A2の値 '{value_a2}' の日付変換中にエラーが発生しました: {e}")
+                    logger.error("警告: A2の値 '%s' の日付変換中にエラーが発生しました: %s", value_a2, e)
                 except Exception as e:
-                    print(f"警告: A2の値の処理中に予期せぬエラーが発生しました: {e}")
+                    logger.error("警告: A2の値の処理中に予期せぬエラーが発生しました: %s", e)
 
             # --- B2 の値を end_date_def に変換 (A2と同様) ---
             if value_b2:
@@ -128,12 +123,12 @@ def get_dates_from_sheet():
                     if dt_obj_b2:
                          end_date_def = dt_obj_b2.strftime('%Y-%m-%d')
                     else:
-                         print(f"警告: B2の値 '{value_b2}' を既知の日付形式に変換できませんでした。")
+                         logger.warning("警告: B2の値 '%s' を既知の日付形式に変換できませんでした。", value_b2)
 
                 except (ValueError, TypeError, AttributeError) as e:
-                    print(f"警告: B2の値 '{value_b2}' の日付変換中にエラーが発生しました: {e}")
+                    logger.error("警告: B2の値 '%s' の日付変換中にエラーが発生しました: %s", value_b2, e)
                 except Exception as e:
-                    print(f"警告: B2の値の処理中に予期せぬエラーが発生しました: {e}")
+                    logger.error("警告: B2の値の処理中に予期せぬエラーが発生しました: %s", e)
 
                         # --- C2 の値を start_date に変換 ---
             if value_c2:
@@ -157,12 +152,12 @@ def get_dates_from_sheet():
                         start_date = dt_obj_c2.strftime('%Y-%m-%d')
                     else:
                         # どの形式にもマッチしなかった場合
-                        print(f"警告: A2の値 '{value_c2}' を既知の日付形式に変換できませんでした。")
+                        logger.warning("警告: A2の値 '%s' を既知の日付形式に変換できませんでした。", value_c2)
 
                 except (ValueError, TypeError, AttributeError) as e:
-                    print(f"警告: A2の値 '{value_c2}' の日付変換中にエラーが発生しました: {e}")
+                    logger.error("警告: A2の値 '%s' の日付変換中にエラーが発生しました: %s", value_c2, e)
                 except Exception as e:
-                    print(f"警告: A2の値の処理中に予期せぬエラーが発生しました: {e}")
+                    logger.error("警告: A2の値の処理中に予期せぬエラーが発生しました: %s", e)
                                 # --- D2 の値を end_date に変換 ---
             if value_d2:
                 try:
@@ -185,30 +180,30 @@ def get_dates_from_sheet():
                         end_date = dt_obj_d2.strftime('%Y-%m-%d')
                     else:
                         # どの形式にもマッチしなかった場合
-                        print(f"警告: A2の値 '{value_d2}' を既知の日付形式に変換できませんでした。")
+                        logger.warning("警告: A2の値 '%s' を既知の日付形式に変換できませんでした。", value_d2)
 
                 except (ValueError, TypeError, AttributeError) as e:
-                    print(f"警告: A2の値 '{value_d2}' の日付変換中にエラーが発生しました: {e}")
+                    logger.error("警告: A2の値 '%s' の日付変換中にエラーが発生しました: %s", value_d2, e)
                 except Exception as e:
-                    print(f"警告: A2の値の処理中に予期せぬエラーが発生しました: {e}")
+                    logger.error("警告: A2の値の処理中に予期せぬエラーが発生しました: %s", e)
 
             # --- ★★★取得した日付文字列をタプルで返す★★★ ---
-            print(f"変換結果: start_date_def='{start_date_def}', end_date_def='{end_date_def}',start_date='{start_date}', end_date='{end_date}'") # デバッグ用
+            logger.info("変換結果: start_date_def='%s', end_date_def='%s',start_date='%s', end_date='%s'", start_date_def, end_date_def, start_date, end_date) # デバッグ用
             return start_date_def, end_date_def, start_date, end_date
 
     except HttpError as err:
-        print(f"APIエラー: {err}")
+        logger.error("APIエラー: %s", err)
         return None, None # APIエラー時も None を返す
     except Exception as e:
-        print(f"日付取得処理中に予期せぬエラー: {e}")
+        logger.error("日付取得処理中に予期せぬエラー: %s", e)
         return None, None # その他のエラー時も None を返す
 
 # --- このファイル単体で実行した場合のテスト用 ---
 if __name__ == "__main__":
-    print("--- get_sheet_dates.py を直接実行 ---")
+    logger.info("--- get_sheet_dates.py を直接実行 ---")
     s_date, e_date,s_date_def, e_date_def = get_dates_from_sheet()
     if s_date and e_date:
-        print(f"テスト取得成功: 開始日={s_date_def}, 終了日={e_date_def} デフォルト：開始日={s_date}, 終了日={e_date}")
+        logger.info("テスト取得成功: 開始日=%s, 終了日=%s デフォルト：開始日=%s, 終了日=%s", s_date_def, e_date_def, s_date, e_date)
     else:
-        print("テスト取得失敗。")
-    print("--- 直接実行終了 ---")
\ No newline at end of file
+        logger.error("テスト取得失敗。")
+    logger.info("--- 直接実行終了 ---")
\ No newline at end of file
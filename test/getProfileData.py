@@ -2,9 +2,12 @@ import os
 import requests
 import json
 from getDateforProfile import get_dates_from_sheet
-from refresh_token import refresh_token
-import pandas as pd
 from dotenv import load_dotenv
+from api_client import api_get
+from lazy_clients import get_access_token
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 load_dotenv()
 
@@ -30,12 +33,15 @@ def aggregate_data(response_data):
     APIレスポンスからデータを集計する関数
     start_dateとend_dateの間の差分を計算
     """
+    # pandas は読み込みに時間がかかるので、集計するときに初めて読み込む
+    import pandas as pd
+
     try:
         # データを取得
         if "data" in response_data:
             daily_data = response_data["data"]
         else:
-            print("'data'キーが見つかりません。")
+            logger.info("'data'キーが見つかりません。")
             return None
         
         # DataFrameに変換
@@ -58,7 +64,7 @@ def aggregate_data(response_data):
                     df[field] = df['metrics'].apply(lambda x: x.get(field, None) if isinstance(x, dict) else None)
 
         if df is None or df.empty:
-            print("変換可能なデータが見つかりませんでした。")
+            logger.info("変換可能なデータが見つかりませんでした。")
             return None
         
         # 集計結果の辞書
@@ -102,7 +108,7 @@ def aggregate_data(response_data):
                     result[f"{col}_increase"] = increase
                     result[f"{col}_total"] = end_val
                 else:
-                    print(f"開始日または終了日のデータが見つかりません。日付の確認: {start_date}, {end_date}")
+                    logger.info("開始日または終了日のデータが見つかりません。日付の確認: %s, %s", start_date, end_date)
                     # 代替処理: 最初と最後のデータを使用
                     if len(df) >= 2:
                         start_val = float(df[col].iloc[0])
@@ -111,46 +117,44 @@ def aggregate_data(response_data):
                         
                         result[f"{col}_increase"] = increase
                         result[f"{col}_total"] = end_val
-                        print(f"代替: 最初と最後のデータを使用して{col}の増加分を計算しました")
+                        logger.info("代替: 最初と最後のデータを使用して%sの増加分を計算しました", col)
         
         # 日付範囲
         result["date_range"] = f"{start_date} から {end_date}"
         
         # 結果を表示
-        print("\n=== 期間の集計結果 ===")
+        logger.info("=== 期間の集計結果 ===")
         
         # 合計値
-        print("\n--- 合計値 ---")
+        logger.info("--- 合計値 ---")
         for col in numeric_columns:
             if col in result:
-                print(f"{col}: {result[col]}")
+                logger.info("%s: %s", col, result[col])
         
         # 増加分
-        print("\n--- 増加分 ---")
+        logger.info("--- 増加分 ---")
         for col in increase_columns:
             key = f"{col}_increase"
             if key in result:
-                print(f"{key}: {result[key]}")
+                logger.info("%s: %s", key, result[key])
         
         # 累計値
-        print("\n--- 累計値 ---")
+        logger.info("--- 累計値 ---")
         for col in increase_columns:
             key = f"{col}_total"
             if key in result:
-                print(f"{key}: {result[key]}")
+                logger.info("%s: %s", key, result[key])
         
         # その他の情報
-        print("\n--- その他の情報 ---")
+        logger.info("--- その他の情報 ---")
         for key in ["username", "display_name", "date_range"]:
             if key in result:
-                print(f"{key}: {result[key]}")
+                logger.info("%s: %s", key, result[key])
         
         return result
     
     except Exception as e:
-        import traceback
-        print(f"データ集計中にエラーが発生しました: {e}")
-        traceback.print_exc()
+        logger.exception("データ集計中にエラーが発生しました: %s", e)
         return None
 
 def getProfileAPI(start_date, end_date, business_id, fields_list, access_token):
@@ -168,30 +172,26 @@ def getProfileAPI(start_date, end_date, business_id, fields_list, access_token):
     Returns:
         dict or None: 集計結果の辞書、またはエラー時にNone
     """
-    print(f"\n=== APIリクエスト開始 ({start_date} から {end_date}) ===")
+    logger.info("=== APIリクエスト開始 (%s から %s) ===", start_date, end_date)
     # 必須パラメータのチェック
     if not start_date or not end_date:
-        print(f"エラー: 開始日 ({start_date}) または終了日 ({end_date}) が無効です。APIリクエストをスキップします。")
+        logger.error("エラー: 開始日 (%s) または終了日 (%s) が無効です。APIリクエストをスキップします。", start_date, end_date)
         return None
     if not business_id or not fields_list or not access_token:
-         print("エラー: APIリクエストに必要なパラメータ(business_id, fields, token)が不足しています。")
+         logger.error("エラー: APIリクエストに必要なパラメータ(business_id, fields, token)が不足しています。")
          return None
 
-    headers = {
-        "Access-Token": access_token
-    }
-
-    print(f"Requesting URL: {BASE_URL}")
-    print(f"Params: {params}") # 機密情報を含まないパラメータは表示してもOK
+    logger.info("Requesting URL: %s", BASE_URL)
+    logger.debug("Params: %s", params) # 機密情報を含まないパラメータは表示してもOK
 
     aggregated_data = None # 初期化
 
     try:
         # GETリクエストを実行
-        response = requests.get(BASE_URL, headers=headers, params=params)
+        response = api_get(BASE_URL, access_token, params=params)
         response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
 
-        print("\nResponse Status Code:", response.status_code)
+        logger.info("Response Status Code: %s", response.status_code)
         try:
             response_data = response.json()
             # print("Response JSON:") # レスポンスJSON全体は大きい場合や機密を含む場合があるので、必要ならコメント解除
@@ -202,94 +202,83 @@ def getProfileAPI(start_date, end_date, business_id, fields_list, access_token):
             aggregated_data = aggregate_data(response_data)
 
         except json.JSONDecodeError:
-            print("エラー: APIレスポンスがJSON形式ではありません:")
-            print(response.text)
+            logger.error("エラー: APIレスポンスがJSON形式ではありません:")
+            logger.info("%s", response.text)
             aggregated_data = {"message": "APIレスポンスJSONエラー", "raw_response": response.text, "date_range": f"{start_date} から {end_date}"}
 
 
     except requests.exceptions.HTTPError as http_err:
-        print(f"\nHTTPエラーが発生しました ({start_date} - {end_date}): {http_err}")
+        logger.error("HTTPエラーが発生しました (%s - %s): %s", start_date, end_date, http_err)
         if http_err.response is not None:
-            print(f"Response status code: {http_err.response.status_code}")
+            logger.info("Response status code: %s", http_err.response.status_code)
             try:
                 # エラーレスポンスの詳細を表示
                 error_content = http_err.response.json()
-                print(f"エラー内容 (JSON): {json.dumps(error_content, indent=2, ensure_ascii=False)}")
+                logger.error("エラー内容 (JSON): %s", json.dumps(error_content, indent=2, ensure_ascii=False))
                 aggregated_data = {"message": "API HTTPエラー", "status_code": http_err.response.status_code, "error_details": error_content, "date_range": f"{start_date} から {end_date}"}
             except json.JSONDecodeError:
-                print(f"エラー内容 (Text): {http_err.response.text}")
+                logger.error("エラー内容 (Text): %s", http_err.response.text)
                 aggregated_data = {"message": "API HTTPエラー (JSON解析不可)", "status_code": http_err.response.status_code, "raw_response": http_err.response.text, "date_range": f"{start_date} から {end_date}"}
             except Exception as e:
-                 print(f"エラーレスポンス処理中に別のエラー: {e}")
+                 logger.error("エラーレスポンス処理中に別のエラー: %s", e)
                  aggregated_data = {"message": "API HTTPエラー (詳細取得中エラー)", "status_code": http_err.response.status_code, "date_range": f"{start_date} から {end_date}"}
 
     except requests.exceptions.RequestException as req_err:
-        print(f"\nリクエストエラーが発生しました ({start_date} - {end_date}): {req_err}")
+        logger.error("リクエストエラーが発生しました (%s - %s): %s", start_date, end_date, req_err)
         aggregated_data = {"message": "API リクエストエラー", "error_details": str(req_err), "date_range": f"{start_date} から {end_date}"}
 
     except Exception as e:
-        import traceback
-        print(f"\nAPIリクエストまたはデータ処理中に予期せぬエラーが発生しました ({start_date} - {end_date}): {e}")
-        traceback.print_exc()
+        logger.exception("APIリクエストまたはデータ処理中に予期せぬエラーが発生しました (%s - %s): %s", start_date, end_date, e)
         aggregated_data = {"message": "予期せぬ処理エラー", "error_details": str(e), "date_range": f"{start_date} から {end_date}"}
 
-    print(f"=== APIリクエスト終了 ({start_date} から {end_date}) ===")
+    logger.info("=== APIリクエスト終了 (%s から %s) ===", start_date, end_date)
     return aggregated_data # 集計結果またはエラー情報を返す
 
 if __name__ == '__main__':
-    print("--- TikTokデータ取得スクリプト開始 ---")
+    logger.info("--- TikTokデータ取得スクリプト開始 ---")
 
     # --- アクセストークン取得 ---
-    # refresh_token() 関数は、環境変数などから認証情報を読み込み、
+    # lazy_clients.get_access_token() が refresh_token() を呼ぶ。refresh_token() は環境変数などから認証情報を読み込み、
     # TikTok APIを呼び出して新しいアクセストークンを返すことを想定
-    access_token = refresh_token()
+    access_token = get_access_token()
     if not access_token:
-        print("エラー: アクセストークンの取得に失敗しました。処理を中断します。")
+        logger.error("エラー: アクセストークンの取得に失敗しました。処理を中断します。")
         exit() # トークンがないとAPI呼び出しができないので終了
-    print("アクセストークン取得完了。")
+    logger.info("アクセストークン取得完了。")
 
     # --- スプレッドシートから日付情報を取得 ---
     # get_dates_from_sheet() 関数は A2, B2, C2, D2 の4つの日付を返すことを想定
-    print("\n--- スプレッドシートから日付情報を取得中 ---")
+    logger.info("--- スプレッドシートから日付情報を取得中 ---")
     user_start_date, user_end_date, default_start_date, default_end_date = get_dates_from_sheet()
 
-    # ここで取得した結果を保存するためのリストなどを用意しても良い
-    all_results = []
-
-    # --- デフォルト期間のデータ取得 ---
-    print("\n--- デフォルト期間のデータ取得処理 ---")
-    if default_start_date and default_end_date:
-        print(f"スプレッドシート(C2/D2)から取得したデフォルト期間: {default_start_date} - {default_end_date}")
-        # getProfileAPI にデフォルト期間を渡して呼び出す
-        default_period_results = getProfileAPI(default_start_date, default_end_date, BUSINESS_ID, FIELDS_LIST, access_token)
-        if default_period_results:
-            print("\n=== デフォルト期間 集計結果概要 ===")
-            print(json.dumps(default_period_results, indent=2, ensure_ascii=False))
-            # all_results.append({"period": "default", "data": default_period_results}) # 結果を保存する場合
+    # --- デフォルト期間 (C2/D2) とユーザー指定期間 (A2/B2) をまとめて取得 ---
+    # 重なっている期間は period_planner で1回の /business/get/ リクエストにまとめ、期間ごとに切り出して集計する
+    from period_planner import fetch_profile_periods
+
+    named_periods = {
+        "デフォルト期間": (default_start_date, default_end_date),
+        "ユーザー指定期間": (user_start_date, user_end_date),
+    }
+    valid_periods = []
+    for label, (start_date, end_date) in named_periods.items():
+        if start_date and end_date:
+            logger.info("スプレッドシートから取得した%s: %s - %s", label, start_date, end_date)
+            valid_periods.append((start_date, end_date))
         else:
-            print(f"デフォルト期間 ({default_start_date} - {default_end_date}) のデータ取得または集計に失敗しました。")
-    else:
-        print("スプレッドシート(C2/D2)からデフォルト期間の日付が取得できなかったか、不完全なためスキップします。")
-        print(f"(取得値: start='{default_start_date}', end='{default_end_date}')")
-
-
-    # --- ユーザー指定期間のデータ取得 ---
-    print("\n--- ユーザー指定期間のデータ取得処理 ---")
-    # ユーザー指定期間の日付 (A2/B2) が有効な場合のみ実行
-    if user_start_date and user_end_date:
-        print(f"スプレッドシート(A2/B2)から取得したユーザー指定期間: {user_start_date} - {user_end_date}")
-        # getProfileAPI にユーザー指定期間を渡して呼び出す
-        user_specified_results = getProfileAPI(user_start_date, user_end_date, BUSINESS_ID, FIELDS_LIST, access_token)
-        if user_specified_results:
-            print("\n=== ユーザー指定期間 集計結果概要 ===")
-            print(json.dumps(user_specified_results, indent=2, ensure_ascii=False))
-            # all_results.append({"period": "user_specified", "data": user_specified_results}) # 結果を保存する場合
+            logger.info("スプレッドシートから%sの日付が取得できなかったか、不完全なためスキップします。", label)
+            logger.info("(取得値: start='%s', end='%s')", start_date, end_date)
+
+    all_results = fetch_profile_periods(valid_periods, BUSINESS_ID, FIELDS_LIST, access_token)
+
+    for label, period in named_periods.items():
+        if period not in all_results:
+            continue
+        if all_results[period]:
+            logger.info("=== %s 集計結果概要 ===", label)
+            logger.info("%s", json.dumps(all_results[period], indent=2, ensure_ascii=False, default=str))
         else:
-            print(f"ユーザー指定期間 ({user_start_date} - {user_end_date}) のデータ取得または集計に失敗しました。")
-    else:
-        print("スプレッドシート(A2/B2)からユーザー指定期間の日付が取得できなかったか、不完全なためスキップします。")
-        print(f"(取得値: start='{user_start_date}', end='{user_end_date}')")
+            logger.error("%s (%s - %s) のデータ取得または集計に失敗しました。", label, period[0], period[1])
 
     # ここで all_results リストなどを使って、取得したすべての結果を後続処理に渡したり、まとめて表示したりできる
 
-    print("\n--- TikTokデータ取得スクリプト終了 ---")
\ No newline at end of file
+    logger.info("--- TikTokデータ取得スクリプト終了 ---")
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+複数のキーワードのハッシュタグ候補をまとめて取得するサービス。
+business/hashtag/suggestion/ は1回の呼び出しでキーワード1つしか受け付けないが、
+コンテンツチームは数百のキーワードの候補を見たい。
+
+    1. キーワードを正規化 (NFKC・前後の空白) して重複を除く
+    2. (keyword, language) をキーにした TTL キャッシュ (ttl_cache) にあるものはそのまま使う
+    3. キャッシュにないキーワードだけを、スレッドプールで並列に API から取得する
+       (リクエストの流量は api_client の共通のレート制限に従う)
+    4. キーワード → 候補 の縦長の表 (シートにそのまま書ける DataFrame) にまとめる
+候補の変化はゆっくりなので、ほとんどの呼び出しは API まで行かずにキャッシュで返る。
+"""
+
+import os
+import argparse
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from testGetRecommendedHashtags import fetch_hashtag_suggestions
+from api_client import resolve_business_id
+from ttl_cache import TTLCache
+from lazy_clients import get_access_token
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_NAMESPACE = "hashtag_suggestion"
+# キャッシュの有効期限 (秒、既定は7日)
+CACHE_TTL = float(os.getenv("TIKTOK_HASHTAG_CACHE_TTL", str(7 * 24 * 3600)))
+# 同時に取得するキーワードの数
+DEFAULT_MAX_WORKERS = int(os.getenv("TIKTOK_HASHTAG_WORKERS", "4"))
+# 書き込むシートの名前
+SHEET_NAME = "testTikTokHashtags"
+
+
+def normalize_keywords(keywords):
+    """
+    キーワードを正規化し、順番を保ったまま重複を除く関数 (全角英数字や前後の空白の違いを同じキーワードとみなす)。
+    """
+    seen = set()
+    result = []
+    for keyword in keywords:
+        normalized = unicodedata.normalize("NFKC", keyword or "").strip()
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            result.append(normalized)
+    return result
+
+
+def suggest_hashtags(keywords, language="ja-JP", business_id=None, access_token=None,
+                     cache=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    キーワードのリストのハッシュタグ候補を返す関数 (キャッシュにないものだけ API を呼ぶ)。
+
+    Args:
+        keywords (list): キーワードのリスト (重複があってもよい)
+        language (str): 言語
+        business_id (str): TikTok Business ID (None なら環境変数 TIKTOK_BUSINESS_ID)
+        access_token (str): 有効なアクセストークン (None なら、API を呼ぶときに lazy_clients.get_access_token())
+        cache (TTLCache): キャッシュ (None ならローカルDBのものを使う)
+        max_workers (int): 同時に取得するキーワードの数
+
+    Returns:
+        dict: keyword → 候補のリスト (取得に失敗したキーワードは含まない)
+
+    Raises:
+        ValueError: API を呼ぶ必要があるのに Business ID が指定されていない場合
+    """
+    cache = cache or TTLCache(CACHE_NAMESPACE, CACHE_TTL)
+    keywords = normalize_keywords(keywords)
+    cached = cache.get_many((keyword, language) for keyword in keywords)
+    results = {keyword: cached[(keyword, language)] for keyword in keywords if (keyword, language) in cached}
+    misses = [keyword for keyword in keywords if keyword not in results]
+    logger.info("ハッシュタグ候補: キーワード%s件 (キャッシュ%s件・API%s件)", len(keywords), len(results), len(misses))
+    if not misses:
+        return results
+
+    # キーワードごとのエラーとして握りつぶさないよう、API を呼ぶ前に確認する
+    business_id = resolve_business_id(business_id)
+    access_token = access_token or get_access_token()
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(misses)))) as executor:
+        futures = {
+            executor.submit(fetch_hashtag_suggestions, keyword, language, business_id, access_token): keyword
+            for keyword in misses
+        }
+        for future in as_completed(futures):
+            keyword = futures[future]
+            try:
+                fetched[keyword] = future.result()
+            except Exception as e:
+                logger.error("ハッシュタグ候補の取得に失敗しました (keyword=%s): %s", keyword, e)
+
+    # 候補が0件だったキーワードもキャッシュする (次回も API を呼ばないように)
+    cache.set_many({(keyword, language): suggestions for keyword, suggestions in fetched.items()})
+    results.update(fetched)
+    return results
+
+
+def suggestions_table(results, language="ja-JP"):
+    """
+    keyword → 候補のリスト を、1行 = 1候補の DataFrame にする関数。
+    候補が文字列でも辞書でもよい (辞書の場合はキーをそのまま列にする)。
+
+    Returns:
+        pd.DataFrame: keyword, language, rank, hashtag, (候補の辞書のその他のキー) の列
+    """
+    import pandas as pd
+
+    rows = []
+    for keyword, suggestions in results.items():
+        for rank, suggestion in enumerate(suggestions, start=1):
+            row = {"keyword": keyword, "language": language, "rank": rank}
+            if isinstance(suggestion, dict):
+                row.update(suggestion)
+                row.setdefault("hashtag", suggestion.get("hashtag_name") or suggestion.get("hashtag"))
+            else:
+                row["hashtag"] = suggestion
+            rows.append(row)
+    columns = ["keyword", "language", "rank", "hashtag"]
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    return df[columns + [c for c in df.columns if c not in columns]]
+
+
+def write_suggestions_to_sheet(df, sheet_name=SHEET_NAME):
+    """
+    ハッシュタグ候補の表をシートに書き込む関数 (毎回シート全体を書き換える)。
+    """
+    import gspread
+    import gspread_dataframe as gd
+    from testIntegrateVideoData import SERVICE_ACCOUNT_FILE, SCOPES, SPREADSHEET_ID
+    from lazy_clients import get_gspread_client
+
+    try:
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
+        worksheet = client.open_by_key(SPREADSHEET_ID).worksheet(sheet_name)
+        worksheet.clear()
+        gd.set_with_dataframe(worksheet, df)
+        logger.info("ハッシュタグ候補 %s 行をシート '%s' に書き込みました。", len(df), sheet_name)
+    except gspread.exceptions.WorksheetNotFound:
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", sheet_name)
+    except Exception as e:
+        logger.error("予期せぬエラーが発生しました: %s", e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数のキーワードのハッシュタグ候補をまとめて取得する")
+    parser.add_argument("keywords", nargs="*", help="キーワード")
+    parser.add_argument("--keywords-file", help="キーワードを1行に1つずつ書いたファイル")
+    parser.add_argument("--language", default="ja-JP", help="言語 (既定: ja-JP)")
+    parser.add_argument("--business-id", default=os.getenv("TIKTOK_BUSINESS_ID"),
+                        help="Business ID (既定: 環境変数 TIKTOK_BUSINESS_ID)")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS, help="同時に取得するキーワードの数")
+    parser.add_argument("--sheet", action="store_true", help=f"結果をシート '{SHEET_NAME}' に書き込む")
+    args = parser.parse_args()
+
+    keywords = list(args.keywords)
+    if args.keywords_file:
+        with open(args.keywords_file, encoding="utf-8") as f:
+            keywords.extend(line.strip() for line in f)
+    if not keywords:
+        parser.error("キーワードが指定されていません")
+    if not args.business_id:
+        parser.error("Business ID が指定されていません (--business-id または TIKTOK_BUSINESS_ID)")
+
+    df = suggestions_table(suggest_hashtags(keywords, args.language, args.business_id, max_workers=args.max_workers), args.language)
+    if args.sheet:
+        write_suggestions_to_sheet(df)
+    else:
+        logger.info("%s", df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
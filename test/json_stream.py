@@ -0,0 +1,195 @@
+"""
+APIレスポンスの JSON を、ボディを全部読み込まずに少しずつデコードするモジュール。
+これまでの getVideoAPI は response.json() でレスポンス全体を dict にし、
+表示用に json.dumps(indent=4) で文字列にし、さらに outputToJson でもう一度シリアライズしていたので、
+同じ内容がメモリ上に最大3つ並んでいた。
+
+ここでは stream=True で受け取ったボディを一定サイズずつ読み、
+    - 読んだバイト列はそのままアーカイブのファイルに書き出す (再エンコードしない)
+    - 同じバイト列をインクリメンタルパーサー (ijson) に渡し、data.videos の要素が1件できるたびに yield する
+ので、1リクエストあたりのメモリは動画の件数によらずほぼ一定になる。
+
+ijson はインストールされていれば使う (pip install ijson)。ない場合はボディを一度だけバイト列で読み、
+orjson (なければ標準の json) でデコードする。
+"""
+
+import os
+import datetime
+import contextlib
+
+from api_client import api_get
+from rate_limiter import RATE_LIMIT_CODES, get_scheduler, retry_after_seconds
+from video_pager import VIDEO_LIST_PATH, MAX_COUNT_PER_PAGE
+from videoFieldsName import VIDEO_FIELDS
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ボディを読む単位 (バイト)
+CHUNK_SIZE = 64 * 1024
+# 生のレスポンスを保存するディレクトリ
+ARCHIVE_DIR = "tiktok_data"
+# items と一緒に取り出しておくスカラー値 (ijson の prefix)
+META_PREFIXES = ("code", "message", "request_id", "data.cursor", "data.has_more")
+
+
+class TeeReader:
+    """
+    レスポンスのボディを read() できるファイルのように見せ、読んだバイト列をそのまま sink にも書くクラス。
+    gzip などの Content-Encoding は iter_content がデコードする。
+    """
+
+    def __init__(self, response, sink=None, chunk_size=CHUNK_SIZE):
+        self._chunks = response.iter_content(chunk_size=chunk_size)
+        self._sink = sink
+        self._buffer = b""
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        while not self._buffer:
+            chunk = next(self._chunks, b"")
+            if not chunk:
+                return b""
+            self.bytes_read += len(chunk)
+            if self._sink is not None:
+                self._sink.write(chunk)
+            self._buffer = chunk
+        if size is None or size < 0:
+            size = len(self._buffer)
+        # 呼び出し側が指定したサイズより長くは返さない (ijson の C バックエンドははみ出した分を捨てる)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def read_all(self):
+        return b"".join(iter(self.read, b""))
+
+
+def _loads(body):
+    try:
+        import orjson
+        return orjson.loads(body)
+    except ImportError:
+        import json
+        return json.loads(body)
+
+
+def _lookup(document, prefix):
+    value = document
+    for key in prefix.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def iter_json_items(reader, prefix, meta=None):
+    """
+    reader (read() を持つオブジェクト) から、prefix の配列の要素を1件ずつデコードして返すジェネレータ。
+
+    Args:
+        reader: TeeReader やファイルなど
+        prefix (str): ijson 形式の配列の位置 (例: "data.videos.item")
+        meta (dict): 渡した場合、META_PREFIXES の値を入れて返す (読み終わってから参照する)
+
+    Yields:
+        dict: 配列の要素
+    """
+    meta = meta if meta is not None else {}
+    try:
+        import ijson
+        from ijson.common import ObjectBuilder
+    except ImportError:
+        document = _loads(reader.read_all() if hasattr(reader, "read_all") else reader.read())
+        for key in META_PREFIXES:
+            meta[key] = _lookup(document, key)
+        items = _lookup(document, prefix.rsplit(".item", 1)[0])
+        del document
+        yield from items or []
+        return
+
+    builder = None
+    for event_prefix, event, value in ijson.parse(reader, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event_prefix == prefix and event in ("end_map", "end_array"):
+                yield builder.value
+                builder = None
+        elif event_prefix == prefix and event in ("start_map", "start_array"):
+            builder = ObjectBuilder()
+            builder.event(event, value)
+        elif event_prefix == prefix:
+            # スカラーの要素
+            yield value
+        elif event_prefix in META_PREFIXES:
+            meta[event_prefix] = value
+
+
+def archive_path(kind, page, timestamp, archive_dir=ARCHIVE_DIR):
+    """tiktok_data/tiktok_<kind>_<日時>_p<ページ>.json のパスを返す関数"""
+    return os.path.join(archive_dir, f"tiktok_{kind}_{timestamp}_p{page:03d}.json")
+
+
+def stream_videos(business_id, access_token, fields_list=VIDEO_FIELDS, max_count=MAX_COUNT_PER_PAGE,
+                  max_pages=None, extra_params=None, archive_dir=ARCHIVE_DIR):
+    """
+    動画一覧をカーソルに従って最後のページまで取得し、デコードできた動画から1件ずつ返すジェネレータ。
+    video_pager.iter_video_pages のストリーミング版で、各ページの生のレスポンスは
+    archive_dir にそのまま保存する (archive_dir=None なら保存しない)。
+
+    Yields:
+        dict: 動画1件
+
+    Raises:
+        requests.exceptions.HTTPError: HTTPエラーが返ってきた場合
+        RuntimeError: API がエラー (code != 0) を返した場合 (レート制限は再試行回数を使い切った場合)
+    """
+    scheduler = get_scheduler()
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    cursor = None
+    page = 0
+    attempt = 0
+    while max_pages is None or page < max_pages:
+        params = {
+            "business_id": business_id,
+            "fields": fields_list,
+            "max_count": min(max_count, MAX_COUNT_PER_PAGE),
+        }
+        if cursor is not None:
+            params["cursor"] = cursor
+        if extra_params:
+            params.update(extra_params)
+
+        meta = {}
+        count = 0
+        response = api_get(VIDEO_LIST_PATH, access_token, params=params, stream=True)
+        with contextlib.ExitStack() as stack:
+            stack.callback(response.close)
+            response.raise_for_status()
+            sink = None
+            if archive_dir:
+                sink = stack.enter_context(open(archive_path("video", page + 1, timestamp, archive_dir), "wb"))
+            reader = TeeReader(response, sink)
+            for video in iter_json_items(reader, "data.videos.item", meta):
+                count += 1
+                yield video
+
+        # ストリーミングのレスポンスは api_client ではボディの code を確認できない (読むとボディを消費してしまう) ので、
+        # レート制限 (code=40100) はここで見つけてスケジューラのバックオフで待ち、同じページを取り直す
+        # (制限されたレスポンスには動画が含まれないので、まだ何も yield していない。アーカイブは取り直したもので上書きされる)
+        if meta.get("code") in RATE_LIMIT_CODES and attempt < scheduler.max_retries:
+            scheduler.on_throttled(business_id, attempt, retry_after_seconds(response))
+            attempt += 1
+            continue
+        attempt = 0
+        page += 1
+        if meta.get("code", 0) != 0:
+            raise RuntimeError(f"動画一覧の取得に失敗しました (page={page}, code={meta.get('code')}, message={meta.get('message')})")
+        logger.debug("動画一覧 %sページ目: %s件, %sバイト (has_more=%s)", page, count, reader.bytes_read, meta.get("data.has_more"))
+
+        next_cursor = meta.get("data.cursor")
+        if not meta.get("data.has_more") or not count or next_cursor is None or next_cursor == cursor:
+            break
+        cursor = next_cursor
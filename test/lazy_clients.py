@@ -0,0 +1,139 @@
+"""
+アクセストークン・Google Sheets / BigQuery のクライアントなど、作るのにネットワーク通信や
+重いライブラリの読み込みが必要なものを「初めて使うときに1回だけ」作るためのファクトリ。
+これまでは testGetProfileData などを import しただけで refresh_token() や
+get_dates_from_sheet() が走り、google / pandas の読み込みも import 時に払っていた。
+ここの関数を呼んだ時点で初めて作成し、以降はプロセス内 (全スレッド) で同じものを使い回す。
+ただし googleapiclient のサービスは httplib2 の Http を持っていてスレッドセーフではないので、スレッドごとに作る。
+"""
+
+import functools
+import threading
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def memoize(func):
+    """
+    引数ごとに戻り値をキャッシュするデコレータ。
+    同じ引数で複数スレッドから同時に呼ばれても、func が実行されるのは1回だけ。
+    例外が発生した場合はキャッシュせず、次の呼び出しで再実行する。
+    """
+    cache = {}
+    lock = threading.Lock()
+    key_locks = {}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        if key in cache:
+            return cache[key]
+        with lock:
+            key_lock = key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in cache:
+                cache[key] = func(*args, **kwargs)
+            return cache[key]
+
+    def cache_clear():
+        with lock:
+            cache.clear()
+            key_locks.clear()
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+def memoize_per_thread(func):
+    """
+    引数ごとの戻り値を、スレッドごとにキャッシュするデコレータ。
+    スレッドセーフではないもの (httplib2 を使う googleapiclient のサービスなど) を、
+    スレッドをまたいで共有せずに使い回すために使う。例外が発生した場合はキャッシュしない。
+    cache_clear() は全スレッドのキャッシュを無効にする (各スレッドの次の呼び出しで作り直す)。
+    """
+    local = threading.local()
+    generation = [0]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(local, "generation", None) != generation[0]:
+            local.cache = {}
+            local.generation = generation[0]
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in local.cache:
+            local.cache[key] = func(*args, **kwargs)
+        return local.cache[key]
+
+    def cache_clear():
+        generation[0] += 1
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+# --- アクセストークン ---
+def get_access_token(force_refresh=False):
+    """
+    アクセストークンを返す関数。
+    token_cache のディスクキャッシュを使い、期限切れが近いときだけ更新する
+    (有効期限があるので memoize はせず、毎回 token_cache に確認する。確認はメモリ上で済む)。
+    """
+    from token_cache import get_access_token as get_cached_access_token
+    return get_cached_access_token(force_refresh=force_refresh)
+
+
+# --- Google 認証情報・クライアント ---
+@memoize
+def get_credentials(service_account_file, scopes=None):
+    """
+    サービスアカウントキーから認証情報を作る関数。
+
+    Args:
+        service_account_file (str): サービスアカウントキー(JSON)ファイルのパス
+        scopes (tuple): スコープ (キャッシュのキーにするためタプルで渡す。list も可)
+    """
+    from google.oauth2.service_account import Credentials
+    return Credentials.from_service_account_file(service_account_file, scopes=list(scopes) if scopes else None)
+
+
+def _scopes_key(scopes):
+    return tuple(scopes) if scopes else None
+
+
+@memoize_per_thread
+def _sheets_service(service_account_file, scopes):
+    from googleapiclient.discovery import build
+    creds = get_credentials(service_account_file, scopes)
+    # discovery ドキュメントのキャッシュは使わない (ファイルキャッシュの警告が出るため)
+    return build('sheets', 'v4', credentials=creds, cache_discovery=False)
+
+
+def get_sheets_service(service_account_file, scopes=None):
+    """Google Sheets API (v4) のサービスを返す関数 (httplib2 はスレッドセーフではないので、スレッドごとに別のサービス)"""
+    return _sheets_service(service_account_file, _scopes_key(scopes))
+
+
+@memoize
+def _gspread_client(service_account_file, scopes):
+    import gspread
+    return gspread.authorize(get_credentials(service_account_file, scopes))
+
+
+def get_gspread_client(service_account_file, scopes=None):
+    """gspread のクライアントを返す関数"""
+    return _gspread_client(service_account_file, _scopes_key(scopes))
+
+
+@memoize
+def get_bigquery_client(service_account_file, project_id):
+    """
+    BigQuery のクライアントを返す関数。
+
+    Args:
+        service_account_file (str): サービスアカウントキー(JSON)ファイルのパス
+        project_id (str): GCPのプロジェクトID
+    """
+    from google.cloud import bigquery
+    creds = get_credentials(service_account_file)
+    return bigquery.Client(credentials=creds, project=project_id)
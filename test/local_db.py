@@ -0,0 +1,36 @@
+"""
+ローカルに保存するデータ (日別メトリクスなど) 用の SQLite 接続をまとめたモジュール。
+保存先は環境変数 TIKTOK_LOCAL_DB で変更できる (未設定なら tiktok_data/tiktok_local.db)。
+"""
+
+import os
+import sqlite3
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("TIKTOK_LOCAL_DB", os.path.join("tiktok_data", "tiktok_local.db"))
+
+
+def connect(db_path=None):
+    """
+    SQLite に接続する関数。保存先ディレクトリがなければ作成する。
+    複数スレッドから同じ接続を使う場合は、呼び出し側でロックを取ること。
+
+    Args:
+        db_path (str): DBファイルのパス。None なら DEFAULT_DB_PATH
+
+    Returns:
+        sqlite3.Connection: 接続
+    """
+    db_path = db_path or DEFAULT_DB_PATH
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+        logger.info("ディレクトリ '%s' を作成しました。", db_dir)
+
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    # 複数プロセスから同時に読み書きしても待たされにくいように WAL モードにする
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,124 @@
+"""
+test/ 以下のスクリプト共通のロガー設定。
+これまでは print でレスポンス全体 (動画一覧だと50KB以上) や集計結果を毎回出していたので、
+アカウント数が増えるとコンソール出力そのものが処理時間の一部になり、ログ収集側もあふれていた。
+
+環境変数で出力を切り替える:
+    TIKTOK_LOG_LEVEL     : ログレベル (DEBUG / INFO / WARNING / ERROR)。既定は INFO
+    TIKTOK_LOG_FORMAT    : "json" にすると1行1JSONで出力する
+    TIKTOK_BATCH_MODE    : "1" にするとバッチモード。JSON形式で、リクエストごとの1行サマリと警告以上だけを出す
+    TIKTOK_DEBUG_PAYLOAD : "1" にするとAPIレスポンス全体のダンプを DEBUG レベルで出す
+"""
+
+import os
+import sys
+import json
+import logging
+import threading
+
+REQUEST_LOGGER_NAME = "tiktok.requests"
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_configured = False
+_configure_lock = threading.Lock()
+
+# LogRecord が元から持っている属性 (extra で渡されたフィールドと区別するため)
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def _env_flag(name):
+    return os.getenv(name, "").strip().lower() in _TRUE_VALUES
+
+
+def is_batch_mode():
+    return _env_flag("TIKTOK_BATCH_MODE")
+
+
+def is_payload_debug():
+    return _env_flag("TIKTOK_DEBUG_PAYLOAD")
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行のJSONにするフォーマッタ (extra で渡したフィールドもそのまま載せる)"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=None, fmt=None):
+    """
+    ルートロガーにハンドラを1つだけ設定する関数 (2回目以降の呼び出しは何もしない)。
+
+    Args:
+        level (str): ログレベル。None なら環境変数 TIKTOK_LOG_LEVEL
+        fmt (str): "json" または "text"。None なら環境変数 TIKTOK_LOG_FORMAT
+    """
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+        batch = is_batch_mode()
+        level = (level or os.getenv("TIKTOK_LOG_LEVEL") or ("WARNING" if batch else "INFO")).upper()
+        fmt = fmt or os.getenv("TIKTOK_LOG_FORMAT") or ("json" if batch else "text")
+
+        handler = logging.StreamHandler(sys.stdout)
+        if fmt == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(message)s"))
+
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level)
+        if is_payload_debug():
+            root.setLevel(logging.DEBUG)
+        # バッチモードでもリクエストごとの1行サマリは出す
+        if batch:
+            logging.getLogger(REQUEST_LOGGER_NAME).setLevel(logging.INFO)
+        _configured = True
+
+
+def get_logger(name):
+    """モジュールごとのロガーを返す関数 (初回呼び出し時にログ設定を行う)"""
+    setup_logging()
+    return logging.getLogger(name)
+
+
+def log_request(method, url, status_code, elapsed_ms, **fields):
+    """
+    APIリクエスト1件につき1レコード出す関数。JSON形式のときは1行のJSONになる。
+
+    Args:
+        method (str): "GET" / "POST"
+        url (str): リクエストURL (クエリ文字列は含めない)
+        status_code (int): HTTPステータスコード
+        elapsed_ms (float): 所要時間 (ミリ秒)
+        **fields: business_id, attempts などの追加情報
+    """
+    logger = get_logger(REQUEST_LOGGER_NAME)
+    if logger.isEnabledFor(logging.INFO):
+        extra = {"method": method, "url": url, "status": status_code, "elapsed_ms": round(elapsed_ms, 1)}
+        extra.update(fields)
+        logger.info("%s %s -> %s (%.0fms)", method, url, status_code, elapsed_ms, extra=extra)
+
+
+def dump_payload(logger, label, payload):
+    """
+    レスポンス全体などの大きなデータを、TIKTOK_DEBUG_PAYLOAD が有効なときだけ DEBUG で出す関数。
+    無効なときは json.dumps 自体を行わない。
+    """
+    if is_payload_debug() and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s:\n%s", label, json.dumps(payload, indent=4, ensure_ascii=False, default=str))
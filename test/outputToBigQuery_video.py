@@ -1,10 +1,12 @@
 import json
 import os
 from google.cloud import bigquery
-from google.oauth2 import service_account
-from google.oauth2.service_account import Credentials
 import datetime
 import logging
+from lazy_clients import get_bigquery_client
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
     # --- 設定 ---
 # !! WARNING: セキュリティのため、コードに直接書き込まず、環境変数などから取得することを強く推奨します !!
@@ -17,17 +19,58 @@ TABLE_NAME = 'ProfileDataNo1'         # <--- あなたのテーブル名に修
 
 def build_bigquery_client(key_file_path, project_id):
     if not os.path.exists(key_file_path):
-        print(f"エラー: サービスアカウントキーファイルが見つかりません: {key_file_path}")
+        logger.error("エラー: サービスアカウントキーファイルが見つかりません: %s", key_file_path)
         return None
     try:
-        creds = Credentials.from_service_account_file(key_file_path)
-        client = bigquery.Client(credentials=creds, project=project_id)
-        return client
+        # 同じキー・プロジェクトのクライアントはプロセス内で使い回す
+        return get_bigquery_client(key_file_path, project_id)
     except Exception as e:
-        print(f"エラー: BigQuery クライアントの構築中にエラーが発生しました: {e}")
-        print(f"指定されたファイルパス: {key_file_path}")
+        logger.error("エラー: BigQuery クライアントの構築中にエラーが発生しました: %s", e)
+        logger.info("指定されたファイルパス: %s", key_file_path)
         return None
 
+def flatten_profile(data, processed_at=None):
+    """
+    プロフィールのレスポンス (/business/get/) を、ProfileDataNo1 テーブルの行 (1行 = 1日分のメトリクス) にする関数
+    
+    Args:
+        data (dict): APIのレスポンス (code, request_id, data を含む辞書)
+        processed_at (str): processed_at 列の値 ('YYYY-MM-DD HH:MM:SS'、None なら現在時刻)
+        
+    Returns:
+        list: 行の辞書のリスト
+    """
+    flattened_data = []
+    
+    # アカウント基本情報を抽出
+    account_info = {
+        'request_id': data.get('request_id', ''),
+        'username': data.get('data', {}).get('username', ''),
+        'display_name': data.get('data', {}).get('display_name', ''),
+        'total_likes': data.get('data', {}).get('total_likes', 0),
+        'followers_count': data.get('data', {}).get('followers_count', 0),
+        'processed_at': processed_at or datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    
+    # メトリクス配列をフラット化して各日付のデータを処理
+    for metric in data.get('data', {}).get('metrics', []):
+        row = account_info.copy()  # アカウント基本情報をコピー
+        
+        # メトリクス情報を追加
+        row.update({
+            'metrics_date': metric.get('date', ''),
+            'metrics_video_views': metric.get('video_views', 0),
+            'metrics_unique_video_views': metric.get('unique_video_views', 0),
+            'metrics_profile_views': metric.get('profile_views', 0),
+            'metrics_comments': metric.get('comments', 0),
+            'metrics_shares': metric.get('shares', 0),
+            'metrics_engaged_audience': metric.get('engaged_audience', 0),
+            'metrics_bio_link_clicks': metric.get('bio_link_clicks', 0)
+        })
+        
+        flattened_data.append(row)
+    return flattened_data
+
 def upload_tiktok_data_to_bigquery(json_data, project_id, dataset_id, table_id, service_account_file):
     """
     TikTokのAPIデータをBigQueryにアップロードする関数
@@ -58,35 +101,7 @@ def upload_tiktok_data_to_bigquery(json_data, project_id, dataset_id, table_id,
             return False
         
         # アカウント情報とメトリクス情報をフラット化
-        flattened_data = []
-        
-        # アカウント基本情報を抽出
-        account_info = {
-            'request_id': data.get('request_id', ''),
-            'username': data.get('data', {}).get('username', ''),
-            'display_name': data.get('data', {}).get('display_name', ''),
-            'total_likes': data.get('data', {}).get('total_likes', 0),
-            'followers_count': data.get('data', {}).get('followers_count', 0),
-            'processed_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # メトリクス配列をフラット化して各日付のデータを処理
-        for metric in data.get('data', {}).get('metrics', []):
-            row = account_info.copy()  # アカウント基本情報をコピー
-            
-            # メトリクス情報を追加
-            row.update({
-                'metrics_date': metric.get('date', ''),
-                'metrics_video_views': metric.get('video_views', 0),
-                'metrics_unique_video_views': metric.get('unique_video_views', 0),
-                'metrics_profile_views': metric.get('profile_views', 0),
-                'metrics_comments': metric.get('comments', 0),
-                'metrics_shares': metric.get('shares', 0),
-                'metrics_engaged_audience': metric.get('engaged_audience', 0),
-                'metrics_bio_link_clicks': metric.get('bio_link_clicks', 0)
-            })
-            
-            flattened_data.append(row)
+        flattened_data = flatten_profile(data)
         
         # データをBigQueryにアップロード
         if flattened_data:
@@ -104,11 +119,11 @@ def upload_tiktok_data_to_bigquery(json_data, project_id, dataset_id, table_id,
             job = client.load_table_from_json(flattened_data, table_ref, job_config=job_config)
             job.result()  # アップロード完了を待機
             
-            print(f"Successfully uploaded {len(flattened_data)} rows to {table_ref}")
+            logger.info("Successfully uploaded %s rows to %s", len(flattened_data), table_ref)
             return True
             
     except Exception as e:
-        print(f"Error uploading data to BigQuery: {str(e)}")
+        logger.error("Error uploading data to BigQuery: %s", str(e))
         logging.error(f"BigQuery upload error: {str(e)}")
         return False
 # 使用例
@@ -0,0 +1,110 @@
+"""
+複数の集計期間 (例: スプレッドシートの A2/B2 ユーザー指定期間と C2/D2 デフォルト期間) を
+まとめて取得するためのプランナー。
+/business/get/ は期間内の日別データ (metrics) を返すので、重なっている・隣接している期間は
+1回のリクエストにまとめて取得し、あとから期間ごとに集計する
+(レスポンスの変換は profile_metrics で1回だけ行い、各期間は累積和から求める)。
+"""
+
+import datetime
+
+from testGetProfileRefactaring import request_profile_data, print_aggregate_result, FIELDS_LIST
+from profile_metrics import aggregate_windows
+from profile_store import fetch_profile_with_store
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def _to_date(date_str):
+    return datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+
+
+def merge_periods(periods):
+    """
+    重なっている、または隣接している期間 (終了日の翌日が次の開始日) を1つにまとめる関数。
+
+    Args:
+        periods (list): (start_date, end_date) のタプルのリスト ('YYYY-MM-DD')
+
+    Returns:
+        list: まとめた後の (start_date, end_date) のタプルのリスト (開始日順)
+    """
+    valid = []
+    for start_date, end_date in periods:
+        if not start_date or not end_date:
+            continue
+        start, end = _to_date(start_date), _to_date(end_date)
+        if start > end:
+            start, end = end, start
+        valid.append((start, end))
+
+    merged = []
+    for start, end in sorted(valid):
+        if merged and start <= merged[-1][1] + datetime.timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return [(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) for start, end in merged]
+
+
+def plan_requests(periods):
+    """
+    各期間がどのリクエスト (まとめた期間) でカバーされるかの対応表を作る関数。
+
+    Returns:
+        dict: {(まとめた期間): [そこに含まれる元の期間, ...]} の辞書
+    """
+    plan = {window: [] for window in merge_periods(periods)}
+    for period in periods:
+        start_date, end_date = period
+        if not start_date or not end_date:
+            continue
+        lo, hi = sorted((start_date, end_date))
+        for window in plan:
+            # 'YYYY-MM-DD' 形式なので文字列比較で日付の前後が判定できる
+            if window[0] <= lo and hi <= window[1]:
+                plan[window].append(period)
+                break
+    return plan
+
+
+def fetch_profile_periods(periods, business_id, fields_list=FIELDS_LIST, access_token=None, store=None):
+    """
+    複数の期間の集計結果を、最小限の /business/get/ リクエストで取得する関数。
+
+    Args:
+        periods (list): (start_date, end_date) のタプルのリスト
+        business_id (str): TikTok Business ID
+        fields_list (list): 取得したいフィールドのリスト
+        access_token (str): 有効なアクセストークン
+        store (ProfileMetricsStore): 指定した場合、保存済みの日は API を呼ばずにローカルから集計する
+
+    Returns:
+        dict: {(start_date, end_date): 集計結果の辞書 (getProfileAPI と同じ形)} の辞書
+    """
+    results = {}
+    plan = plan_requests(periods)
+    logger.info("%s 期間を %s 回のリクエストにまとめて取得します: %s", len([p for p in periods if p[0] and p[1]]), len(plan), list(plan.keys()))
+
+    for (window_start, window_end), covered_periods in plan.items():
+        if store is not None:
+            response_data, error_info = fetch_profile_with_store(window_start, window_end, business_id, fields_list,
+                                                                 access_token, store, request_profile_data)
+        else:
+            response_data, error_info = request_profile_data(window_start, window_end, business_id, fields_list, access_token)
+        if response_data is None:
+            for period in covered_periods:
+                start_date, end_date = sorted(period)
+                # エラー情報の date_range は元の期間のものに差し替える
+                results[period] = dict(error_info, date_range=f"{start_date} から {end_date}") if error_info else None
+            continue
+
+        windows = [tuple(sorted(period)) for period in covered_periods]
+        for period, result in zip(covered_periods, aggregate_windows(response_data, windows)):
+            if "message" not in result:
+                print_aggregate_result(result)
+            results[period] = result
+
+    return results
@@ -0,0 +1,125 @@
+"""
+複数のビジネスアカウント・複数期間のプロフィールデータを並列に取得するバッチ処理。
+getProfileAPI は1回の呼び出しでブロッキングするHTTPリクエストを1本投げるだけなので、
+スレッドプールで同時に走らせれば、全体の所要時間はおおむね「一番遅いアカウントのレイテンシ」になる。
+同じアカウントの複数期間は period_planner で1回のリクエストにまとめてから投げる。
+"""
+
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from testGetProfileRefactaring import FIELDS_LIST
+from period_planner import fetch_profile_periods
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# 同時に投げるリクエスト数の上限 (環境変数で上書き可能)
+DEFAULT_MAX_WORKERS = int(os.getenv("TIKTOK_MAX_WORKERS", "8"))
+
+
+def fetch_profiles_concurrently(jobs, fields_list=FIELDS_LIST, max_workers=DEFAULT_MAX_WORKERS, store=None):
+    """
+    (business_id, access_token, (start_date, end_date)) のジョブ一覧を並列に実行し、
+    終わったものから順に結果を返すジェネレータ。
+
+    Args:
+        jobs (list): (business_id, access_token, (start_date, end_date)) のタプルのリスト
+        fields_list (list): 取得したいフィールドのリスト
+        max_workers (int): 同時実行数の上限
+        store (ProfileMetricsStore): 指定した場合、保存済みの日は API を呼ばずにローカルから集計する
+
+    Yields:
+        tuple: (job, result) のタプル。result は getProfileAPI と同じ集計結果の辞書
+               (エラー時はエラー情報の辞書、または None)
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+
+    # 同じアカウント (business_id, access_token) のジョブは1つのタスクにまとめる
+    account_jobs = {}
+    for job in jobs:
+        business_id, access_token, _ = job
+        account_jobs.setdefault((business_id, access_token), []).append(job)
+
+    # タスク数より多いスレッドを立てても意味がないので絞る
+    workers = max(1, min(max_workers, len(account_jobs)))
+    logger.info("=== バッチ取得開始: %s ジョブ / %s アカウント (同時実行数: %s) ===", len(jobs), len(account_jobs), workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        future_to_account = {}
+        for (business_id, access_token), grouped_jobs in account_jobs.items():
+            periods = [tuple(period) for _, _, period in grouped_jobs]
+            future = executor.submit(fetch_profile_periods, periods, business_id, fields_list, access_token, store)
+            future_to_account[future] = grouped_jobs
+
+        for future in as_completed(future_to_account):
+            grouped_jobs = future_to_account[future]
+            try:
+                period_results = future.result()
+            except Exception as e:
+                # 取得処理の中で例外は握りつぶしているはずだが、念のためアカウント単位で閉じ込める
+                business_id = grouped_jobs[0][0]
+                logger.error("エラー: アカウント %s の取得中に予期せぬエラー: %s", business_id, e)
+                period_results = {}
+                for _, _, (start_date, end_date) in grouped_jobs:
+                    period_results[(start_date, end_date)] = {"message": "予期せぬ処理エラー", "error_details": str(e), "date_range": f"{start_date} から {end_date}"}
+            for job in grouped_jobs:
+                yield job, period_results.get(tuple(job[2]))
+
+    logger.info("=== バッチ取得終了 ===")
+
+
+def fetch_profiles(jobs, fields_list=FIELDS_LIST, max_workers=DEFAULT_MAX_WORKERS, store=None):
+    """
+    fetch_profiles_concurrently の結果を business_id ごとにまとめて返す関数。
+
+    Returns:
+        dict: {business_id: {(start_date, end_date): result}} の辞書
+    """
+    results = {}
+    for (business_id, _, period), result in fetch_profiles_concurrently(jobs, fields_list, max_workers, store):
+        results.setdefault(business_id, {})[tuple(period)] = result
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="複数のビジネスアカウントのプロフィールデータを並列に取得する")
+    parser.add_argument("--business-ids", default=os.getenv("TIKTOK_BUSINESS_IDS", os.getenv("TIKTOK_BUSINESS_ID", "")),
+                        help="カンマ区切りのBusiness ID (既定: 環境変数 TIKTOK_BUSINESS_IDS / TIKTOK_BUSINESS_ID)")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="同時に投げるリクエスト数の上限 (既定: %(default)s)")
+    parser.add_argument("--no-store", action="store_true",
+                        help="ローカルの ProfileMetricsStore を使わず、毎回全期間を API から取得する")
+    return parser.parse_args(argv)
+
+
+# --- メイン処理 ---
+if __name__ == '__main__':
+    args = parse_args()
+
+    # トークン取得・スプレッドシート読み込みは引数の確認が済んでから行う (--help では何も通信しない)
+    from getDateforProfile import get_dates_from_sheet
+    from lazy_clients import get_access_token
+    from profile_store import ProfileMetricsStore
+
+    # カンマ区切りで複数のBusiness IDを指定 (未設定なら TIKTOK_BUSINESS_ID の1件のみ)
+    business_ids = [b.strip() for b in args.business_ids.split(",") if b.strip()]
+    if not business_ids:
+        logger.error("エラー: 環境変数 'TIKTOK_BUSINESS_IDS' または 'TIKTOK_BUSINESS_ID' が設定されていません。")
+        exit()
+
+    access_token = get_access_token()
+    if not access_token:
+        logger.error("エラー: アクセストークンの取得に失敗しました。処理を中断します。")
+        exit()
+
+    user_start_date, user_end_date, default_start_date, default_end_date = get_dates_from_sheet()
+    periods = [p for p in [(default_start_date, default_end_date), (user_start_date, user_end_date)] if p[0] and p[1]]
+
+    jobs = [(business_id, access_token, period) for business_id in business_ids for period in periods]
+    store = None if args.no_store else ProfileMetricsStore()
+    for (business_id, _, (start_date, end_date)), result in fetch_profiles_concurrently(jobs, max_workers=args.max_workers, store=store):
+        logger.info("完了: %s (%s - %s) -> %s", business_id, start_date, end_date, result)
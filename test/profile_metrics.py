@@ -0,0 +1,209 @@
+"""
+/business/get/ の日別データ (metrics) を複数の期間でまとめて集計するためのエンジン。
+metrics を1回だけ日付インデックス付きの NumPy 配列に変換し、合計対象カラムは累積和を前計算しておく。
+そうすると任意の (開始日, 終了日) の合計は累積和の引き算、増加分は期間内の最初と最後の日の値の差で
+それぞれ O(1) で求められるので、週次・月次比較のように何百個も期間がある場合でも pandas を毎回回さずに済む。
+"""
+
+import math
+
+import numpy as np
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# aggregate_data で使用するカラムリスト
+AGGREGATE_SUM_COLUMNS = ["unique_video_views", "engaged_audience", "shares",
+                         "video_views", "profile_views", "comments", "bio_link_clicks"]
+AGGREGATE_INCREASE_COLUMNS = ["followers_count", "total_likes"]
+AGGREGATE_INFO_COLUMNS = ["username", "display_name"]
+
+
+def _to_float(value):
+    """数値に変換できない値は NaN にする (pd.to_numeric(errors='coerce') 相当)"""
+    if value is None or isinstance(value, bool):
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _to_day(value):
+    """'YYYY-MM-DD' (または先頭がその形式の文字列) を日単位の datetime64 に変換する。変換できなければ None"""
+    if value is None:
+        return None
+    try:
+        return np.datetime64(str(value)[:10], 'D')
+    except ValueError:
+        return None
+
+
+def _as_number(value):
+    """整数として表せる値は int、NaN はそのまま、それ以外は float で返す (シートに書きやすい形にする)"""
+    if isinstance(value, float) and not math.isnan(value) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ProfileMetricsSeries:
+    """
+    1つのAPIレスポンスの metrics を日付インデックス付きの配列として持ち、任意の期間を集計するクラス。
+    日付は最初の日から最後の日までの連続した日 (データがない日は0件) として扱う。
+    """
+
+    def __init__(self, data_dict):
+        self.account_info = {
+            "username": data_dict.get("username", "不明"),
+            "display_name": data_dict.get("display_name", "不明"),
+            "followers_count_total": _as_number(_to_float(data_dict.get("followers_count"))), # 期間終了時点の累計
+            "total_likes_total": _as_number(_to_float(data_dict.get("total_likes")))          # 期間終了時点の累計
+        }
+
+        rows = []
+        columns = set()
+        for row in data_dict.get("metrics") or []:
+            if not isinstance(row, dict):
+                continue
+            columns.update(row.keys())
+            day = _to_day(row.get("date"))
+            if day is not None:
+                rows.append((day, row))
+        self.columns = columns
+        self.has_dates = bool(rows)
+
+        if not rows:
+            self.origin = None
+            self.size = 0
+            return
+
+        # 日付順に並べる (同じ日付が複数ある場合は後ろの行の値を増加分計算に使う)
+        rows.sort(key=lambda item: item[0])
+        days = np.array([day for day, _ in rows], dtype='datetime64[D]')
+        self.origin = days[0]
+        self.size = int((days[-1] - days[0]).astype(int)) + 1
+        index = (days - self.origin).astype(np.int64)
+
+        # その日にデータがあるかどうか (行数) の累積和
+        present = np.zeros(self.size, dtype=np.int64)
+        np.add.at(present, index, 1)
+        self.row_prefix = np.concatenate(([0], np.cumsum(present)))
+
+        # 各位置から見て「次に/前に」データがある日の位置 (期間内の最初と最後の日を O(1) で引くため)
+        positions = np.arange(self.size)
+        self.next_present = np.minimum.accumulate(np.where(present > 0, positions, self.size)[::-1])[::-1]
+        self.prev_present = np.maximum.accumulate(np.where(present > 0, positions, -1))
+
+        # 合計対象カラム: NaN は0として日ごとに足し込み、累積和を前計算
+        self.sum_prefix = {}
+        for col in AGGREGATE_SUM_COLUMNS:
+            if col not in columns:
+                continue
+            values = np.array([_to_float(row.get(col)) for _, row in rows], dtype=np.float64)
+            daily = np.zeros(self.size, dtype=np.float64)
+            np.add.at(daily, index, np.nan_to_num(values, nan=0.0))
+            self.sum_prefix[col] = np.concatenate(([0.0], np.cumsum(daily)))
+
+        # 増加分カラム: 日ごとの値 (NaN は計算不可の判定に使うのでそのまま残す)
+        self.daily_values = {}
+        for col in AGGREGATE_INCREASE_COLUMNS:
+            if col not in columns:
+                continue
+            values = np.array([_to_float(row.get(col)) for _, row in rows], dtype=np.float64)
+            daily = np.full(self.size, np.nan, dtype=np.float64)
+            daily[index] = values # 同じ日付が複数ある場合は後ろの行が残る
+            self.daily_values[col] = daily
+
+    def _bounds(self, start_date_str, end_date_str):
+        """期間を配列上の位置 [lo, hi] に変換する。期間内にデータの日が1つもなければ None"""
+        start, end = _to_day(start_date_str), _to_day(end_date_str)
+        if start is None or end is None or not self.has_dates:
+            return None
+        lo = max(0, int((start - self.origin).astype(int)))
+        hi = min(self.size - 1, int((end - self.origin).astype(int)))
+        if lo > hi or self.row_prefix[hi + 1] - self.row_prefix[lo] == 0:
+            return None
+        return lo, hi
+
+    def aggregate(self, start_date_str, end_date_str):
+        """
+        指定期間の集計結果を aggregate_data と同じ形の辞書で返す関数。
+
+        Args:
+            start_date_str (str): 集計対象期間の開始日 ('YYYY-MM-DD')
+            end_date_str (str): 集計対象期間の終了日 ('YYYY-MM-DD')
+
+        Returns:
+            dict: 集計結果の辞書
+        """
+        result = {}
+        result["date_range"] = f"{start_date_str} から {end_date_str}"
+        result.update(self.account_info) # アカウント情報をマージ (累計値もここに含まれる)
+
+        if not self.has_dates:
+            for col in AGGREGATE_SUM_COLUMNS:
+                result[col] = 0
+            for col in AGGREGATE_INCREASE_COLUMNS:
+                result[f"{col}_increase"] = "計算不可 (日別データ/dateカラムなし)"
+            return result
+
+        bounds = self._bounds(start_date_str, end_date_str)
+
+        # --- 数値データの合計 (期間内の合計) ---
+        for col in AGGREGATE_SUM_COLUMNS:
+            prefix = self.sum_prefix.get(col)
+            if bounds is None or prefix is None:
+                result[col] = 0
+            else:
+                lo, hi = bounds
+                result[col] = _as_number(float(prefix[hi + 1] - prefix[lo]))
+
+        # --- 増加分の計算 (期間内の最初と最後の日の値の差) ---
+        if bounds is None:
+            for col in AGGREGATE_INCREASE_COLUMNS:
+                result[f"{col}_increase"] = "計算不可 (期間内データなし)"
+            return result
+
+        first = int(self.next_present[bounds[0]])
+        last = int(self.prev_present[bounds[1]])
+        for col in AGGREGATE_INCREASE_COLUMNS:
+            daily = self.daily_values.get(col)
+            if first == last:
+                result[f"{col}_increase"] = 0 # 期間内のデータが1日分しかない場合は増加分0
+            elif daily is None:
+                result[f"{col}_increase"] = "計算不可 (カラムなし)"
+            elif math.isnan(daily[first]) or math.isnan(daily[last]):
+                result[f"{col}_increase"] = "計算不可"
+            else:
+                result[f"{col}_increase"] = _as_number(float(daily[last] - daily[first]))
+        return result
+
+    def aggregate_many(self, windows):
+        """複数の (start_date, end_date) をまとめて集計する関数"""
+        return [self.aggregate(start_date_str, end_date_str) for start_date_str, end_date_str in windows]
+
+
+def aggregate_windows(response_data, windows):
+    """
+    APIレスポンスを1回だけ配列に変換し、複数の期間の集計結果を返す関数。
+
+    Args:
+        response_data (dict): APIからのレスポンスJSONデータ
+        windows (list): (start_date, end_date) のタプルのリスト
+
+    Returns:
+        list: 期間ごとの集計結果の辞書のリスト (windows と同じ順番)
+    """
+    if "data" not in response_data or not isinstance(response_data["data"], dict):
+        logger.warning("警告: レスポンスに 'data' キーがないか、辞書形式ではありません。")
+        if "message" in response_data:
+            logger.info("APIメッセージ: %s", response_data['message'])
+        return [{"message": "データ形式不正", "date_range": f"{s} から {e}"} for s, e in windows]
+
+    data_dict = response_data["data"]
+    if "metrics" not in data_dict or not isinstance(data_dict["metrics"], list):
+        logger.warning("警告: レスポンスの 'data' 内に 'metrics' キーがないか、リスト形式ではありません。")
+        return [{"message": "日別データ(metrics)なし", "date_range": f"{s} から {e}"} for s, e in windows]
+
+    return ProfileMetricsSeries(data_dict).aggregate_many(windows)
+
@@ -0,0 +1,218 @@
+"""
+/business/get/ の日別データ (metrics) を (business_id, date) 単位でローカルの SQLite に保存するストア。
+API は直近およそ60日分しか返さないので、一度取得した日はここから読み出し、
+まだ持っていない日 (と、数値が確定していない直近の数日) だけを API に取りに行く。
+60日より前のデータもここに残るので、APIの期間を超えた履歴の集計にも使える。
+field_projection でリクエストするフィールドを絞っているので、日ごとにどのフィールドを
+取得済みかも保存し、足りないフィールドがある日は取り直す。
+"""
+
+import json
+import datetime
+import threading
+
+from local_db import connect
+from field_projection import PROFILE_FIELDS
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# API から取得できるのは今日から何日前までか
+API_HORIZON_DAYS = 60
+# 直近の数日は数値が後から更新されることがあるので、保存済みでも毎回取り直す
+REFRESH_RECENT_DAYS = 3
+
+
+def _to_date(date_str):
+    return datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+
+
+def _to_str(date_obj):
+    return date_obj.strftime('%Y-%m-%d')
+
+
+def _parse_fields(value):
+    # fields 列が NULL の行 (この列を追加する前に保存した行) は全フィールドで取得していた
+    if value is None:
+        return set(PROFILE_FIELDS)
+    return {field for field in value.split(",") if field}
+
+
+class ProfileMetricsStore:
+    """
+    日別メトリクスとアカウント情報 (username, followers_count など) を保存するクラス。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS profile_daily_metrics (
+                    business_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    metrics_json TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL,
+                    fields TEXT,
+                    PRIMARY KEY (business_id, date)
+                )
+            """)
+            # fields 列がない古いDBには列を追加する (NULL の行は全フィールド取得済みとみなす)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(profile_daily_metrics)")}
+            if "fields" not in columns:
+                self.conn.execute("ALTER TABLE profile_daily_metrics ADD COLUMN fields TEXT")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS profile_accounts (
+                    business_id TEXT PRIMARY KEY,
+                    account_json TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL
+                )
+            """)
+
+    def save_response(self, business_id, response_data, fields_list=None):
+        """
+        APIレスポンスの日別データとアカウント情報を保存する関数。
+        同じ日付がすでにある場合は、保存済みの値に今回の値を上書きでマージする
+        (今回リクエストしなかったフィールドの値は残す)。
+
+        Args:
+            business_id (str): TikTok Business ID
+            response_data (dict): /business/get/ のレスポンス
+            fields_list (list): このレスポンスをリクエストしたときの fields (None なら全フィールド)
+
+        Returns:
+            int: 保存した日別データの件数
+        """
+        data_dict = response_data.get("data") if isinstance(response_data, dict) else None
+        if not isinstance(data_dict, dict):
+            return 0
+
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        fetched_fields = set(fields_list or PROFILE_FIELDS)
+        metrics = {}
+        for metric in data_dict.get("metrics") or []:
+            if isinstance(metric, dict) and metric.get("date"):
+                metrics[str(metric["date"])[:10]] = metric
+        account = {k: v for k, v in data_dict.items() if k != "metrics"}
+
+        with self._lock, self.conn:
+            existing = {}
+            if metrics:
+                cursor = self.conn.execute(
+                    "SELECT date, metrics_json, fields FROM profile_daily_metrics WHERE business_id = ? AND date BETWEEN ? AND ?",
+                    (business_id, min(metrics), max(metrics)),
+                )
+                existing = {row[0]: (json.loads(row[1]), _parse_fields(row[2])) for row in cursor}
+
+            rows = []
+            for date, metric in metrics.items():
+                merged, fields = dict(metric), set(fetched_fields)
+                if date in existing:
+                    old_metric, old_fields = existing[date]
+                    merged = {**old_metric, **metric}
+                    fields |= old_fields
+                rows.append((business_id, date, json.dumps(merged, ensure_ascii=False), now, ",".join(sorted(fields))))
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO profile_daily_metrics (business_id, date, metrics_json, fetched_at, fields) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            if account:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO profile_accounts (business_id, account_json, fetched_at) VALUES (?, ?, ?)",
+                    (business_id, json.dumps(account, ensure_ascii=False), now),
+                )
+        return len(rows)
+
+    def stored_dates(self, business_id, start_date, end_date, fields_list=None):
+        """
+        期間内で保存済みの日付を返す関数。fields_list を指定した場合は、
+        そのフィールドを全て取得済みの日だけを返す。
+        """
+        required = set(fields_list or [])
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT date, fields FROM profile_daily_metrics WHERE business_id = ? AND date BETWEEN ? AND ?",
+                (business_id, start_date, end_date),
+            )
+            return {row[0] for row in cursor if required <= _parse_fields(row[1])}
+
+    def missing_ranges(self, business_id, start_date, end_date, today=None, fields_list=None):
+        """
+        期間内で API から取り直す必要がある日を、連続した (start_date, end_date) の区間にまとめて返す関数。
+        API で取得できない古い日 (API_HORIZON_DAYS より前) は対象外。
+        fields_list のうち未取得のフィールドがある日も取り直す対象になる。
+
+        Returns:
+            list: (start_date, end_date) のタプルのリスト
+        """
+        today = today or datetime.date.today()
+        start, end = sorted((_to_date(start_date), _to_date(end_date)))
+        horizon = today - datetime.timedelta(days=API_HORIZON_DAYS)
+        refresh_from = today - datetime.timedelta(days=REFRESH_RECENT_DAYS)
+        stored = self.stored_dates(business_id, _to_str(start), _to_str(end), fields_list)
+
+        ranges = []
+        day = max(start, horizon)
+        while day <= end:
+            if day >= refresh_from or _to_str(day) not in stored:
+                if ranges and ranges[-1][1] == day - datetime.timedelta(days=1):
+                    ranges[-1] = (ranges[-1][0], day)
+                else:
+                    ranges.append((day, day))
+            day += datetime.timedelta(days=1)
+        return [(_to_str(s), _to_str(e)) for s, e in ranges]
+
+    def build_response(self, business_id, start_date, end_date):
+        """
+        保存済みのデータから、/business/get/ のレスポンスと同じ形の辞書を組み立てる関数。
+        aggregate_data / profile_metrics にそのまま渡せる。
+        """
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT metrics_json FROM profile_daily_metrics WHERE business_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (business_id, start_date, end_date),
+            )
+            metrics = [json.loads(row[0]) for row in cursor]
+            account_row = self.conn.execute(
+                "SELECT account_json FROM profile_accounts WHERE business_id = ?", (business_id,)
+            ).fetchone()
+
+        data_dict = json.loads(account_row[0]) if account_row else {}
+        data_dict["metrics"] = metrics
+        return {"code": 0, "message": "OK (local store)", "data": data_dict}
+
+
+def fetch_profile_with_store(start_date, end_date, business_id, fields_list, access_token, store, request_func):
+    """
+    ストアに足りない日だけを API から取得して保存し、期間全体のレスポンスをストアから組み立てる関数。
+
+    Args:
+        start_date (str): 期間の開始日 ('YYYY-MM-DD')
+        end_date (str): 期間の終了日 ('YYYY-MM-DD')
+        business_id (str): TikTok Business ID
+        fields_list (list): 取得したいフィールドのリスト
+        access_token (str): 有効なアクセストークン
+        store (ProfileMetricsStore): 保存先のストア
+        request_func (callable): 実際に API を呼ぶ関数 (testGetProfileRefactaring.request_profile_data)
+
+    Returns:
+        tuple: (response_data, error_info) のタプル (request_profile_data と同じ形)
+    """
+    gaps = store.missing_ranges(business_id, start_date, end_date, fields_list=fields_list)
+    if gaps:
+        logger.info("ローカルに無い期間だけ API から取得します (%s): %s", business_id, gaps)
+    else:
+        logger.info("期間 %s - %s は全てローカルのデータから集計します (%s)。", start_date, end_date, business_id)
+
+    for gap_start, gap_end in gaps:
+        response_data, error_info = request_func(gap_start, gap_end, business_id, fields_list, access_token)
+        if response_data is None:
+            return None, error_info
+        if response_data.get("code", 0) != 0:
+            # API がエラーを返した場合は保存せず、そのまま呼び出し側に返す
+            return response_data, None
+        saved = store.save_response(business_id, response_data, fields_list)
+        logger.info("%s - %s の日別データを %s 件保存しました。", gap_start, gap_end, saved)
+
+    return store.build_response(business_id, *sorted((start_date, end_date))), None
@@ -0,0 +1,208 @@
+"""
+TikTok Business API 呼び出しのレート制限 (QPS) を管理するスケジューラ。
+アプリ単位と business_id 単位のトークンバケットを持ち、両方のバケットから
+トークンを取れたときだけリクエストを送る。
+レート制限エラーが返ってきた場合はジッター付きの指数バックオフで待ってから再キューし、
+そのバケットの流量を半分に落とす (成功が続けば少しずつ元の流量まで戻す)。
+"""
+
+import os
+import re
+import time
+import random
+import threading
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# --- 設定 (環境変数で上書き可能) ---
+# アプリ全体で1秒あたりに送るリクエスト数の上限
+APP_QPS = float(os.getenv("TIKTOK_APP_QPS", "10"))
+# 1つの business_id あたりで1秒あたりに送るリクエスト数の上限
+BUSINESS_QPS = float(os.getenv("TIKTOK_BUSINESS_QPS", "5"))
+# レート制限時の再試行回数とバックオフ (秒)
+MAX_RETRIES = int(os.getenv("TIKTOK_RATE_LIMIT_RETRIES", "6"))
+BACKOFF_BASE = float(os.getenv("TIKTOK_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("TIKTOK_BACKOFF_MAX", "60.0"))
+
+# TikTok がレート制限時に返すレスポンスの code (HTTPステータスは200のまま返ってくる)
+# 40100: Requests made too frequently
+RATE_LIMIT_CODES = {40100}
+
+# レスポンス先頭の "code": 12345 を読むための正規表現 (ボディ全体をJSONパースしないため)
+_CODE_PATTERN = re.compile(rb'"code"\s*:\s*(\d+)')
+# 流量を落としたときの下限 (元の流量に対する割合)
+_MIN_RATE_RATIO = 0.1
+# 成功1回あたりに戻す流量 (元の流量に対する割合)
+_RECOVERY_RATIO = 0.05
+
+
+class TokenBucket:
+    """
+    トークンバケット1つ分。rate (トークン/秒) で補充され、capacity まで貯まる。
+    スレッドセーフにするためのロックは RateLimitScheduler 側で持つ。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.throttled_count = 0
+
+    def refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, tokens=1.0):
+        """トークンが tokens 個貯まるまでの秒数 (すでにあれば0)"""
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def throttled(self):
+        """レート制限を受けたとき: 流量を半分にしてバケットを空にする"""
+        self.throttled_count += 1
+        self.rate = max(self.max_rate * _MIN_RATE_RATIO, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        """成功したとき: 流量を少しずつ元に戻す"""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * _RECOVERY_RATIO)
+
+    def headroom(self):
+        return {
+            "tokens": round(max(self.tokens, 0.0), 3),
+            "capacity": self.capacity,
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "throttled_count": self.throttled_count,
+        }
+
+
+class RateLimitScheduler:
+    """
+    アプリ単位 + business_id 単位のトークンバケットでリクエストを流すスケジューラ。
+    """
+
+    def __init__(self, app_qps=APP_QPS, business_qps=BUSINESS_QPS, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.app_bucket = TokenBucket(app_qps)
+        self.business_qps = business_qps
+        self.business_buckets = {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+
+    def _buckets_for(self, business_id):
+        buckets = [self.app_bucket]
+        if business_id:
+            bucket = self.business_buckets.get(business_id)
+            if bucket is None:
+                bucket = TokenBucket(self.business_qps)
+                self.business_buckets[business_id] = bucket
+            buckets.append(bucket)
+        return buckets
+
+    def acquire(self, business_id=None):
+        """
+        アプリと business_id の両方のバケットからトークンを1つずつ取れるまで待つ。
+        片方だけ消費して待つことがないよう、両方そろったときにまとめて消費する。
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = self._buckets_for(business_id)
+                for bucket in buckets:
+                    bucket.refill(now)
+                wait = max(bucket.wait_time() for bucket in buckets)
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.tokens -= 1
+                    return
+            time.sleep(wait)
+
+    def on_success(self, business_id=None):
+        with self._lock:
+            for bucket in self._buckets_for(business_id):
+                bucket.succeeded()
+
+    def on_throttled(self, business_id, attempt, retry_after=None):
+        """
+        レート制限を受けたときに呼ぶ。流量を落とし、ジッター付きの指数バックオフで待つ。
+
+        Args:
+            business_id (str): 制限を受けたリクエストの business_id
+            attempt (int): 何回目の再試行か (0始まり)
+            retry_after (float): サーバーから Retry-After が返ってきた場合の秒数
+        """
+        with self._lock:
+            for bucket in self._buckets_for(business_id):
+                bucket.throttled()
+        # Full Jitter: 0 〜 min(上限, base * 2^attempt) の一様乱数
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            delay = max(delay, retry_after)
+        logger.info("レート制限を検知しました (business_id=%s, 試行%s回目)。%.2f秒待機して再キューします。", business_id, attempt + 1, delay)
+        time.sleep(delay)
+
+    def quota_headroom(self):
+        """
+        現在のクォータの余裕を返す関数 (大量のバックフィル時に流量を調整する目安)。
+
+        Returns:
+            dict: {"app": {...}, "business": {business_id: {...}}} の辞書
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.app_bucket.refill(now)
+            business = {}
+            for business_id, bucket in self.business_buckets.items():
+                bucket.refill(now)
+                business[business_id] = bucket.headroom()
+            return {"app": self.app_bucket.headroom(), "business": business}
+
+
+def is_rate_limited(response, stream=False):
+    """
+    レスポンスがレート制限によるものかを判定する関数。
+    TikTok はHTTP 200で code=40100 を返すので、ボディ先頭の code も確認する。
+    """
+    if response.status_code == 429:
+        return True
+    if stream or response.status_code != 200:
+        return False
+    match = _CODE_PATTERN.search(response.content[:256])
+    return bool(match) and int(match.group(1)) in RATE_LIMIT_CODES
+
+
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """プロセス内で共有するスケジューラを返す関数 (初回呼び出し時に作成)"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateLimitScheduler()
+    return _scheduler
+
+
+def quota_headroom():
+    """共有スケジューラのクォータの余裕を返す"""
+    return get_scheduler().quota_headroom()
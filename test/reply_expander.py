@@ -0,0 +1,199 @@
+"""
+返信が増えたコメントだけ、返信の一覧 (business/comment/reply/list/) を取得するモジュール。
+コメントには replies (返信数) と comment_id が入っているが、これまで返信はどこでも取得していなかった。
+全てのスレッドを毎回たどり直すのではなく、comment_crawler が保存した返信数と
+「前回展開したときの返信数」(replies_expanded) を比べて、増えたスレッドだけを取得する。
+
+返信の取得はコメント一覧のクロールとは別のスレッドプール (REPLY_WORKERS 本) で動かすので、
+返信の多い動画があってもコメント一覧のワーカーが返信の取得で埋まることはない
+(リクエストの流量は api_client の共通のレート制限に従う)。
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import api_get
+from testGetComments import fetch_comments, save_comments, MAX_COMMENTS_PER_PAGE
+from comment_crawler import CommentCrawlStore, SORT_PARAMS
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+REPLY_LIST_PATH = "business/comment/reply/list/"
+# 返信の取得に使うスレッドの数 (コメント一覧のワーカーより少なくしておく)
+REPLY_WORKERS = int(os.getenv("TIKTOK_REPLY_WORKERS", "2"))
+# 返信数を更新するために、返信の多い順に取得するコメント一覧のページ数
+REFRESH_PAGES = int(os.getenv("TIKTOK_REPLY_REFRESH_PAGES", "1"))
+
+
+def fetch_replies(business_id, video_id, comment_id, access_token, cursor=None, max_count=MAX_COMMENTS_PER_PAGE):
+    """
+    コメント1件の返信を1ページ分取得する関数。
+
+    Returns:
+        dict: APIレスポンスの "data" ({"comments": [...], "cursor": ..., "has_more": ...})
+
+    Raises:
+        requests.exceptions.HTTPError: HTTPエラーが返ってきた場合
+        RuntimeError: API がエラー (code != 0) を返した場合
+    """
+    params = {"business_id": business_id, "video_id": video_id, "comment_id": comment_id,
+              "max_count": min(max_count, MAX_COMMENTS_PER_PAGE), **SORT_PARAMS}
+    if cursor is not None:
+        params["cursor"] = cursor
+    response = api_get(REPLY_LIST_PATH, access_token, params=params)
+    response.raise_for_status()
+    response_data = response.json()
+    if response_data.get("code", 0) != 0:
+        raise RuntimeError(f"返信一覧の取得に失敗しました (comment_id={comment_id}, code={response_data.get('code')}, message={response_data.get('message')})")
+    return response_data.get("data") or {}
+
+
+def refresh_reply_counts(business_id, video_id, access_token, store, max_pages=REFRESH_PAGES):
+    """
+    クロール済みのコメントの返信数を更新する関数。
+    comment_crawler の差分クロールは新しいコメントしか取得しないので、古いコメントの返信数は更新されない。
+    ここでは返信の多い順 (sort_field=replies) に max_pages ページだけ取得し、
+    返信が0件のコメントが出てきたらそこでやめる。
+    """
+    cursor = None
+    for _ in range(max_pages):
+        response_data = fetch_comments(video_id, business_id, access_token, cursor=cursor,
+                                       extra_params={"sort_field": "replies", "sort_order": "desc"})
+        data = response_data.get("data") or {}
+        comments = data.get("comments") or []
+        store.update_reply_counts(comments)
+        next_cursor = data.get("cursor")
+        if (not comments or not data.get("has_more") or not int(comments[-1].get("replies") or 0)
+                or next_cursor is None or next_cursor == cursor):
+            return
+        cursor = next_cursor
+
+
+def expand_thread(business_id, video_id, comment_id, access_token, store, sink=None, expected=None):
+    """
+    コメント1件の返信を新しい順にたどり、まだ見たことのない返信だけをページごとに sink に渡す関数。
+    ページは sink に渡してから取得済みとして記録するので、途中で失敗しても保存した返信は失われない。
+
+    見たことのある返信が出てきたら、それより古い返信は取得済みなのでやめる。
+    ただし保存済みの返信がまだ expected 件に届いていない (前回の展開が途中で失敗した) 場合は、
+    取得済みのページを読み飛ばして先に進む。
+
+    Args:
+        sink (callable): sink(video_id, comment_id, replies) で新しい返信を保存する関数 (None なら保存しない)
+        expected (int): 最後までたどったときに保存済みになるはずの返信の件数
+                        (None なら見たことのある返信が出てきた時点でやめる)
+
+    Returns:
+        int: 新しい返信の件数
+    """
+    new_count = 0
+    cursor = None
+    while True:
+        data = fetch_replies(business_id, video_id, comment_id, access_token, cursor)
+        page = data.get("comments") or []
+        known = store.known_ids(str(r["comment_id"]) for r in page if r.get("comment_id") is not None)
+        fresh = [r for r in page if r.get("comment_id") is not None and str(r["comment_id"]) not in known]
+        # 保存できたページだけを取得済みにする (sink で例外が出たらこのページは記録しない)
+        if fresh and sink is not None:
+            sink(video_id, comment_id, fresh)
+        store.record_replies(video_id, comment_id, fresh)
+        new_count += len(fresh)
+
+        next_cursor = data.get("cursor")
+        if not data.get("has_more") or not page or next_cursor is None or next_cursor == cursor:
+            return new_count
+        if known and (expected is None or store.reply_count(comment_id) >= expected):
+            return new_count
+        cursor = next_cursor
+
+
+def expand_video_replies(business_id, video_id, access_token, store, sink=None, refresh_pages=REFRESH_PAGES):
+    """
+    動画1本の、返信数が増えたコメントのスレッドだけを展開する関数。
+
+    Args:
+        sink (callable): sink(video_id, comment_id, replies) で新しい返信を保存する関数 (None なら保存しない)
+        refresh_pages (int): 先に返信数を更新するページ数 (0 ならクロールで取得した返信数だけを使う)
+
+    Returns:
+        int: 新しい返信の件数
+    """
+    if refresh_pages:
+        refresh_reply_counts(business_id, video_id, access_token, store, refresh_pages)
+
+    total = 0
+    threads = store.pending_reply_threads(video_id)
+    for comment_id, replies, replies_expanded, replies_seen in threads:
+        # 削除・非表示の返信は replies に数えられていても取得できないので、replies とは比べずに
+        # 前回の展開で取得できた件数に、そこから増えた返信数を足した件数まで取得できればやめる
+        expected = replies_seen + replies - replies_expanded
+        count = expand_thread(business_id, video_id, comment_id, access_token, store, sink, expected)
+        # 途中で失敗した場合は次回もう一度対象になるように、最後まで取得できてから記録する
+        store.mark_replies_expanded(comment_id, replies)
+        total += count
+    if threads:
+        logger.debug("返信の展開 (video_id=%s): スレッド%s件・新しい返信%s件", video_id, len(threads), total)
+    return total
+
+
+def save_new_replies(video_id, comment_id, replies):
+    """
+    新しい返信を tiktok_data/tiktok_comments_<video_id>_<日時>.json に保存する関数
+    (返信には親コメントの comment_id を parent_comment_id として入れる)。
+    """
+    rows = [{**reply, "parent_comment_id": comment_id} for reply in replies]
+    save_comments({"code": 0, "message": "OK", "data": {"comments": rows}}, video_id)
+
+
+class ReplyExpander:
+    """
+    返信の展開を、コメント一覧のクロールとは別のスレッドプールで実行するクラス。
+    comment_crawler.crawl_handler に渡すと、動画のクロールが終わるたびに submit される。
+    """
+
+    def __init__(self, store=None, max_workers=REPLY_WORKERS, sink=None, refresh_pages=REFRESH_PAGES):
+        self.store = store or CommentCrawlStore()
+        self.sink = sink
+        self.refresh_pages = refresh_pages
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="reply-expander")
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.stats = {"videos": 0, "replies": 0, "failed": []}
+
+    def submit(self, business_id, video_id, access_token):
+        """動画1本の返信の展開を予約する (同じ動画が実行待ちなら何もしない)"""
+        with self._lock:
+            if video_id in self._pending:
+                return
+            self._pending.add(video_id)
+        self._executor.submit(self._run, business_id, video_id, access_token)
+
+    def _run(self, business_id, video_id, access_token):
+        try:
+            count = expand_video_replies(business_id, video_id, access_token, self.store, self.sink, self.refresh_pages)
+        except Exception as e:
+            logger.error("返信の取得に失敗しました (video_id=%s): %s", video_id, e)
+            with self._lock:
+                self.stats["failed"].append(video_id)
+            return
+        finally:
+            with self._lock:
+                self._pending.discard(video_id)
+        with self._lock:
+            self.stats["videos"] += 1
+            self.stats["replies"] += count
+
+    def close(self):
+        """予約済みの展開が全て終わるまで待つ"""
+        self._executor.shutdown(wait=True)
+        logger.info("返信の展開: 動画%s本・新しい返信%s件 (失敗%s本)",
+                    self.stats["videos"], self.stats["replies"], len(self.stats["failed"]))
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
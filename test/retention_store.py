@@ -0,0 +1,363 @@
+"""
+動画の視聴維持率カーブ (video_view_retention) といいねの推移 (engagement_likes) を
+列指向の NumPy 配列で持ち、まとめて集計するモジュール。
+
+API のレスポンスではどちらも [{"second": "13", "percentage": 0.43}, ...] という辞書のリストで、
+second は文字列、順番もバラバラ。これを DataFrame の object 列のまま扱うと、
+集計のたびに Python で辞書を1つずつたどることになり、動画データの変換で一番遅い処理になっていた。
+
+ここでは1回だけパースして、全動画分を1本の配列にまとめる (CSR 形式):
+    seconds      : uint16  (全カーブの秒を連結したもの。カーブ内では昇順)
+    percentages  : float32 (seconds と同じ並び)
+    offsets      : int64   (i 番目のカーブは offsets[i]:offsets[i+1])
+離脱秒・曲線下面積・平均カーブは、この配列に対してループなしで計算する。
+カーブは item_id ごとにローカルの SQLite に BLOB で保存できる (RetentionStore)。
+"""
+
+import datetime
+import threading
+
+import numpy as np
+
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+RETENTION_FIELD = "video_view_retention"
+ENGAGEMENT_FIELD = "engagement_likes"
+CURVE_FIELDS = (RETENTION_FIELD, ENGAGEMENT_FIELD)
+
+# dropoff_seconds の既定のしきい値 (視聴維持率がこの値を下回った最初の秒)
+DROP_OFF_THRESHOLD = 0.5
+# mean_curve の既定のグリッド (動画の長さに対する位置 0%〜100% を1%刻み)
+DEFAULT_GRID = np.linspace(0.0, 1.0, 101)
+
+
+class RetentionCurves:
+    """
+    複数の動画のカーブをまとめて持つクラス (列指向・CSR 形式)。
+
+    Attributes:
+        item_ids (list): 動画ID (カーブの順番)
+        offsets (np.ndarray): int64, 長さ len(item_ids) + 1
+        seconds (np.ndarray): uint16, 全カーブの秒
+        percentages (np.ndarray): float32, 全カーブの値
+        durations (np.ndarray): float32, 動画の長さ (秒)。不明なら NaN
+    """
+
+    def __init__(self, item_ids, offsets, seconds, percentages, durations=None):
+        self.item_ids = list(item_ids)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.seconds = np.asarray(seconds, dtype=np.uint16)
+        self.percentages = np.asarray(percentages, dtype=np.float32)
+        if durations is None:
+            durations = np.full(len(self.item_ids), np.nan)
+        self.durations = np.asarray(durations, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @classmethod
+    def from_videos(cls, videos, field=RETENTION_FIELD):
+        """
+        /business/video/list/ の data.videos からカーブを取り出す関数。
+        辞書をたどるのはここでの1回だけで、秒の文字列もまとめて数値に変換する。
+        カーブがない (フィールドを取得していない・空) 動画は含めない。
+
+        Args:
+            videos (list): 動画の辞書のリスト
+            field (str): "video_view_retention" または "engagement_likes"
+        """
+        item_ids, lengths, durations = [], [], []
+        raw_seconds, raw_percentages = [], []
+        for video in videos:
+            points = video.get(field)
+            if not points or video.get("item_id") is None:
+                continue
+            item_ids.append(str(video["item_id"]))
+            lengths.append(len(points))
+            durations.append(video.get("video_duration") or np.nan)
+            raw_seconds.extend(point["second"] for point in points)
+            raw_percentages.extend(point["percentage"] for point in points)
+
+        offsets = np.zeros(len(item_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        seconds = np.array(raw_seconds, dtype=np.uint16)
+        percentages = np.array(raw_percentages, dtype=np.float32)
+
+        # カーブ内で秒の昇順に並べ替える (カーブの番号 → 秒 の順でソート)
+        curve_index = np.repeat(np.arange(len(item_ids)), lengths)
+        order = np.lexsort((seconds, curve_index))
+        return cls(item_ids, offsets, seconds[order], percentages[order], durations)
+
+    # --- 内部で使う補助配列 ---
+    def _lengths(self):
+        return np.diff(self.offsets)
+
+    def _curve_index(self):
+        return np.repeat(np.arange(len(self)), self._lengths())
+
+    def _nonempty(self):
+        return self._lengths() > 0
+
+    def curve(self, item_id):
+        """1本分のカーブを (seconds, percentages) で返す"""
+        i = self.item_ids.index(str(item_id))
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.seconds[start:end], self.percentages[start:end]
+
+    # --- 集計 ---
+    def dropoff_seconds(self, threshold=DROP_OFF_THRESHOLD):
+        """
+        各カーブで値が threshold を下回った最初の秒を返す関数。
+
+        Returns:
+            np.ndarray: int32。一度も下回らなかったカーブは -1
+        """
+        result = np.full(len(self), -1, dtype=np.int32)
+        if len(self.percentages) == 0:
+            return result
+        below = self.percentages < threshold
+        # 下回った点の位置のうち、各カーブで最初のもの (下回った点がなければカーブの終わり)
+        positions = np.where(below, np.arange(len(below)), len(below))
+        nonempty = self._nonempty()
+        first = np.full(len(self), len(below), dtype=np.int64)
+        first[nonempty] = np.minimum.reduceat(positions, self.offsets[:-1][nonempty])
+        found = first < self.offsets[1:]
+        result[found] = self.seconds[first[found]]
+        return result
+
+    def steepest_drop_seconds(self):
+        """
+        各カーブで、直前の点からの下がり幅が一番大きかった秒を返す関数。
+
+        Returns:
+            np.ndarray: int32。点が1つ以下のカーブは -1
+        """
+        result = np.full(len(self), -1, dtype=np.int32)
+        if len(self.percentages) < 2:
+            return result
+        y = self.percentages.astype(np.float64)
+        drops = np.empty_like(y)
+        drops[0] = -np.inf
+        drops[1:] = y[:-1] - y[1:]
+        # 各カーブの先頭の点は前のカーブとの差になってしまうので除外する
+        drops[self.offsets[:-1][self._nonempty()]] = -np.inf
+        valid = self._lengths() > 1
+        if not valid.any():
+            return result
+        # カーブごとの最大値の位置: カーブ → 下がり幅の順でソートし、カーブごとに最後の要素を取る
+        # (下がり幅が同じなら早い秒が最後に来るように、位置の降順も最後のキーに加える)
+        curve_index = self._curve_index()
+        order = np.lexsort((-np.arange(len(drops)), drops, curve_index))
+        last_positions = order[self.offsets[1:][valid] - 1]
+        result[valid] = self.seconds[last_positions]
+        return result
+
+    def auc(self, normalize=True):
+        """
+        各カーブの曲線下面積 (台形公式) を返す関数。
+
+        Args:
+            normalize (bool): True ならカーブの長さ (最後の秒 - 最初の秒) で割る
+                              (= 動画全体を通した平均の視聴維持率)
+
+        Returns:
+            np.ndarray: float64。点が1つ以下のカーブは NaN
+        """
+        result = np.full(len(self), np.nan)
+        if len(self.seconds) < 2:
+            return result
+        x = self.seconds.astype(np.float64)
+        y = self.percentages.astype(np.float64)
+        areas = np.empty_like(x)
+        areas[0] = 0.0
+        areas[1:] = (x[1:] - x[:-1]) * (y[1:] + y[:-1]) / 2
+        areas[self.offsets[:-1][self._nonempty()]] = 0.0
+        valid = self._lengths() > 1
+        totals = np.add.reduceat(areas, self.offsets[:-1][valid])
+        result[valid] = totals
+        if normalize:
+            span = x[self.offsets[1:][valid] - 1] - x[self.offsets[:-1][valid]]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[valid] = np.where(span > 0, totals / span, np.nan)
+        return result
+
+    def resample(self, grid=DEFAULT_GRID, relative=True):
+        """
+        全カーブを共通のグリッドに線形補間した行列を返す関数。
+
+        Args:
+            grid (array): 補間する位置
+            relative (bool): True なら grid はカーブの長さ (最後の秒) に対する割合 (0〜1)、False なら秒
+
+        Returns:
+            np.ndarray: float32, 形は (カーブの数, len(grid))。カーブの範囲外は NaN
+        """
+        grid = np.asarray(grid, dtype=np.float64)
+        n = len(self)
+        out = np.full((n, len(grid)), np.nan, dtype=np.float32)
+        valid = self._nonempty()
+        if not valid.any():
+            return out
+
+        curve_index = self._curve_index()
+        x = self.seconds.astype(np.float64)
+        first_x = x[self.offsets[:-1][valid]]
+        last_x = x[self.offsets[1:][valid] - 1]
+        if relative:
+            # 最後の秒で割って 0〜1 にする (長さの違う動画を同じ横軸で比べるため)
+            length = np.where(last_x > 0, last_x, 1.0)
+            scale = np.ones(n)
+            scale[valid] = length
+            x = x / scale[curve_index]
+            first_x, last_x = first_x / length, last_x / length
+
+        # カーブごとに x をずらして1本の単調増加な配列にし、np.interp を1回で済ませる
+        span = max(float(x.max()) if len(x) else 0.0, float(grid.max()) if len(grid) else 0.0) + 1.0
+        shift = curve_index * span * 2
+        keys = x + shift
+
+        rows = np.flatnonzero(valid)
+        query = grid[None, :] + (rows * span * 2)[:, None]
+        inside = (grid[None, :] >= first_x[:, None]) & (grid[None, :] <= last_x[:, None])
+        values = np.interp(query.ravel(), keys, self.percentages.astype(np.float64)).reshape(query.shape)
+        out[rows] = np.where(inside, values, np.nan)
+        return out
+
+    def mean_curve(self, grid=DEFAULT_GRID, relative=True):
+        """
+        全カーブを共通のグリッドに補間して平均したカーブを返す関数。
+
+        Returns:
+            tuple: (grid, 平均値の配列, 各点で値を持っていたカーブの数)
+        """
+        matrix = self.resample(grid, relative)
+        counts = np.sum(~np.isnan(matrix), axis=0)
+        with np.errstate(invalid="ignore"):
+            means = np.where(counts > 0, np.nansum(matrix, axis=0) / np.maximum(counts, 1), np.nan)
+        return np.asarray(grid), means.astype(np.float32), counts
+
+    def summary(self, threshold=DROP_OFF_THRESHOLD):
+        """
+        動画ごとの集計結果 (item_id → 離脱秒・最大の下がり幅の秒・平均維持率) を辞書で返す関数。
+        """
+        dropoff = self.dropoff_seconds(threshold)
+        steepest = self.steepest_drop_seconds()
+        auc = self.auc()
+        return {
+            item_id: {"dropoff_second": int(dropoff[i]), "steepest_drop_second": int(steepest[i]),
+                      "auc": None if np.isnan(auc[i]) else float(auc[i])}
+            for i, item_id in enumerate(self.item_ids)
+        }
+
+    def to_arrow(self):
+        """
+        pyarrow の ListArray (list<struct<second: uint16, percentage: float32>>) に変換する関数。
+        Parquet への書き出しや BigQuery へのロードに使う。
+        """
+        import pyarrow as pa
+        points = pa.StructArray.from_arrays(
+            [pa.array(self.seconds, type=pa.uint16()), pa.array(self.percentages, type=pa.float32())],
+            names=["second", "percentage"],
+        )
+        return pa.ListArray.from_arrays(pa.array(self.offsets.astype(np.int32)), points)
+
+
+class RetentionStore:
+    """
+    カーブを item_id ごとに SQLite に保存するクラス (配列はそのままの型で BLOB にする)。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_curves (
+                    item_id TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    duration REAL,
+                    seconds BLOB NOT NULL,
+                    percentages BLOB NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (item_id, field)
+                )
+            """)
+
+    def save(self, curves, field=RETENTION_FIELD):
+        """
+        カーブを保存する関数 (同じ item_id は上書き)。
+
+        Returns:
+            int: 保存したカーブの数
+        """
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = []
+        for i, item_id in enumerate(curves.item_ids):
+            start, end = curves.offsets[i], curves.offsets[i + 1]
+            duration = None if np.isnan(curves.durations[i]) else float(curves.durations[i])
+            rows.append((item_id, field, duration, curves.seconds[start:end].tobytes(),
+                         curves.percentages[start:end].tobytes(), now))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO video_curves (item_id, field, duration, seconds, percentages, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def save_videos(self, videos):
+        """
+        動画の辞書のリストから、含まれているカーブ (retention / engagement) を全て保存する関数。
+
+        Returns:
+            dict: {field: 保存したカーブの数}
+        """
+        saved = {}
+        for field in CURVE_FIELDS:
+            curves = RetentionCurves.from_videos(videos, field)
+            if len(curves):
+                saved[field] = self.save(curves, field)
+        return saved
+
+    def load(self, item_ids=None, field=RETENTION_FIELD):
+        """
+        保存済みのカーブを読み込む関数。
+
+        Args:
+            item_ids (list): 読み込む item_id (None なら全て)
+            field (str): "video_view_retention" または "engagement_likes"
+
+        Returns:
+            RetentionCurves: 読み込んだカーブ
+        """
+        with self._lock:
+            if item_ids is None:
+                cursor = self.conn.execute(
+                    "SELECT item_id, duration, seconds, percentages FROM video_curves WHERE field = ? ORDER BY item_id",
+                    (field,),
+                )
+                rows = cursor.fetchall()
+            else:
+                rows = []
+                item_ids = [str(item_id) for item_id in item_ids]
+                for i in range(0, len(item_ids), 500):
+                    chunk = item_ids[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(self.conn.execute(
+                        f"SELECT item_id, duration, seconds, percentages FROM video_curves WHERE field = ? AND item_id IN ({placeholders})",
+                        [field, *chunk],
+                    ))
+
+        seconds = [np.frombuffer(row[2], dtype=np.uint16) for row in rows]
+        percentages = [np.frombuffer(row[3], dtype=np.float32) for row in rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in seconds], out=offsets[1:])
+        return RetentionCurves(
+            [row[0] for row in rows],
+            offsets,
+            np.concatenate(seconds) if seconds else np.empty(0, dtype=np.uint16),
+            np.concatenate(percentages) if percentages else np.empty(0, dtype=np.float32),
+            [np.nan if row[1] is None else row[1] for row in rows],
+        )
@@ -1,18 +1,15 @@
-import requests
-import json
+from api_client import api_get
+from log_utils import get_logger
 
 """
 アクセストークンを介して承認されたTikTokアカウントの権限スコープを取得する
 https://business-api.tiktok.com/portal/docs?id=1765927978092545
 """
 
-# APIエンドポイント
-url = "https://business-api.tiktok.com/open_api/v1.3/tt_user/token_info/get/"
+logger = get_logger(__name__)
 
-# ヘッダー
-headers = {
-    "Content-Type": "application/json"
-}
+# APIエンドポイント
+PATH = "tt_user/token_info/get/"
 
 # データペイロード
 payload = {
@@ -20,11 +17,11 @@ payload = {
     "access_token": "769b7d5e7a4dc8c31d259e395c1437a721184f95"
 }
 
-# リクエストの送信
-response = requests.get(url, headers=headers, data=json.dumps(payload))
+# リクエストの送信 (token_info.py と同じく、パラメータはクエリで渡す)
+response = api_get(PATH, params=payload)
 
 # レスポンスの確認
 if response.status_code == 200:
-    print("Success:", response.json())
+    logger.info("Success: %s", response.json())
 else:
-    print("Error:", response.status_code, response.text)
\ No newline at end of file
+    logger.error("Error: %s %s", response.status_code, response.text)
\ No newline at end of file
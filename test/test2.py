@@ -1,18 +1,15 @@
-import requests
-import json
+from api_client import api_post
+from log_utils import get_logger
 
 """
 /oauth/トークン/
 https://business-api.tiktok.com/portal/docs?id=1739965703387137
 """
 
-# APIエンドポイント
-url = "https://business-api.tiktok.com/open_api/v1.3/oauth/token/"
+logger = get_logger(__name__)
 
-# ヘッダー
-headers = {
-    "Content-Type": "application/json"
-}
+# APIエンドポイント
+PATH = "oauth/token/"
 
 # データペイロード
 payload = {
@@ -23,10 +20,10 @@ payload = {
 }
 
 # リクエストの送信
-response = requests.post(url, headers=headers, data=json.dumps(payload))
+response = api_post(PATH, payload=payload)
 
 # レスポンスの確認
 if response.status_code == 200:
-    print("Success:", response.json())
+    logger.info("Success: %s", response.json())
 else:
-    print("Error:", response.status_code, response.text)
\ No newline at end of file
+    logger.error("Error: %s %s", response.status_code, response.text)
\ No newline at end of file
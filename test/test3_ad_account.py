@@ -2,26 +2,15 @@
 import os
 import json
 
-from six import string_types
-from urllib.parse import urlencode, urlunparse
+from api_client import api_get
+from log_utils import get_logger
 
-import requests
+logger = get_logger(__name__)
 
 ACCESS_TOKEN = "63ce543a676f71d860aa415af50ffe5cb89f1d6b"
 PATH = "/open_api/v1.3/oauth2/advertiser/get/"
 
 
-def build_url(path, query=""):
-    # type: (str, str) -> str
-    """
-    Build request URL
-    :param path: Request path
-    :param query: Querystring
-    :return: Request URL
-    """
-    scheme, netloc = "https", "business-api.tiktok.com"
-    return urlunparse((scheme, netloc, path, "", query, ""))
-
 def get(json_str):
     # type: (str) -> dict
     """
@@ -30,12 +19,7 @@ def get(json_str):
     :return: Response in JSON format
     """
     args = json.loads(json_str)
-    query_string = urlencode({k: v if isinstance(v, string_types) else json.dumps(v) for k, v in args.items()})
-    url = build_url(PATH, query_string)
-    headers = {
-        "Access-Token": ACCESS_TOKEN,
-    }
-    rsp = requests.get(url,  headers=headers)
+    rsp = api_get(PATH, ACCESS_TOKEN, params=args)
     return rsp.json()
 
 if __name__ == '__main__':
@@ -46,5 +30,5 @@ if __name__ == '__main__':
 
     # Args in JSON format
     my_args = "{\"secret\": \"%s\", \"app_id\": \"%s\"}" % (secret, app_id)
-    print(get(my_args))
+    logger.info("%s", get(my_args))
 
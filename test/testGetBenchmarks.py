@@ -1,5 +1,9 @@
+import os
 import requests
 import json
+from api_client import api_get, resolve_business_id
+from lazy_clients import get_access_token
+from log_utils import get_logger, dump_payload
 
 """
 TikTok Business APIを使用してビジネスアカウント情報を取得する
@@ -8,6 +12,8 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
        正確なドキュメントはTikTok Business API Portalで確認してください。
 """
 
+logger = get_logger(__name__)
+
 # --- curlコマンドから抽出した設定 ---
 
 # APIエンドポイント (curlコマンドのURLから)
@@ -18,17 +24,11 @@ url = "https://business-api.tiktok.com/open_api/v1.3/business/benchmark/"
 # 重要: このトークンはサンプルです。実際の有効なトークンに置き換えてください。
 access_token = "act.CT1xYxEuLnB05mGXjKJfpSGOo3Wa1WIDm2a3TFo74awXFJ5M1XmSWXkzVfL3!5342.va"
 
-# ヘッダー (curlコマンドのヘッダーから)
-headers = {
-    "Access-Token": access_token
-    # GETリクエストの場合、通常 Content-Type は不要ですが、
-    # APIによっては要求される場合もあります。
-    # "Content-Type": "application/json"
-}
+# Access-Token ヘッダーは api_client.api_get が付与する
 
 # クエリパラメータ (curlコマンドのURLの ? 以降から)
 # fieldsパラメータはJSON配列の文字列として渡す必要があるため、json.dumpsを使用します。
-business_id = "-000GlCTHa4_dkqLBG4sczTYmZgmNGSRXF3j" # 実際のBusiness IDに置き換えてください
+business_id = os.getenv("TIKTOK_BUSINESS_ID") # 実際のBusiness IDに置き換えてください
 business_category = "HOME_FURNITURE_AND_APPLIANCES"
 
 params = {
@@ -36,33 +36,65 @@ params = {
     "business_category":business_category,
 }
 
-# --- APIリクエストの実行 ---
-print(f"Requesting URL: {url}")
-print(f"Headers: {headers}")
-print(f"Params: {params}")
+BENCHMARK_PATH = "business/benchmark/"
+
+
+def fetch_benchmark(business_category, business_id=None, access_token=None):
+    """
+    カテゴリ1つのベンチマークを取得する関数。
+    複数のアカウントと比較する場合は benchmark_compare を使う (カテゴリごとに1日キャッシュする)。
+
+    Args:
+        business_category (str): カテゴリ ("HOME_FURNITURE_AND_APPLIANCES" など)
+        business_id (str): TikTok Business ID (None なら環境変数 TIKTOK_BUSINESS_ID)
+        access_token (str): 有効なアクセストークン (None なら lazy_clients.get_access_token())
 
-try:
-    # GETリクエストを実行
-    response = requests.get(url, headers=headers, params=params)
+    Returns:
+        dict: APIレスポンスの "data"
 
-    # レスポンスステータスコードを確認
-    response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
+    Raises:
+        ValueError: Business ID が指定されていない場合
+        requests.exceptions.HTTPError: HTTPエラーが返ってきた場合
+        RuntimeError: API がエラー (code != 0) を返した場合
+    """
+    business_id = resolve_business_id(business_id)
+    request_params = {"business_id": business_id, "business_category": business_category}
+    response = api_get(BENCHMARK_PATH, access_token or get_access_token(), params=request_params)
+    response.raise_for_status()
+    response_data = response.json()
+    if response_data.get("code", 0) != 0:
+        raise RuntimeError(f"ベンチマークの取得に失敗しました (business_category={business_category}, code={response_data.get('code')}, message={response_data.get('message')})")
+    dump_payload(logger, "APIレスポンス", response_data)
+    return response_data.get("data") or {}
+
+
+if __name__ == "__main__":
+    # --- APIリクエストの実行 ---
+    logger.info("Requesting URL: %s", url)
+    logger.debug("Params: %s", params)
 
-    # レスポンス内容 (JSON形式と仮定) を表示
-    print("\nResponse Status Code:", response.status_code)
     try:
-        response_data = response.json()
-        print("Response JSON:")
-        # JSONデータを整形して表示
-        print(json.dumps(response_data, indent=4, ensure_ascii=False))
-    except json.JSONDecodeError:
-        print("Response is not in JSON format:")
-        print(response.text)
-
-except requests.exceptions.RequestException as e:
-    print(f"\nError during requests to {url}: {e}")
-    if hasattr(e, 'response') and e.response is not None:
-        print(f"Response status code: {e.response.status_code}")
-        print(f"Response text: {e.response.text}")
-except Exception as e:
-    print(f"\nAn unexpected error occurred: {e}")
\ No newline at end of file
+        # GETリクエストを実行
+        response = api_get(url, access_token, params=params)
+
+        # レスポンスステータスコードを確認
+        response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
+
+        # レスポンス内容 (JSON形式と仮定) を表示
+        logger.info("Response Status Code: %s", response.status_code)
+        try:
+            response_data = response.json()
+            logger.info("Response JSON:")
+            # JSONデータを整形して表示
+            dump_payload(logger, "APIレスポンス", response_data)
+        except json.JSONDecodeError:
+            logger.info("Response is not in JSON format:")
+            logger.info("%s", response.text)
+
+    except requests.exceptions.RequestException as e:
+        logger.error("Error during requests to %s: %s", url, e)
+        if hasattr(e, 'response') and e.response is not None:
+            logger.info("Response status code: %s", e.response.status_code)
+            logger.info("Response text: %s", e.response.text)
+    except Exception as e:
+        logger.error("An unexpected error occurred: %s", e)
@@ -4,7 +4,9 @@ import os
 from dotenv import load_dotenv
 import datetime
 
-from refresh_token import refresh_token
+from api_client import api_get
+from lazy_clients import get_access_token
+from log_utils import get_logger, dump_payload
 
 """
 TikTok Business APIを使用してビジネスアカウント情報を取得する
@@ -12,6 +14,8 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
 ※注意: 上記ドキュメントURLは/business/get/に関する直接的なものではない可能性があります。
        正確なドキュメントはTikTok Business API Portalで確認してください。
 """
+
+logger = get_logger(__name__)
 #4月17日成功！！（フィールドのいじり方はこれから）
 # --- curlコマンドから抽出した設定 ---
 
@@ -19,15 +23,9 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
 # 注意: クエリパラメータは `params` 引数で渡すため、ベースURLのみを記述します
 url = "https://business-api.tiktok.com/open_api/v1.3/business/comment/list/"
 
-access_token = refresh_token()
+# アクセストークンは getCommentsAPI() を呼んだときに lazy_clients.get_access_token() で取得する
 
-# ヘッダー (curlコマンドのヘッダーから)
-headers = {
-    "Access-Token": access_token
-    # GETリクエストの場合、通常 Content-Type は不要ですが、
-    # APIによっては要求される場合もあります。
-    # "Content-Type": "application/json"
-}
+# Access-Token ヘッダーは api_client.api_get が付与する
 
 # クエリパラメータ (curlコマンドのURLの ? 以降から)
 business_id = os.getenv("TIKTOK_BUSINESS_ID")
@@ -42,54 +40,109 @@ params = {
 
 }
 
-# --- APIリクエストの実行 ---
-print(f"Requesting URL: {url}")
-print(f"Headers: {headers}")
-print(f"Params: {params}")
+COMMENT_LIST_PATH = "business/comment/list/"
+# 1ページあたりの最大件数 (API の上限は30)
+MAX_COMMENTS_PER_PAGE = 30
+OUTPUT_DIR = "tiktok_data"
+
+
+def fetch_comments(video_id, business_id=business_id, access_token=None, cursor=None, max_count=None, extra_params=None):
+    """
+    動画1本のコメント一覧を1ページ分取得する関数。
+
+    Args:
+        video_id (str): 動画ID (item_id)
+        business_id (str): TikTok Business ID
+        access_token (str): 有効なアクセストークン (None なら lazy_clients.get_access_token())
+        cursor (int): 続きから取得する場合のカーソル
+        max_count (int): 1ページあたりの件数 (None なら API の既定値)
+        extra_params (dict): 追加のクエリパラメータ (sort_field など)
+
+    Returns:
+        dict: APIレスポンス
+
+    Raises:
+        requests.exceptions.HTTPError: HTTPエラーが返ってきた場合
+        RuntimeError: API がエラー (code != 0) を返した場合
+    """
+    request_params = {"business_id": business_id, "video_id": video_id}
+    if cursor is not None:
+        request_params["cursor"] = cursor
+    if max_count is not None:
+        request_params["max_count"] = min(max_count, MAX_COMMENTS_PER_PAGE)
+    if extra_params:
+        request_params.update(extra_params)
+
+    response = api_get(COMMENT_LIST_PATH, access_token or get_access_token(), params=request_params)
+    response.raise_for_status()
+    response_data = response.json()
+    if response_data.get("code", 0) != 0:
+        raise RuntimeError(f"コメント一覧の取得に失敗しました (video_id={video_id}, code={response_data.get('code')}, message={response_data.get('message')})")
+    return response_data
+
+
+def save_comments(response_data, video_id, output_dir=OUTPUT_DIR):
+    """
+    コメント一覧のレスポンスを tiktok_data/tiktok_comments_<video_id>_<日時>.json に保存する関数。
 
-try:
-    # GETリクエストを実行
-    response = requests.get(url, headers=headers, params=params)
+    Returns:
+        str: 保存したファイルのパス
+    """
+    # 現在の日時を取得してファイル名に使用
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # レスポンスステータスコードを確認
-    response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
+    # 出力ディレクトリの設定（存在しない場合は作成）
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        logger.info("ディレクトリ '%s' を作成しました。", output_dir)
+
+    # ファイル名の作成（タイムスタンプとvideo_idを含む）
+    filename = f"{output_dir}/tiktok_comments_{video_id}_{timestamp}.json"
+
+    # JSONデータをファイルに書き込み
+    # (クローラーは同じ動画のページを1秒以内に続けて保存することがあるので、既にあれば _pNNN を付けて上書きしない)
+    page = 1
+    while True:
+        try:
+            with open(filename, 'x', encoding='utf-8') as f:
+                json.dump(response_data, f, indent=4, ensure_ascii=False)
+            return filename
+        except FileExistsError:
+            page += 1
+            filename = f"{output_dir}/tiktok_comments_{video_id}_{timestamp}_p{page:03d}.json"
+
+
+def getCommentsAPI():
+    """
+    video_id の動画のコメント一覧を取得し、tiktok_data/ にJSONとして保存する関数。
+    複数の動画をまとめて取得する場合は comment_fanout を使う。
+
+    Returns:
+        dict or None: APIレスポンス、またはエラー時にNone
+    """
+    # --- APIリクエストの実行 ---
+    logger.info("Requesting URL: %s", url)
+    logger.debug("Params: %s", params)
 
-    # レスポンス内容 (JSON形式と仮定) を表示
-    print("\nResponse Status Code:", response.status_code)
     try:
-        response_data = response.json()
-        print("Response JSON:")
+        response_data = fetch_comments(video_id)
         # JSONデータを整形して表示
-        print(json.dumps(response_data, indent=4, ensure_ascii=False))
-
-                # ここから追加: JSONをファイルとして出力する処理
-        # 現在の日時を取得してファイル名に使用
-        now = datetime.datetime.now()
-        timestamp = now.strftime("%Y%m%d_%H%M%S")
-        
-        # 出力ディレクトリの設定（存在しない場合は作成）
-        output_dir = "tiktok_data"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            print(f"ディレクトリ '{output_dir}' を作成しました。")
-        
-        # ファイル名の作成（タイムスタンプとvideo_idを含む）
-        filename = f"{output_dir}/tiktok_comments_{video_id}_{timestamp}.json"
-        
-        # JSONデータをファイルに書き込み
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(response_data, f, indent=4, ensure_ascii=False)
-        
-        print(f"\nデータが正常に保存されました: {filename}")
-
-    except json.JSONDecodeError:
-        print("Response is not in JSON format:")
-        print(response.text)
-
-except requests.exceptions.RequestException as e:
-    print(f"\nError during requests to {url}: {e}")
-    if hasattr(e, 'response') and e.response is not None:
-        print(f"Response status code: {e.response.status_code}")
-        print(f"Response text: {e.response.text}")
-except Exception as e:
-    print(f"\nAn unexpected error occurred: {e}")
\ No newline at end of file
+        dump_payload(logger, "APIレスポンス", response_data)
+
+        filename = save_comments(response_data, video_id)
+        logger.info("データが正常に保存されました: %s", filename)
+        return response_data
+
+    except json.JSONDecodeError as e:
+        logger.info("Response is not in JSON format: %s", e)
+    except requests.exceptions.RequestException as e:
+        logger.error("Error during requests to %s: %s", url, e)
+        if hasattr(e, 'response') and e.response is not None:
+            logger.info("Response status code: %s", e.response.status_code)
+            logger.info("Response text: %s", e.response.text)
+    except Exception as e:
+        logger.error("An unexpected error occurred: %s", e)
+
+
+if __name__ == "__main__":
+    getCommentsAPI()
@@ -2,12 +2,14 @@ import os
 import requests
 import json
 import datetime
-import pandas as pd
 from dotenv import load_dotenv
 
 from getDateforProfile import get_dates_from_sheet
-from refresh_token import refresh_token
 from outputToJson import outputToJson
+from api_client import api_get
+from field_projection import plan_fields
+from lazy_clients import get_access_token, memoize
+from log_utils import get_logger, dump_payload
 
 """
 TikTok Business APIを使用してビジネスアカウント情報を取得する
@@ -15,6 +17,8 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
 ※注意: 上記ドキュメントURLは/business/get/に関する直接的なものではない可能性があります。
        正確なドキュメントはTikTok Business API Portalで確認してください。
 """
+
+logger = get_logger(__name__)
 #4月21日testGetDatafromSheet.pyから日付のデータを獲得、指定した範囲でのデータの取得およびその開始日と終了日の差分を表示させることに成功。
 load_dotenv()
 # --- 設定 ---
@@ -22,43 +26,52 @@ load_dotenv()
 # 注意: クエリパラメータは `params` 引数で渡すため、ベースURLのみを記述します
 url = "https://business-api.tiktok.com/open_api/v1.3/business/get/"
 
-# アクセストークン (curlコマンドのヘッダーから)
-# 重要: このトークンはサンプルです。実際の有効なトークンに置き換えてください。
-access_token = refresh_token()
+# アクセストークンは getProfileAPI() を呼んだときに lazy_clients.get_access_token() で取得する
+# (import しただけではトークン更新やスプレッドシートの読み込みは行わない)
 
-# ヘッダー (curlコマンドのヘッダーから)
-headers = {
-    "Access-Token": access_token
-    # GETリクエストの場合、通常 Content-Type は不要ですが、
-    # APIによっては要求される場合もあります。
-    # "Content-Type": "application/json"
-}
+# Access-Token ヘッダーは api_client.api_get が付与する
 
 # クエリパラメータ (curlコマンドのURLの ? 以降から)
 # fieldsパラメータはJSON配列の文字列として渡す必要があるため、json.dumpsを使用します。
 business_id = os.getenv('TIKTOK_BUSINESS_ID') # 実際のBusiness IDに置き換えてください
-fields_list = ["username", "display_name","followers_count","total_likes", "video_views","unique_video_views","profile_views", "shares", "comments","engaged_audience","bio_link_clicks"]
-start_date_def, end_date_def, start_date, end_date= get_dates_from_sheet() 
+# このモジュールの取得結果はシート (testIntegrateTiktokToSheet) にだけ書き込むので、シートで使うフィールドだけ取得する
+fields_list = plan_fields("profile", ["sheet"])
+
 
+@memoize
+def get_sheet_dates():
+    """スプレッドシートの日付 (A2:D2) を返す関数 (プロセス内で1回だけ読み込む)"""
+    return get_dates_from_sheet()
+
+
+def build_params():
+    """
+    APIリクエストのクエリパラメータを作る関数。
+    期間はスプレッドシートのデフォルト期間 (A2/B2) を使う。
+    """
+    start_date_def, end_date_def, start_date, end_date = get_sheet_dates()
+    return {
+        "business_id": business_id,
+        "fields": json.dumps(fields_list), # リストをJSON文字列に変換
+        "start_date": start_date_def,
+        "end_date": end_date_def
+    }
 
-params = {
-    "business_id": business_id,
-    "fields": json.dumps(fields_list), # リストをJSON文字列に変換
-    "start_date": start_date_def,
-    "end_date": end_date_def
-}
 # print("実行してる？？")
-def aggregate_data(response_data):
+def aggregate_data(response_data, start_date, end_date):
     """
     APIレスポンスからデータを集計する関数
     start_dateとend_dateの間の差分を計算
     """
+    # pandas は読み込みに時間がかかるので、集計するときに初めて読み込む
+    import pandas as pd
+
     try:
         # データを取得
         if "data" in response_data:
             daily_data = response_data["data"]
         else:
-            print("'data'キーが見つかりません。")
+            logger.info("'data'キーが見つかりません。")
             return None
         
         # DataFrameに変換
@@ -81,7 +94,7 @@ def aggregate_data(response_data):
                     df[field] = df['metrics'].apply(lambda x: x.get(field, None) if isinstance(x, dict) else None)
 
         if df is None or df.empty:
-            print("変換可能なデータが見つかりませんでした。")
+            logger.info("変換可能なデータが見つかりませんでした。")
             return None
         
         # 集計結果の辞書
@@ -103,9 +116,7 @@ def aggregate_data(response_data):
                 result[col] = df[col].astype(float).sum()
         
         # start_dateとend_dateに基づいて増加分を計算
-        # APIから取得した開始日と終了日のデータを使用
-        start_date = params["start_date"]  # APIリクエストで使用した開始日(デフォルト) 
-        end_date = params["end_date"]      # APIリクエストで使用した終了日(デフォルト) 
+        # APIリクエストで使用した開始日と終了日(デフォルト)のデータを使用
         
         # 増加分を計算する対象
         increase_columns = ["followers_count", "total_likes"]
@@ -125,7 +136,7 @@ def aggregate_data(response_data):
                     result[f"{col}_increase"] = increase
                     result[f"{col}_total"] = end_val
                 else:
-                    print(f"開始日または終了日のデータが見つかりません。日付の確認: {start_date}, {end_date}")
+                    logger.info("開始日または終了日のデータが見つかりません。日付の確認: %s, %s", start_date, end_date)
                     # 代替処理: 最初と最後のデータを使用
                     if len(df) >= 2:
                         start_val = float(df[col].iloc[0])
@@ -134,89 +145,88 @@ def aggregate_data(response_data):
                         
                         result[f"{col}_increase"] = increase
                         result[f"{col}_total"] = end_val
-                        print(f"代替: 最初と最後のデータを使用して{col}の増加分を計算しました")
+                        logger.info("代替: 最初と最後のデータを使用して%sの増加分を計算しました", col)
         
         # 日付範囲
         result["date_range"] = f"{start_date} から {end_date}"
         
         # 結果を表示
-        print("\n=== 期間の集計結果 ===")
+        logger.info("=== 期間の集計結果 ===")
         
         # 合計値
-        print("\n--- 合計値 ---")
+        logger.info("--- 合計値 ---")
         for col in numeric_columns:
             if col in result:
-                print(f"{col}: {result[col]}")
+                logger.info("%s: %s", col, result[col])
         
         # 増加分
-        print("\n--- 増加分 ---")
+        logger.info("--- 増加分 ---")
         for col in increase_columns:
             key = f"{col}_increase"
             if key in result:
-                print(f"{key}: {result[key]}")
+                logger.info("%s: %s", key, result[key])
         
         # 累計値
-        print("\n--- 累計値 ---")
+        logger.info("--- 累計値 ---")
         for col in increase_columns:
             key = f"{col}_total"
             if key in result:
-                print(f"{key}: {result[key]}")
+                logger.info("%s: %s", key, result[key])
         
         # その他の情報
-        print("\n--- その他の情報 ---")
+        logger.info("--- その他の情報 ---")
         for key in ["username", "display_name", "date_range"]:
             if key in result:
-                print(f"{key}: {result[key]}")
+                logger.info("%s: %s", key, result[key])
         
         return result
         
     except Exception as e:
-        import traceback
-        print(f"データ集計中にエラーが発生しました: {e}")
-        traceback.print_exc()
+        logger.exception("データ集計中にエラーが発生しました: %s", e)
         return None
     
 # --- APIリクエストの実行,
 def getProfileAPI():
-    print(f"Requesting URL: {url}")
-    print(f"Headers: {headers}")
-    print(f"Params: {params}")
+    params = build_params()
+    access_token = get_access_token()
+    logger.info("Requesting URL: %s", url)
+    logger.debug("Params: %s", params)
 
     try:
         # refresh_token()←いずれこの関数を用いて取得したトークンを代入する
         # print("refresh_complete")
 
         # GETリクエストを実行
-        response = requests.get(url, headers=headers, params=params)
+        response = api_get(url, access_token, params=params)
 
         # レスポンスステータスコードを確認
         response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
 
         # レスポンス内容 (JSON形式と仮定) を表示
-        print("\nResponse Status Code:", response.status_code)
+        logger.info("Response Status Code: %s", response.status_code)
         try:
             response_data = response.json()
-            print("Response JSON:")
+            logger.info("Response JSON:")
             # JSONデータを整形して表示
-            print(json.dumps(response_data, indent=4, ensure_ascii=False))
+            dump_payload(logger, "APIレスポンス", response_data)
 
             outputToJson(response_data)
 
-            aggregated_data = aggregate_data(response_data)
+            aggregated_data = aggregate_data(response_data, params["start_date"], params["end_date"])
 
             return aggregated_data
 
         except json.JSONDecodeError:
-            print("Response is not in JSON format:")
-            print(response.text)
+            logger.info("Response is not in JSON format:")
+            logger.info("%s", response.text)
 
     except requests.exceptions.RequestException as e:
-        print(f"\nError during requests to {url}: {e}")
+        logger.error("Error during requests to %s: %s", url, e)
         if hasattr(e, 'response') and e.response is not None:
-            print(f"Response status code: {e.response.status_code}")
-            print(f"Response text: {e.response.text}")
+            logger.info("Response status code: %s", e.response.status_code)
+            logger.info("Response text: %s", e.response.text)
     except Exception as e:
-        print(f"\nAn unexpected error occurred: {e}")
+        logger.error("An unexpected error occurred: %s", e)
 
 
 # --- メイン処理 ---
@@ -1,5 +1,9 @@
+import os
 import requests
 import json
+from api_client import api_get, resolve_business_id
+from lazy_clients import get_access_token
+from log_utils import get_logger, dump_payload
 
 """
 TikTok Business APIを使用してビジネスアカウント情報を取得する
@@ -7,6 +11,8 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
 ※注意: 上記ドキュメントURLは/business/get/に関する直接的なものではない可能性があります。
        正確なドキュメントはTikTok Business API Portalで確認してください。
 """
+
+logger = get_logger(__name__)
 #4月17日成功！！（フィールドのいじり方はこれから）
 # --- curlコマンドから抽出した設定 ---
 
@@ -16,18 +22,12 @@ url = "https://business-api.tiktok.com/open_api/v1.3/business/hashtag/suggestion
 
 access_token = "act.CT1xYxEuLnB05mGXjKJfpSGOo3Wa1WIDm2a3TFo74awXFJ5M1XmSWXkzVfL3!5342.va"
 
-# ヘッダー (curlコマンドのヘッダーから)
-headers = {
-    "Access-Token": access_token
-    # GETリクエストの場合、通常 Content-Type は不要ですが、
-    # APIによっては要求される場合もあります。
-    # "Content-Type": "application/json"
-}
+# Access-Token ヘッダーは api_client.api_get が付与する
 
 # クエリパラメータ (curlコマンドのURLの ? 以降から)
 # fieldsパラメータはJSON配列の文字列として渡す必要があるため、json.dumpsを使用します。
 #start_dateは今日の日付から60日以前だとエラーが出る。
-business_id = "-000GlCTHa4_dkqLBG4sczTYmZgmNGSRXF3j"
+business_id = os.getenv("TIKTOK_BUSINESS_ID") # 実際のBusiness IDに置き換えてください
 keyword = "ポケモンカード151"
 language = "ja-JP"
 #fields_list = ["item_id","create_time","thumbnail_url","share_url","embed_url","caption","video_views","likes","comments","shares","reach","video_duration","full_video_watched_rate","total_time_watched","average_time_watched","impression_sources","audience_countries","new_followers","profile_views","website_clicks"]
@@ -39,34 +39,81 @@ params = {
     "language": language,
 }
 
-# --- APIリクエストの実行 ---
+HASHTAG_SUGGESTION_PATH = "business/hashtag/suggestion/"
+
+
+def extract_suggestions(response_data):
+    """
+    ハッシュタグ候補のレスポンスから候補のリストを取り出す関数。
+    data の中の最初のリスト (suggestions など) を候補とみなす。
+    """
+    data = response_data.get("data") or {}
+    if isinstance(data, list):
+        return data
+    for value in data.values():
+        if isinstance(value, list):
+            return value
+    return []
+
+
+def fetch_hashtag_suggestions(keyword, language=language, business_id=None, access_token=None):
+    """
+    キーワード1つのハッシュタグ候補を取得する関数 (APIは1回の呼び出しでキーワード1つまで)。
+    複数のキーワードをまとめて取得する場合は hashtag_service を使う。
 
-print(f"Requesting URL: {url}")
-print(f"Headers: {headers}")
-print(f"Params: {params}")
+    Args:
+        keyword (str): キーワード
+        language (str): 言語 ("ja-JP" など)
+        business_id (str): TikTok Business ID (None なら環境変数 TIKTOK_BUSINESS_ID)
+        access_token (str): 有効なアクセストークン (None なら lazy_clients.get_access_token())
 
-try:
-    # GETリクエストを実行
-    response = requests.get(url, headers=headers, params=params)
+    Returns:
+        list: ハッシュタグ候補のリスト
 
-    # レスポンスステータスコードを確認
-    response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
+    Raises:
+        ValueError: Business ID が指定されていない場合
+        requests.exceptions.HTTPError: HTTPエラーが返ってきた場合
+        RuntimeError: API がエラー (code != 0) を返した場合
+    """
+    business_id = resolve_business_id(business_id)
+    request_params = {"business_id": business_id, "keyword": keyword, "language": language}
+    response = api_get(HASHTAG_SUGGESTION_PATH, access_token or get_access_token(), params=request_params)
+    response.raise_for_status()
+    response_data = response.json()
+    if response_data.get("code", 0) != 0:
+        raise RuntimeError(f"ハッシュタグ候補の取得に失敗しました (keyword={keyword}, code={response_data.get('code')}, message={response_data.get('message')})")
+    dump_payload(logger, "APIレスポンス", response_data)
+    return extract_suggestions(response_data)
+
+
+if __name__ == "__main__":
+    # --- APIリクエストの実行 ---
+
+    logger.info("Requesting URL: %s", url)
+    logger.debug("Params: %s", params)
 
-    # レスポンス内容 (JSON形式と仮定) を表示
-    print("\nResponse Status Code:", response.status_code)
     try:
-        response_data = response.json()
-        print("Response JSON:")
-        # JSONデータを整形して表示
-        print(json.dumps(response_data, indent=4, ensure_ascii=False))
-    except json.JSONDecodeError:
-        print("Response is not in JSON format:")
-        print(response.text)
-
-except requests.exceptions.RequestException as e:
-    print(f"\nError during requests to {url}: {e}")
-    if hasattr(e, 'response') and e.response is not None:
-        print(f"Response status code: {e.response.status_code}")
-        print(f"Response text: {e.response.text}")
-except Exception as e:
-    print(f"\nAn unexpected error occurred: {e}")
\ No newline at end of file
+        # GETリクエストを実行
+        response = api_get(url, access_token, params=params)
+
+        # レスポンスステータスコードを確認
+        response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
+
+        # レスポンス内容 (JSON形式と仮定) を表示
+        logger.info("Response Status Code: %s", response.status_code)
+        try:
+            response_data = response.json()
+            logger.info("Response JSON:")
+            # JSONデータを整形して表示
+            dump_payload(logger, "APIレスポンス", response_data)
+        except json.JSONDecodeError:
+            logger.info("Response is not in JSON format:")
+            logger.info("%s", response.text)
+
+    except requests.exceptions.RequestException as e:
+        logger.error("Error during requests to %s: %s", url, e)
+        if hasattr(e, 'response') and e.response is not None:
+            logger.info("Response status code: %s", e.response.status_code)
+            logger.info("Response text: %s", e.response.text)
+    except Exception as e:
+        logger.error("An unexpected error occurred: %s", e)
@@ -4,10 +4,11 @@ import os
 from datetime import datetime
 from dotenv import load_dotenv
 
-from refresh_token import refresh_token
-from videoFieldsName import VIDEO_FIELDS
+from field_projection import plan_fields
 from date_utils import get_date_range
-from outputToJson import outputToJson
+from json_stream import stream_videos
+from lazy_clients import get_access_token
+from log_utils import get_logger, dump_payload
 
 
 
@@ -17,6 +18,8 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
 ※注意: 上記ドキュメントURLは/business/get/に関する直接的なものではない可能性があります。
        正確なドキュメントはTikTok Business API Portalで確認してください。
 """
+
+logger = get_logger(__name__)
 #4月20日：毎回の実行の前にrefresh_token.pyを用いてアクセストークンとリフレッシュトークンを更新する仕組みを実装しておかないとダメぽい
 #4/24日付の取得をdatetimeを利用した処理に変更、todayはどの関数でも値が必ず一緒なのでグローバルで定義しておいて問題ない
 # --- curlコマンドから抽出した設定 ---
@@ -25,21 +28,16 @@ API Doc: https://business-api.tiktok.com/portal/docs?id=1739940603393026 (推定
 # 注意: クエリパラメータは `params` 引数で渡すため、ベースURLのみを記述します
 url = "https://business-api.tiktok.com/open_api/v1.3/business/video/list/"
 
-access_token = refresh_token()
+# アクセストークンは getVideoAPI() を呼んだときに lazy_clients.get_access_token() で取得する
 
-# ヘッダー (curlコマンドのヘッダーから)
-headers = {
-    "Access-Token": access_token
-    # GETリクエストの場合、通常 Content-Type は不要ですが、
-    # APIによっては要求される場合もあります。
-    # "Content-Type": "application/json"
-}
+# Access-Token ヘッダーは api_client.api_get が付与する
 
 # クエリパラメータ (curlコマンドのURLの ? 以降から)
 # fieldsパラメータはJSON配列の文字列として渡す必要があるため、json.dumpsを使用します。
 #start_dateは今日の日付から60日以前だとエラーが出る。
 business_id = os.getenv("TIKTOK_BUSINESS_ID") # 実際のBusiness IDに置き換えてください
-fields_list = VIDEO_FIELDS
+# video_view_retention などの大きな配列は TIKTOK_FIELDS_MODE=deep のときだけ取得する
+fields_list = plan_fields("video")
 start_date, end_date = get_date_range(3,2)
 
 params = {
@@ -50,45 +48,47 @@ params = {
 }
 
 def getVideoAPI():
+    """
+    動画一覧を最後のページまで取得し、1つのレスポンスにまとめて返す関数。
+    動画を1件ずつ処理したい場合は json_stream.stream_videos、ページごとに処理したい場合は
+    video_pager.iter_video_pages を直接使う。
+
+    Returns:
+        dict or None: 全ページの動画を data.videos にまとめたレスポンス、またはエラー時にNone
+    """
+    access_token = get_access_token()
 
     # --- APIリクエストの実行 ---
-    print(f"Requesting URL: {url}")
-    print(f"Headers: {headers}")
-    print(f"Params: {params}")
+    logger.info("Requesting URL: %s", url)
+    logger.debug("Params: %s", params)
 
     try:
-        # GETリクエストを実行
-        response = requests.get(url, headers=headers, params=params)
-
-        # レスポンスステータスコードを確認
-        response.raise_for_status()  # ステータスコードが 2xx でない場合に例外を発生させる
-
-        # レスポンス内容 (JSON形式と仮定) を表示
-        print("\nResponse Status Code:", response.status_code)
-        try:
-            response_data = response.json()
-            post_date_str = end_date
-            response_data['post_date'] = post_date_str
-            print("Response JSON:")
-            # JSONデータを整形して表示
-            print(json.dumps(response_data, indent=4, ensure_ascii=False))
-
-            outputToJson(response_data)
-
-            return response_data
-    
-        except json.JSONDecodeError:
-            print("Response is not in JSON format:")
-            print(response.text)
-
-        except requests.exceptions.RequestException as e:
-            print(f"\nError during requests to {url}: {e}")
+        # レスポンスはページごとに少しずつデコードし、生のバイト列はそのまま tiktok_data に保存する
+        videos = list(stream_videos(business_id, access_token, fields_list,
+                                    extra_params={"start_date": start_date, "end_date": end_date}))
+        logger.info("動画一覧を取得しました: %s件", len(videos))
+
+        response_data = {
+            "code": 0,
+            "message": "OK",
+            "data": {"videos": videos, "has_more": False},
+        }
+        post_date_str = end_date
+        response_data['post_date'] = post_date_str
+        # JSONデータを整形して表示 (TIKTOK_DEBUG_PAYLOAD が有効なときだけ)
+        dump_payload(logger, "APIレスポンス", response_data)
+
+        return response_data
+
+    except requests.exceptions.RequestException as e:
+        logger.error("Error during requests to %s: %s", url, e)
         if hasattr(e, 'response') and e.response is not None:
-            print(f"Response status code: {e.response.status_code}")
-            print(f"Response text: {e.response.text}")
+            logger.info("Response status code: %s", e.response.status_code)
+            logger.info("Response text: %s", e.response.text)
+        return None
 
     except Exception as e:
-        print(f"\nAn unexpected error occurred: {e}")
+        logger.error("An unexpected error occurred: %s", e)
         return None
     
 
@@ -1,11 +1,11 @@
 import os
-import gspread
-import gspread_dataframe as gd
-import pandas as pd
-from google.oauth2.service_account import Credentials
 import datetime
 from testGetProfileData import getProfileAPI
+from lazy_clients import get_gspread_client
 from dotenv import load_dotenv
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # 4月20日venvの仮想環境を用いて、gspreadは仮想環境にのみ"pip install gspreads"して、ダミーデータを入力することに成功
 # 1から4の設定をちゃんと入力すれば動く、こいつはあくまでも書き込みをするための男
@@ -34,11 +34,6 @@ SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
 SHEET_NAME = 'testTikTok'
 # --- 設定ここまで ---
 
-#APIで取得したデータを持ってくる
-#このprofileDataのリストの順番が、そのままスプレッドシートに書き込まれる列の順番になる。
-profileData = getProfileAPI()
-print(profileData)
-
 keys = [
     'username', 'display_name', 'unique_video_views', 'engaged_audience',
     'shares', 'video_views', 'profile_views', 'comments',
@@ -63,15 +58,22 @@ en_to_jp = {
     'date_range': '期間'
 }
 
-#いったん空のリストを作成
-listData = []
-#空のリストにvalueという変数に追加した各々の値をリストに追加
-for key in keys:
-    if key != 'date_range':
-        value = profileData.get(key, "")
-        jp_key = en_to_jp.get(key, key)
-        listData.append(value) 
-print(listData)
+
+def build_list_data(profileData):
+    """
+    APIで取得したデータを、シートに書き込む順番のリストにする関数。
+    このprofileDataのリストの順番が、そのままスプレッドシートに書き込まれる列の順番になる。
+    """
+    #いったん空のリストを作成
+    listData = []
+    #空のリストにvalueという変数に追加した各々の値をリストに追加
+    for key in keys:
+        if key != 'date_range':
+            value = profileData.get(key, "")
+            jp_key = en_to_jp.get(key, key)
+            listData.append(value) 
+    logger.info("%s", listData)
+    return listData
 
 
 # print("前処理開始")
@@ -82,13 +84,11 @@ def write_dummy_data_to_sheet():
     """
     サービスアカウントを使って認証し、ダミーデータをスプレッドシートに追記する関数
     """
-    try:
-        # サービスアカウントキーを使って認証情報を生成
-        creds = Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    import gspread
 
-        # gspreadクライアントを認証情報で初期化
-        client = gspread.authorize(creds)
+    try:
+        # サービスアカウントキーで認証したgspreadクライアント (プロセス内で1回だけ作成して使い回す)
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
 
         # スプレッドシートIDでシートを開く
         spreadsheet = client.open_by_key(SPREADSHEET_ID)
@@ -108,36 +108,40 @@ def write_dummy_data_to_sheet():
             [current_date, f"dummy_video_{current_time}_B", 678, 90],
         ]
 
-        print(f"以下のデータをシート '{SHEET_NAME}' に追記します:")
+        logger.info("以下のデータをシート '%s' に追記します:", SHEET_NAME)
         for row in dummy_data:
-            print(row)
+            logger.info("%s", row)
 
         # --- シートへのデータ追記 ---
         # append_rowsはリストのリストを受け取り、シートの最後の空行から追記する
         worksheet.append_rows(dummy_data)
 
-        print("\nデータの追記が成功しました！")
+        logger.info("データの追記が成功しました！")
 
     except FileNotFoundError:
-        print(f"エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: {SERVICE_ACCOUNT_FILE}")
+        logger.error("エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: %s", SERVICE_ACCOUNT_FILE)
     except gspread.exceptions.SpreadsheetNotFound:
-        print(f"エラー: スプレッドシートが見つかりません。IDを確認してください: {SPREADSHEET_ID}")
+        logger.error("エラー: スプレッドシートが見つかりません。IDを確認してください: %s", SPREADSHEET_ID)
     except gspread.exceptions.WorksheetNotFound:
-        print(f"エラー: シートが見つかりません。シート名を確認してください: {SHEET_NAME}")
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", SHEET_NAME)
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
+        logger.error("予期せぬエラーが発生しました: %s", e)
 
-def write_profileData_to_sheet():
+def write_profileData_to_sheet(listData):
     """
     サービスアカウントを使って認証し、プロファイルデータをスプレッドシートに追記する関数
+
+    Args:
+        listData (list): build_list_data() で作ったリスト
     """
-    try:
-        # サービスアカウントキーを使って認証情報を生成
-        creds = Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    # gspread / pandas は読み込みに時間がかかるので、書き込むときに初めて読み込む
+    import gspread
+    import gspread_dataframe as gd
+    import pandas as pd
 
-        # gspreadクライアントを認証情報で初期化
-        client = gspread.authorize(creds)
+    try:
+        # サービスアカウントキーで認証したgspreadクライアント (プロセス内で1回だけ作成して使い回す)
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
 
         # スプレッドシートIDでシートを開く
         spreadsheet = client.open_by_key(SPREADSHEET_ID)
@@ -145,8 +149,8 @@ def write_profileData_to_sheet():
         # シート名でワークシートを選択
         worksheet = spreadsheet.worksheet(SHEET_NAME)
 
-        print(f"以下のデータをシート '{SHEET_NAME}' に追記します:")
-        print(listData)
+        logger.info("以下のデータをシート '%s' に追記します:", SHEET_NAME)
+        logger.info("%s", listData)
 
         # リストをPandasのDataFrameに変換→gspread_dataflameを利用するにあたって必要（そもそもgspread_dataflameはpandasのdataflameを利用するためのもの）
         # 日本語の列名を取得（date_rangeを除く）
@@ -172,25 +176,28 @@ def write_profileData_to_sheet():
         transposed_df = pairs_df.transpose()
 
         #debug
-        print("元のDataFrameの列名:", df.columns.tolist())
-        print("出力用DataFrameの列名:", output_df.columns.tolist())
-        print("出力用DataFrameの内容:")
-        print(output_df)
+        logger.info("元のDataFrameの列名: %s", df.columns.tolist())
+        logger.info("出力用DataFrameの列名: %s", output_df.columns.tolist())
+        logger.info("出力用DataFrameの内容:")
+        logger.info("%s", output_df)
         
         # DataFrameをシートに書き込み
         gd.set_with_dataframe(worksheet, transposed_df)
 
-        print("\nデータの追記が成功しました！")
+        logger.info("データの追記が成功しました！")
 
     except FileNotFoundError:
-        print(f"エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: {SERVICE_ACCOUNT_FILE}")
+        logger.error("エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: %s", SERVICE_ACCOUNT_FILE)
     except gspread.exceptions.SpreadsheetNotFound:
-        print(f"エラー: スプレッドシートが見つかりません。IDを確認してください: {SPREADSHEET_ID}")
+        logger.error("エラー: スプレッドシートが見つかりません。IDを確認してください: %s", SPREADSHEET_ID)
     except gspread.exceptions.WorksheetNotFound:
-        print(f"エラー: シートが見つかりません。シート名を確認してください: {SHEET_NAME}")
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", SHEET_NAME)
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
+        logger.error("予期せぬエラーが発生しました: %s", e)
 
 # スクリプトが直接実行された場合にのみ関数を呼び出す
 if __name__ == '__main__':
-    write_profileData_to_sheet()
+    #APIで取得したデータを持ってくる
+    profileData = getProfileAPI()
+    logger.info("%s", profileData)
+    write_profileData_to_sheet(build_list_data(profileData))
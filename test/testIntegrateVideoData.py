@@ -1,11 +1,12 @@
 import os
-import gspread
-import gspread_dataframe as gd
-import pandas as pd
-from google.oauth2.service_account import Credentials
 import datetime
-from testGetProfileData import getProfileAPI
+from testGetVideoData import getVideoAPI, business_id
+from video_snapshots import VideoSnapshotStore, views_gained_yesterday
+from lazy_clients import get_gspread_client
 from dotenv import load_dotenv
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # 4月20日venvの仮想環境を用いて、gspreadは仮想環境にのみ"pip install gspreads"して、ダミーデータを入力することに成功
 # 1から4の設定をちゃんと入力すれば動く、こいつはあくまでも書き込みをするための男
@@ -32,13 +33,10 @@ SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
 # 4. 書き込みたいシートの名前
 #    例: 'シート1', 'TikTokデータ' など
 SHEET_NAME = 'testTikTok'
+# 5. 動画ごとの「昨日増えた再生数」を書き込むシートの名前
+VIDEO_GAINS_SHEET_NAME = 'testTikTokVideos'
 # --- 設定ここまで ---
 
-#APIで取得したデータを持ってくる
-#このprofileDataのリストの順番が、そのままスプレッドシートに書き込まれる列の順番になる。
-videoData = getVideoAPI()
-print(vedioData)
-
 keys = [
     'username', 'display_name', 'unique_video_views', 'engaged_audience',
     'shares', 'video_views', 'profile_views', 'comments',
@@ -63,26 +61,38 @@ en_to_jp = {
     'date_range': '期間'
 }
 
-#いったん空のリストを作成
-listData = []
-#空のリストにvalueという変数に追加した各々の値をリストに追加
-for key in keys:
-    if key != 'date_range':
-        value = profileData.get(key, "")
-        jp_key = en_to_jp.get(key, key)
-        listData.append(value) 
-print(listData)
-def write_videData_to_sheet():
+
+def build_list_data(profileData):
+    """
+    APIで取得したデータを、シートに書き込む順番のリストにする関数。
+    このprofileDataのリストの順番が、そのままスプレッドシートに書き込まれる列の順番になる。
+    """
+    #いったん空のリストを作成
+    listData = []
+    #空のリストにvalueという変数に追加した各々の値をリストに追加
+    for key in keys:
+        if key != 'date_range':
+            value = profileData.get(key, "")
+            jp_key = en_to_jp.get(key, key)
+            listData.append(value) 
+    logger.info("%s", listData)
+    return listData
+
+def write_videData_to_sheet(listData):
     """
     サービスアカウントを使って認証し、プロファイルデータをスプレッドシートに追記する関数
+
+    Args:
+        listData (list): build_list_data() で作ったリスト
     """
-    try:
-        # サービスアカウントキーを使って認証情報を生成
-        creds = Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    # gspread / pandas は読み込みに時間がかかるので、書き込むときに初めて読み込む
+    import gspread
+    import gspread_dataframe as gd
+    import pandas as pd
 
-        # gspreadクライアントを認証情報で初期化
-        client = gspread.authorize(creds)
+    try:
+        # サービスアカウントキーで認証したgspreadクライアント (プロセス内で1回だけ作成して使い回す)
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
 
         # スプレッドシートIDでシートを開く
         spreadsheet = client.open_by_key(SPREADSHEET_ID)
@@ -90,8 +100,8 @@ def write_videData_to_sheet():
         # シート名でワークシートを選択
         worksheet = spreadsheet.worksheet(SHEET_NAME)
 
-        print(f"以下のデータをシート '{SHEET_NAME}' に追記します:")
-        print(listData)
+        logger.info("以下のデータをシート '%s' に追記します:", SHEET_NAME)
+        logger.info("%s", listData)
 
         # リストをPandasのDataFrameに変換→gspread_dataflameを利用するにあたって必要（そもそもgspread_dataflameはpandasのdataflameを利用するためのもの）
         # 日本語の列名を取得（date_rangeを除く）
@@ -117,21 +127,83 @@ def write_videData_to_sheet():
         transposed_df = pairs_df.transpose()
 
         #debug
-        print("元のDataFrameの列名:", df.columns.tolist())
-        print("出力用DataFrameの列名:", output_df.columns.tolist())
-        print("出力用DataFrameの内容:")
-        print(output_df)
+        logger.info("元のDataFrameの列名: %s", df.columns.tolist())
+        logger.info("出力用DataFrameの列名: %s", output_df.columns.tolist())
+        logger.info("出力用DataFrameの内容:")
+        logger.info("%s", output_df)
         
         # DataFrameをシートに書き込み
         gd.set_with_dataframe(worksheet, transposed_df)
 
-        print("\nデータの追記が成功しました！")
+        logger.info("データの追記が成功しました！")
 
     except FileNotFoundError:
-        print(f"エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: {SERVICE_ACCOUNT_FILE}")
+        logger.error("エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: %s", SERVICE_ACCOUNT_FILE)
+    except gspread.exceptions.SpreadsheetNotFound:
+        logger.error("エラー: スプレッドシートが見つかりません。IDを確認してください: %s", SPREADSHEET_ID)
+    except gspread.exceptions.WorksheetNotFound:
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", SHEET_NAME)
+    except Exception as e:
+        logger.error("予期せぬエラーが発生しました: %s", e)
+
+def build_video_gains(videoData, snapshot_store=None):
+    """
+    動画の累計値を今日のスナップショットとして保存し、動画ごとの「昨日増えた再生数」を付けた DataFrame を返す関数。
+
+    Args:
+        videoData (dict): getVideoAPI() の戻り値
+        snapshot_store (VideoSnapshotStore): スナップショットのストア (None ならローカルDBのものを使う)
+
+    Returns:
+        pd.DataFrame: 日本語の列名 (動画ID・キャプション・動画再生数・昨日の再生数増加) の DataFrame
+    """
+    import pandas as pd
+
+    videos = ((videoData or {}).get("data") or {}).get("videos") or []
+    snapshot_store = snapshot_store or VideoSnapshotStore()
+    snapshot_store.save_snapshots(business_id, videos)
+    gained = views_gained_yesterday(snapshot_store, business_id)
+
+    df = pd.DataFrame(videos, columns=["item_id", "caption", "video_views"])
+    df["item_id"] = df["item_id"].astype(str)
+    df["views_gained_yesterday"] = df["item_id"].map(gained)
+    df = df.sort_values("views_gained_yesterday", ascending=False, na_position="last")
+    return df.rename(columns={
+        "item_id": "動画ID",
+        "caption": "キャプション",
+        "video_views": "動画再生数",
+        "views_gained_yesterday": "昨日の再生数増加",
+    })
+
+
+def write_video_gains_to_sheet(gains_df):
+    """
+    動画ごとの「昨日増えた再生数」をシート (VIDEO_GAINS_SHEET_NAME) に書き込む関数
+
+    Args:
+        gains_df (pd.DataFrame): build_video_gains() で作った DataFrame
+    """
+    import gspread
+    import gspread_dataframe as gd
+
+    try:
+        client = get_gspread_client(SERVICE_ACCOUNT_FILE, SCOPES)
+        worksheet = client.open_by_key(SPREADSHEET_ID).worksheet(VIDEO_GAINS_SHEET_NAME)
+        # 前回の内容は残さず、毎回シート全体を書き換える
+        worksheet.clear()
+        gd.set_with_dataframe(worksheet, gains_df)
+        logger.info("動画 %s 件の再生数増加をシート '%s' に書き込みました。", len(gains_df), VIDEO_GAINS_SHEET_NAME)
     except gspread.exceptions.SpreadsheetNotFound:
-        print(f"エラー: スプレッドシートが見つかりません。IDを確認してください: {SPREADSHEET_ID}")
+        logger.error("エラー: スプレッドシートが見つかりません。IDを確認してください: %s", SPREADSHEET_ID)
     except gspread.exceptions.WorksheetNotFound:
-        print(f"エラー: シートが見つかりません。シート名を確認してください: {SHEET_NAME}")
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", VIDEO_GAINS_SHEET_NAME)
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
\ No newline at end of file
+        logger.error("予期せぬエラーが発生しました: %s", e)
+
+# スクリプトが直接実行された場合にのみ関数を呼び出す
+if __name__ == '__main__':
+    #APIで取得したデータを持ってくる
+    videoData = getVideoAPI()
+    logger.info("%s", videoData)
+    write_videData_to_sheet(build_list_data(videoData))
+    write_video_gains_to_sheet(build_video_gains(videoData))
@@ -1,6 +1,9 @@
 import gspread
 from google.oauth2.service_account import Credentials
 import datetime
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # 4月20日venvの仮想環境を用いて、gspreadは仮想環境にのみpip　installしているダミーデータを入力することに成功
 # 1から4の設定をちゃんと入力すれば動く
@@ -57,24 +60,24 @@ def write_dummy_data_to_sheet():
             [current_date, f"dummy_video_{current_time}_B", 678, 90],
         ]
 
-        print(f"以下のデータをシート '{SHEET_NAME}' に追記します:")
+        logger.info("以下のデータをシート '%s' に追記します:", SHEET_NAME)
         for row in dummy_data:
-            print(row)
+            logger.info("%s", row)
 
         # --- シートへのデータ追記 ---
         # append_rowsはリストのリストを受け取り、シートの最後の空行から追記する
         worksheet.append_rows(dummy_data)
 
-        print("\nデータの追記が成功しました！")
+        logger.info("データの追記が成功しました！")
 
     except FileNotFoundError:
-        print(f"エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: {SERVICE_ACCOUNT_FILE}")
+        logger.error("エラー: サービスアカウントキーファイルが見つかりません。パスを確認してください: %s", SERVICE_ACCOUNT_FILE)
     except gspread.exceptions.SpreadsheetNotFound:
-        print(f"エラー: スプレッドシートが見つかりません。IDを確認してください: {SPREADSHEET_ID}")
+        logger.error("エラー: スプレッドシートが見つかりません。IDを確認してください: %s", SPREADSHEET_ID)
     except gspread.exceptions.WorksheetNotFound:
-        print(f"エラー: シートが見つかりません。シート名を確認してください: {SHEET_NAME}")
+        logger.error("エラー: シートが見つかりません。シート名を確認してください: %s", SHEET_NAME)
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
+        logger.error("予期せぬエラーが発生しました: %s", e)
 
 # スクリプトが直接実行された場合にのみ関数を呼び出す
 if __name__ == '__main__':
@@ -1,16 +1,23 @@
 import os
 import json
-import requests
-import pandas as pd
 from google.cloud import bigquery
-from google.oauth2.service_account import Credentials
 
 # Sheets API 関連は削除
 # from googleapiclient.discovery import build
 # from googleapiclient.errors import HttpError
 
-# testGetVideoData.py から getVideoAPI 関数をインポート（要確認）
-from testGetVideoData import getVideoAPI
+# 取得対象の設定 (Business ID・期間) は testGetVideoData.py と共通
+from testGetVideoData import business_id, start_date, end_date
+from field_projection import plan_fields
+from video_pager import iter_video_pages, prefetch_pages
+from video_sync import VideoSyncStore, iter_changed_videos, page_cutoff
+from retention_store import RetentionStore
+from video_snapshots import VideoSnapshotStore, views_gained_yesterday
+from video_arrow import videos_to_arrow, load_videos_parquet
+from lazy_clients import get_access_token, get_bigquery_client
+from log_utils import get_logger
+
+logger = get_logger(__name__)
 
 # --- 設定 ---
 # !! WARNING: セキュリティのため、コードに直接書き込まず、環境変数などから取得することを強く推奨します !!
@@ -19,89 +26,113 @@ SERVICE_ACCOUNT_FILE = '../.seacrets/isentropic-now-457219-t2-ffcae5667fbe.json'
 PROJECT_ID = 'isentropic-now-457219-t2' # <--- あなたのGCPプロジェクトIDに修正
 DATASET_ID = 'TikTok_insight_tool'     # <--- あなたのデータセットIDに修正
 TABLE_NAME = 'videoDataNo1'         # <--- あなたのテーブル名に修正
+# このテーブルの列だけを取得する (field_projection の "bigquery" に登録)
+FIELDS_LIST = plan_fields("video", ["bigquery"])
 
 
 def build_bigquery_client(key_file_path, project_id):
     if not os.path.exists(key_file_path):
-        print(f"エラー: サービスアカウントキーファイルが見つかりません: {key_file_path}")
+        logger.error("エラー: サービスアカウントキーファイルが見つかりません: %s", key_file_path)
         return None
     try:
-        creds = Credentials.from_service_account_file(key_file_path)
-        client = bigquery.Client(credentials=creds, project=project_id)
-        return client
+        # 同じキー・プロジェクトのクライアントはプロセス内で使い回す
+        return get_bigquery_client(key_file_path, project_id)
     except Exception as e:
-        print(f"エラー: BigQuery クライアントの構築中にエラーが発生しました: {e}")
-        print(f"指定されたファイルパス: {key_file_path}")
+        logger.error("エラー: BigQuery クライアントの構築中にエラーが発生しました: %s", e)
+        logger.info("指定されたファイルパス: %s", key_file_path)
         return None
 
 
-def output():
+def output(sync_store=None):
+    """
+    動画データを BigQuery に追記する関数。
+    前回の同期から新しく増えた動画と、メトリクスが変わった動画だけをロードする (video_sync)。
+    ウォーターマークより SYNC_LOOKBACK_DAYS 日以上前に投稿された動画のページまで来たら、ページ送りをやめる。
+
+    Args:
+        sync_store (VideoSyncStore): 差分の判定に使うストア (None ならローカルDBのものを使う)
+    """
     client = build_bigquery_client(SERVICE_ACCOUNT_FILE, PROJECT_ID)
 
     if client is None:
-        print("BigQueryクライアントの構築に失敗したため、処理を中断します。")
+        logger.error("BigQueryクライアントの構築に失敗したため、処理を中断します。")
         return
 
-    response_dict = getVideoAPI()
-    print(response_dict)
-    print("実行したよね？？")
+    sync_store = sync_store or VideoSyncStore()
+    watermark = sync_store.watermark(business_id)
+    if watermark:
+        logger.info("前回の同期: %s (最新の投稿 create_time=%s)", watermark["last_synced_at"], watermark["max_create_time"])
 
-    if response_dict.get("code") != 0:
-        print(f"APIからエラー応答が返されました: code={response_dict.get('code')}, message={response_dict.get('message')}")
+    # 動画一覧はページ単位で取得し (次のページは裏で先読み)、ページごとに新規・変更分だけを取り出す
+    # observed には実際に取得した動画の item_id が入る (ページ送りをやめた先の古い動画は含まれない)
+    observed = set()
+    try:
+        pages = iter_video_pages(business_id, get_access_token(), FIELDS_LIST,
+                                 extra_params={"start_date": start_date, "end_date": end_date})
+        changes = list(iter_changed_videos(business_id, prefetch_pages(pages), sync_store,
+                                           stop_before=page_cutoff(watermark), observed=observed))
+    except RuntimeError as e:
+        logger.error("APIからエラー応答が返されました: %s", e)
+        return
+    except Exception as e:
+        logger.error("動画データの取得中にエラーが発生しました: %s", e)
         return
 
-    # --- ここを修正 ---
-    # APIレスポンス全体の辞書から "data" キーの値（ネストされた辞書）を取得
-    api_data_payload = response_dict.get("data", {})
+    if not changes:
+        logger.info("前回の同期から新しい動画・変更のあった動画はありませんでした。")
+        # 取得した動画に変化がなかったことも記録しておく (翌日の増加分を前日からの1日分として扱えるように)
+        VideoSnapshotStore().save_snapshots(business_id, [], observed=observed)
+        return
 
-    # そのネストされた辞書から "videos" キーの値（動画データのリスト）を取得
-    data_list = api_data_payload.get("videos", [])
-    # --- 修正ここまで ---
+    # deep モードで取得した視聴維持率カーブなどは、パースして item_id ごとにローカルにも保存しておく
+    videos = [video for video, _, _ in changes]
+    saved_curves = RetentionStore().save_videos(videos)
+    if saved_curves:
+        logger.info("カーブを保存しました: %s", saved_curves)
 
-    if not data_list:
-        print("APIレスポンスに挿入対象のデータがありませんでした。")
-        return
+    # 累計値を今日のスナップショットとして、前回のスナップショットとの差から「昨日増えた再生数」を出す
+    # (取得して変化のなかった動画はスナップショットを保存しない = 増加分0)。スナップショットはロードが成功してから保存する
+    snapshot_store = VideoSnapshotStore()
+    gained = views_gained_yesterday(snapshot_store, business_id, pending=videos, observed=observed)
 
+    # 配列フィールドも含めて明示的なスキーマの Arrow テーブルにする (pandas の object 列を経由しない)
     try:
-        df = pd.DataFrame(data_list)
+        table = videos_to_arrow(videos, extra_columns={
+            gained.name: [gained.get(str(video.get("item_id"))) for video in videos],
+        })
     except Exception as e:
-        print(f"APIレスポンスデータをDataFrameに変換中にエラーが発生しました: {e}")
+        logger.error("APIレスポンスデータをArrowテーブルに変換中にエラーが発生しました: %s", e)
         return
-
-    if 'create_time' in df.columns:
-        df['create_time'] = pd.to_datetime(df['create_time'], unit='s', errors='coerce')
+    logger.info("動画データ %s 件をロードします。", table.num_rows)
 
     try:
         table_ref = client.dataset(DATASET_ID, project=PROJECT_ID).table(TABLE_NAME)
         # テーブルの存在確認は必須ではないので省略
         # table = client.get_table(table_ref)
     except Exception as e:
-        print(f"エラー: BigQueryテーブル '{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}' の参照中にエラーが発生しました: {e}")
+        logger.error("エラー: BigQueryテーブル '%s.%s.%s' の参照中にエラーが発生しました: %s", PROJECT_ID, DATASET_ID, TABLE_NAME, e)
         return
 
-    job_config = bigquery.LoadJobConfig(write_disposition="WRITE_APPEND")
-
     try:
-        job = client.load_table_from_dataframe(
-            df, table_ref, job_config=job_config
-        )
-
-        # ジョブの完了を待機
-        job.result()
+        # Parquet でロードし、完了を待機
+        job = load_videos_parquet(client, table_ref, table)
 
         if job.state == 'DONE':
             if job.error_result:
-                print("BigQueryロードジョブ中にエラーが発生しました:", job.error_result)
+                logger.error("BigQueryロードジョブ中にエラーが発生しました: %s", job.error_result)
                 for error in job.errors:
-                    print(error)
+                    logger.error("  %s", error)
             else:
                  # 成功時のメッセージは任意。最低限のエラー報告のみにするならこれも削除
-                print(f"BigQueryテーブル '{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}' に {job.output_rows} 件のデータをロードしました。")
+                logger.info("BigQueryテーブル '%s.%s.%s' に %s 件のデータをロードしました。", PROJECT_ID, DATASET_ID, TABLE_NAME, job.output_rows)
+                # ロードが成功した動画だけを同期済みにする (失敗した場合は次回もう一度対象になる)
+                sync_store.mark_synced(business_id, changes)
+                snapshot_store.save_snapshots(business_id, videos, observed=observed)
         else:
-            print(f"BigQueryロードジョブは異常終了しました。状態: {job.state}")
+            logger.info("BigQueryロードジョブは異常終了しました。状態: %s", job.state)
 
     except Exception as e:
-        print(f"BigQueryへのデータロード中に予期しないエラーが発生しました: {e}")
+        logger.error("BigQueryへのデータロード中に予期しないエラーが発生しました: %s", e)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# test/ 以下のスクリプトは互いにモジュール名だけで import しているので、test/ を import パスに入れる
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """テストごとに空の SQLite ファイルのパスを返す"""
+    return str(tmp_path / "tiktok_local.db")
@@ -0,0 +1,112 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import api_client
+import rate_limiter
+from api_client import api_get, api_post, build_url, encode_params, resolve_business_id
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, method="GET", url="https://example/"):
+        self.content = json.dumps(body).encode()
+        self.status_code = status_code
+        self.headers = {}
+        self.url = url
+        self.request = SimpleNamespace(method=method)
+        self.closed = False
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """送ったリクエストを記録し、用意したレスポンスを順番に返す requests.Session の代わり"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def _send(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+    def get(self, url, **kwargs):
+        return self._send("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._send("POST", url, **kwargs)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(*responses):
+        fake = FakeSession(responses)
+        monkeypatch.setattr(api_client, "_session", fake)
+        return fake
+
+    scheduler = rate_limiter.RateLimitScheduler(app_qps=1000, business_qps=1000, max_retries=2, backoff_base=0)
+    monkeypatch.setattr(rate_limiter, "_scheduler", scheduler)
+    return install
+
+
+def test_build_url_prefixes_the_api_version():
+    assert build_url("business/get/") == "https://business-api.tiktok.com/open_api/v1.3/business/get/"
+    assert build_url("/open_api/v1.2/oauth2/advertiser/get/") == \
+        "https://business-api.tiktok.com/open_api/v1.2/oauth2/advertiser/get/"
+
+
+def test_encode_params_serializes_lists_and_drops_none():
+    assert encode_params({"fields": ["a", "b"], "business_id": "B", "cursor": None}) == \
+        {"fields": '["a", "b"]', "business_id": "B"}
+    assert encode_params(None) == {}
+
+
+def test_resolve_business_id(monkeypatch):
+    monkeypatch.setenv("TIKTOK_BUSINESS_ID", "ENV")
+    assert resolve_business_id("ARG") == "ARG"
+    assert resolve_business_id() == "ENV"
+    monkeypatch.delenv("TIKTOK_BUSINESS_ID")
+    with pytest.raises(ValueError):
+        resolve_business_id()
+
+
+def test_api_get_sends_token_and_encoded_params(session):
+    fake = session(FakeResponse({"code": 0}))
+    response = api_get("business/get/", "token", params={"business_id": "B", "fields": ["x"]})
+
+    assert response.json() == {"code": 0}
+    method, url, kwargs = fake.calls[0]
+    assert (method, url) == ("GET", build_url("business/get/"))
+    assert kwargs["headers"] == {"Access-Token": "token"}
+    assert kwargs["params"] == {"business_id": "B", "fields": '["x"]'}
+
+
+def test_api_post_sends_json_payload(session):
+    fake = session(FakeResponse({"code": 0}, method="POST"))
+    api_post("tt_user/oauth2/token/", payload={"auth_code": "c"})
+
+    method, url, kwargs = fake.calls[0]
+    assert method == "POST"
+    assert kwargs["json"] == {"auth_code": "c"}
+    assert kwargs["headers"] == {"Content-Type": "application/json"}
+
+
+def test_rate_limited_response_is_retried(session):
+    throttled = FakeResponse({"code": 40100, "message": "rate limit"})
+    fake = session(throttled, FakeResponse({"code": 0}))
+
+    assert api_get("business/get/", params={"business_id": "B"}).json() == {"code": 0}
+    assert len(fake.calls) == 2
+    assert throttled.closed
+
+
+def test_last_response_is_returned_when_retries_run_out(session):
+    fake = session(*[FakeResponse({}, status_code=429) for _ in range(3)])
+
+    assert api_get("business/get/").status_code == 429
+    assert len(fake.calls) == 3
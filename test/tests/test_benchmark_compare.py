@@ -0,0 +1,124 @@
+import datetime
+import math
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import benchmark_compare
+import profile_store
+import testGetProfileRefactaring
+from benchmark_compare import account_metrics, baseline_metrics, compare_to_baselines, get_baselines, parse_accounts
+from profile_store import ProfileMetricsStore
+
+
+def days_ago(n):
+    return (datetime.date.today() - datetime.timedelta(days=n)).isoformat()
+
+
+def daily_response(start_date, end_date, views=10):
+    start, end = datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date)
+    metrics = []
+    while start <= end:
+        metrics.append({"date": start.isoformat(), "video_views": views, "comments": 1})
+        start += datetime.timedelta(days=1)
+    return {"code": 0, "data": {"username": "user", "metrics": metrics}}
+
+
+@pytest.fixture
+def store(db_path):
+    return ProfileMetricsStore(db_path)
+
+
+def test_account_metrics_fetches_missing_days(monkeypatch, store):
+    requests = []
+
+    def fake_request(start_date, end_date, business_id, fields_list, access_token):
+        requests.append((business_id, start_date, end_date))
+        return daily_response(start_date, end_date), None
+
+    monkeypatch.setattr(testGetProfileRefactaring, "request_profile_data", fake_request)
+    start, end = days_ago(20), days_ago(11)
+    store.save_response("A", daily_response(start, days_ago(16)))
+
+    df = account_metrics({"A": "FOOD"}, start, end, store=store, access_token="token")
+
+    # 保存済みの日は取り直さない
+    assert requests == [("A", days_ago(15), end)]
+    row = df.iloc[0]
+    assert row["days_covered"] == 10
+    assert row["video_views"] == pytest.approx(10.0)
+
+
+def test_account_with_gaps_is_left_out_of_the_comparison(store):
+    start, end = days_ago(20), days_ago(11)
+    store.save_response("A", daily_response(start, days_ago(16)))
+
+    df = account_metrics({"A": "FOOD"}, start, end, store=store, fetch=False)
+
+    assert df.iloc[0]["days_covered"] == 5
+    assert math.isnan(df.iloc[0]["video_views"])
+
+
+def test_parse_accounts():
+    assert parse_accounts(" A=FOOD, B = GAME ,broken,C=") == {"A": "FOOD", "B": "GAME"}
+
+
+def test_baseline_metrics_strips_prefixes():
+    assert baseline_metrics({"average_video_views": "12.5", "avg_shares": 3, "name": "x"}) == {
+        "video_views": 12.5, "shares": 3.0}
+
+
+def test_compare_to_baselines_ranks_by_log_ratio():
+    import pandas as pd
+
+    accounts = pd.DataFrame([
+        {"business_id": "A", "category": "FOOD", "video_views": 200.0, "shares": 20.0},
+        {"business_id": "B", "category": "FOOD", "video_views": 50.0, "shares": 10.0},
+        {"business_id": "C", "category": "GAME", "video_views": float("nan"), "shares": float("nan")},
+    ])
+    baselines = {"FOOD": {"video_views": 100.0, "shares": 10.0}, "GAME": {"video_views": 100.0, "shares": 10.0}}
+
+    result = compare_to_baselines(accounts, baselines)
+
+    assert list(result["business_id"]) == ["A", "B", "C"]
+    assert result.loc[0, "video_views_ratio"] == pytest.approx(2.0)
+    assert result.loc[0, "score"] == pytest.approx((1.0 + 1.0) / 2)
+    assert result.loc[1, "score"] == pytest.approx((-1.0 + 0.0) / 2)
+    # データのないアカウントは最下位 (score は NaN)
+    assert math.isnan(result.loc[2, "score"])
+
+
+class FakeCache:
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def get_many(self, keys):
+        return {key: self.values[key] for key in keys if key in self.values}
+
+    def set_many(self, mapping):
+        self.values.update(mapping)
+
+
+def test_get_baselines_fetches_only_cache_misses(monkeypatch):
+    fetched = []
+
+    def fake_fetch(category, business_id, access_token):
+        fetched.append((category, business_id))
+        return {"average_video_views": 7}
+
+    monkeypatch.setattr(benchmark_compare, "fetch_benchmark", fake_fetch)
+    cache = FakeCache({"FOOD": {"video_views": 1.0}})
+
+    baselines = get_baselines(["FOOD", "GAME", "GAME", ""], business_id="B", cache=cache)
+
+    assert fetched == [("GAME", "B")]
+    assert baselines == {"FOOD": {"video_views": 1.0}, "GAME": {"video_views": 7.0}}
+    assert cache.values["GAME"] == {"video_views": 7.0}
+
+
+def test_get_baselines_requires_business_id_only_on_a_miss(monkeypatch):
+    monkeypatch.delenv("TIKTOK_BUSINESS_ID", raising=False)
+    assert get_baselines(["FOOD"], cache=FakeCache({"FOOD": {"x": 1.0}})) == {"FOOD": {"x": 1.0}}
+    with pytest.raises(ValueError):
+        get_baselines(["GAME"], cache=FakeCache())
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+import bulk_bq_loader
+from bulk_bq_loader import LoadManifest, dedupe_rows, load_kind
+
+
+class FakeJob:
+    def __init__(self, output_rows=0, affected=0):
+        self.error_result = None
+        self.output_rows = output_rows
+        self.num_dml_affected_rows = affected
+
+    def result(self):
+        return self
+
+
+class FakeTable:
+    def __init__(self, schema):
+        self.schema = schema
+
+
+class FakeClient:
+    """ロードジョブ・MERGE・テーブルの削除を記録する bigquery.Client の代わり"""
+
+    def __init__(self, fail_merge=False):
+        self.loads = []
+        self.queries = []
+        self.deleted = []
+        self.fail_merge = fail_merge
+
+    def load_table_from_json(self, rows, table_ref, job_config=None):
+        self.loads.append((table_ref, list(rows), job_config))
+        return FakeJob(output_rows=len(rows))
+
+    def get_table(self, table_ref):
+        return FakeTable(self.loads[-1][2].schema)
+
+    def query(self, query):
+        if self.fail_merge:
+            raise RuntimeError("merge failed")
+        self.queries.append(query)
+        return FakeJob(affected=1)
+
+    def delete_table(self, table_ref, not_found_ok=False):
+        self.deleted.append(table_ref)
+
+
+def write_profile(tmp_path, name, username, dates):
+    path = tmp_path / name
+    metrics = [{"date": date, "video_views": 1} for date in dates]
+    path.write_text(json.dumps({"code": 0, "data": {"username": username, "metrics": metrics}}), encoding="utf-8")
+    return str(path)
+
+
+def test_dedupe_rows_on_composite_key():
+    rows = [
+        {"username": "a", "metrics_date": "2025-05-01", "v": 1},
+        {"username": "a", "metrics_date": "2025-05-02", "v": 2},
+        {"username": "b", "metrics_date": "2025-05-01", "v": 3},
+        {"username": "a", "metrics_date": "2025-05-01", "v": 4},
+        {"username": "", "metrics_date": "2025-05-01", "v": 5},
+    ]
+    deduped = dedupe_rows(rows, ("username", "metrics_date"))
+    assert sorted(row["v"] for row in deduped) == [2, 3, 4]
+
+
+def test_profile_rows_are_deduped_and_merged_through_a_per_run_staging_table(tmp_path, db_path):
+    paths = [write_profile(tmp_path, "tiktok_profile_1.json", "a", ["2025-05-01", "2025-05-02"]),
+             write_profile(tmp_path, "tiktok_profile_2.json", "a", ["2025-05-02", "2025-05-03"])]
+    client = FakeClient()
+
+    load_kind(client, "profile", paths, LoadManifest(db_path))
+    load_kind(client, "profile", paths, LoadManifest(db_path))
+
+    (first_ref, rows, config), (second_ref, _, _) = client.loads
+    assert len(rows) == 3
+    # スキーマを渡すので、ロード先のテーブルがなくても作れる
+    assert {field.name for field in config.schema} >= {"username", "metrics_date"}
+    assert first_ref != second_ref
+    assert first_ref.startswith(f"{bulk_bq_loader.PROJECT_ID}.{bulk_bq_loader.DATASET_ID}.")
+    assert bulk_bq_loader.STAGING_SUFFIX in first_ref
+    assert "T.`username` = S.`username` AND T.`metrics_date` = S.`metrics_date`" in client.queries[0]
+    assert client.deleted == [first_ref, second_ref]
+
+
+def test_staging_table_is_deleted_when_merge_fails(tmp_path, db_path):
+    path = write_profile(tmp_path, "tiktok_profile_1.json", "a", ["2025-05-01"])
+    client = FakeClient(fail_merge=True)
+    manifest = LoadManifest(db_path)
+
+    assert load_kind(client, "profile", [path], manifest) == 0
+    assert client.deleted == [client.loads[0][0]]
+    # 失敗したファイルは次回もう一度対象になる
+    assert manifest.pending([path]) == [path]
+    assert os.path.exists(path)
@@ -0,0 +1,136 @@
+import pytest
+
+import comment_crawler
+from comment_crawler import CommentCrawlStore, crawl_video_comments
+
+
+class FakeCommentsAPI:
+    """create_time の新しい順にコメントを返す video/comment/list/ の代わり (cursor はオフセット)"""
+
+    def __init__(self):
+        self.comments = []
+        self.next_time = 1000
+        self.fail_on_call = None
+        self.calls = 0
+
+    def post(self, count):
+        for _ in range(count):
+            self.next_time += 1
+            self.comments.insert(0, {"comment_id": f"c{self.next_time}", "create_time": self.next_time,
+                                     "likes": 0, "replies": 0})
+
+    def __call__(self, video_id, business_id, access_token, cursor=None, max_count=20, extra_params=None):
+        self.calls += 1
+        if self.fail_on_call == self.calls:
+            raise RuntimeError("network error")
+        offset = cursor or 0
+        page = self.comments[offset:offset + max_count]
+        next_cursor = offset + len(page)
+        return {"code": 0, "data": {"comments": [dict(c) for c in page], "cursor": next_cursor,
+                                    "has_more": next_cursor < len(self.comments)}}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeCommentsAPI()
+    monkeypatch.setattr(comment_crawler, "fetch_comments", fake)
+    return fake
+
+
+@pytest.fixture
+def store(db_path):
+    return CommentCrawlStore(db_path)
+
+
+def crawl(store, sink, **kwargs):
+    return crawl_video_comments("B", "V", "token", store, sink=lambda video_id, page: sink.extend(page),
+                                page_size=20, **kwargs)
+
+
+def stored_ids(store):
+    return {row[0] for row in store.conn.execute("SELECT comment_id FROM crawled_comments")}
+
+
+def test_initial_crawl_resumes_after_max_pages(api, store):
+    api.post(50)
+    saved = []
+    assert crawl(store, saved, max_pages=2) == 40
+    assert not store.state("B", "V")["completed"]
+    assert crawl(store, saved) == 10
+    assert store.state("B", "V")["completed"]
+    assert len(stored_ids(store)) == 50 and len({c["comment_id"] for c in saved}) == 50
+
+
+def test_incremental_crawl_stops_at_known_comments(api, store):
+    api.post(30)
+    crawl(store, [])
+    api.post(5)
+    saved = []
+    assert crawl(store, saved) == 5
+    # 先頭のページだけで既知のコメントに届く
+    assert api.calls == 2 + 1
+
+
+def test_interrupted_incremental_crawl_is_resumed(api, store):
+    api.post(20)
+    crawl(store, [])
+    api.post(100)
+
+    saved = []
+    assert crawl(store, saved, max_pages=2) == 40
+    state = store.state("B", "V")
+    assert state["resume_cursor"] == 40 and state["catchup_boundary"] == 1020
+
+    # 止まっている間に増えたコメントも、再開した分のあとで先頭に戻って取得する
+    api.post(3)
+    assert crawl(store, saved) == 63
+    assert len(stored_ids(store)) == 123
+    assert len(saved) == len({c["comment_id"] for c in saved}) == 103
+    state = store.state("B", "V")
+    assert state["resume_cursor"] is None and state["catchup_boundary"] is None
+
+    # 取り残しがなければ、次回は先頭の1ページで止まる
+    calls = api.calls
+    assert crawl(store, saved) == 0
+    assert api.calls == calls + 1
+
+
+def test_failed_incremental_page_is_fetched_again(api, store):
+    api.post(20)
+    crawl(store, [])
+    api.post(100)
+    api.fail_on_call = api.calls + 3
+
+    saved = []
+    with pytest.raises(RuntimeError):
+        crawl(store, saved)
+    assert len(saved) == 40
+
+    assert crawl(store, saved) == 60
+    assert len(stored_ids(store)) == 120
+
+
+def test_sink_failure_does_not_record_the_page(api, store):
+    api.post(20)
+
+    def failing_sink(video_id, page):
+        raise IOError("disk full")
+
+    with pytest.raises(IOError):
+        crawl_video_comments("B", "V", "token", store, sink=failing_sink, page_size=20)
+    assert stored_ids(store) == set()
+    saved = []
+    assert crawl(store, saved) == 20
+
+
+def test_old_state_table_gets_catchup_column(db_path):
+    from local_db import connect
+    conn = connect(db_path)
+    conn.execute("""CREATE TABLE comment_crawl_state (business_id TEXT NOT NULL, video_id TEXT NOT NULL,
+                    max_create_time INTEGER NOT NULL DEFAULT 0, resume_cursor INTEGER,
+                    completed INTEGER NOT NULL DEFAULT 0, last_crawled_at TEXT NOT NULL,
+                    PRIMARY KEY (business_id, video_id))""")
+    conn.execute("INSERT INTO comment_crawl_state VALUES ('B', 'V', 5, NULL, 1, '2024-01-01')")
+    conn.commit()
+    conn.close()
+    assert CommentCrawlStore(db_path).state("B", "V")["catchup_boundary"] is None
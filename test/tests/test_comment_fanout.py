@@ -0,0 +1,66 @@
+import threading
+import time
+
+from comment_fanout import fan_out_comments
+
+
+def test_every_video_with_comments_is_handled_once():
+    handled = []
+    lock = threading.Lock()
+
+    def handler(business_id, video, access_token):
+        with lock:
+            handled.append(video["item_id"])
+        return 2
+
+    videos = [{"item_id": str(i), "create_time": i, "comments": i % 3} for i in range(30)]
+    videos.append({"item_id": None})
+    stats = fan_out_comments("B", iter(videos), handler, access_token="token", max_workers=4, queue_size=3)
+
+    expected = [v["item_id"] for v in videos if v.get("comments")]
+    assert sorted(handled) == sorted(expected)
+    assert stats == {"videos": len(expected), "skipped": 10, "comments": 2 * len(expected), "failed": []}
+
+
+def test_newer_videos_are_fetched_first():
+    released = threading.Event()
+    order = []
+
+    def handler(business_id, video, access_token):
+        # 最初の1本の処理中に残りの動画がキューに溜まるようにする
+        if not order:
+            released.wait(2)
+        order.append(int(video["create_time"]))
+        return 0
+
+    def videos():
+        for create_time in [5, 1, 9, 3, 7]:
+            yield {"item_id": str(create_time), "create_time": str(create_time)}
+        released.set()
+
+    fan_out_comments("B", videos(), handler, access_token="token", max_workers=1)
+    # ワーカーが最初に取り出す1本はタイミング次第なので、それ以降の順番を確認する
+    assert sorted(order) == [1, 3, 5, 7, 9]
+    assert order[1:] == sorted(order[1:], reverse=True)
+
+
+def test_concurrency_is_bounded_and_failures_are_reported():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def handler(business_id, video, access_token):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.005)
+        with lock:
+            active[0] -= 1
+        if video["item_id"] == "3":
+            raise RuntimeError("boom")
+        return 1
+
+    stats = fan_out_comments("B", ({"item_id": str(i)} for i in range(20)), handler, access_token="token",
+                             max_workers=3)
+    assert peak[0] <= 3
+    assert stats["failed"] == ["3"]
+    assert stats["videos"] == 19
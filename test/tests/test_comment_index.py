@@ -0,0 +1,84 @@
+import datetime
+import json
+import os
+
+import pytest
+
+from comment_index import CommentIndex, ingest_files, video_id_from_path
+
+
+def epoch(*args):
+    return int(datetime.datetime(*args).timestamp())
+
+
+COMMENTS = [
+    {"comment_id": "1", "video_id": "V1", "user_id": "u1", "username": "alice", "text": "この動画は最高です",
+     "likes": 3, "create_time": epoch(2025, 5, 1, 10)},
+    {"comment_id": "2", "video_id": "V1", "user_id": "u2", "username": "bob", "text": "100%_off? spam",
+     "likes": 0, "create_time": epoch(2025, 5, 2, 10)},
+    {"comment_id": "3", "video_id": "V2", "user_id": "u1", "username": "alice", "text": "次の動画も楽しみ",
+     "likes": "7", "create_time": str(epoch(2025, 5, 3, 23, 59))},
+]
+
+
+@pytest.fixture
+def index(db_path):
+    index = CommentIndex(db_path)
+    index.add(COMMENTS)
+    return index
+
+
+def ids(rows):
+    return [row["comment_id"] for row in rows]
+
+
+def test_phrase_search_matches_japanese_substrings(index):
+    assert ids(index.search("最高です")) == ["1"]
+    # 3文字未満の語も探せる (trigram では LIKE を使う)
+    assert ids(index.search("動画")) == ["3", "1"]
+
+
+def test_like_wildcards_in_the_phrase_are_literal(index):
+    assert ids(index.search("%_")) == ["2"]
+    assert ids(index.search("0%")) == ["2"]
+
+
+def test_filters_combine(index):
+    assert ids(index.search(author="alice")) == ["3", "1"]
+    assert ids(index.search(author="u2")) == ["2"]
+    assert ids(index.search(video_id="V1", start_date="2025-05-02")) == ["2"]
+    # end_date はその日の終わりまで含む
+    assert ids(index.search(start_date="2025-05-03", end_date="2025-05-03")) == ["3"]
+    assert ids(index.search("動画", author="alice", video_id="V2")) == ["3"]
+    assert len(index.search(limit=1)) == 1
+
+
+def test_updates_reindex_changed_text(index):
+    index.add([{"comment_id": "1", "text": "編集されたコメント", "likes": 9}])
+    assert ids(index.search("最高です")) == []
+    assert ids(index.search("編集された")) == ["1"]
+    row = index.search("編集された")[0]
+    # 送られてこなかった列は元の値のまま
+    assert (row["likes"], row["video_id"], row["username"]) == (9, "V1", "alice")
+    assert index.count() == 3
+
+
+def test_video_id_from_path():
+    assert video_id_from_path("tiktok_data/tiktok_comments_7012_20250501_101010.json") == "7012"
+    assert video_id_from_path("tiktok_comments_7012_20250501_101010_p002.json") == "7012"
+    assert video_id_from_path("tiktok_video_20250501_101010.json") is None
+
+
+def test_ingest_reads_only_new_or_changed_files(tmp_path, db_path):
+    index = CommentIndex(db_path)
+    path = tmp_path / "tiktok_comments_V9_20250501_101010.json"
+    path.write_text(json.dumps({"data": {"comments": [{"comment_id": "a", "text": "hello"}]}}), encoding="utf-8")
+
+    assert ingest_files(index, str(tmp_path)) == 1
+    assert ingest_files(index, str(tmp_path)) == 0
+    assert index.search("hello")[0]["video_id"] == "V9"
+
+    path.write_text(json.dumps({"data": {"comments": [{"comment_id": "b", "text": "again"}]}}), encoding="utf-8")
+    os.utime(path, (1, 1))
+    assert ingest_files(index, str(tmp_path)) == 1
+    assert index.count() == 2
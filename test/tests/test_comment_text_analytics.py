@@ -0,0 +1,122 @@
+import json
+import math
+import os
+
+import pytest
+
+import comment_text_analytics as cta
+from comment_text_analytics import CommentTextStore, analyze_comments, analyze_files, count_batch, load_video_accounts
+
+
+def write_comments(data_dir, video_id, comments, stamp="20240501_120000"):
+    path = os.path.join(data_dir, f"tiktok_comments_{video_id}_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"code": 0, "data": {"comments": comments}}, f, ensure_ascii=False)
+    return path
+
+
+def comment(comment_id, text, likes=0, video_id=None):
+    c = {"comment_id": comment_id, "text": text, "likes": likes}
+    if video_id:
+        c["video_id"] = video_id
+    return c
+
+
+@pytest.fixture(autouse=True)
+def plain_tokenizer(monkeypatch):
+    # janome の有無で結果が変わらないように、文字種の切れ目で区切る方を使う
+    monkeypatch.setattr(cta, "_tokenizer", False)
+
+
+@pytest.fixture
+def store(db_path):
+    return CommentTextStore(db_path)
+
+
+def terms(store, scope):
+    return {term: count for term, count, _ in store.top_terms(scope, limit=100)}
+
+
+def test_count_batch_counts_once_per_comment_and_weights_by_likes():
+    counts, weighted = count_batch([comment("1", "ポケモン ポケモン 最高😀", likes=0),
+                                    comment("2", "ポケモン", likes=9)])
+    assert counts["term"]["ポケモン"] == 2
+    assert counts["emoji"]["😀"] == 1
+    assert weighted["term"]["ポケモン"] == pytest.approx(1.0 + (1.0 + math.log1p(9)))
+
+
+def test_analyze_comments_counts_new_comments_once_per_scope(store):
+    comments = [comment("1", "ポケモン"), comment("2", "ピカチュウ")]
+    assert analyze_comments(comments, ["video:V", "account:A"], store) == 2
+    assert analyze_comments(comments, ["video:V", "account:A"], store) == 0
+    # 新しい scope には、集計済みのコメントも足し込む
+    assert analyze_comments(comments, ["video:V", "account:B"], store) == 2
+    assert terms(store, "video:V") == {"ポケモン": 1, "ピカチュウ": 1}
+    assert terms(store, "account:B") == {"ポケモン": 1, "ピカチュウ": 1}
+
+
+def test_account_scope_comes_from_the_video_mapping(store, tmp_path):
+    data_dir = str(tmp_path)
+    write_comments(data_dir, "111", [comment("1", "ポケモン")])
+    write_comments(data_dir, "222", [comment("2", "ピカチュウ")])
+
+    analyze_files(store, data_dir, accounts={"111": "A", "222": "B"})
+
+    assert terms(store, "account:A") == {"ポケモン": 1}
+    assert terms(store, "account:B") == {"ピカチュウ": 1}
+    assert terms(store, "video:111") == {"ポケモン": 1}
+
+
+def test_unknown_video_is_only_counted_per_video_until_its_account_is_known(store, tmp_path):
+    data_dir = str(tmp_path)
+    write_comments(data_dir, "111", [comment("1", "ポケモン")])
+
+    assert analyze_files(store, data_dir, accounts={}) == 1
+    assert store.scopes() == ["video:111"]
+    # 対応がわからないままなら読み直さない
+    assert analyze_files(store, data_dir, accounts={"999": "A"}) == 0
+
+    # 対応がわかったら読み直して、アカウント単位にだけ足し込む
+    assert analyze_files(store, data_dir, accounts={"111": "A"}) == 1
+    assert terms(store, "account:A") == {"ポケモン": 1}
+    assert terms(store, "video:111") == {"ポケモン": 1}
+    assert analyze_files(store, data_dir, accounts={"111": "A"}) == 0
+
+
+def test_video_id_falls_back_to_the_file_name(store, tmp_path):
+    write_comments(str(tmp_path), "333", [comment("1", "ポケモン"), comment("2", "ピカチュウ", video_id="444")])
+    analyze_files(store, str(tmp_path), accounts={"333": "A", "444": "A"})
+    assert terms(store, "video:333") == {"ポケモン": 1}
+    assert terms(store, "video:444") == {"ピカチュウ": 1}
+    assert terms(store, "account:A") == {"ポケモン": 1, "ピカチュウ": 1}
+
+
+def test_load_video_accounts_skips_videos_in_several_accounts(db_path):
+    from comment_crawler import CommentCrawlStore
+    from video_sync import VideoSyncStore
+
+    crawl_store = CommentCrawlStore(db_path)
+    crawl_store.record_page("A", "111", [])
+    crawl_store.record_page("A", "333", [])
+    crawl_store.record_page("B", "333", [])
+    sync_store = VideoSyncStore(db_path)
+    sync_store.mark_synced("B", sync_store.diff("B", [{"item_id": "222", "create_time": 1}]))
+
+    assert load_video_accounts(db_path) == {"111": "A", "222": "B"}
+
+
+def test_old_schema_is_rebuilt(db_path):
+    from local_db import connect
+    conn = connect(db_path)
+    conn.execute("CREATE TABLE comment_text_files (path TEXT NOT NULL, account TEXT NOT NULL, mtime REAL NOT NULL, "
+                 "PRIMARY KEY (path, account))")
+    conn.execute("CREATE TABLE comment_term_stats (scope TEXT, kind TEXT, term TEXT, count INTEGER, weighted REAL, "
+                 "PRIMARY KEY (scope, kind, term))")
+    conn.execute("INSERT INTO comment_term_stats VALUES ('account:WRONG', 'term', 'x', 1, 1.0)")
+    conn.commit()
+    conn.close()
+    assert CommentTextStore(db_path).scopes() == []
+
+
+def test_tokenize_texts_returns_one_list_per_text():
+    assert cta.tokenize_texts(["ポケモンカード 最高", "", "Pikachu です"]) == [["ポケモンカード", "最高"], [], ["pikachu"]]
@@ -0,0 +1,90 @@
+import datetime
+import random
+
+import pytest
+
+from commenter_sketches import (CommenterSketch, CommenterSketchStore, CountMinSketch, HyperLogLog, hash_keys,
+                                sketch_sink, update_sketches)
+
+
+def comments_for(counts, day=None):
+    create_time = int(datetime.datetime(*(day or (2025, 5, 1)), 12).timestamp())
+    return [{"user_id": f"u{user}", "username": f"name{user}", "create_time": create_time}
+            for user, count in counts.items() for _ in range(count)]
+
+
+def test_hash_keys_is_stable():
+    assert hash_keys(["a", "b"]).tolist() == hash_keys(["a", "b"]).tolist()
+    assert hash_keys(["a"])[0] != hash_keys(["b"])[0]
+
+
+def test_count_min_never_underestimates():
+    rng = random.Random(0)
+    counts = {f"k{i}": rng.randint(1, 30) for i in range(3000)}
+    cms = CountMinSketch(width=512, depth=4)
+    cms.add(hash_keys([key for key, count in counts.items() for _ in range(count)]))
+    estimates = cms.estimate(hash_keys(list(counts)))
+    assert all(estimate >= count for estimate, count in zip(estimates, counts.values()))
+
+
+@pytest.mark.parametrize("true_count", [10, 1000, 50000])
+def test_hyperloglog_is_within_a_few_percent(true_count):
+    hll = HyperLogLog()
+    hll.add(hash_keys(range(true_count)))
+    hll.add(hash_keys(range(true_count // 2)))  # 何回入れても同じ
+    assert hll.count() == pytest.approx(true_count, rel=0.06)
+
+
+def test_merged_daily_sketches_equal_one_sketch_of_all_comments():
+    days = [comments_for({i: 1 + i % 3 for i in range(d * 50, d * 50 + 200)}) for d in range(3)]
+    merged = CommenterSketch()
+    for day in days:
+        sketch = CommenterSketch()
+        sketch.add_comments(day)
+        merged.merge(sketch)
+    single = CommenterSketch()
+    single.add_comments([c for day in days for c in day])
+
+    assert merged.comments == single.comments
+    assert merged.distinct() == single.distinct()
+    assert (merged.cms.table == single.cms.table).all()
+
+
+def test_top_commenters_are_found():
+    counts = {i: 1 for i in range(500)}
+    counts.update({"heavy": 40, "second": 25})
+    sketch = CommenterSketch(top_k=20)
+    sketch.add_comments(comments_for(counts))
+    top = sketch.top(2)
+    assert [(key, name) for key, name, _ in top] == [("uheavy", "nameheavy"), ("usecond", "namesecond")]
+    assert top[0][2] >= 40
+    assert len(sketch.candidates) == 20
+
+
+def test_store_windows_merge_days_and_scopes(db_path):
+    store = CommenterSketchStore(db_path)
+    update_sketches(comments_for({1: 2, 2: 1}, (2025, 5, 1)), store, video_id="V1", business_id="B")
+    update_sketches(comments_for({2: 1, 3: 1}, (2025, 5, 2)), store, video_id="V2", business_id="B")
+    update_sketches(comments_for({4: 1}, (2025, 5, 9)), store, video_id="V2", business_id="B")
+
+    week = store.window("account:B", "2025-05-01", "2025-05-07")
+    assert week.comments == 5
+    assert week.distinct() == 3
+    videos = store.window(["video:V1", "video:V2"], "2025-05-01", "2025-05-31")
+    assert videos.comments == 6
+    assert store.load("video:V1", "2025-05-01").comments == 3
+
+
+def test_sketch_sink_skips_pages_the_next_sink_failed_to_save(db_path):
+    store = CommenterSketchStore(db_path)
+
+    def failing_sink(video_id, comments):
+        raise OSError("disk full")
+
+    sink = sketch_sink("B", store, failing_sink)
+    with pytest.raises(OSError):
+        sink("V", comments_for({1: 1}))
+    assert store.window("account:B", "2000-01-01", "2100-01-01").comments == 0
+
+    sketch_sink("B", store)("V", comments_for({1: 1}))
+    assert store.window("account:B", "2000-01-01", "2100-01-01").comments == 1
@@ -0,0 +1,36 @@
+import pytest
+
+from field_projection import ALL_FIELDS, CONSUMER_FIELDS, HEAVY_FIELDS, configured_consumers, plan_fields
+
+
+def test_sheet_only_profile_run_requests_the_sheet_columns():
+    assert plan_fields("profile", ["sheet"], deep=False) == [
+        "username", "display_name", "followers_count", "video_views", "profile_views", "bio_link_clicks"]
+
+
+def test_heavy_video_fields_only_in_deep_mode():
+    normal = plan_fields("video", ["bigquery"], deep=False)
+    deep = plan_fields("video", ["bigquery"], deep=True)
+    assert not HEAVY_FIELDS["video"] & set(normal)
+    assert HEAVY_FIELDS["video"] <= set(deep)
+
+
+def test_key_fields_are_always_requested_in_api_order():
+    fields = plan_fields("video", ["engagement"], deep=True)
+    assert fields[:2] == ["item_id", "create_time"]
+    assert fields == [field for field in ALL_FIELDS["video"] if field in fields]
+
+
+def test_unknown_consumer_is_rejected():
+    with pytest.raises(ValueError):
+        plan_fields("profile", ["unknown"])
+
+
+def test_consumers_and_mode_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("TIKTOK_VIDEO_CONSUMERS", " comments , ")
+    monkeypatch.setenv("TIKTOK_FIELDS_MODE", "Deep")
+    assert configured_consumers("video") == ["comments"]
+    assert plan_fields("video") == ["item_id", "comments", "create_time"]
+
+    monkeypatch.delenv("TIKTOK_VIDEO_CONSUMERS")
+    assert configured_consumers("video") == list(CONSUMER_FIELDS["video"])
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import hashtag_service
+import ttl_cache
+from hashtag_service import normalize_keywords, suggest_hashtags, suggestions_table
+from ttl_cache import TTLCache
+
+
+@pytest.fixture
+def cache(db_path):
+    return TTLCache("hashtag_suggestion", ttl_seconds=60, db_path=db_path)
+
+
+def test_ttl_cache_round_trip_and_expiry(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "time", lambda: now[0])
+
+    cache.set_many({("猫", "ja-JP"): ["#猫"], "plain": {"n": 1}})
+    cache.set("short", 1, ttl_seconds=5)
+    assert cache.get_many([("猫", "ja-JP"), "plain", "missing"]) == {("猫", "ja-JP"): ["#猫"], "plain": {"n": 1}}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    now[0] += 10
+    assert cache.get("short", "expired") == "expired"
+    assert cache.purge_expired() == 1
+    now[0] += 60
+    assert cache.get("plain") is None
+
+
+def test_namespaces_do_not_share_entries(cache, db_path):
+    cache.set("k", 1)
+    assert TTLCache("other", 60, db_path).get("k") is None
+
+
+def test_normalize_keywords():
+    assert normalize_keywords([" ｃａｔ ", "cat", "", None, "犬"]) == ["cat", "犬"]
+
+
+def test_only_cache_misses_are_fetched_and_then_cached(cache, monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_fetch(keyword, language, business_id, access_token):
+        with lock:
+            calls.append(keyword)
+        if keyword == "fail":
+            raise RuntimeError("API error")
+        return [f"#{keyword}"]
+
+    monkeypatch.setattr(hashtag_service, "fetch_hashtag_suggestions", fake_fetch)
+    cache.set(("cat", "ja-JP"), ["#cached"])
+
+    results = suggest_hashtags(["cat", "dog", "ｄｏｇ", "fail", "bird"], business_id="B", access_token="t",
+                               cache=cache)
+
+    assert sorted(calls) == ["bird", "dog", "fail"]
+    assert results == {"cat": ["#cached"], "dog": ["#dog"], "bird": ["#bird"]}
+    calls.clear()
+    assert suggest_hashtags(["dog", "bird"], business_id="B", access_token="t", cache=cache) == \
+        {"dog": ["#dog"], "bird": ["#bird"]}
+    assert calls == []
+
+
+def test_business_id_is_required_only_for_misses(cache, monkeypatch):
+    monkeypatch.delenv("TIKTOK_BUSINESS_ID", raising=False)
+    cache.set(("cat", "ja-JP"), [])
+    assert suggest_hashtags(["cat"], cache=cache) == {"cat": []}
+    with pytest.raises(ValueError):
+        suggest_hashtags(["dog"], cache=cache)
+
+
+def test_suggestions_table():
+    df = suggestions_table({"cat": ["#cat", {"hashtag_name": "#kitten", "views": 3}], "dog": []})
+    assert list(df.columns[:4]) == ["keyword", "language", "rank", "hashtag"]
+    assert df["hashtag"].tolist() == ["#cat", "#kitten"]
+    assert df["rank"].tolist() == [1, 2]
+    assert suggestions_table({}).empty
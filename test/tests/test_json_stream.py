@@ -0,0 +1,98 @@
+import io
+import json
+import sys
+
+import pytest
+
+import json_stream
+import rate_limiter
+from json_stream import TeeReader, iter_json_items, stream_videos
+
+
+class StreamResponse:
+    """iter_content で少しずつボディを返す、stream=True のレスポンスの代わり"""
+
+    def __init__(self, body):
+        self.raw = json.dumps(body).encode()
+        self.headers = {}
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.raw), 7):
+            yield self.raw[i:i + 7]
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+BODY = {"code": 0, "message": "OK", "request_id": "r",
+        "data": {"videos": [{"item_id": "1", "likes": 2.5, "video_view_retention": [{"second": "0"}]},
+                            {"item_id": "2", "likes": 3}],
+                 "cursor": 2, "has_more": False}}
+
+
+@pytest.fixture(params=["ijson", "fallback"])
+def decoder(request, monkeypatch):
+    if request.param == "ijson":
+        pytest.importorskip("ijson")
+    else:
+        # ijson がない環境の経路 (ボディを一度に読んで orjson / json でデコードする)
+        monkeypatch.setitem(sys.modules, "ijson", None)
+    return request.param
+
+
+def test_items_and_meta_are_decoded(decoder):
+    meta = {}
+    reader = TeeReader(StreamResponse(BODY))
+    videos = list(iter_json_items(reader, "data.videos.item", meta))
+    assert videos == BODY["data"]["videos"]
+    assert meta["code"] == 0
+    assert meta["data.cursor"] == 2
+    assert meta["data.has_more"] is False
+
+
+def test_tee_reader_archives_the_raw_bytes():
+    response = StreamResponse(BODY)
+    sink = io.BytesIO()
+    reader = TeeReader(response, sink)
+    assert reader.read(3) == response.raw[:3]
+    assert reader.read_all() == response.raw[3:]
+    assert sink.getvalue() == response.raw
+    assert reader.bytes_read == len(response.raw)
+
+
+def test_stream_videos_pages_archives_and_retries_rate_limits(tmp_path, monkeypatch, decoder):
+    pages = [
+        {"code": 0, "data": {"videos": [{"item_id": "1"}], "cursor": 1, "has_more": True}},
+        {"code": 40100, "message": "Requests made too frequently"},
+        {"code": 0, "data": {"videos": [{"item_id": "2"}], "cursor": 2, "has_more": False}},
+    ]
+    responses = []
+
+    def fake_get(path, access_token, params=None, stream=False):
+        assert stream
+        responses.append((params.get("cursor"), StreamResponse(pages[len(responses)])))
+        return responses[-1][1]
+
+    monkeypatch.setattr(json_stream, "api_get", fake_get)
+    monkeypatch.setattr(rate_limiter, "_scheduler", rate_limiter.RateLimitScheduler(backoff_base=0))
+
+    videos = list(stream_videos("B", "token", ["item_id"], archive_dir=str(tmp_path)))
+
+    assert [v["item_id"] for v in videos] == ["1", "2"]
+    assert [cursor for cursor, _ in responses] == [None, 1, 1]
+    assert all(response.closed for _, response in responses)
+    archives = sorted(p.name for p in tmp_path.iterdir())
+    assert len(archives) == 2 and archives[0].endswith("_p001.json") and archives[1].endswith("_p002.json")
+    # 取り直したページのアーカイブは、レート制限のレスポンスではなく取り直したもの
+    assert json.loads((tmp_path / archives[1]).read_text())["data"]["videos"] == [{"item_id": "2"}]
+
+
+def test_stream_videos_raises_on_api_errors(monkeypatch, decoder):
+    monkeypatch.setattr(json_stream, "api_get",
+                        lambda *args, **kwargs: StreamResponse({"code": 40002, "message": "bad"}))
+    with pytest.raises(RuntimeError):
+        list(stream_videos("B", "token", ["item_id"], archive_dir=None))
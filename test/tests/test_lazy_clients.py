@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from lazy_clients import memoize, memoize_per_thread
+
+
+def run_in_threads(func, count=4):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def target(i):
+        barrier.wait()
+        results[i] = func()
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_memoize_builds_once_across_threads():
+    calls = []
+
+    @memoize
+    def build(name):
+        calls.append(name)
+        return object()
+
+    results = run_in_threads(lambda: build("x"))
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_memoize_does_not_cache_exceptions():
+    calls = []
+
+    @memoize
+    def build():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("first call fails")
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        build()
+    assert build() == "ok"
+    assert build() == "ok"
+    assert len(calls) == 2
+
+
+def test_memoize_per_thread_builds_one_per_thread():
+    @memoize_per_thread
+    def build(name):
+        return object()
+
+    main = build("x")
+    assert build("x") is main
+    assert build("y") is not main
+
+    results = run_in_threads(lambda: (build("x"), build("x")))
+    assert all(first is second for first, second in results)
+    assert len({id(first) for first, _ in results} | {id(main)}) == len(results) + 1
+
+
+def test_memoize_per_thread_cache_clear():
+    @memoize_per_thread
+    def build():
+        return object()
+
+    first = build()
+    build.cache_clear()
+    assert build() is not first
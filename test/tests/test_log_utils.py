@@ -0,0 +1,49 @@
+import json
+import logging
+
+import log_utils
+from log_utils import JsonFormatter, dump_payload, log_request
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("tiktok.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_emits_one_line_with_extra_fields():
+    line = JsonFormatter().format(make_record("%s -> %s", "GET", 200, business_id="B", elapsed_ms=12.5))
+    assert "\n" not in line
+    entry = json.loads(line)
+    assert entry["msg"] == "GET -> 200"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "tiktok.test"
+    assert entry["business_id"] == "B"
+    assert entry["elapsed_ms"] == 12.5
+    assert "args" not in entry and "levelno" not in entry
+
+
+def test_log_request_carries_structured_fields(caplog):
+    with caplog.at_level(logging.INFO, logger=log_utils.REQUEST_LOGGER_NAME):
+        log_request("GET", "https://example/business/get/", 200, 12.34, business_id="B", attempts=2)
+    record = caplog.records[-1]
+    assert record.getMessage() == "GET https://example/business/get/ -> 200 (12ms)"
+    assert (record.status, record.elapsed_ms, record.business_id, record.attempts) == (200, 12.3, "B", 2)
+
+
+def test_dump_payload_is_skipped_unless_enabled(monkeypatch, caplog):
+    logger = logging.getLogger("tiktok.test.payload")
+
+    class Unserializable:
+        def __repr__(self):
+            raise AssertionError("dump_payload が無効なのにダンプされた")
+
+    monkeypatch.delenv("TIKTOK_DEBUG_PAYLOAD", raising=False)
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        dump_payload(logger, "response", {"x": Unserializable()})
+    assert not caplog.records
+
+    monkeypatch.setenv("TIKTOK_DEBUG_PAYLOAD", "1")
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        dump_payload(logger, "response", {"x": 1})
+    assert caplog.records[-1].getMessage() == 'response:\n{\n    "x": 1\n}'
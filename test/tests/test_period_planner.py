@@ -0,0 +1,46 @@
+import period_planner
+from period_planner import fetch_profile_periods, merge_periods, plan_requests
+
+
+def test_merge_periods_joins_overlapping_and_adjacent_periods():
+    periods = [("2025-05-10", "2025-05-20"), ("2025-05-01", "2025-05-09"), ("2025-05-15", "2025-05-25"),
+               ("2025-06-01", "2025-06-03"), ("", "2025-06-10"), ("2025-07-05", "2025-07-01")]
+    assert merge_periods(periods) == [("2025-05-01", "2025-05-25"), ("2025-06-01", "2025-06-03"),
+                                      ("2025-07-01", "2025-07-05")]
+
+
+def test_plan_requests_maps_each_period_to_its_window():
+    a, b, c = ("2025-05-01", "2025-05-07"), ("2025-05-05", "2025-05-10"), ("2025-06-01", "2025-06-02")
+    assert plan_requests([a, b, c, (None, None)]) == {("2025-05-01", "2025-05-10"): [a, b],
+                                                      ("2025-06-01", "2025-06-02"): [c]}
+
+
+def test_overlapping_periods_are_fetched_with_one_request(monkeypatch):
+    requests = []
+
+    def fake_request(start_date, end_date, business_id, fields_list, access_token):
+        requests.append((start_date, end_date))
+        metrics = [{"date": f"2025-05-{day:02d}", "video_views": day} for day in range(1, 11)]
+        return {"code": 0, "data": {"username": "user", "metrics": metrics}}, None
+
+    monkeypatch.setattr(period_planner, "request_profile_data", fake_request)
+    a, b = ("2025-05-01", "2025-05-07"), ("2025-05-05", "2025-05-10")
+
+    results = fetch_profile_periods([a, b], "B", access_token="token")
+
+    assert requests == [("2025-05-01", "2025-05-10")]
+    assert results[a]["video_views"] == sum(range(1, 8))
+    assert results[b]["video_views"] == sum(range(5, 11))
+
+
+def test_failed_request_reports_each_original_period(monkeypatch):
+    def fake_request(start_date, end_date, business_id, fields_list, access_token):
+        return None, {"message": "API error", "date_range": f"{start_date} から {end_date}"}
+
+    monkeypatch.setattr(period_planner, "request_profile_data", fake_request)
+    a, b = ("2025-05-07", "2025-05-01"), ("2025-05-05", "2025-05-10")
+
+    results = fetch_profile_periods([a, b], "B", access_token="token")
+
+    assert results[a] == {"message": "API error", "date_range": "2025-05-01 から 2025-05-07"}
+    assert results[b]["date_range"] == "2025-05-05 から 2025-05-10"
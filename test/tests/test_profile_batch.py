@@ -0,0 +1,54 @@
+import threading
+
+import profile_batch
+
+
+def test_groups_periods_by_account_and_returns_every_job(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_fetch(periods, business_id, fields_list, access_token, store):
+        with lock:
+            calls.append((business_id, tuple(periods)))
+        return {period: {"business_id": business_id, "period": period} for period in periods}
+
+    monkeypatch.setattr(profile_batch, "fetch_profile_periods", fake_fetch)
+    jobs = [
+        ("A", "token", ("2024-01-01", "2024-01-07")),
+        ("B", "token", ("2024-01-01", "2024-01-07")),
+        ("A", "token", ("2024-02-01", "2024-02-07")),
+    ]
+
+    results = profile_batch.fetch_profiles(jobs, max_workers=4)
+
+    # 同じアカウントの期間は1回の呼び出しにまとまる
+    assert sorted(calls) == [
+        ("A", (("2024-01-01", "2024-01-07"), ("2024-02-01", "2024-02-07"))),
+        ("B", (("2024-01-01", "2024-01-07"),)),
+    ]
+    assert set(results) == {"A", "B"}
+    assert results["A"][("2024-02-01", "2024-02-07")]["business_id"] == "A"
+    assert len(results["A"]) == 2 and len(results["B"]) == 1
+
+
+def test_account_failure_is_contained(monkeypatch):
+    def fake_fetch(periods, business_id, fields_list, access_token, store):
+        if business_id == "BAD":
+            raise RuntimeError("boom")
+        return {period: {"ok": True} for period in periods}
+
+    monkeypatch.setattr(profile_batch, "fetch_profile_periods", fake_fetch)
+    jobs = [("BAD", "t", ("2024-01-01", "2024-01-02")), ("OK", "t", ("2024-01-01", "2024-01-02"))]
+
+    results = profile_batch.fetch_profiles(jobs)
+
+    assert results["OK"][("2024-01-01", "2024-01-02")] == {"ok": True}
+    assert results["BAD"][("2024-01-01", "2024-01-02")]["error_details"] == "boom"
+
+
+def test_no_jobs_yields_nothing(monkeypatch):
+    def unexpected_fetch(*args):
+        raise AssertionError("fetch_profile_periods は呼ばれないはず")
+
+    monkeypatch.setattr(profile_batch, "fetch_profile_periods", unexpected_fetch)
+    assert list(profile_batch.fetch_profiles_concurrently([])) == []
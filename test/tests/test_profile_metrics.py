@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from profile_metrics import AGGREGATE_SUM_COLUMNS, ProfileMetricsSeries, aggregate_windows
+
+
+def response(metrics, **account):
+    return {"code": 0, "data": {"username": "user", "display_name": "User", **account, "metrics": metrics}}
+
+
+def naive_aggregate(metrics, start, end):
+    """日ごとの行を素直に足し合わせる参照実装"""
+    rows = sorted((m for m in metrics if start <= m["date"] <= end), key=lambda m: m["date"])
+    result = {col: sum(m.get(col) or 0 for m in rows) for col in AGGREGATE_SUM_COLUMNS}
+    if rows:
+        result["followers_count_increase"] = rows[-1]["followers_count"] - rows[0]["followers_count"]
+    return result
+
+
+def test_windows_match_a_naive_sum_over_random_data():
+    rng = random.Random(0)
+    metrics = []
+    followers = 100
+    for day in range(1, 31):
+        if rng.random() < 0.2:
+            continue  # データのない日
+        followers += rng.randint(0, 5)
+        metrics.append({"date": f"2025-04-{day:02d}", "followers_count": followers, "total_likes": 0,
+                        **{col: rng.randint(0, 50) for col in AGGREGATE_SUM_COLUMNS}})
+    windows = [(f"2025-04-{a:02d}", f"2025-04-{b:02d}") for a in range(1, 31, 3) for b in range(a, 31, 4)]
+
+    results = aggregate_windows(response(metrics), windows)
+
+    for (start, end), result in zip(windows, results):
+        expected = naive_aggregate(metrics, start, end)
+        for col in AGGREGATE_SUM_COLUMNS:
+            assert result[col] == expected[col], (start, end, col)
+        if "followers_count_increase" in expected:
+            assert result["followers_count_increase"] == expected["followers_count_increase"]
+
+
+def test_window_clipped_to_the_data_range():
+    metrics = [{"date": "2025-04-02", "video_views": 3}, {"date": "2025-04-03", "video_views": 4}]
+    result = ProfileMetricsSeries(response(metrics)["data"]).aggregate("2025-03-01", "2025-05-01")
+    assert result["video_views"] == 7
+    assert result["date_range"] == "2025-03-01 から 2025-05-01"
+
+
+def test_window_without_data_days():
+    metrics = [{"date": "2025-04-02", "video_views": 3, "followers_count": 1}]
+    result = aggregate_windows(response(metrics), [("2025-05-01", "2025-05-02")])[0]
+    assert result["video_views"] == 0
+    assert result["followers_count_increase"] == "計算不可 (期間内データなし)"
+
+
+def test_single_day_has_zero_increase_and_missing_values_are_not_computable():
+    metrics = [{"date": "2025-04-01", "followers_count": 10, "total_likes": None},
+               {"date": "2025-04-02", "followers_count": 12, "total_likes": 5}]
+    single, both = aggregate_windows(response(metrics), [("2025-04-01", "2025-04-01"), ("2025-04-01", "2025-04-02")])
+    assert single["followers_count_increase"] == 0
+    assert both["followers_count_increase"] == 2
+    assert both["total_likes_increase"] == "計算不可"
+
+
+def test_non_numeric_values_count_as_zero_and_totals_are_kept():
+    metrics = [{"date": "2025-04-01", "shares": "x"}, {"date": "2025-04-02", "shares": "2"}]
+    result = aggregate_windows(response(metrics, followers_count="120"), [("2025-04-01", "2025-04-02")])[0]
+    assert result["shares"] == 2
+    assert result["followers_count_total"] == 120
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"code": 0, "message": "bad"}, "データ形式不正"),
+    ({"code": 0, "data": {"username": "user"}}, "日別データ(metrics)なし"),
+])
+def test_malformed_responses(data, message):
+    assert aggregate_windows(data, [("2025-04-01", "2025-04-02")]) == [
+        {"message": message, "date_range": "2025-04-01 から 2025-04-02"}]
@@ -0,0 +1,84 @@
+import datetime
+
+import pytest
+
+from profile_store import ProfileMetricsStore, fetch_profile_with_store
+
+TODAY = datetime.date(2025, 6, 30)
+
+
+def day(n):
+    """TODAY の n 日前の 'YYYY-MM-DD'"""
+    return (TODAY - datetime.timedelta(days=n)).isoformat()
+
+
+def response(dates, **values):
+    return {"code": 0, "data": {"username": "user", "followers_count": 10,
+                                "metrics": [{"date": date, **values} for date in dates]}}
+
+
+@pytest.fixture
+def store(db_path):
+    return ProfileMetricsStore(db_path)
+
+
+def test_missing_ranges_skip_stored_days_but_refresh_recent_ones(store):
+    store.save_response("B", response([day(10), day(9), day(2), day(1)], video_views=1))
+    assert store.missing_ranges("B", day(12), day(0), today=TODAY) == [
+        (day(12), day(11)), (day(8), day(0))]
+    # 他の business_id の保存済みの日は関係ない
+    assert store.missing_ranges("C", day(10), day(9), today=TODAY) == [(day(10), day(9))]
+
+
+def test_missing_ranges_stop_at_the_api_horizon(store):
+    assert store.missing_ranges("B", day(70), day(58), today=TODAY) == [(day(60), day(58))]
+
+
+def test_days_missing_requested_fields_are_refetched(store):
+    store.save_response("B", response([day(10)], video_views=1), fields_list=["video_views"])
+    assert store.missing_ranges("B", day(10), day(10), today=TODAY, fields_list=["video_views"]) == []
+    assert store.missing_ranges("B", day(10), day(10), today=TODAY, fields_list=["video_views", "shares"]) == [
+        (day(10), day(10))]
+
+
+def test_save_response_merges_fields_of_the_same_day(store):
+    store.save_response("B", response([day(10)], video_views=5), fields_list=["video_views"])
+    store.save_response("B", response([day(10)], shares=2), fields_list=["shares"])
+
+    metrics = store.build_response("B", day(10), day(10))["data"]["metrics"]
+    assert metrics == [{"date": day(10), "video_views": 5, "shares": 2}]
+    assert store.stored_dates("B", day(10), day(10), ["video_views", "shares"]) == {day(10)}
+
+
+def test_fetch_with_store_requests_only_gaps(db_path):
+    class Store(ProfileMetricsStore):
+        def missing_ranges(self, business_id, start_date, end_date, today=None, fields_list=None):
+            return super().missing_ranges(business_id, start_date, end_date, today=TODAY, fields_list=fields_list)
+
+    store = Store(db_path)
+    store.save_response("B", response([day(20), day(19)], video_views=1))
+    calls = []
+
+    def request(start_date, end_date, business_id, fields_list, access_token):
+        calls.append((start_date, end_date))
+        dates = [datetime.date.fromordinal(o).isoformat() for o in range(
+            datetime.date.fromisoformat(start_date).toordinal(), datetime.date.fromisoformat(end_date).toordinal() + 1)]
+        return response(dates, video_views=2), None
+
+    data, error = fetch_profile_with_store(day(21), day(18), "B", None, "token", store, request)
+
+    assert error is None
+    assert calls == [(day(21), day(21)), (day(18), day(18))]
+    assert [m["video_views"] for m in data["data"]["metrics"]] == [2, 1, 1, 2]
+    assert data["data"]["username"] == "user"
+
+
+def test_fetch_with_store_does_not_save_api_errors(store):
+    def request(start_date, end_date, business_id, fields_list, access_token):
+        return {"code": 40001, "message": "invalid"}, None
+
+    # missing_ranges は実際の今日を基準にするので、API で取得できる期間内の日を使う
+    recent = (datetime.date.today() - datetime.timedelta(days=5)).isoformat()
+    data, error = fetch_profile_with_store(recent, recent, "B", None, "token", store, request)
+    assert data["code"] == 40001
+    assert store.stored_dates("B", recent, recent) == set()
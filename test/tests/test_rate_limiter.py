@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimitScheduler, TokenBucket, is_rate_limited, retry_after_seconds
+
+
+def response(status_code=200, content=b'{"code": 0}', headers=None):
+    return SimpleNamespace(status_code=status_code, content=content, headers=headers or {})
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=2, capacity=4)
+    bucket.tokens, bucket.updated_at = 0.0, 100.0
+    assert bucket.wait_time() == pytest.approx(0.5)
+    bucket.refill(101.0)
+    assert bucket.tokens == pytest.approx(2.0)
+    bucket.refill(110.0)
+    assert bucket.tokens == pytest.approx(4.0)
+    assert bucket.wait_time() == 0.0
+
+
+def test_throttled_bucket_halves_its_rate_and_recovers():
+    bucket = TokenBucket(rate=10)
+    bucket.throttled()
+    assert bucket.rate == pytest.approx(5.0)
+    assert bucket.tokens <= 0
+    for _ in range(10):
+        bucket.throttled()
+    # 元の流量の 10% より下げない
+    assert bucket.rate == pytest.approx(1.0)
+    for _ in range(100):
+        bucket.succeeded()
+    assert bucket.rate == pytest.approx(10.0)
+    assert bucket.headroom()["throttled_count"] == 11
+
+
+def test_acquire_takes_from_app_and_business_buckets(monkeypatch):
+    scheduler = RateLimitScheduler(app_qps=3, business_qps=1)
+    waits = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: (waits.append(seconds), _advance(scheduler, seconds)))
+
+    scheduler.acquire("A")
+    scheduler.acquire("B")
+    assert waits == []
+    # A のバケットは空なので、補充されるまで待つ
+    scheduler.acquire("A")
+    assert waits and waits[0] > 0
+    assert set(scheduler.quota_headroom()["business"]) == {"A", "B"}
+
+
+def _advance(scheduler, seconds):
+    for bucket in [scheduler.app_bucket, *scheduler.business_buckets.values()]:
+        bucket.updated_at -= seconds
+
+
+def test_on_throttled_waits_at_least_retry_after(monkeypatch):
+    scheduler = RateLimitScheduler(backoff_base=0)
+    slept = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", slept.append)
+    scheduler.on_throttled("A", attempt=3, retry_after=2.5)
+    assert slept == [2.5]
+    assert scheduler.business_buckets["A"].throttled_count == 1
+
+
+@pytest.mark.parametrize("resp, expected", [
+    (response(429), True),
+    (response(content=b'{"code": 40100, "message": "Requests made too frequently"}'), True),
+    (response(content=b'{"code": 0, "data": {"code": 40100}}'), False),
+    (response(500, b'{"code": 40100}'), False),
+])
+def test_is_rate_limited(resp, expected):
+    assert is_rate_limited(resp) is expected
+
+
+def test_streamed_200_is_not_inspected():
+    assert not is_rate_limited(response(content=b'{"code": 40100}'), stream=True)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(response(headers={"Retry-After": "3"})) == 3.0
+    assert retry_after_seconds(response(headers={"Retry-After": "soon"})) is None
+    assert retry_after_seconds(response()) is None
@@ -0,0 +1,93 @@
+import pytest
+
+import reply_expander
+from comment_crawler import CommentCrawlStore
+from reply_expander import expand_video_replies
+
+
+class FakeRepliesAPI:
+    """新しい順に返信を返す business/comment/reply/list/ の代わり (cursor はオフセット・1ページ2件)"""
+
+    def __init__(self, page_size=2):
+        self.replies = []
+        self.next_id = 0
+        self.page_size = page_size
+        self.fail_on_call = None
+        self.calls = 0
+
+    def post(self, count):
+        for _ in range(count):
+            self.next_id += 1
+            self.replies.insert(0, {"comment_id": f"r{self.next_id}", "create_time": self.next_id, "likes": 0})
+
+    def __call__(self, business_id, video_id, comment_id, access_token, cursor=None):
+        self.calls += 1
+        if self.fail_on_call == self.calls:
+            raise RuntimeError("network error")
+        offset = cursor or 0
+        page = self.replies[offset:offset + self.page_size]
+        next_cursor = offset + len(page)
+        return {"comments": [dict(r) for r in page], "cursor": next_cursor, "has_more": next_cursor < len(self.replies)}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeRepliesAPI()
+    monkeypatch.setattr(reply_expander, "fetch_replies", fake)
+    return fake
+
+
+@pytest.fixture
+def store(db_path):
+    return CommentCrawlStore(db_path)
+
+
+def set_reply_count(store, replies):
+    store.record_page("B", "V", [{"comment_id": "p", "create_time": 1, "replies": replies}])
+
+
+def expand(store, saved):
+    return expand_video_replies("B", "V", "token", store, sink=lambda video_id, comment_id, page: saved.extend(page),
+                                refresh_pages=0)
+
+
+def test_thread_with_deleted_replies_is_not_rewalked(api, store):
+    api.post(10)
+    # 2件は削除・非表示で、返信数 (replies) には数えられていても取得できない
+    set_reply_count(store, 12)
+    saved = []
+    assert expand(store, saved) == 10
+    assert store.pending_reply_threads("V") == []
+
+    api.post(1)
+    set_reply_count(store, 13)
+    api.calls = 0
+    assert expand(store, saved) == 1
+    # 新しい返信の入った最初のページだけを取得して止まる
+    assert api.calls == 1
+    assert len({r["comment_id"] for r in saved}) == 11
+
+
+def test_interrupted_expansion_continues_past_saved_pages(api, store):
+    api.post(6)
+    set_reply_count(store, 6)
+    saved = []
+    api.fail_on_call = 2
+    with pytest.raises(RuntimeError):
+        expand(store, saved)
+    assert store.reply_count("p") == 2
+    assert len(store.pending_reply_threads("V")) == 1
+
+    api.fail_on_call = None
+    assert expand(store, saved) == 4
+    assert sorted(r["comment_id"] for r in saved) == sorted(f"r{i}" for i in range(1, 7))
+    assert store.pending_reply_threads("V") == []
+
+
+def test_unchanged_thread_is_skipped(api, store):
+    api.post(3)
+    set_reply_count(store, 3)
+    expand(store, [])
+    api.calls = 0
+    assert expand(store, []) == 0
+    assert api.calls == 0
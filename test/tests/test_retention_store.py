@@ -0,0 +1,101 @@
+import random
+
+import numpy as np
+import pytest
+
+from retention_store import ENGAGEMENT_FIELD, RETENTION_FIELD, RetentionCurves, RetentionStore
+
+
+def make_videos(count=30, seed=0):
+    rng = random.Random(seed)
+    videos = []
+    for i in range(count):
+        n = rng.choice([0, 1, 2, 5, 12])
+        seconds = rng.sample(range(0, 60), n)
+        points = [{"second": str(s), "percentage": round(rng.random(), 3)} for s in seconds]
+        videos.append({"item_id": i, "video_duration": 60, RETENTION_FIELD: points})
+    return videos
+
+
+def sorted_curve(video):
+    points = sorted(video[RETENTION_FIELD], key=lambda p: int(p["second"]))
+    return [int(p["second"]) for p in points], [np.float32(p["percentage"]) for p in points]
+
+
+def naive_dropoff(xs, ys, threshold):
+    return next((x for x, y in zip(xs, ys) if y < threshold), -1)
+
+
+def naive_steepest(xs, ys):
+    if len(xs) < 2:
+        return -1
+    drops = [(ys[i - 1] - ys[i], -i) for i in range(1, len(xs))]
+    return xs[-max(drops)[1]]
+
+
+def naive_auc(xs, ys):
+    if len(xs) < 2 or xs[-1] == xs[0]:
+        return None
+    area = sum((xs[i] - xs[i - 1]) * (float(ys[i]) + float(ys[i - 1])) / 2 for i in range(1, len(xs)))
+    return area / (xs[-1] - xs[0])
+
+
+def test_vectorized_summary_matches_a_per_curve_loop():
+    videos = make_videos()
+    curves = RetentionCurves.from_videos(videos)
+    summary = curves.summary(threshold=0.4)
+
+    expected_ids = [str(v["item_id"]) for v in videos if v[RETENTION_FIELD]]
+    assert curves.item_ids == expected_ids
+    for video in videos:
+        if not video[RETENTION_FIELD]:
+            continue
+        xs, ys = sorted_curve(video)
+        result = summary[str(video["item_id"])]
+        assert result["dropoff_second"] == naive_dropoff(xs, ys, 0.4)
+        assert result["steepest_drop_second"] == naive_steepest(xs, ys)
+        expected_auc = naive_auc(xs, ys)
+        if expected_auc is None:
+            assert result["auc"] is None
+        else:
+            assert result["auc"] == pytest.approx(expected_auc, rel=1e-5)
+
+
+def test_resample_interpolates_within_each_curve():
+    videos = [{"item_id": "a", RETENTION_FIELD: [{"second": "10", "percentage": 0.0}, {"second": "0", "percentage": 1.0}]},
+              {"item_id": "b", RETENTION_FIELD: [{"second": "5", "percentage": 0.5}, {"second": "20", "percentage": 0.2}]}]
+    curves = RetentionCurves.from_videos(videos)
+
+    matrix = curves.resample([0, 5, 10, 15], relative=False)
+    np.testing.assert_allclose(matrix[0], [1.0, 0.5, 0.0, np.nan])
+    np.testing.assert_allclose(matrix[1], [np.nan, 0.5, 0.4, 0.3], rtol=1e-6)
+
+    grid, means, counts = curves.mean_curve([0, 5, 10, 15], relative=False)
+    np.testing.assert_allclose(means, [1.0, 0.5, 0.2, 0.3], rtol=1e-6)
+    assert list(counts) == [1, 2, 2, 1]
+
+
+def test_store_round_trip(db_path):
+    videos = make_videos(10, seed=1)
+    videos[0][ENGAGEMENT_FIELD] = [{"second": "3", "percentage": 0.1}]
+    store = RetentionStore(db_path)
+
+    saved = store.save_videos(videos)
+    curves = RetentionCurves.from_videos(videos)
+    assert saved == {RETENTION_FIELD: len(curves), ENGAGEMENT_FIELD: 1}
+
+    loaded = store.load(curves.item_ids)
+    for item_id in curves.item_ids:
+        np.testing.assert_array_equal(loaded.curve(item_id)[0], curves.curve(item_id)[0])
+        np.testing.assert_array_equal(loaded.curve(item_id)[1], curves.curve(item_id)[1])
+    assert len(store.load(["missing"])) == 0
+    assert store.load(field=ENGAGEMENT_FIELD).item_ids == ["0"]
+
+
+def test_to_arrow_keeps_the_curve_boundaries():
+    pytest.importorskip("pyarrow")
+    curves = RetentionCurves.from_videos(make_videos(5, seed=2))
+    array = curves.to_arrow()
+    assert len(array) == len(curves)
+    first = array[0].as_py()
+    assert [p["second"] for p in first] == list(curves.curve(curves.item_ids[0])[0])
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+import token_cache
+from token_cache import get_access_token, load_cache, save_cache
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "token_cache.json")
+    monkeypatch.setattr(token_cache, "TOKEN_CACHE_PATH", path)
+    monkeypatch.setattr(token_cache, "_memory_cache", None)
+    monkeypatch.setenv("TIKTOK_REFRESH_TOKEN", "env-refresh")
+    return path
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+
+    def fake_refresh(refresh_token):
+        calls.append(refresh_token)
+        time.sleep(0.01)
+        now = time.time()
+        return {"access_token": f"access-{len(calls)}", "access_token_expires_at": now + 3600,
+                "refresh_token": f"refresh-{len(calls)}", "refresh_token_expires_at": now + 86400, "updated_at": now}
+
+    monkeypatch.setattr(token_cache, "request_token_refresh", fake_refresh)
+    return calls
+
+
+def test_fresh_cached_token_is_used_without_refreshing(cache_path, refreshes):
+    save_cache({"access_token": "cached", "access_token_expires_at": time.time() + 3600, "updated_at": time.time()})
+    assert get_access_token() == "cached"
+    assert refreshes == []
+
+
+def test_token_close_to_expiry_is_refreshed_and_rotation_is_saved(cache_path, refreshes):
+    save_cache({"access_token": "old", "access_token_expires_at": time.time() + 10, "refresh_token": "cached-refresh"})
+    assert get_access_token() == "access-1"
+    assert refreshes == ["cached-refresh"]
+    assert load_cache()["refresh_token"] == "refresh-1"
+
+
+def test_concurrent_callers_share_one_refresh(cache_path, refreshes):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_access_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert refreshes == ["env-refresh"]
+    assert results == ["access-1"] * 8
+
+
+def test_force_refresh_ignores_a_fresh_token(cache_path, refreshes):
+    assert get_access_token() == "access-1"
+    assert get_access_token(force_refresh=True) == "access-2"
+    assert refreshes == ["env-refresh", "refresh-1"]
+
+
+def test_corrupt_cache_file_is_treated_as_missing(cache_path, refreshes):
+    with open(cache_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert load_cache() is None
+    assert get_access_token() == "access-1"
+
+
+def test_request_token_refresh_parses_the_response(monkeypatch):
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"code": 0, "data": {"access_token": "a", "expires_in": 86400, "refresh_token": "r2",
+                                        "refresh_token_expires_in": 31536000}}
+
+    sent = []
+    monkeypatch.setattr(token_cache, "api_post", lambda path, payload=None: sent.append(payload) or Response())
+    monkeypatch.setenv("TIKTOK_CLIENT_ID", "id")
+    monkeypatch.setenv("TIKTOK_CLIENT_SECRET", "secret")
+    monkeypatch.delenv("TIKTOK_GRANT_TYPE", raising=False)
+
+    token = token_cache.request_token_refresh("r1")
+
+    assert sent[0]["refresh_token"] == "r1" and sent[0]["grant_type"] == "refresh_token"
+    assert token["access_token"] == "a" and token["refresh_token"] == "r2"
+    assert token["access_token_expires_at"] - token["updated_at"] == pytest.approx(86400)
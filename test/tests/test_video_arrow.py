@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from video_arrow import to_parquet_buffer, video_arrow_schema, videos_to_arrow
+
+VIDEOS = [
+    {"item_id": 7001, "caption": "a", "likes": "12", "create_time": "1714521600", "video_duration": 15.5,
+     "video_view_retention": [{"second": "0", "percentage": 1.0}, {"second": "3", "percentage": 0.4}],
+     "audience_countries": []},
+    {"item_id": "7002", "caption": None, "likes": 3, "create_time": 1714608000, "custom_metric": 1.5},
+]
+
+
+def test_columns_follow_the_registered_order_and_types():
+    table = videos_to_arrow(VIDEOS)
+    assert table.column_names[:5] == ["item_id", "caption", "video_duration", "likes", "create_time"]
+    assert table.column_names[-1] == "custom_metric"
+    schema = table.schema
+    assert schema.field("item_id").type == pa.string()
+    assert schema.field("likes").type == pa.int64()
+    assert schema.field("create_time").type == pa.timestamp("s", tz="UTC")
+    assert schema.field("custom_metric").type == pa.float64()
+
+
+def test_string_numbers_are_cast_in_one_pass():
+    table = videos_to_arrow(VIDEOS).to_pydict()
+    assert table["item_id"] == ["7001", "7002"]
+    assert table["likes"] == [12, 3]
+    assert [t.timestamp() for t in table["create_time"]] == [1714521600, 1714608000]
+
+
+def test_repeated_fields_become_lists_of_structs():
+    table = videos_to_arrow(VIDEOS)
+    assert table.schema.field("video_view_retention").type == video_arrow_schema(["video_view_retention"]).field(0).type
+    retention = table.column("video_view_retention").to_pylist()
+    assert retention == [[{"second": 0, "percentage": 1.0}, {"second": 3, "percentage": 0.4}], None]
+    # 空のリストは空の配列、フィールドのない動画は NULL
+    assert table.column("audience_countries").to_pylist() == [[], None]
+
+
+def test_extra_columns_turn_nan_into_null():
+    table = videos_to_arrow(VIDEOS, columns=["item_id"], extra_columns={"views_gained_yesterday": [5.0, math.nan]})
+    assert table.column("views_gained_yesterday").to_pylist() == [5.0, None]
+
+
+def test_parquet_round_trip_keeps_columns_and_values():
+    table = videos_to_arrow(VIDEOS)
+    restored = pq.read_table(to_parquet_buffer(table))
+    # Parquet には秒単位の timestamp がないので、create_time だけはミリ秒単位で戻ってくる
+    assert restored.schema.field("create_time").type == pa.timestamp("ms", tz="UTC")
+    assert restored.schema.field("video_view_retention").type == table.schema.field("video_view_retention").type
+    assert restored.to_pydict() == table.to_pydict()
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+import video_pager
+from video_pager import iter_video_pages, iter_videos, prefetch_pages
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class FakeVideoList:
+    """cursor をオフセットとして動画を返す business/video/list/ の代わり"""
+
+    def __init__(self, total, stuck_cursor=False, error_on_page=None):
+        self.videos = [{"item_id": str(i)} for i in range(total)]
+        self.stuck_cursor = stuck_cursor
+        self.error_on_page = error_on_page
+        self.params = []
+
+    def __call__(self, path, access_token, params=None):
+        self.params.append(dict(params))
+        if self.error_on_page == len(self.params):
+            return FakeResponse({"code": 40002, "message": "bad request"})
+        offset = params.get("cursor") or 0
+        page = self.videos[offset:offset + params["max_count"]]
+        next_cursor = offset if self.stuck_cursor else offset + len(page)
+        return FakeResponse({"code": 0, "data": {"videos": page, "cursor": next_cursor,
+                                                 "has_more": offset + len(page) < len(self.videos)}})
+
+
+@pytest.fixture
+def video_list(monkeypatch):
+    def install(*args, **kwargs):
+        fake = FakeVideoList(*args, **kwargs)
+        monkeypatch.setattr(video_pager, "api_get", fake)
+        return fake
+    return install
+
+
+def test_pages_follow_the_cursor_to_the_end(video_list):
+    fake = video_list(45)
+    pages = list(iter_video_pages("B", "token", ["item_id"], max_count=50))
+    assert [len(page["videos"]) for page in pages] == [20, 20, 5]
+    assert [params.get("cursor") for params in fake.params] == [None, 20, 40]
+    assert fake.params[0]["max_count"] == 20
+
+
+def test_max_pages_and_stuck_cursor_end_the_walk(video_list):
+    video_list(100)
+    assert len(list(iter_video_pages("B", "token", ["item_id"], max_pages=2))) == 2
+    # カーソルが進まなくなったら has_more が True でもやめる
+    fake = video_list(100, stuck_cursor=True)
+    assert len(list(iter_video_pages("B", "token", ["item_id"]))) == 2
+    assert [params.get("cursor") for params in fake.params] == [None, 0]
+
+
+def test_api_error_raises(video_list):
+    video_list(45, error_on_page=2)
+    pages = iter_video_pages("B", "token", ["item_id"])
+    next(pages)
+    with pytest.raises(RuntimeError):
+        next(pages)
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iter_videos_flattens_pages(video_list, prefetch):
+    video_list(45)
+    assert [v["item_id"] for v in iter_videos("B", "token", ["item_id"], prefetch=prefetch)] == \
+        [str(i) for i in range(45)]
+
+
+def test_prefetch_reraises_producer_errors_in_the_caller():
+    def pages():
+        yield {"videos": [1]}
+        raise ValueError("boom")
+
+    prefetched = prefetch_pages(pages())
+    assert next(prefetched) == {"videos": [1]}
+    with pytest.raises(ValueError):
+        next(prefetched)
+
+
+def test_prefetch_stops_the_producer_when_the_caller_stops():
+    produced = []
+    finished = threading.Event()
+
+    def pages():
+        try:
+            for i in range(1000):
+                produced.append(i)
+                yield i
+        finally:
+            finished.set()
+
+    prefetched = prefetch_pages(pages(), depth=1)
+    assert next(prefetched) == 0
+    prefetched.close()
+    assert finished.wait(2)
+    assert len(produced) < 10
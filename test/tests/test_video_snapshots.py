@@ -0,0 +1,79 @@
+import datetime
+import math
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from video_snapshots import VideoSnapshotStore, gained_on, views_gained_yesterday
+
+OLD = int(datetime.datetime(2020, 1, 1).timestamp())
+
+
+def video(item_id, views, create_time=OLD):
+    return {"item_id": item_id, "create_time": create_time, "video_views": views, "likes": 1}
+
+
+@pytest.fixture
+def store(db_path):
+    return VideoSnapshotStore(db_path)
+
+
+def gains(store, date):
+    return views_gained_yesterday(store, "B", today=date).to_dict()
+
+
+def test_unchanged_observed_video_gains_zero(store):
+    store.save_snapshots("B", [video("a", 100), video("b", 50)], "2024-05-01")
+    store.save_snapshots("B", [video("a", 130)], "2024-05-02", observed={"a", "b"})
+    assert gains(store, "2024-05-02") == {"a": 30.0, "b": 0.0}
+
+
+def test_video_not_fetched_by_cut_off_run_is_null(store):
+    store.save_snapshots("B", [video("a", 100), video("b", 50)], "2024-05-01")
+    # ページ送りを途中でやめたので b は取得していない
+    store.save_snapshots("B", [video("a", 130)], "2024-05-02", observed={"a"})
+    result = gains(store, "2024-05-02")
+    assert result["a"] == 30.0
+    assert math.isnan(result["b"])
+
+
+def test_missed_day_is_null(store):
+    store.save_snapshots("B", [video("a", 100)], "2024-05-01")
+    store.save_snapshots("B", [video("a", 160)], "2024-05-03")
+    assert math.isnan(gains(store, "2024-05-03")["a"])
+
+
+def test_gain_counts_from_the_last_day_the_video_was_observed(store):
+    store.save_snapshots("B", [video("a", 100), video("b", 10)], "2024-05-01")
+    store.save_snapshots("B", [], "2024-05-02", observed={"a"})
+    store.save_snapshots("B", [video("a", 120), video("b", 30)], "2024-05-03")
+    result = gains(store, "2024-05-03")
+    # a は前日に変化なしを確認しているので1日分、b は前日に取得していないので2日分 (NaN)
+    assert result["a"] == 20.0
+    assert math.isnan(result["b"])
+
+
+def test_new_video_counts_its_full_value(store):
+    posted = int(datetime.datetime(2024, 5, 1, 12).timestamp())
+    store.save_snapshots("B", [video("new", 40, create_time=posted), video("old", 500)], "2024-05-02")
+    result = gains(store, "2024-05-02")
+    assert result["new"] == 40.0
+    assert math.isnan(result["old"])
+
+
+def test_pending_matches_saved_result(store, db_path):
+    store.save_snapshots("B", [video("a", 100), video("b", 50), video("c", 5)], "2024-05-01")
+    pending = gained_on(store, "2024-05-02", "B", pending=[video("a", 110)], observed={"a", "b"})
+    assert "2024-05-02" not in set(store.load("B")["snapshot_date"])
+
+    store.save_snapshots("B", [video("a", 110)], "2024-05-02", observed={"a", "b"})
+    saved = gained_on(store, "2024-05-02", "B")
+    assert pending.sort_index().equals(saved.sort_index())
+    assert saved.loc["a", "video_views_delta"] == 10.0
+    assert saved.loc["b", "video_views_delta"] == 0.0
+    assert math.isnan(saved.loc["c", "video_views_delta"])
+
+
+def test_empty_store_returns_empty_frame(store):
+    assert views_gained_yesterday(store, "B", today="2024-05-02").empty
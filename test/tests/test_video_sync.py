@@ -0,0 +1,81 @@
+from video_sync import VideoSyncStore, content_hash, iter_changed_videos, page_cutoff
+
+DAY = 24 * 3600
+
+
+def video(item_id, create_time, views):
+    return {"item_id": item_id, "create_time": create_time, "video_views": views}
+
+
+def test_content_hash_ignores_key_order_and_item_id():
+    a = {"item_id": "1", "likes": 3, "video_views": 10}
+    b = {"video_views": 10, "likes": 3, "item_id": "2"}
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash({**a, "likes": 4})
+
+
+def test_diff_and_mark_synced(db_path):
+    store = VideoSyncStore(db_path)
+    videos = [video("1", 100, 10), video("2", 200, 20)]
+    changes = store.diff("B", videos)
+    assert [(v["item_id"], is_new) for v, _, is_new in changes] == [("1", True), ("2", True)]
+
+    # mark_synced するまでは同じ動画がまた差分に出る
+    assert len(store.diff("B", videos)) == 2
+    store.mark_synced("B", changes)
+    assert store.watermark("B")["max_create_time"] == 200
+    assert store.diff("B", videos) == []
+
+    changed = store.diff("B", [video("1", 100, 11), video("2", 200, 20)])
+    assert [(v["item_id"], is_new) for v, _, is_new in changed] == [("1", False)]
+    # 別のアカウントの同じ item_id は別扱い
+    assert len(store.diff("OTHER", videos)) == 2
+
+
+def test_page_cutoff():
+    assert page_cutoff(None) is None
+    assert page_cutoff({"max_create_time": 0}) is None
+    assert page_cutoff({"max_create_time": 100 * DAY}, lookback_days=-1) is None
+    assert page_cutoff({"max_create_time": 100 * DAY}, lookback_days=28) == 72 * DAY
+
+
+class Pages:
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched = 0
+        self.closed = False
+
+    def __iter__(self):
+        for page in self.pages:
+            self.fetched += 1
+            yield page
+
+    def close(self):
+        self.closed = True
+
+
+def test_cutoff_stops_paging_and_observed_lists_only_fetched_videos(db_path):
+    store = VideoSyncStore(db_path)
+    pages = Pages([
+        {"videos": [video("5", 50 * DAY, 1), video("4", 40 * DAY, 1)]},
+        {"videos": [video("3", 9 * DAY, 1), video("2", 8 * DAY, 1)]},
+        {"videos": [video("1", 1 * DAY, 1)]},
+    ])
+    observed = set()
+    changes = list(iter_changed_videos("B", pages, store, stop_before=10 * DAY, observed=observed))
+
+    assert pages.fetched == 2 and pages.closed
+    assert {v["item_id"] for v, _, _ in changes} == {"5", "4", "3", "2"}
+    # 取得しなかった動画 ("1") は observed に入らない (下流では「変化なし」ではなく「未取得」)
+    assert observed == {"5", "4", "3", "2"}
+
+
+def test_observed_includes_unchanged_videos(db_path):
+    store = VideoSyncStore(db_path)
+    videos = [video("1", 100, 10), video("2", 200, 20)]
+    store.mark_synced("B", store.diff("B", videos))
+
+    observed = set()
+    changes = list(iter_changed_videos("B", [{"videos": videos}], store, observed=observed))
+    assert changes == []
+    assert observed == {"1", "2"}
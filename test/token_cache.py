@@ -0,0 +1,214 @@
+"""
+アクセストークンをディスクにキャッシュし、複数のスクリプト・プロセスで共有するモジュール。
+これまでは各スクリプトが毎回 refresh_token() を呼び、トークンがまだ何時間も有効でも
+ネットワーク越しにトークンを更新 (リフレッシュトークンもローテーション) していた。
+
+ここでは access_token / refresh_token とそれぞれの有効期限をファイルに保存し、
+期限切れの少し前 (REFRESH_MARGIN_SECONDS) になったときだけ更新する。
+更新はファイルロックを取ったプロセスが1回だけ行い (single-flight)、
+他のプロセス・スレッドはロックが空いたあとにキャッシュを読み直して同じトークンを使う。
+並列ジョブが同時にリフレッシュトークンをローテーションして、片方のトークンが無効になることを防ぐ。
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+from dotenv import load_dotenv
+
+from api_client import api_post
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+load_dotenv()
+
+# --- 設定 (環境変数で上書き可能) ---
+# キャッシュファイルの場所 (トークンを含むので git には含めない)
+TOKEN_CACHE_PATH = os.getenv("TIKTOK_TOKEN_CACHE", os.path.join("tiktok_data", "token_cache.json"))
+# 有効期限の何秒前になったら更新するか
+REFRESH_MARGIN_SECONDS = int(os.getenv("TIKTOK_TOKEN_REFRESH_MARGIN", "600"))
+
+# リフレッシュトークンで新しいアクセストークンを取得するエンドポイント
+REFRESH_PATH = "tt_user/oauth2/refresh_token/"
+
+_memory_cache = None
+_process_lock = threading.Lock()
+
+
+# --- ファイルロック ---
+@contextlib.contextmanager
+def _file_lock(lock_path):
+    """
+    プロセス間の排他ロック。Linux / macOS は fcntl、Windows は msvcrt を使う。
+    """
+    lock_dir = os.path.dirname(lock_path)
+    if lock_dir and not os.path.exists(lock_dir):
+        os.makedirs(lock_dir, exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK は約10秒で諦めるので、取れるまで繰り返す
+                    continue
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+# --- キャッシュファイルの読み書き ---
+def load_cache(path=None):
+    """
+    キャッシュファイルを読み込む関数。ファイルがない・壊れている場合は None を返す。
+
+    Returns:
+        dict or None: {"access_token", "access_token_expires_at", "refresh_token",
+                       "refresh_token_expires_at", "updated_at"} の辞書
+    """
+    path = path or TOKEN_CACHE_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (ValueError, OSError) as e:
+        logger.warning("警告: トークンキャッシュ '%s' を読み込めませんでした: %s", path, e)
+        return None
+
+
+def save_cache(token_data, path=None):
+    """
+    キャッシュファイルに書き込む関数。途中で落ちても壊れたファイルが残らないよう、
+    一時ファイルに書いてから置き換える。
+    """
+    path = path or TOKEN_CACHE_PATH
+    cache_dir = os.path.dirname(path)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(token_data, f, indent=4, ensure_ascii=False)
+    try:
+        os.chmod(tmp_path, 0o600) # トークンを含むので所有者だけが読めるようにする
+    except OSError:
+        pass
+    os.replace(tmp_path, path)
+
+
+def _is_fresh(token_data, now=None):
+    if not token_data or not token_data.get("access_token"):
+        return False
+    now = now or time.time()
+    return token_data.get("access_token_expires_at", 0) - REFRESH_MARGIN_SECONDS > now
+
+
+# --- トークン更新 ---
+def request_token_refresh(refresh_token):
+    """
+    リフレッシュトークンで新しいアクセストークンを取得する関数。
+
+    Args:
+        refresh_token (str): 現在のリフレッシュトークン
+
+    Returns:
+        dict or None: キャッシュに保存する形の辞書、またはエラー時にNone
+    """
+    client_id = os.getenv("TIKTOK_CLIENT_ID")
+    client_secret = os.getenv("TIKTOK_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        logger.error("エラー: 環境変数 'TIKTOK_CLIENT_ID' / 'TIKTOK_CLIENT_SECRET' が設定されていません。")
+        return None
+
+    payload = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": os.getenv("TIKTOK_GRANT_TYPE") or "refresh_token",
+        "refresh_token": refresh_token,
+    }
+    try:
+        response = api_post(REFRESH_PATH, payload=payload)
+        response.raise_for_status()
+        response_data = response.json()
+    except Exception as e:
+        logger.error("エラー: アクセストークンの更新に失敗しました: %s", e)
+        return None
+
+    data = response_data.get("data") or {}
+    if response_data.get("code", 0) != 0 or not data.get("access_token"):
+        logger.error("エラー: アクセストークンの更新に失敗しました: code=%s, message=%s",
+                     response_data.get("code"), response_data.get("message"))
+        return None
+
+    now = time.time()
+    return {
+        "access_token": data["access_token"],
+        "access_token_expires_at": now + int(data.get("expires_in") or 0),
+        # リフレッシュトークンはローテーションされるので、返ってきたものを必ず保存する
+        "refresh_token": data.get("refresh_token") or refresh_token,
+        "refresh_token_expires_at": now + int(data.get("refresh_token_expires_in") or 0),
+        "open_id": data.get("open_id"),
+        "updated_at": now,
+    }
+
+
+def get_access_token(force_refresh=False):
+    """
+    有効なアクセストークンを返す関数。
+    メモリ → キャッシュファイルの順に確認し、期限切れが近いときだけファイルロックを取って更新する。
+
+    Args:
+        force_refresh (bool): True ならキャッシュが有効でも更新する (401 が返ってきたときなど)
+
+    Returns:
+        str or None: アクセストークン、または取得できなかった場合にNone
+    """
+    global _memory_cache
+    if not force_refresh and _is_fresh(_memory_cache):
+        return _memory_cache["access_token"]
+
+    # 同じプロセス内のスレッドは1本だけがファイルを確認・更新する
+    with _process_lock:
+        if not force_refresh and _is_fresh(_memory_cache):
+            return _memory_cache["access_token"]
+
+        requested_at = time.time()
+        with _file_lock(TOKEN_CACHE_PATH + ".lock"):
+            # ロックを待っている間に他のプロセスが更新しているかもしれないので読み直す
+            # (force_refresh のときは、この呼び出しより後に更新されたトークンだけを使う)
+            cached = load_cache()
+            if _is_fresh(cached) and not (force_refresh and cached.get("updated_at", 0) < requested_at):
+                _memory_cache = cached
+                return cached["access_token"]
+
+            refresh_token = (cached or {}).get("refresh_token") or os.getenv("TIKTOK_REFRESH_TOKEN")
+            if not refresh_token:
+                logger.error("エラー: リフレッシュトークンがありません。環境変数 'TIKTOK_REFRESH_TOKEN' を設定してください。")
+                return None
+            if cached and cached.get("refresh_token_expires_at") and cached["refresh_token_expires_at"] < time.time():
+                logger.warning("警告: キャッシュのリフレッシュトークンが期限切れです。再認可が必要な可能性があります。")
+
+            logger.info("アクセストークンを更新します。")
+            token_data = request_token_refresh(refresh_token)
+            if token_data is None:
+                return None
+            save_cache(token_data)
+            _memory_cache = token_data
+            logger.info("アクセストークンを更新しました (有効期限: %s)。",
+                        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(token_data["access_token_expires_at"])))
+            return token_data["access_token"]
@@ -2,26 +2,15 @@
 import os
 import json
 
-from six import string_types
-from urllib.parse import urlencode, urlunparse
+from api_client import api_get
+from log_utils import get_logger
 
-import requests
+logger = get_logger(__name__)
 
 ACCESS_TOKEN = "act.CT1xYxEuLnB05mGXjKJfpSGOo3Wa1WIDm2a3TFo74awXFJ5M1XmSWXkzVfL3!5342.va"
 PATH = "/open_api/v1.3/tt_user/token_info/get/"
 
 
-def build_url(path, query=""):
-    # type: (str, str) -> str
-    """
-    Build request URL
-    :param path: Request path
-    :param query: Querystring
-    :return: Request URL
-    """
-    scheme, netloc = "https", "business-api.tiktok.com"
-    return urlunparse((scheme, netloc, path, "", query, ""))
-
 def get(json_str):
     # type: (str) -> dict
     """
@@ -30,20 +19,16 @@ def get(json_str):
     :return: Response in JSON format
     """
     args = json.loads(json_str)
-    query_string = urlencode({k: v if isinstance(v, string_types) else json.dumps(v) for k, v in args.items()})
-    url = build_url(PATH, query_string)
-    headers = {
-        "Access-Token": ACCESS_TOKEN,
-    }
-    rsp = requests.get(url,  headers=headers)
+    rsp = api_get(PATH, ACCESS_TOKEN, params=args)
+    url = rsp.url
 
     # レスポンスの情報を表示
-    print("=== レスポンス情報 ===")
-    print("URL:", url)
-    print("Status Code:", rsp.status_code)
-    print("Headers:", rsp.headers)
-    print("Response Text:", rsp.text)
-    print("======================")
+    logger.info("=== レスポンス情報 ===")
+    logger.info("URL: %s", url)
+    logger.info("Status Code: %s", rsp.status_code)
+    logger.info("Headers: %s", rsp.headers)
+    logger.info("Response Text: %s", rsp.text)
+    logger.info("======================")
 
     return rsp.json()
 
@@ -57,5 +42,5 @@ if __name__ == '__main__':
 
 
     my_args = "{\"secret\": \"%s\", \"app_id\": \"%s\"}" % (secret, app_id)
-    print(get(my_args))
+    logger.info("%s", get(my_args))
 
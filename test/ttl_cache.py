@@ -0,0 +1,107 @@
+"""
+API のレスポンスを有効期限 (TTL) 付きでローカルの SQLite に保存しておくキャッシュ。
+ハッシュタグの候補やカテゴリのベンチマークのように、変化がゆっくりで何度も同じ条件で呼ぶ API の結果を、
+期限が切れるまでは API を呼ばずに返すために使う。
+
+値は JSON で保存するので、dict / list / 数値 / 文字列ならそのまま入れられる。
+キーは (keyword, language) のようなタプルでもよい (JSON 文字列にして保存する)。
+"""
+
+import json
+import time
+import threading
+
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def _encode_key(key):
+    return json.dumps(key, ensure_ascii=False, sort_keys=True) if not isinstance(key, str) else key
+
+
+class TTLCache:
+    """
+    namespace ごとに分かれた、有効期限付きのキャッシュ。
+
+    Args:
+        namespace (str): キャッシュの種類 ("hashtag_suggestion" など)
+        ttl_seconds (float): 保存してから有効な秒数
+        db_path (str): DBファイルのパス (None なら local_db の既定のパス)
+    """
+
+    def __init__(self, namespace, ttl_seconds, db_path=None):
+        self.namespace = namespace
+        self.ttl_seconds = float(ttl_seconds)
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS api_cache (
+                    namespace TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, cache_key)
+                )
+            """)
+
+    def get(self, key, default=None):
+        """期限内の値を返す (なければ default)"""
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        """
+        期限内の値をまとめて取得する関数。
+
+        Returns:
+            dict: key → 値 (期限切れ・未保存のキーは含まない)
+        """
+        keys = list(keys)
+        encoded = {_encode_key(key): key for key in keys}
+        found = {}
+        now = time.time()
+        with self._lock:
+            items = list(encoded)
+            # SQLite の変数の数の上限を超えないように分けて問い合わせる
+            for i in range(0, len(items), 500):
+                chunk = items[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(
+                    f"SELECT cache_key, value FROM api_cache WHERE namespace = ? AND expires_at > ? AND cache_key IN ({placeholders})",
+                    [self.namespace, now, *chunk],
+                )
+                for cache_key, value in cursor:
+                    found[encoded[cache_key]] = json.loads(value)
+            self.hits += len(found)
+            self.misses += len(set(encoded)) - len(found)
+        return found
+
+    def set(self, key, value, ttl_seconds=None):
+        self.set_many({key: value}, ttl_seconds)
+
+    def set_many(self, items, ttl_seconds=None):
+        """
+        値をまとめて保存する関数 (同じキーは上書き)。
+
+        Args:
+            items (dict): key → 値
+            ttl_seconds (float): この保存だけ有効期限を変える場合に指定
+        """
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else float(ttl_seconds))
+        rows = [(self.namespace, _encode_key(key), json.dumps(value, ensure_ascii=False, default=str), expires_at)
+                for key, value in items.items()]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO api_cache (namespace, cache_key, value, expires_at) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def purge_expired(self):
+        """期限切れの行を削除する関数。削除した件数を返す"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM api_cache WHERE namespace = ? AND expires_at <= ?",
+                                       (self.namespace, time.time()))
+        return cursor.rowcount
@@ -0,0 +1,214 @@
+"""
+動画データを明示的な Arrow スキーマで Arrow テーブル / Parquet に変換し、BigQuery にロードするためのモジュール。
+これまでは pd.DataFrame(videos) をそのまま load_table_from_dataframe に渡していたので、
+video_view_retention などの配列フィールドは Python の object 列になり、
+pyarrow が1行ずつ型を推測していた (BigQuery 側では JSON 文字列として扱うしかなかった)。
+
+ここでは配列フィールドを REPEATED STRUCT (list<struct<...>>) として定義し、
+API のリストを1回だけたどって Arrow の ListArray を直接組み立てる。
+ロードジョブはこのスキーマの Parquet を送るので、BigQuery 側で型の推測は行われず、
+SQL からは UNNEST でそのまま集計できる。
+"""
+
+import io
+
+import numpy as np
+
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# --- スキーマ ---
+# スカラー列 (API のフィールド名 → Arrow の型名)
+SCALAR_COLUMNS = {
+    "item_id": "string",
+    "caption": "string",
+    "video_duration": "float64",
+    "likes": "int64",
+    "comments": "int64",
+    "shares": "int64",
+    "favorites": "int64",
+    "create_time": "timestamp",
+    "reach": "int64",
+    "video_views": "int64",
+    "total_time_watched": "float64",
+    "average_time_watched": "float64",
+    "full_video_watched_rate": "float64",
+    "new_followers": "int64",
+    "profile_views": "int64",
+    "website_clicks": "int64",
+    "phone_number_clicks": "int64",
+}
+
+# 配列列 (API のフィールド名 → 要素の辞書のキーと型)
+# 例: video_view_retention = [{"second": "13", "percentage": 0.43}, ...]
+REPEATED_COLUMNS = {
+    "video_view_retention": {"second": "int64", "percentage": "float64"},
+    "engagement_likes": {"second": "int64", "percentage": "float64"},
+    "impression_sources": {"impression_source": "string", "percentage": "float64"},
+    "audience_countries": {"country": "string", "percentage": "float64"},
+}
+
+
+def _arrow_type(name):
+    import pyarrow as pa
+    if name == "timestamp":
+        return pa.timestamp("s", tz="UTC")
+    return {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64()}[name]
+
+
+def video_arrow_schema(columns):
+    """
+    columns (API のフィールド名のリスト) に対応する Arrow スキーマを返す関数。
+    SCALAR_COLUMNS / REPEATED_COLUMNS に登録されていない列は float64 として扱う。
+    """
+    import pyarrow as pa
+    fields = []
+    for column in columns:
+        if column in REPEATED_COLUMNS:
+            struct = pa.struct([(key, _arrow_type(kind)) for key, kind in REPEATED_COLUMNS[column].items()])
+            fields.append(pa.field(column, pa.list_(pa.field("item", struct))))
+        else:
+            fields.append(pa.field(column, _arrow_type(SCALAR_COLUMNS.get(column, "float64"))))
+    return pa.schema(fields)
+
+
+def bigquery_schema(columns):
+    """
+    columns に対応する BigQuery の SchemaField のリストを返す関数 (配列列は REPEATED RECORD)。
+    """
+    from google.cloud import bigquery
+
+    bq_types = {"string": "STRING", "int64": "INTEGER", "float64": "FLOAT", "timestamp": "TIMESTAMP"}
+    schema = []
+    for column in columns:
+        if column in REPEATED_COLUMNS:
+            children = [bigquery.SchemaField(key, bq_types[kind]) for key, kind in REPEATED_COLUMNS[column].items()]
+            schema.append(bigquery.SchemaField(column, "RECORD", mode="REPEATED", fields=children))
+        else:
+            schema.append(bigquery.SchemaField(column, bq_types[SCALAR_COLUMNS.get(column, "float64")]))
+    return schema
+
+
+# --- 変換 ---
+def _scalar_array(values, kind):
+    import pyarrow as pa
+    if kind == "string":
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    target = pa.int64() if kind == "timestamp" else _arrow_type(kind)
+    try:
+        array = pa.array(values, type=target)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # second や create_time のように数値が文字列で返ってくるフィールドは、文字列の配列にしてからまとめて cast する
+        array = pa.array([None if v is None else str(v) for v in values], type=pa.string()).cast(target)
+    if kind == "timestamp":
+        # create_time は UNIX 秒
+        array = array.cast(_arrow_type("timestamp"))
+    return array
+
+
+def _repeated_array(rows, spec):
+    """
+    辞書のリストの列を ListArray<Struct> に変換する関数。
+    要素はここで1回だけたどり、キーごとに連結した配列を最後にまとめて型変換する。
+    フィールドがない動画は NULL、空のリストは空の配列にする。
+    """
+    import pyarrow as pa
+    lengths = np.zeros(len(rows), dtype=np.int32)
+    missing = np.zeros(len(rows), dtype=bool)
+    children = {key: [] for key in spec}
+    for i, points in enumerate(rows):
+        if points is None:
+            missing[i] = True
+            continue
+        lengths[i] = len(points)
+        for key, values in children.items():
+            values.extend(point.get(key) for point in points)
+
+    offsets = np.zeros(len(rows) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    struct = pa.StructArray.from_arrays(
+        [_scalar_array(children[key], kind) for key, kind in spec.items()],
+        fields=[pa.field(key, _arrow_type(kind)) for key, kind in spec.items()],
+    )
+    return pa.ListArray.from_arrays(
+        pa.array(offsets), struct, type=pa.list_(pa.field("item", struct.type)),
+        mask=pa.array(missing) if missing.any() else None,
+    )
+
+
+def videos_to_arrow(videos, columns=None, extra_columns=None):
+    """
+    動画の辞書のリストを、明示的なスキーマの Arrow テーブルに変換する関数。
+
+    Args:
+        videos (list): /business/video/list/ の data.videos
+        columns (list): 出力する列 (None なら videos に含まれている列を SCALAR_COLUMNS / REPEATED_COLUMNS の順で)
+        extra_columns (dict): 追加の列 (列名 → 値のリスト。views_gained_yesterday など)
+
+    Returns:
+        pyarrow.Table: 変換したテーブル
+    """
+    import pyarrow as pa
+
+    if columns is None:
+        present = set()
+        for video in videos:
+            present.update(video)
+        columns = [c for c in [*SCALAR_COLUMNS, *REPEATED_COLUMNS] if c in present]
+        columns += sorted(present - set(columns))
+
+    arrays = []
+    for column in columns:
+        values = [video.get(column) for video in videos]
+        if column in REPEATED_COLUMNS:
+            arrays.append(_repeated_array(values, REPEATED_COLUMNS[column]))
+        else:
+            arrays.append(_scalar_array(values, SCALAR_COLUMNS.get(column, "float64")))
+    schema = video_arrow_schema(columns)
+
+    for name, values in (extra_columns or {}).items():
+        arrays.append(pa.array(values, type=pa.float64(), from_pandas=True))
+        schema = schema.append(pa.field(name, pa.float64()))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def to_parquet_buffer(table):
+    """Arrow テーブルを Parquet にしてメモリ上のバッファで返す関数 (load_table_from_file に渡す)"""
+    import pyarrow.parquet as pq
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="snappy")
+    buffer.seek(0)
+    return buffer
+
+
+def load_videos_parquet(client, table_ref, table, write_disposition="WRITE_APPEND"):
+    """
+    Arrow テーブルを Parquet で BigQuery にロードする関数 (完了まで待つ)。
+
+    Args:
+        client (bigquery.Client): BigQuery クライアント
+        table_ref: ロード先のテーブル
+        table (pyarrow.Table): videos_to_arrow() で作ったテーブル
+        write_disposition (str): 書き込みモード
+
+    Returns:
+        bigquery.LoadJob: 完了したロードジョブ
+    """
+    from google.cloud import bigquery
+
+    parquet_options = bigquery.format_options.ParquetOptions()
+    # list<struct> を (list.element の入れ子ではなく) REPEATED RECORD として読ませる
+    parquet_options.enable_list_inference = True
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=write_disposition,
+        schema=bigquery_schema(table.column_names),
+        # 配列列・追加の列がまだないテーブルにも追記できるように列の追加を許可する
+        schema_update_options=[bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION],
+    )
+    job_config.parquet_options = parquet_options
+
+    job = client.load_table_from_file(to_parquet_buffer(table), table_ref, job_config=job_config)
+    job.result()
+    return job
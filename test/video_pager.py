@@ -0,0 +1,139 @@
+"""
+/business/video/list/ をカーソルでページ送りしながら動画を取得するモジュール。
+getVideoAPI はこれまで1回だけリクエストして最初のページしか返していなかったため、
+動画が多いアカウントでは data.cursor / data.has_more が無視されて途中までしか取れていなかった。
+
+iter_video_pages は1ページずつ yield するジェネレータなので、メモリに持つのは常に数ページ分だけ。
+prefetch_pages で包むと、呼び出し側 (BigQuery へのロード・シートへの書き込みなど) が
+今のページを処理している間に、別スレッドで次のページを取りに行く。
+"""
+
+import queue
+import threading
+
+from api_client import api_get
+from videoFieldsName import VIDEO_FIELDS
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+VIDEO_LIST_PATH = "business/video/list/"
+# 1ページあたりの最大件数 (API の上限は20)
+MAX_COUNT_PER_PAGE = 20
+# 先読みしておくページ数 (キューの大きさ)
+PREFETCH_DEPTH = 2
+
+
+def iter_video_pages(business_id, access_token, fields_list=VIDEO_FIELDS, max_count=MAX_COUNT_PER_PAGE,
+                     max_pages=None, extra_params=None):
+    """
+    動画一覧をカーソルに従って最後のページまで取得し、1ページずつ返すジェネレータ。
+
+    Args:
+        business_id (str): TikTok Business ID
+        access_token (str): 有効なアクセストークン
+        fields_list (list): 取得したいフィールドのリスト
+        max_count (int): 1ページあたりの件数 (最大20)
+        max_pages (int): 取得するページ数の上限 (None なら has_more が False になるまで)
+        extra_params (dict): 追加のクエリパラメータ (filters など)
+
+    Yields:
+        dict: 1ページ分のレスポンスの "data" ({"videos": [...], "cursor": ..., "has_more": ...})
+
+    Raises:
+        requests.exceptions.HTTPError: HTTPエラーが返ってきた場合
+        RuntimeError: API がエラー (code != 0) を返した場合
+    """
+    cursor = None
+    page = 0
+    while max_pages is None or page < max_pages:
+        params = {
+            "business_id": business_id,
+            "fields": fields_list, # api_client がJSON文字列に変換する
+            "max_count": min(max_count, MAX_COUNT_PER_PAGE),
+        }
+        if cursor is not None:
+            params["cursor"] = cursor
+        if extra_params:
+            params.update(extra_params)
+
+        response = api_get(VIDEO_LIST_PATH, access_token, params=params)
+        response.raise_for_status()
+        response_data = response.json()
+        if response_data.get("code", 0) != 0:
+            raise RuntimeError(f"動画一覧の取得に失敗しました (page={page + 1}, code={response_data.get('code')}, message={response_data.get('message')})")
+
+        data = response_data.get("data") or {}
+        videos = data.get("videos") or []
+        page += 1
+        logger.debug("動画一覧 %sページ目: %s件 (has_more=%s)", page, len(videos), data.get("has_more"))
+        yield data
+
+        next_cursor = data.get("cursor")
+        if not data.get("has_more") or not videos or next_cursor is None or next_cursor == cursor:
+            # カーソルが進まない場合も無限ループを避けるため終了する
+            break
+        cursor = next_cursor
+
+
+def iter_videos(business_id, access_token, fields_list=VIDEO_FIELDS, prefetch=True, **kwargs):
+    """
+    動画を1件ずつ返すジェネレータ (ページの切れ目を意識しなくてよい版)。
+    prefetch=True なら次のページを裏で先読みする。
+    """
+    pages = iter_video_pages(business_id, access_token, fields_list, **kwargs)
+    if prefetch:
+        pages = prefetch_pages(pages)
+    for data in pages:
+        yield from data.get("videos") or []
+
+
+_DONE = object()
+
+
+def prefetch_pages(pages, depth=PREFETCH_DEPTH):
+    """
+    ページのイテレータを別スレッドで先読みするジェネレータ。
+    キューの大きさを depth に制限しているので、呼び出し側の処理が遅くても
+    メモリ上に溜まるのは depth ページ分まで。
+    取得中に発生した例外は、呼び出し側のスレッドで投げ直す。
+
+    Args:
+        pages (iterator): iter_video_pages などのイテレータ
+        depth (int): 先読みしておくページ数の上限
+    """
+    page_queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def _put(item):
+        # 呼び出し側が途中でやめた場合に、いつまでも put で待ち続けないようにする
+        while not stop.is_set():
+            try:
+                page_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer():
+        try:
+            for page in pages:
+                if not _put((page, None)):
+                    return
+        except BaseException as e:
+            _put((_DONE, e))
+            return
+        _put((_DONE, None))
+
+    worker = threading.Thread(target=_producer, name="video-page-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            page, error = page_queue.get()
+            if page is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield page
+    finally:
+        stop.set()
@@ -0,0 +1,279 @@
+"""
+動画ごとの累計値 (video_views, likes, shares, reach, new_followers など) を
+(item_id, snapshot_date) 単位でローカルの SQLite に保存し、日ごとの増加分を計算するモジュール。
+/business/video/list/ は動画ごとの「これまでの累計」しか返さないので、
+毎日のスナップショットの差分を取ることで「昨日増えた再生数」を出す
+(プロフィールの aggregate_data で followers_count の増加分を出しているのと同じ考え方)。
+
+増加分は動画ごとにループせず、pandas で (item_id, snapshot_date) の順に並べてから
+item_id ごとの diff を1回で計算する。
+
+video_sync で「変わった動画」だけを保存するので、スナップショットと一緒に「その日に取得した item_id」
+(変わっていない動画も含む) も保存しておき、ある日のスナップショットがない動画は、
+その日に取得していれば「前回のスナップショットから変化なし」(増加分0) として扱う。
+video_sync はウォーターマークより古い動画のページを取得しないことがあるので、取得していない動画の増加分は
+0 ではなく NaN (BigQuery・シートでは NULL・空欄) にする。
+増加分は「その動画を前回取得した日からの増加分」として扱い、前回の取得が前日でない場合は、
+その増加分が昨日1日のものかわからないので「昨日の増加分」は NaN にする。
+"""
+
+import datetime
+import threading
+
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# スナップショットに保存する累計値
+SNAPSHOT_METRICS = ["video_views", "likes", "comments", "shares", "favorites", "reach",
+                    "new_followers", "profile_views", "website_clicks", "total_time_watched"]
+
+
+# video_snapshots の列
+SNAPSHOT_COLUMNS = ["business_id", "item_id", "snapshot_date", "create_time", *SNAPSHOT_METRICS]
+
+
+def _to_number(value):
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _snapshot_rows(business_id, videos, snapshot_date):
+    """動画の辞書のリストを video_snapshots の行 (SNAPSHOT_COLUMNS の順のタプル) にする"""
+    rows = []
+    for video in videos:
+        if video.get("item_id") is None:
+            continue
+        create_time = _to_number(video.get("create_time"))
+        rows.append((business_id, str(video["item_id"]), snapshot_date,
+                     None if create_time is None else int(create_time),
+                     *(_to_number(video.get(metric)) for metric in SNAPSHOT_METRICS)))
+    return rows
+
+
+class VideoSnapshotStore:
+    """
+    動画の累計値のスナップショットを保存し、日ごとの増加分を計算するクラス。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        metric_columns = ",\n".join(f"                    {metric} REAL" for metric in SNAPSHOT_METRICS)
+        with self._lock, self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS video_snapshots (
+                    business_id TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    snapshot_date TEXT NOT NULL,
+                    create_time INTEGER,
+{metric_columns},
+                    PRIMARY KEY (item_id, snapshot_date)
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_video_snapshots_business ON video_snapshots (business_id, snapshot_date)"
+            )
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_snapshot_observed (
+                    business_id TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    snapshot_date TEXT NOT NULL,
+                    PRIMARY KEY (item_id, snapshot_date)
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_video_snapshot_observed_business ON video_snapshot_observed (business_id, snapshot_date)"
+            )
+            # 以前の実行日の記録は、どの動画を取得したかがわからないので使わない
+            self.conn.execute("DROP TABLE IF EXISTS video_snapshot_runs")
+
+    def save_snapshots(self, business_id, videos, snapshot_date=None, observed=None):
+        """
+        動画の累計値を snapshot_date のスナップショットとして保存する関数 (同じ日は上書き)。
+
+        Args:
+            business_id (str): TikTok Business ID
+            videos (list): /business/video/list/ の data.videos
+            snapshot_date (str): 'YYYY-MM-DD' (None なら今日)
+            observed (iterable): この実行で取得した (変化がないことを確認した) 動画の item_id
+                                 (videos の動画は指定しなくても取得した動画として記録する)
+
+        Returns:
+            int: 保存した件数
+        """
+        snapshot_date = snapshot_date or datetime.date.today().strftime('%Y-%m-%d')
+        rows = _snapshot_rows(business_id, videos, snapshot_date)
+        seen = {row[1] for row in rows} | {str(item_id) for item_id in observed or ()}
+        columns = ", ".join(SNAPSHOT_COLUMNS)
+        placeholders = ", ".join("?" * len(SNAPSHOT_COLUMNS))
+        with self._lock, self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO video_snapshots ({columns}) VALUES ({placeholders})", rows)
+            # 変わった動画が0件でも、この日に取得した動画 (= 変化がないことを確認した動画) を記録する
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO video_snapshot_observed (business_id, item_id, snapshot_date) VALUES (?, ?, ?)",
+                [(business_id, item_id, snapshot_date) for item_id in seen],
+            )
+        return len(rows)
+
+    def observations(self, business_id=None, end_date=None):
+        """
+        動画を取得した日を DataFrame で返す関数 (business_id, item_id, snapshot_date の列)。
+        """
+        import pandas as pd
+
+        query = "SELECT business_id, item_id, snapshot_date FROM video_snapshot_observed WHERE 1 = 1"
+        params = []
+        if business_id:
+            query += " AND business_id = ?"
+            params.append(business_id)
+        if end_date:
+            query += " AND snapshot_date <= ?"
+            params.append(end_date)
+        with self._lock:
+            return pd.read_sql_query(query + " ORDER BY item_id, snapshot_date", self.conn, params=params)
+
+    def load(self, business_id=None, end_date=None):
+        """
+        スナップショットを DataFrame で読み込む関数 (item_id, snapshot_date の順に並べて返す)。
+        """
+        import pandas as pd
+
+        query = "SELECT * FROM video_snapshots WHERE 1 = 1"
+        params = []
+        if business_id:
+            query += " AND business_id = ?"
+            params.append(business_id)
+        if end_date:
+            query += " AND snapshot_date <= ?"
+            params.append(end_date)
+        query += " ORDER BY item_id, snapshot_date"
+        with self._lock:
+            return pd.read_sql_query(query, self.conn, params=params)
+
+
+def compute_deltas(snapshots, observations=None):
+    """
+    スナップショットから、スナップショットごとの増加分を計算する関数。
+    item_id ごとに1つ前のスナップショットとの差を取る (sort → groupby.diff の1回だけで全動画分を計算)。
+
+    最初のスナップショットは前の値がないので、投稿日がスナップショットの前日以降の動画 (新しい動画) だけ
+    累計値をそのまま増加分 (days=1) とし、それ以外は NaN にする。
+
+    Args:
+        snapshots (pd.DataFrame): VideoSnapshotStore.load() の戻り値
+        observations (pd.DataFrame): VideoSnapshotStore.observations() の戻り値
+                                     (None なら前回のスナップショットからの日数を使う)
+
+    Returns:
+        pd.DataFrame: item_id, snapshot_date, days (増加分が何日分か), <metric>_delta の列を持つ DataFrame。
+                      変化のなかった日は保存されていないので、days は「その動画を前回取得した日から」の日数
+                      (取得日の記録がなければ前回のスナップショットからの日数)
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = snapshots.sort_values(["item_id", "snapshot_date"], kind="mergesort").reset_index(drop=True)
+    dates = pd.to_datetime(df["snapshot_date"])
+    grouped = df.groupby("item_id", sort=False)
+
+    deltas = grouped[SNAPSHOT_METRICS].diff()
+    result = df[["business_id", "item_id", "snapshot_date"]].copy()
+    days = dates.groupby(df["item_id"], sort=False).diff().dt.days
+    first = days.isna()
+
+    if observations is not None and not observations.empty:
+        # 前回の取得日 (このスナップショットの日より前で一番新しい取得日) を item_id ごとに引く
+        seen_dates = pd.DataFrame({"item_id": observations["item_id"].astype(str),
+                                   "seen_date": pd.to_datetime(observations["snapshot_date"])}).sort_values("seen_date")
+        left = pd.DataFrame({"item_id": df["item_id"].astype(str), "date": dates,
+                             "row": np.arange(len(df))}).sort_values("date")
+        previous = pd.merge_asof(left, seen_dates, left_on="date", right_on="seen_date", by="item_id",
+                                 allow_exact_matches=False).sort_values("row")
+        seen_days = (dates - pd.Series(previous["seen_date"].to_numpy(), index=df.index)).dt.days
+        # 前回のスナップショットより後にも取得していれば、その間は変化なし = 増加分はそれ以降の日数分
+        days = pd.Series(np.fmin(days.to_numpy(dtype=float), seen_days.to_numpy(dtype=float)), index=df.index)
+        days[first] = np.nan
+
+    # 最初のスナップショット: 新しい動画なら累計値 = 増加分
+    posted = pd.to_datetime(df["create_time"], unit="s", errors="coerce").dt.normalize()
+    is_new = first & (posted >= dates - pd.Timedelta(days=1))
+    result["days"] = days.mask(is_new, 1.0)
+    for metric in SNAPSHOT_METRICS:
+        result[f"{metric}_delta"] = np.where(is_new, df[metric], deltas[metric])
+    return result
+
+
+def gained_on(snapshot_store, date=None, business_id=None, pending=None, observed=None):
+    """
+    date の前日から date までの1日の増加分を動画ごとに返す関数。
+        - date にスナップショットがある動画: 前回取得した日からの増加分 (前回の取得が前日でなければ NaN)
+        - date にスナップショットがない動画: 前日と date の両方に取得していれば変化なしなので0。
+          どちらかの日に取得していなければ (ページ送りを途中でやめた場合など) NaN
+
+    Args:
+        snapshot_store (VideoSnapshotStore): スナップショットのストア
+        date (str): 'YYYY-MM-DD' (None なら今日)
+        business_id (str): 絞り込む Business ID (None なら全て)
+        pending (list): まだ保存していない date のスナップショットにする動画のリスト
+                        (ロードが成功してから save_snapshots する場合に、先に増加分を出すために使う。business_id が必要)
+        observed (iterable): まだ保存していない、date に取得した動画の item_id (save_snapshots の observed と同じ)
+
+    Returns:
+        pd.DataFrame: item_id をインデックスにした <metric>_delta の DataFrame
+    """
+    import numpy as np
+    import pandas as pd
+
+    date = date or datetime.date.today().strftime('%Y-%m-%d')
+    snapshots = snapshot_store.load(business_id, end_date=date)
+    observations = snapshot_store.observations(business_id, end_date=date)
+    if pending is not None or observed is not None:
+        fresh = pd.DataFrame(_snapshot_rows(business_id, pending or [], date), columns=SNAPSHOT_COLUMNS)
+        replaced = (snapshots["snapshot_date"] == date) & snapshots["item_id"].isin(fresh["item_id"])
+        snapshots = pd.concat([snapshots[~replaced], fresh], ignore_index=True)
+        seen = sorted(set(fresh["item_id"]) | {str(item_id) for item_id in observed or ()})
+        observations = pd.concat([observations, pd.DataFrame({"business_id": business_id, "item_id": seen,
+                                                              "snapshot_date": date})],
+                                 ignore_index=True).drop_duplicates(["item_id", "snapshot_date"])
+    delta_columns = [f"{metric}_delta" for metric in SNAPSHOT_METRICS]
+    if snapshots.empty:
+        return pd.DataFrame(columns=delta_columns, dtype=float)
+
+    deltas = compute_deltas(snapshots, observations)
+    on_date = deltas[deltas["snapshot_date"] == date].set_index("item_id")
+    # 前回の取得から1日より空いている増加分は、昨日1日の増加分ではないので NaN にする
+    on_date = on_date[delta_columns].where(on_date["days"] == 1, np.nan)
+
+    # その日にスナップショットがない動画は、前日と date の両方に取得していれば変化なしなので0にする
+    # (取得していない動画は変化があったかわからないので NaN のまま)
+    previous_day = (datetime.date.fromisoformat(date) - datetime.timedelta(days=1)).isoformat()
+    item_ids = observations["item_id"].astype(str)
+    seen_on_date = item_ids[observations["snapshot_date"] == date]
+    seen_previous_day = item_ids[observations["snapshot_date"] == previous_day]
+    others = deltas.loc[~deltas["item_id"].isin(on_date.index)].drop_duplicates("item_id", keep="last")
+    confirmed = others["item_id"].isin(seen_on_date) & others["item_id"].isin(seen_previous_day)
+    fill = np.where(confirmed.to_numpy(dtype=bool), 0.0, np.nan)
+    zeros = pd.DataFrame(np.repeat(fill[:, None], len(delta_columns), axis=1),
+                         index=pd.Index(others["item_id"], name="item_id"), columns=delta_columns)
+    return on_date if zeros.empty else pd.concat([on_date, zeros])
+
+
+def views_gained_yesterday(snapshot_store, business_id=None, today=None, pending=None, observed=None):
+    """
+    動画ごとの「昨日増えた再生数」(昨日から今日までの1日の増加分) を返す関数。
+    前回その動画を取得したのが昨日でない場合 (実行が抜けた・ページ送りを途中でやめた場合) は、
+    何日分かの増加分かわからないので NaN にする。
+
+    Args:
+        pending (list): まだ保存していない今日のスナップショットにする動画のリスト (gained_on を参照)
+        observed (iterable): まだ保存していない、今日取得した動画の item_id (gained_on を参照)
+
+    Returns:
+        pd.Series: item_id → 増えた再生数
+    """
+    today = today or datetime.date.today().strftime('%Y-%m-%d')
+    return gained_on(snapshot_store, today, business_id, pending, observed)["video_views_delta"].rename("views_gained_yesterday")
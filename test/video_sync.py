@@ -0,0 +1,210 @@
+"""
+動画データの差分同期。
+これまでは実行のたびに期間内の動画を全件取得し、BigQuery に WRITE_APPEND で全件追記していたので、
+実行するたびにテーブルの行数が動画の件数分ずつ増えていた。
+
+ここでは business_id ごとに「同期済みの最新の create_time と最終同期時刻 (ウォーターマーク)」を、
+item_id ごとに「メトリクスのハッシュ」をローカルの SQLite に持っておき、
+新しい動画と数値が変わった動画だけを下流 (BigQuery・シート) に渡す。
+ハッシュの保存 (mark_synced) は下流への書き込みが成功してから行うので、
+書き込みに失敗した場合は次回の実行で同じ動画がもう一度対象になる。
+
+動画一覧は新しい順に返ってくるので、ウォーターマークの create_time から SYNC_LOOKBACK_DAYS 日より前に
+投稿された動画だけのページまで来たら、それより先のページは取得しない (古い動画のメトリクスの変化は追わない)。
+そのため「差分に出てこなかった動画」が全て変化なしとは限らない。iter_changed_videos に observed を渡すと
+その実行で実際に取得した item_id が入るので、下流 (video_snapshots) ではそれ以外の動画を「未取得」として扱う。
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import threading
+
+from local_db import connect
+from log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# ウォーターマークより何日前に投稿された動画まで、メトリクスの変化を確認するか (負の値なら全ページを確認する)
+SYNC_LOOKBACK_DAYS = float(os.getenv("TIKTOK_SYNC_LOOKBACK_DAYS", "28"))
+
+# ハッシュの計算に含めないフィールド (動画を特定するためのキー)
+_IDENTITY_FIELDS = {"item_id"}
+
+
+def content_hash(video):
+    """
+    動画1件のメトリクスのハッシュを返す関数 (キーの順番に依存しないようソートしてからハッシュする)。
+    """
+    payload = {k: v for k, v in video.items() if k not in _IDENTITY_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _create_time(video):
+    try:
+        return int(video.get("create_time") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class VideoSyncStore:
+    """
+    business_id ごとのウォーターマークと、item_id ごとのハッシュを保存するクラス。
+    """
+
+    def __init__(self, db_path=None):
+        self.conn = connect(db_path)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_sync_state (
+                    business_id TEXT PRIMARY KEY,
+                    max_create_time INTEGER NOT NULL,
+                    last_synced_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_item_hashes (
+                    business_id TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    create_time INTEGER,
+                    synced_at TEXT NOT NULL,
+                    PRIMARY KEY (business_id, item_id)
+                )
+            """)
+
+    def watermark(self, business_id):
+        """
+        Returns:
+            dict or None: {"max_create_time": int, "last_synced_at": str}、まだ同期していなければ None
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT max_create_time, last_synced_at FROM video_sync_state WHERE business_id = ?", (business_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"max_create_time": row[0], "last_synced_at": row[1]}
+
+    def item_accounts(self):
+        """同期したことのある (item_id, business_id) の組のリストを返す関数"""
+        with self._lock:
+            return self.conn.execute("SELECT item_id, business_id FROM video_item_hashes").fetchall()
+
+    def diff(self, business_id, videos):
+        """
+        videos のうち、新しい動画と前回の同期からメトリクスが変わった動画だけを返す関数。
+        (ここでは保存しない。下流への書き込みが成功したら mark_synced を呼ぶ)
+
+        Args:
+            business_id (str): TikTok Business ID
+            videos (list): /business/video/list/ の data.videos (1ページ分でもよい)
+
+        Returns:
+            list: (video, content_hash, is_new) のタプルのリスト
+        """
+        candidates = [(video, str(video["item_id"])) for video in videos if video.get("item_id") is not None]
+        if not candidates:
+            return []
+
+        known = {}
+        item_ids = [item_id for _, item_id in candidates]
+        with self._lock:
+            # SQLite の変数の数の上限を超えないように分けて問い合わせる
+            for i in range(0, len(item_ids), 500):
+                chunk = item_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(
+                    f"SELECT item_id, content_hash FROM video_item_hashes WHERE business_id = ? AND item_id IN ({placeholders})",
+                    [business_id, *chunk],
+                )
+                known.update(cursor)
+
+        changes = []
+        for video, item_id in candidates:
+            digest = content_hash(video)
+            if known.get(item_id) != digest:
+                changes.append((video, digest, item_id not in known))
+        return changes
+
+    def mark_synced(self, business_id, changes):
+        """
+        下流への書き込みが成功した動画のハッシュとウォーターマークを保存する関数。
+
+        Args:
+            business_id (str): TikTok Business ID
+            changes (list): diff() が返したタプルのリスト
+        """
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = [(business_id, str(video["item_id"]), digest, _create_time(video), now) for video, digest, _ in changes]
+        max_create_time = max((_create_time(video) for video, _, _ in changes), default=0)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO video_item_hashes (business_id, item_id, content_hash, create_time, synced_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.execute(
+                """
+                INSERT INTO video_sync_state (business_id, max_create_time, last_synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(business_id) DO UPDATE SET
+                    max_create_time = MAX(max_create_time, excluded.max_create_time),
+                    last_synced_at = excluded.last_synced_at
+                """,
+                (business_id, max_create_time, now),
+            )
+
+
+def page_cutoff(watermark, lookback_days=SYNC_LOOKBACK_DAYS):
+    """
+    ページ送りをやめる create_time を返す関数 (ページの動画が全てこれより前に投稿されていたらやめる)。
+
+    Args:
+        watermark (dict): VideoSyncStore.watermark() の戻り値
+        lookback_days (float): ウォーターマークより何日前まで確認するか (負の値なら制限しない)
+
+    Returns:
+        int or None: UNIX 秒 (まだ同期していない・制限しない場合は None)
+    """
+    if not watermark or not watermark["max_create_time"] or lookback_days < 0:
+        return None
+    return watermark["max_create_time"] - int(lookback_days * 24 * 3600)
+
+
+def iter_changed_videos(business_id, pages, store, stop_before=None, observed=None):
+    """
+    ページのイテレータ (video_pager.iter_video_pages など) から、新しい動画と変わった動画だけを取り出すジェネレータ。
+    メモリに持つのはページ1枚分と変更分だけ。
+
+    Args:
+        stop_before (int): ページの動画が全てこの create_time より前なら、それより先のページは取得しない (page_cutoff)
+        observed (set): 指定した場合、取得したページの動画の item_id を (変わっていない動画も) 全て追加する。
+                        stop_before でページ送りをやめた場合、それより先のページの動画は含まれない
+
+    Yields:
+        tuple: (video, content_hash, is_new)
+    """
+    total = new = changed = 0
+    partial = False
+    for page in pages:
+        videos = page.get("videos") or []
+        total += len(videos)
+        if observed is not None:
+            observed.update(str(video["item_id"]) for video in videos if video.get("item_id") is not None)
+        for change in store.diff(business_id, videos):
+            if change[2]:
+                new += 1
+            else:
+                changed += 1
+            yield change
+        if stop_before is not None and videos and all(_create_time(video) < stop_before for video in videos):
+            logger.info("ウォーターマークより前の動画のページまで来たので、ページ送りをやめます (%s)。", business_id)
+            if hasattr(pages, "close"):
+                pages.close()
+            partial = True
+            break
+    logger.info("動画の差分 (%s): 取得した%s件中 新規%s件・変更%s件・変更なし%s件%s",
+                business_id, total, new, changed, total - new - changed,
+                " (それより前の動画は未取得)" if partial else "")